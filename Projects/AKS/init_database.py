@@ -10,6 +10,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src/backend'))
 
 from src.backend.utils.db_utils import db_connection
+from repositories.base import DOCUMENT_COLLECTIONS, document_table_ddl
 
 class DatabaseInitializer:
     """数据库初始化类"""
@@ -124,6 +125,10 @@ class DatabaseInitializer:
             """
         ]
         
+        # 业务模块文档表（服务层仓储使用）
+        for collection, indexed_fields in DOCUMENT_COLLECTIONS.items():
+            create_table_queries.extend(document_table_ddl(collection, indexed_fields))
+        
         try:
             # 连接数据库
             db_connection.connect()
@@ -0,0 +1,116 @@
+# 竞拍引擎并发出价基准测试
+# 多线程向数百场进行中的竞拍并发出价（经 LandBiddingService.create_bid_record，含出价记录写入），
+# 统计吞吐量，并校验每场竞拍的最高价、出价次数与保存的出价记录一致、被接受的出价严格递增
+#
+# 用法: python benchmarks/auction_engine_benchmark.py --auctions 300 --threads 16 --bids 200000
+import sys
+import os
+import argparse
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AKS_REPOSITORY_BACKEND", "memory")
+
+from models.land_bidding import BiddingInfo, CreateBidRequest
+from repositories.base import build_filters
+from services.auction_engine import BidRejectedError
+from services.land_bidding_service import land_bidding_service
+
+
+def create_auctions(count: int) -> list:
+    """创建进行中的竞拍，结束时间足够远，不触发延时"""
+    now = datetime.now()
+    auctions = []
+    for index in range(count):
+        bidding = BiddingInfo(
+            id=str(uuid.uuid4()),
+            land_id=f"bench-land-{index}",
+            title=f"基准测试竞拍{index}",
+            description="基准测试",
+            starting_price=1000.0,
+            increment=10.0,
+            deposit_amount=100.0,
+            start_time=now - timedelta(minutes=1),
+            end_time=now + timedelta(hours=1),
+            status="进行中",
+            create_time=now,
+            update_time=now
+        )
+        land_bidding_service.bidding_info_db[bidding.id] = bidding
+        auctions.append(bidding.id)
+    return auctions
+
+
+def run(auction_count: int, thread_count: int, total_bids: int, bidder_count: int) -> bool:
+    auctions = create_auctions(auction_count)
+    per_thread = total_bids // thread_count
+    accepted = [0] * thread_count
+    rejected = [0] * thread_count
+    start_barrier = threading.Barrier(thread_count + 1)
+
+    def worker(slot: int) -> None:
+        rng = random.Random(slot)
+        start_barrier.wait()
+        for _ in range(per_thread):
+            bidding_id = rng.choice(auctions)
+            state = land_bidding_service.get_bidding_status(bidding_id)
+            # 按读取到的最低价出价，并发时可能已被他人抢先而被拒绝
+            price = state["minimum_price"] + rng.choice((0, 0, 0, 10))
+            user_id = f"bidder-{rng.randrange(bidder_count)}"
+            try:
+                land_bidding_service.create_bid_record(
+                    CreateBidRequest(bidding_id=bidding_id, bid_price=price), user_id
+                )
+                accepted[slot] += 1
+            except BidRejectedError:
+                rejected[slot] += 1
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    attempts = per_thread * thread_count
+    print(f"竞拍 {auction_count} 场, 线程 {thread_count}, 出价 {attempts} 次, 用时 {elapsed:.2f}s")
+    print(f"吞吐量: {attempts / elapsed:,.0f} 次/秒, 接受 {sum(accepted)}, 拒绝 {sum(rejected)}")
+
+    # 一致性校验
+    ok = True
+    for bidding_id in auctions:
+        state = land_bidding_service.get_bidding_status(bidding_id)
+        records = land_bidding_service.bid_records_db.find(build_filters(bidding_id=bidding_id))
+        # 出价时间精度为微秒，同一时刻的出价按金额排列
+        records.sort(key=lambda x: (x.bid_time, x.bid_price))
+        prices = [record.bid_price for record in records]
+        if len(records) != state["bid_count"]:
+            print(f"出价次数不一致: {bidding_id} 记录 {len(records)} 状态 {state['bid_count']}")
+            ok = False
+        if records and max(prices) != state["current_price"]:
+            print(f"最高价不一致: {bidding_id}")
+            ok = False
+        if any(later < earlier + 10.0 - 1e-6 for earlier, later in zip(prices, prices[1:])):
+            print(f"出价未按加价幅度递增: {bidding_id}")
+            ok = False
+    if sum(accepted) != len(land_bidding_service.bid_records_db.find(build_filters(bidding_id__in=auctions))):
+        print("接受的出价数与出价记录数不一致")
+        ok = False
+    print("一致性校验通过" if ok else "一致性校验失败")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="竞拍引擎并发出价基准测试")
+    parser.add_argument("--auctions", type=int, default=300, help="竞拍场数")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    parser.add_argument("--bids", type=int, default=200000, help="出价总次数")
+    parser.add_argument("--bidders", type=int, default=1000, help="竞拍人数")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.auctions, args.threads, args.bids, args.bidders) else 1)
@@ -0,0 +1,125 @@
+# 融资项目级联删除基准测试
+# 逐步扩大项目规模（每个项目带节点、台账、投后任务、权证、资金监管和还款提醒），在每个规模下
+# 删除一批项目（经 FinancingManagementService.delete_mortgage_project），统计单次删除的平均和P95耗时，
+# 耗时应基本不随项目总数增长；并校验被删除项目的子数据全部删除、其他项目的子数据未受影响
+#
+# 用法: python benchmarks/financing_cascade_benchmark.py --sizes 1000,10000,50000 --deletes 200
+import sys
+import os
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AKS_REPOSITORY_BACKEND", "memory")
+
+from models.financing_management import (
+    DigitalCertificate,
+    FinancingProjectLedger,
+    FinancingProjectNode,
+    FundSupervision,
+    MortgageFinancingProject,
+    PostInvestmentRightTask,
+)
+from services.financing_management_service import RepaymentReminder, financing_management_service
+
+service = financing_management_service
+
+
+def create_projects(count: int) -> list:
+    """批量写入待审批项目及其子数据，返回项目ID"""
+    now = datetime.now()
+    projects, nodes, ledgers, tasks, certificates, supervisions, reminders = [], [], [], [], [], [], []
+    for index in range(count):
+        project_id = str(uuid.uuid4())
+        projects.append(MortgageFinancingProject(
+            id=project_id, project_name=f"基准测试项目{index}", project_code=f"BENCH-{project_id[:8]}",
+            borrower_id=f"bench-borrower-{index}", borrower_name="基准测试借款人", loan_amount=100000.0,
+            loan_term=36, interest_rate=4.2, collateral_type="土地使用权", collateral_value=200000.0,
+            allocated_land_id=f"bench-land-{index}", project_status="待审批", apply_time=now,
+            create_time=now, update_time=now
+        ))
+        for step in range(3):
+            nodes.append(FinancingProjectNode(
+                id=str(uuid.uuid4()), project_id=project_id, node_name=f"节点{step}", node_type="审批",
+                expected_time=now + timedelta(days=step), status="待处理"
+            ))
+        for step in range(2):
+            ledgers.append(FinancingProjectLedger(
+                id=str(uuid.uuid4()), project_id=project_id, record_type="其他", amount=100.0,
+                record_time=now, description="基准测试", creator_id="bench"
+            ))
+        tasks.append(PostInvestmentRightTask(
+            id=str(uuid.uuid4()), project_id=project_id, task_name="确权", task_type="土地确权",
+            start_time=now, end_time=now + timedelta(days=30), assignee_id="bench", progress=0, status="待开始"
+        ))
+        certificates.append(DigitalCertificate(
+            id=str(uuid.uuid4()), certificate_code=f"CERT-{project_id[:8]}", certificate_type="其他",
+            owner_id=f"bench-borrower-{index}", owner_name="基准测试借款人", project_id=project_id,
+            issue_date=now, expiry_date=now + timedelta(days=365), digital_file_path="/dev/null", status="有效"
+        ))
+        supervisions.append(FundSupervision(
+            id=str(uuid.uuid4()), project_id=project_id, transaction_type="放款", transaction_amount=100000.0,
+            transaction_time=now, transaction_account="bench", description="基准测试", is_abnormal=False
+        ))
+        reminders.append(RepaymentReminder(
+            id=str(uuid.uuid4()), project_id=project_id, reminder_type="到期提醒", reminder_date=now,
+            due_date=now + timedelta(days=30), reminder_amount=3000.0, status="待发送",
+            created_at=now, updated_at=now
+        ))
+    service.mortgage_projects_db.bulk_put(projects)
+    service.project_nodes_db.bulk_put(nodes)
+    service.ledgers_db.bulk_put(ledgers)
+    service.post_investment_tasks_db.bulk_put(tasks)
+    service.digital_certificates_db.bulk_put(certificates)
+    service.fund_supervisions_db.bulk_put(supervisions)
+    service.repayment_reminders_db.bulk_put(reminders)
+    return [project.id for project in projects]
+
+
+def verify(deleted: list, kept: list) -> bool:
+    ok = True
+    for project_id in deleted:
+        if service.get_project_dependents(project_id) or project_id in service.mortgage_projects_db:
+            print(f"项目 {project_id} 删除后仍有关联数据")
+            ok = False
+    for project_id in kept:
+        if sum(service.get_project_dependents(project_id).values()) != 9:
+            print(f"未删除的项目 {project_id} 的关联数据不完整")
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="融资项目级联删除基准测试")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="逐步达到的项目总数，逗号分隔")
+    parser.add_argument("--deletes", type=int, default=200, help="每个规模下删除的项目数")
+    args = parser.parse_args()
+
+    project_ids = []
+    ok = True
+    for size in (int(value) for value in args.sizes.split(",")):
+        project_ids.extend(create_projects(size - len(project_ids)))
+        random.shuffle(project_ids)
+        deleted, project_ids = project_ids[:args.deletes], project_ids[args.deletes:]
+
+        latencies = []
+        for project_id in deleted:
+            started = time.perf_counter()
+            if not service.delete_mortgage_project(project_id):
+                print(f"项目 {project_id} 删除失败")
+                ok = False
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        average = sum(latencies) / len(latencies)
+        p95 = latencies[int(len(latencies) * 0.95)]
+        print(f"项目总数 {size}: 删除 {len(deleted)} 个项目，平均 {average * 1000:.3f} ms，P95 {p95 * 1000:.3f} ms")
+        ok = verify(deleted, project_ids[:args.deletes]) and ok
+
+    print("校验通过" if ok else "校验失败")
+
+
+if __name__ == "__main__":
+    main()
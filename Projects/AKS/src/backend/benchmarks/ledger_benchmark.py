@@ -0,0 +1,113 @@
+# 记账引擎并发扣款基准测试
+# 多线程对少量热点账户并发支出（经 AccountManagementService.create_expense，含支出记录和分录写入），
+# 统计吞吐量，并校验：没有账户透支、账户余额等于初始余额减去成功支出之和、每个分录借贷平衡
+#
+# 用法: python benchmarks/ledger_benchmark.py --accounts 8 --threads 16 --debits 100000
+import sys
+import os
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AKS_REPOSITORY_BACKEND", "memory")
+
+from models.account_management import CreateAccountInfoRequest, CreateExpenseDetailRequest
+from repositories.base import build_filters
+from services.account_management_service import account_management_service
+from services.ledger_engine import InsufficientBalanceError, to_amount
+
+
+def create_accounts(count: int, balance: float) -> list:
+    accounts = []
+    for index in range(count):
+        account = account_management_service.create_account(CreateAccountInfoRequest(
+            user_id=f"bench-user-{index}-{time.time_ns()}",
+            user_type="承包户",
+            account_balance=balance,
+            account_status=1
+        ))
+        accounts.append(account.id)
+    return accounts
+
+
+def verify(accounts: list, initial_balance: float) -> bool:
+    ok = True
+    for account_id in accounts:
+        account = account_management_service.get_account_by_id(account_id)
+        spent = sum(
+            (to_amount(expense.expense_amount) for expense in
+             account_management_service.expense_details_db.find(build_filters(account_id=account_id))),
+            Decimal("0")
+        )
+        expected = to_amount(initial_balance) - spent
+        if account.account_balance < 0 or to_amount(account.account_balance) != expected:
+            print(f"账户 {account_id} 余额 {account.account_balance}，应为 {expected}")
+            ok = False
+
+        # 每个分录借方与贷方金额相等
+        entry_ids = {record.entry_id for record in
+                     account_management_service.transactions_db.find(build_filters(account_id=account_id))}
+        entries = defaultdict(Decimal)
+        for record in account_management_service.transactions_db.find(build_filters(entry_id__in=list(entry_ids))):
+            sign = 1 if record.entry_side == "credit" else -1
+            entries[record.entry_id] += sign * to_amount(record.amount)
+        unbalanced = [entry_id for entry_id, total in entries.items() if total != 0]
+        if unbalanced:
+            print(f"账户 {account_id} 有 {len(unbalanced)} 个分录借贷不平衡")
+            ok = False
+    return ok
+
+
+def run(account_count: int, thread_count: int, total_debits: int, initial_balance: float) -> bool:
+    accounts = create_accounts(account_count, initial_balance)
+    per_thread = total_debits // thread_count
+    accepted = [0] * thread_count
+    rejected = [0] * thread_count
+    start_barrier = threading.Barrier(thread_count + 1)
+
+    def worker(slot: int) -> None:
+        rng = random.Random(slot)
+        start_barrier.wait()
+        for _ in range(per_thread):
+            request = CreateExpenseDetailRequest(
+                account_id=rng.choice(accounts),
+                expense_amount=rng.choice((0.01, 0.1, 1.0, 3.33, 10.0)),
+                expense_type="其他费用"
+            )
+            try:
+                account_management_service.create_expense(request)
+                accepted[slot] += 1
+            except InsufficientBalanceError:
+                rejected[slot] += 1
+
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = per_thread * thread_count
+    print(f"账户数: {account_count}  线程数: {thread_count}  支出请求: {total}")
+    print(f"成功: {sum(accepted)}  余额不足: {sum(rejected)}")
+    print(f"耗时: {elapsed:.2f}s  吞吐量: {total / elapsed:,.0f} 次/秒")
+
+    ok = verify(accounts, initial_balance)
+    print("一致性校验: " + ("通过" if ok else "失败"))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="记账引擎并发扣款基准测试")
+    parser.add_argument("--accounts", type=int, default=8, help="热点账户数")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    parser.add_argument("--debits", type=int, default=100000, help="支出请求总数")
+    parser.add_argument("--balance", type=float, default=20000.0, help="每个账户的初始余额，较小时部分支出因余额不足被拒绝")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.accounts, args.threads, args.debits, args.balance) else 1)
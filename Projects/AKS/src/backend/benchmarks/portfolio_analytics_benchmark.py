@@ -0,0 +1,129 @@
+# 组合风险看板基准测试
+# 生成若干乡镇、村队、借款人和融资项目，统计完整看板（含按乡镇、村队的敞口）的计算耗时，
+# 并与逐个项目累加的结果对比敞口合计、乡镇敞口、抵押不足项目数和借款人集中度
+#
+# 用法: python benchmarks/portfolio_analytics_benchmark.py --projects 100000 --borrowers 20000 --runs 20
+import sys
+import os
+import argparse
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AKS_REPOSITORY_BACKEND", "memory")
+
+from models.basic_info import FarmerInfo, VillageBaseInfo
+from models.financing_management import MortgageFinancingProject
+from services.basic_info_service import basic_info_service
+from services.financing_management_service import financing_management_service
+from services.portfolio_analytics import EXPOSURE_STATUSES
+
+service = financing_management_service
+STATUSES = ["待审批", "审批中", "已批准", "已放款", "已放款", "已放款", "已逾期", "已还款", "已违约"]
+
+
+def create_borrowers(count: int, villages: int, townships: int) -> list:
+    """批量写入村队和农户，返回农户ID"""
+    now = datetime.now()
+    village_records = [
+        VillageBaseInfo(id=f"bench-village-{index}", name=f"村队{index}", code=f"V{index}",
+                        township_id=f"bench-township-{index % townships}", land_area=1000.0, household_count=100,
+                        contact_person="基准测试", contact_phone="00000000000", address="基准测试", status=1)
+        for index in range(villages)
+    ]
+    farmers = [
+        FarmerInfo(id=f"bench-farmer-{index}", farmer_name=f"农户{index}", id_card_number=f"BENCH{index:012d}",
+                   phone_number="00000000000", address="基准测试", village_id=f"bench-village-{index % villages}",
+                   household_size=4, cultivated_area=50.0, main_crops=["棉花"], status=1, create_time=now)
+        for index in range(count)
+    ]
+    basic_info_service.villages_db.bulk_put(village_records)
+    basic_info_service.farmers_db.bulk_put(farmers)
+    return [farmer.id for farmer in farmers]
+
+
+def create_projects(count: int, borrowers: list) -> None:
+    now = datetime.now()
+    projects = []
+    for index in range(count):
+        loan_amount = round(random.uniform(10000, 1000000), 2)
+        start = now - timedelta(days=random.randint(0, 1500))
+        projects.append(MortgageFinancingProject(
+            id=str(uuid.uuid4()), project_name=f"基准测试项目{index}", project_code=f"BENCH-{index}",
+            borrower_id=random.choice(borrowers), borrower_name="基准测试借款人", loan_amount=loan_amount,
+            loan_term=random.choice([12, 24, 36, 60]), interest_rate=round(random.uniform(3, 8), 2),
+            collateral_type=random.choice(["土地使用权", "其他"]),
+            collateral_value=round(loan_amount * random.uniform(0.6, 3.5), 2),
+            project_status=random.choice(STATUSES), apply_time=start, loan_time=start + timedelta(days=10),
+            create_time=now, update_time=now
+        ))
+    service.mortgage_projects_db.bulk_put(projects)
+
+
+def reference(today: date) -> dict:
+    """逐个项目累加的敞口合计、乡镇敞口、抵押不足项目数、借款人集中度"""
+    loan_amount = 0.0
+    by_township = defaultdict(float)
+    by_borrower = defaultdict(float)
+    under = 0
+    for project in service.mortgage_projects_db.values():
+        if project.project_status not in EXPOSURE_STATUSES:
+            continue
+        loan_amount += project.loan_amount
+        by_township[service._borrower_region(project.borrower_id)[1]] += project.loan_amount
+        by_borrower[project.borrower_id] += project.loan_amount
+        if project.collateral_value < project.loan_amount:
+            under += 1
+    hhi = sum((amount / loan_amount) ** 2 for amount in by_borrower.values())
+    return {"loan_amount": loan_amount, "by_township": by_township, "under": under, "hhi": hhi}
+
+
+def close(a: float, b: float) -> bool:
+    return abs(a - b) <= 1e-6 * max(1.0, abs(a), abs(b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="组合风险看板基准测试")
+    parser.add_argument("--projects", type=int, default=100000, help="融资项目数")
+    parser.add_argument("--borrowers", type=int, default=20000, help="借款人数")
+    parser.add_argument("--villages", type=int, default=200, help="村队数")
+    parser.add_argument("--townships", type=int, default=12, help="乡镇数")
+    parser.add_argument("--runs", type=int, default=20, help="看板计算次数")
+    args = parser.parse_args()
+
+    borrowers = create_borrowers(args.borrowers, args.villages, args.townships)
+    started = time.perf_counter()
+    create_projects(args.projects, borrowers)
+    print(f"写入 {args.projects} 个项目（含列存增量更新）耗时 {time.perf_counter() - started:.2f} s")
+
+    today = date.today()
+    started = time.perf_counter()
+    dashboard = service.get_portfolio_dashboard(as_of=today)
+    print(f"首次计算看板（含解析 {args.borrowers} 个借款人的地区）耗时 {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        dashboard = service.get_portfolio_dashboard(as_of=today)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"看板计算 {args.runs} 次: 中位数 {timings[len(timings) // 2] * 1000:.1f} ms，"
+          f"最大 {timings[-1] * 1000:.1f} ms")
+
+    expected = reference(today)
+    townships = {item["key"]: item["loan_amount"] for item in dashboard["by_township"]}
+    ok = (close(dashboard["loan_amount"], expected["loan_amount"])
+          and dashboard["coverage"]["under_collateralized_count"] == expected["under"]
+          and close(dashboard["concentration"]["hhi"], expected["hhi"])
+          and townships.keys() == expected["by_township"].keys()
+          and all(close(townships[key], value) for key, value in expected["by_township"].items()))
+    print(f"敞口 {dashboard['loan_amount']:.2f}，{dashboard['project_count']} 个项目，"
+          f"抵押不足 {dashboard['coverage']['under_collateralized_count']} 个")
+    print("校验通过" if ok else "校验失败")
+
+
+if __name__ == "__main__":
+    main()
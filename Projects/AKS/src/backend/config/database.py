@@ -1,7 +1,18 @@
 # 数据库配置模块
 import os
 import json
-from typing import Optional
+from typing import Optional, Dict, Any
+
+# 连接池默认参数，可在配置文件各环境的 "pool" 节点中覆盖
+DEFAULT_POOL_CONFIG = {
+    "min_size": 2,                   # 启动时预先建立的连接数
+    "max_size": 20,                  # 连接池允许的最大连接数
+    "checkout_timeout": 10.0,        # 获取连接的最长等待时间（秒）
+    "max_lifetime": 1800.0,          # 连接最长存活时间（秒），超过后回收重建
+    "max_idle_time": 300.0,          # 空闲连接最长保留时间（秒），超出min_size的部分会被回收
+    "health_check_interval": 30.0,   # 空闲超过该时间的连接在借出前执行健康检查（秒）
+    "retry_interval": 30.0           # 连接失败后再次尝试连接的间隔（秒）
+}
 
 class DatabaseConfig:
     """数据库配置类"""
@@ -30,7 +41,9 @@ class DatabaseConfig:
                     "database": "aks_agriculture",
                     "username": "super",
                     "password": "1qazxsw2",
-                    "sslmode": "prefer"
+                    "sslmode": "prefer",
+                    "repository_backend": "memory",
+                    "pool": dict(DEFAULT_POOL_CONFIG)
                 },
                 "test": {
                     "engine": "postgresql",
@@ -39,7 +52,9 @@ class DatabaseConfig:
                     "database": "aks_agriculture_test",
                     "username": "super",
                     "password": "1qazxsw2",
-                    "sslmode": "prefer"
+                    "sslmode": "prefer",
+                    "repository_backend": "memory",
+                    "pool": dict(DEFAULT_POOL_CONFIG)
                 }
             }
     
@@ -55,5 +70,32 @@ class DatabaseConfig:
             f"sslmode={db_config['sslmode']}"
         )
 
+    def get_repository_backend(self, env: str = "default") -> str:
+        """获取业务数据存储后端（memory 或 postgresql），环境变量 AKS_REPOSITORY_BACKEND 优先"""
+        if env not in self.config:
+            env = "default"
+        return os.environ.get(
+            "AKS_REPOSITORY_BACKEND",
+            self.config[env].get("repository_backend", "memory")
+        ).lower()
+    
+    def get_pool_config(self, env: str = "default") -> Dict[str, Any]:
+        """获取连接池配置，环境变量 AKS_DB_POOL_* 优先于配置文件"""
+        if env not in self.config:
+            env = "default"
+        
+        pool_config = dict(DEFAULT_POOL_CONFIG)
+        pool_config.update(self.config[env].get("pool", {}))
+        
+        for key, default_value in DEFAULT_POOL_CONFIG.items():
+            env_value = os.environ.get(f"AKS_DB_POOL_{key.upper()}")
+            if env_value is not None:
+                try:
+                    pool_config[key] = type(default_value)(env_value)
+                except ValueError:
+                    print(f"警告: 环境变量 AKS_DB_POOL_{key.upper()} 的值无效: {env_value}")
+        
+        return pool_config
+
 # 单例实例
 database_config = DatabaseConfig()
\ No newline at end of file
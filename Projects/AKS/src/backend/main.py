@@ -9,6 +9,8 @@ from fastapi.staticfiles import StaticFiles
 from datetime import datetime, timedelta
 import logging
 
+from utils.pagination import InvalidCursorError, NEXT_CURSOR_HEADER
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -40,6 +42,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 列表接口通过响应头返回下一页游标
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # 导入所有路由模块
@@ -69,6 +73,29 @@ from routes.fee_management_routes import router as fee_management_router
 # 融资确权管理模块路由
 from routes.financing_management_routes import router as financing_management_router
 
+# 后台导出任务路由
+from routes.export_job_routes import router as export_job_router
+from services.export_job_service import export_job_service
+
+# 数据导入路由
+from routes.data_import_routes import router as data_import_router
+
+# 统计数据定期校正
+from repositories.aggregates import aggregate_reconciler
+
+# 竞拍开始、结束定时任务
+from services.land_bidding_service import land_bidding_service
+
+# 费用逾期定时任务
+from services.fee_management_service import fee_management_service
+
+# 还款提醒定时发送
+from services.financing_management_service import financing_management_service
+
+# 数据库连接池
+from utils.db_utils import db_connection
+from utils.async_db_utils import async_db_connection
+
 # 注册路由
 app.include_router(system_management_router)
 app.include_router(basic_info_router)
@@ -78,6 +105,8 @@ app.include_router(land_bidding_router)
 app.include_router(contract_management_router)
 app.include_router(fee_management_router)
 app.include_router(financing_management_router)
+app.include_router(export_job_router)
+app.include_router(data_import_router)
 
 # 静态文件服务
 # 创建uploads目录（如果不存在）
@@ -100,6 +129,84 @@ def health_check():
     }
 
 
+# 数据库连接池状态端点
+@app.get("/health/database", status_code=status.HTTP_200_OK)
+def database_health_check():
+    """数据库连接池状态及借出指标"""
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "pool": db_connection.get_pool_stats(),
+        "async_pool": async_db_connection.get_pool_stats()
+    }
+
+
+# 关闭服务时释放数据库连接池
+@app.on_event("shutdown")
+async def shutdown_database_pool():
+    """关闭数据库连接池"""
+    db_connection.disconnect()
+    await async_db_connection.disconnect()
+
+
+# 关闭服务时等待导出任务结束
+@app.on_event("shutdown")
+def shutdown_export_jobs():
+    """停止导出任务线程池"""
+    export_job_service.shutdown()
+
+
+# 启动统计数据定期校正（PostgreSQL 存储默认启用，AKS_STATS_RECONCILE_SECONDS 可设置间隔，0表示不启用）
+@app.on_event("startup")
+def start_aggregate_reconciler():
+    """启动增量统计校正线程"""
+    aggregate_reconciler.start()
+
+
+@app.on_event("shutdown")
+def stop_aggregate_reconciler():
+    """停止增量统计校正线程"""
+    aggregate_reconciler.stop()
+
+
+# 启动竞拍定时任务，按竞拍的开始、结束时间自动开拍、结束并结算
+@app.on_event("startup")
+def start_auction_scheduler():
+    """启动竞拍定时任务线程"""
+    land_bidding_service.start_scheduler()
+
+
+@app.on_event("shutdown")
+def stop_auction_scheduler():
+    """停止竞拍定时任务线程"""
+    land_bidding_service.scheduler.stop()
+
+
+# 启动费用逾期定时任务，每日标记逾期费用、计提滞纳金并生成逾期通知
+@app.on_event("startup")
+def start_fee_overdue_scheduler():
+    """启动费用逾期定时任务线程"""
+    fee_management_service.scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_fee_overdue_scheduler():
+    """停止费用逾期定时任务线程"""
+    fee_management_service.scheduler.stop()
+
+
+# 启动还款提醒调度，按提醒日期唤醒并分批发送到期的还款提醒
+@app.on_event("startup")
+def start_repayment_reminder_scheduler():
+    """启动还款提醒调度线程"""
+    financing_management_service.reminder_scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_repayment_reminder_scheduler():
+    """停止还款提醒调度线程"""
+    financing_management_service.reminder_scheduler.stop()
+
+
 # 根路径端点
 @app.get("/")
 def root():
@@ -142,13 +249,24 @@ def global_exception_handler(request, exc):
     )
 
 
+@app.exception_handler(InvalidCursorError)
+def invalid_cursor_handler(request, exc):
+    """分页游标异常处理器"""
+    logger.warning(f"分页游标无效: {str(exc)}")
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)}
+    )
+
+
 @app.exception_handler(HTTPException)
 def http_exception_handler(request, exc):
     """HTTP异常处理器"""
     logger.error(f"HTTP异常: {exc.status_code} - {exc.detail}")
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 
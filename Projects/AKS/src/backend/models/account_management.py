@@ -13,6 +13,10 @@ class AccountInfo(BaseModel):
     frozen_balance: float = Field(..., description="冻结余额")
     currency: str = Field(default="元", description="货币单位")
     account_status: int = Field(..., description="账户状态", enum=[0, 1, 2])  # 0: 禁用, 1: 正常, 2: 冻结
+    version: int = Field(0, description="版本号，每次修改加一，用于乐观并发控制")
+    entry_sequence: int = Field(0, description="最后一个记账分录的序号")
+    total_credit: float = Field(0, description="经记账引擎累计转入可用余额的金额")
+    total_debit: float = Field(0, description="经记账引擎累计从可用余额转出的金额")
     create_time: Optional[datetime] = Field(None, description="创建时间")
     update_time: Optional[datetime] = Field(None, description="更新时间")
 
@@ -45,8 +49,10 @@ class RechargeDetail(BaseModel):
 
 # 充值请求
 class CreateRechargeDetailRequest(BaseModel):
+    account_id: str = Field(..., description="账户ID")
     amount: float = Field(..., description="充值金额")
     payment_method: str = Field(..., description="支付方式", enum=["在线支付", "线下支付", "其他"])
+    transaction_id: Optional[str] = Field(None, description="交易流水号")
     remark: Optional[str] = Field(None, description="备注")
 
 # 更新充值请求
@@ -96,8 +102,6 @@ class AccountQueryRequest(BaseModel):
     account_type: Optional[str] = Field(None, description="账户类型")
     status: Optional[str] = Field(None, description="状态")
     holder_id: Optional[str] = Field(None, description="持有者ID")
-    page: int = Field(1, description="页码", ge=1)
-    page_size: int = Field(10, description="每页数量", ge=1, le=100)
 
 # 账户交易记录模型
 class AccountTransaction(BaseModel):
@@ -105,12 +109,20 @@ class AccountTransaction(BaseModel):
     account_id: str = Field(..., description="账户ID")
     transaction_type: str = Field(..., description="交易类型", enum=["充值", "支出"])
     amount: float = Field(..., description="交易金额")
-    balance_before: float = Field(..., description="交易前余额")
-    balance_after: float = Field(..., description="交易后余额")
+    balance_before: Optional[float] = Field(None, description="交易前余额")
+    balance_after: Optional[float] = Field(None, description="交易后余额")
     transaction_time: datetime = Field(..., description="交易时间")
     business_type: str = Field(..., description="业务类型")
     business_id: Optional[str] = Field(None, description="业务ID")
     remark: Optional[str] = Field(None, description="备注")
+    entry_id: Optional[str] = Field(None, description="记账分录ID，同一分录的借方与贷方金额相等")
+    entry_side: Optional[str] = Field(None, description="借贷方向", enum=["debit", "credit"])  # debit: 转出, credit: 转入
+    balance_type: Optional[str] = Field(None, description="余额类型", enum=["available", "frozen"])
+    sequence: Optional[int] = Field(None, description="账户内记账序号，同一分录的记录序号相同")
+    running_balance: Optional[float] = Field(None, description="本分录后的账户可用余额")
+    running_frozen_balance: Optional[float] = Field(None, description="本分录后的账户冻结余额")
+    total_credit: Optional[float] = Field(None, description="截至本分录（含）可用余额的累计转入金额")
+    total_debit: Optional[float] = Field(None, description="截至本分录（含）可用余额的累计转出金额")
 
 # 创建交易记录请求
 class CreateAccountTransactionRequest(BaseModel):
@@ -130,6 +130,4 @@ class UpdateFarmerInfoRequest(BaseModel):
 class FarmerQueryRequest(BaseModel):
     farmer_name: Optional[str] = Field(None, description="种植户姓名")
     village_id: Optional[str] = Field(None, description="所属村队ID")
-    status: Optional[int] = Field(None, description="状态", enum=[0, 1])
-    page: int = Field(1, description="页码")
-    page_size: int = Field(10, description="每页大小")
\ No newline at end of file
+    status: Optional[int] = Field(None, description="状态", enum=[0, 1])
\ No newline at end of file
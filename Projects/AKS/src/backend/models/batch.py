@@ -0,0 +1,18 @@
+# 批量导入结果模型定义
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+# 批量导入行错误
+class BatchRowError(BaseModel):
+    index: int = Field(..., description="请求列表中的行序号（从0开始）")
+    field: Optional[str] = Field(None, description="出错字段")
+    message: str = Field(..., description="错误信息")
+
+# 批量导入结果
+class BatchCreateResult(BaseModel):
+    created_count: int = Field(0, description="成功创建数量")
+    created_ids: List[str] = Field(default_factory=list, description="成功创建的记录ID")
+    failed_count: int = Field(0, description="失败行数")
+    duplicate_count: int = Field(0, description="按流水号判定为已处理过而跳过的行数")
+    errors: List[BatchRowError] = Field(default_factory=list, description="逐行错误报告")
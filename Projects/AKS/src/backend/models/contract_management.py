@@ -76,6 +76,10 @@ class ContractFee(BaseModel):
     due_date: datetime = Field(..., description="到期日期")
     status: FeeStatusEnum = Field(..., description="费用状态")
     payment_time: Optional[datetime] = Field(None, description="支付时间")
+    plan_period: Optional[str] = Field(None, description="费用计划期间（如 2024-03、2024Q1、2024），手工录入的费用为空")
+    period_start: Optional[datetime] = Field(None, description="计费期间开始日期")
+    period_end: Optional[datetime] = Field(None, description="计费期间结束日期")
+    fee_year: Optional[int] = Field(None, description="费用年度")
     create_time: Optional[datetime] = Field(None, description="创建时间")
     update_time: Optional[datetime] = Field(None, description="更新时间")
 
@@ -101,8 +105,6 @@ class ContractQueryRequest(BaseModel):
     start_date: Optional[datetime] = Field(None, description="开始日期")
     end_date: Optional[datetime] = Field(None, description="结束日期")
     status: Optional[str] = Field(None, description="合同状态")
-    page: int = Field(..., description="页码", ge=1)
-    page_size: int = Field(..., description="每页数量", ge=1, le=100)
 
 # 合同附件模型
 class ContractAttachment(BaseModel):
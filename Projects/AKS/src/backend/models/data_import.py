@@ -0,0 +1,23 @@
+# 数据导入模型定义
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+# 导入行错误
+class ImportRowError(BaseModel):
+    row: int = Field(..., description="文件中的行号（表头为第1行）")
+    field: Optional[str] = Field(None, description="出错字段")
+    message: str = Field(..., description="错误信息")
+
+# 导入结果
+class ImportResult(BaseModel):
+    import_id: str = Field(..., description="导入批次ID")
+    import_type: str = Field(..., description="导入类型")
+    dry_run: bool = Field(..., description="是否仅校验不写入")
+    total_rows: int = Field(0, description="数据行数（不含表头和空行）")
+    valid_rows: int = Field(0, description="通过校验的行数")
+    created_count: int = Field(0, description="成功写入数量")
+    failed_count: int = Field(0, description="校验失败行数")
+    duplicate_count: int = Field(0, description="已导入过而跳过的行数")
+    errors: List[ImportRowError] = Field(default_factory=list, description="错误示例（最多返回前100条）")
+    error_sheet_url: Optional[str] = Field(None, description="错误明细表下载地址，无错误时为空")
@@ -0,0 +1,43 @@
+# 后台导出任务模型定义
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from utils.export_utils import ExportFormat
+
+
+# 导出任务状态枚举
+class ExportJobStatusEnum(str, Enum):
+    PENDING = "排队中"
+    RUNNING = "进行中"
+    COMPLETED = "已完成"
+    FAILED = "失败"
+    EXPIRED = "已过期"
+
+# 导出任务模型
+class ExportJob(BaseModel):
+    id: str = Field(..., description="任务ID")
+    export_type: str = Field(..., description="导出类型")
+    file_format: ExportFormat = Field(..., description="导出格式")
+    time_from: Optional[datetime] = Field(None, description="时间范围起始")
+    time_to: Optional[datetime] = Field(None, description="时间范围结束")
+    fingerprint: str = Field(..., description="请求指纹，相同请求复用同一任务")
+    status: ExportJobStatusEnum = Field(..., description="任务状态")
+    total_rows: Optional[int] = Field(None, description="预计导出行数")
+    processed_rows: int = Field(0, description="已导出行数")
+    progress: float = Field(0.0, description="进度百分比")
+    file_name: Optional[str] = Field(None, description="导出文件名")
+    file_size: Optional[int] = Field(None, description="文件大小（字节）")
+    error: Optional[str] = Field(None, description="失败原因")
+    create_time: datetime = Field(..., description="创建时间")
+    start_time: Optional[datetime] = Field(None, description="开始时间")
+    finish_time: Optional[datetime] = Field(None, description="完成时间")
+    update_time: Optional[datetime] = Field(None, description="更新时间，执行中的任务随进度更新")
+
+# 导出任务创建请求
+class CreateExportJobRequest(BaseModel):
+    export_type: str = Field(..., description="导出类型，如 accounts、fees、contracts、projects")
+    file_format: ExportFormat = Field(ExportFormat.CSV, description="导出格式")
+    time_from: Optional[datetime] = Field(None, description="时间范围起始")
+    time_to: Optional[datetime] = Field(None, description="时间范围结束")
@@ -39,6 +39,9 @@ class FeeInfo(BaseModel):
     amount: float = Field(..., description="费用金额")
     original_amount: float = Field(..., description="原始金额")
     reduction_amount: float = Field(..., description="核减金额")
+    paid_amount: float = Field(0, description="已支付金额（成功的支付记录合计）")
+    penalty_amount: float = Field(0, description="滞纳金")
+    penalty_accrued_to: Optional[datetime] = Field(None, description="滞纳金已计至日期")
     due_date: datetime = Field(..., description="到期日期")
     status: FeeStatusEnum = Field(..., description="费用状态")
     payment_time: Optional[datetime] = Field(None, description="支付时间")
@@ -100,8 +103,6 @@ class FeeQueryRequest(BaseModel):
     status: Optional[FeeStatusEnum] = Field(None, description="费用状态")
     start_date: Optional[datetime] = Field(None, description="开始日期")
     end_date: Optional[datetime] = Field(None, description="结束日期")
-    page: int = Field(..., description="页码", ge=1)
-    page_size: int = Field(..., description="每页数量", ge=1, le=100)
 
 # 费用明细查询请求
 class FeeDetailQueryRequest(BaseModel):
@@ -129,6 +130,7 @@ class PaymentRecord(BaseModel):
     transaction_id: Optional[str] = Field(None, description="交易流水号")
     payment_time: datetime = Field(..., description="支付时间")
     status: PaymentStatusEnum = Field(..., description="支付状态")
+    update_time: Optional[datetime] = Field(None, description="更新时间")
 
 # 支付记录创建请求
 class CreatePaymentRecordRequest(BaseModel):
@@ -136,6 +138,8 @@ class CreatePaymentRecordRequest(BaseModel):
     amount: float = Field(..., description="支付金额")
     payment_method: str = Field(..., description="支付方式")
     transaction_id: Optional[str] = Field(None, description="交易流水号")
+    payment_time: Optional[datetime] = Field(None, description="支付时间")
+    status: Optional[PaymentStatusEnum] = Field(None, description="支付状态")
 
 # 支付记录更新请求
 class UpdatePaymentRecordRequest(BaseModel):
@@ -153,6 +157,9 @@ class FeeOverdueNotice(BaseModel):
     content: str = Field(..., description="通知内容")
     send_time: Optional[datetime] = Field(None, description="发送时间")
     status: str = Field(..., description="通知状态", enum=["已发送", "发送失败", "待发送"])
+    township_id: Optional[str] = Field(None, description="所属乡镇ID（由土地所属村队确定）")
+    batch_id: Optional[str] = Field(None, description="通知批次号，同一次逾期处理中同一乡镇的通知为一批")
+    create_time: Optional[datetime] = Field(None, description="创建时间")
 
 # 支付记录查询请求
 class PaymentRecordQueryRequest(BaseModel):
@@ -165,6 +172,4 @@ class PaymentRecordQueryRequest(BaseModel):
     amount_from: Optional[float] = Field(None, description="金额下限")
     amount_to: Optional[float] = Field(None, description="金额上限")
     sort_by: Optional[str] = Field(None, description="排序字段")
-    sort_descending: bool = Field(False, description="是否降序排序")
-    page: Optional[int] = Field(None, description="页码")
-    page_size: Optional[int] = Field(None, description="每页数量")
\ No newline at end of file
+    sort_descending: bool = Field(False, description="是否降序排序")
\ No newline at end of file
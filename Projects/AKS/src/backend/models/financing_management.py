@@ -13,6 +13,7 @@ class ProjectStatusEnum(str):
     PENDING_APPROVAL = "待审批"
     UNDER_REVIEW = "审批中"
     APPROVED = "已批准"
+    REJECTED = "已驳回"
     DISBURSED = "已放款"
     REPAID = "已还款"
     OVERDUE = "已逾期"
@@ -158,14 +159,35 @@ class MortgageFinancingProject(BaseModel):
     interest_rate: float = Field(..., description="贷款利率")
     collateral_type: str = Field(..., description="抵押物类型", enum=["土地使用权", "其他"])
     collateral_value: float = Field(..., description="抵押物价值")
-    project_status: str = Field(..., description="项目状态", enum=["待审批", "审批中", "已批准", "已放款", "已还款", "已逾期", "已违约"])
+    allocated_land_id: Optional[str] = Field(None, description="抵押的确权地块ID")
+    repayment_method: str = Field("等额本息", description="还款方式", enum=["等额本息", "等额本金"])
+    project_status: str = Field(..., description="项目状态", enum=["待审批", "审批中", "已批准", "已驳回", "已放款", "已还款", "已逾期", "已违约"])
     apply_time: datetime = Field(..., description="申请时间")
     approval_time: Optional[datetime] = Field(None, description="批准时间")
     loan_time: Optional[datetime] = Field(None, description="放款时间")
     repayment_time: Optional[datetime] = Field(None, description="还款时间")
+    status_time: Optional[datetime] = Field(None, description="进入当前状态的时间")
+    workflow_version: int = Field(0, description="流程版本号，等于最后一条流程事件的序号")
     create_time: Optional[datetime] = Field(None, description="创建时间")
     update_time: Optional[datetime] = Field(None, description="更新时间")
 
+# 融资项目流程事件（只追加，记录每次状态变化）
+class FinancingProjectEvent(BaseModel):
+    id: str = Field(..., description="事件ID")
+    project_id: str = Field(..., description="项目ID")
+    sequence: int = Field(..., description="项目内的事件序号，从1开始")
+    action: str = Field(..., description="流程动作")
+    from_status: Optional[str] = Field(None, description="变化前状态，项目创建时为空")
+    to_status: str = Field(..., description="变化后状态")
+    operator_id: Optional[str] = Field(None, description="操作人ID")
+    remark: Optional[str] = Field(None, description="备注")
+    event_time: datetime = Field(..., description="事件时间")
+
+# 融资项目流程动作请求
+class FinancingProjectTransitionRequest(BaseModel):
+    operator_id: Optional[str] = Field(None, description="操作人ID")
+    remark: Optional[str] = Field(None, description="备注")
+
 # 抵押融资项目创建请求
 class CreateMortgageFinancingProjectRequest(BaseModel):
     project_name: str = Field(..., description="项目名称")
@@ -177,6 +199,8 @@ class CreateMortgageFinancingProjectRequest(BaseModel):
     interest_rate: float = Field(..., description="贷款利率")
     collateral_type: str = Field(..., description="抵押物类型", enum=["土地使用权", "其他"])
     collateral_value: float = Field(..., description="抵押物价值")
+    allocated_land_id: Optional[str] = Field(None, description="抵押的确权地块ID")
+    repayment_method: str = Field("等额本息", description="还款方式", enum=["等额本息", "等额本金"])
 
 # 抵押融资项目更新请求
 class UpdateMortgageFinancingProjectRequest(BaseModel):
@@ -189,7 +213,8 @@ class UpdateMortgageFinancingProjectRequest(BaseModel):
     interest_rate: Optional[float] = Field(None, description="贷款利率")
     collateral_type: Optional[str] = Field(None, description="抵押物类型", enum=["土地使用权", "其他"])
     collateral_value: Optional[float] = Field(None, description="抵押物价值")
-    project_status: Optional[str] = Field(None, description="项目状态", enum=["待审批", "审批中", "已批准", "已放款", "已还款", "已逾期", "已违约"])
+    repayment_method: Optional[str] = Field(None, description="还款方式", enum=["等额本息", "等额本金"])
+    project_status: Optional[str] = Field(None, description="项目状态", enum=["待审批", "审批中", "已批准", "已驳回", "已放款", "已还款", "已逾期", "已违约"])
     approval_time: Optional[datetime] = Field(None, description="批准时间")
     loan_time: Optional[datetime] = Field(None, description="放款时间")
     repayment_time: Optional[datetime] = Field(None, description="还款时间")
@@ -295,6 +320,7 @@ class DigitalCertificate(BaseModel):
     certificate_type: str = Field(..., description="权证类型", enum=["土地使用权证", "房产证", "其他"])
     owner_id: str = Field(..., description="所有权人ID")
     owner_name: str = Field(..., description="所有权人名称")
+    project_id: Optional[str] = Field(None, description="关联的融资项目ID（抵押登记等项目权证）")
     issue_date: datetime = Field(..., description="发证日期")
     expiry_date: datetime = Field(..., description="到期日期")
     digital_file_path: str = Field(..., description="数字化文件路径")
@@ -308,6 +334,7 @@ class CreateDigitalCertificateRequest(BaseModel):
     certificate_type: str = Field(..., description="权证类型", enum=["土地使用权证", "房产证", "其他"])
     owner_id: str = Field(..., description="所有权人ID")
     owner_name: str = Field(..., description="所有权人名称")
+    project_id: Optional[str] = Field(None, description="关联的融资项目ID")
     issue_date: datetime = Field(..., description="发证日期")
     expiry_date: datetime = Field(..., description="到期日期")
     digital_file_path: str = Field(..., description="数字化文件路径")
@@ -393,6 +420,4 @@ class FinancingProjectQueryRequest(BaseModel):
     borrower_id: Optional[str] = Field(None, description="借款人ID")
     project_status: Optional[str] = Field(None, description="项目状态")
     start_date: Optional[datetime] = Field(None, description="开始日期")
-    end_date: Optional[datetime] = Field(None, description="结束日期")
-    page: int = Field(1, description="页码")
-    page_size: int = Field(10, description="每页大小")
\ No newline at end of file
+    end_date: Optional[datetime] = Field(None, description="结束日期")
\ No newline at end of file
@@ -107,6 +107,4 @@ class LandQueryRequest(BaseModel):
     land_name: Optional[str] = Field(None, description="土地名称")
     land_type: Optional[str] = Field(None, description="地类")
     village_id: Optional[str] = Field(None, description="所属村队ID")
-    current_status: Optional[str] = Field(None, description="当前状态")
-    page: int = Field(1, description="页码")
-    page_size: int = Field(10, description="每页大小")
\ No newline at end of file
+    current_status: Optional[str] = Field(None, description="当前状态")
\ No newline at end of file
@@ -140,4 +140,14 @@ class BiddingReviewRequest(BaseModel):
 class CreateBiddingReviewRequest(BaseModel):
     registration_id: str = Field(..., description="注册ID")
     status: str = Field(..., description="审核状态", enum=["已通过", "已拒绝"])
-    remark: Optional[str] = Field(None, description="审核备注")
\ No newline at end of file
+    remark: Optional[str] = Field(None, description="审核备注")
+
+# 竞拍信息查询请求
+class BiddingQueryRequest(BaseModel):
+    land_id: Optional[str] = Field(None, description="土地ID")
+    title: Optional[str] = Field(None, description="竞拍标题")
+    status: Optional[str] = Field(None, description="竞拍状态")
+    start_time_from: Optional[datetime] = Field(None, description="开始时间范围起始")
+    start_time_to: Optional[datetime] = Field(None, description="开始时间范围结束")
+    end_time_from: Optional[datetime] = Field(None, description="结束时间范围起始")
+    end_time_to: Optional[datetime] = Field(None, description="结束时间范围结束")
\ No newline at end of file
@@ -0,0 +1,333 @@
+# 增量统计
+# 统计注册到仓储时不读取数据。内存存储下分组计数、求和与有序索引在首次读取时初始化，之后仓储在每次写入
+# （赋值、批量写入、删除）时更新，统计接口直接读取结果，不再逐次全量扫描；
+# PostgreSQL 存储下分组计数、求和与有序索引每次读取时在数据库中按字段索引查询，多个工作进程读到同一结果。
+# 只能在进程内维护的统计（如融资项目列存）首次读取时加载，定期校正以全量数据重算已加载的统计，
+# 修正其他工作进程写入造成的偏差，最多滞后一个校正间隔
+import sys
+import os
+import bisect
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import FieldFilter, aggregated_repositories, build_filters, group_key, to_document_value
+from repositories.factory import use_memory_backend
+
+# 定期校正间隔（秒），0表示不启用；未设置时内存存储不启用，PostgreSQL 存储使用 STATS_RECONCILE_DEFAULT_SECONDS
+STATS_RECONCILE_SECONDS = os.getenv("AKS_STATS_RECONCILE_SECONDS")
+STATS_RECONCILE_DEFAULT_SECONDS = 60.0
+
+
+def reconcile_interval() -> float:
+    """当前存储后端的定期校正间隔（秒）"""
+    if STATS_RECONCILE_SECONDS is not None:
+        return float(STATS_RECONCILE_SECONDS)
+    return 0.0 if use_memory_backend() else STATS_RECONCILE_DEFAULT_SECONDS
+
+
+class RepositoryView:
+    """注册到仓储、在进程内维护的统计的公共部分
+
+    注册时不读取数据，首次读取时才以仓储现有数据初始化（built 为True），导入和启动时不访问存储，
+    初始化失败只影响当次读取；初始化之前的写入不处理，初始化之后随仓储写入增量更新
+    """
+
+    def __init__(self):
+        self.repository = None
+        self.built = False
+        self._build_lock = threading.Lock()
+
+    def attach(self, repository: Any) -> None:
+        self.repository = repository
+
+    def ensure_built(self) -> None:
+        """未初始化时以仓储现有数据初始化；未注册到仓储（由调用方直接更新）时无需初始化"""
+        if self.built or self.repository is None:
+            return
+        with self._build_lock:
+            if not self.built:
+                self.repository.build_aggregate(self)
+
+
+class Aggregate(RepositoryView):
+    """按分组维护记录数和字段求和
+
+    group_by 为分组字段名或字段名序列（字段名__date 表示按日期分组），为空时不分组（全部记录计入同一组）；
+    sum_fields 为求和字段，where 为参与统计的过滤条件（build_filters 构造）。
+    仓储能下推统计（PostgreSQL）时每次读取在数据库中分组求和，多个工作进程结果一致，进程内不保存数据；
+    否则在进程内增量维护，每条记录计入的分组和数值单独保存，记录原地修改后写回时据此扣除旧值，与仓储索引的做法一致。
+    """
+
+    def __init__(self, group_by: Union[str, Sequence[str], None] = None,
+                 sum_fields: Sequence[str] = (), where: Optional[List[FieldFilter]] = None):
+        super().__init__()
+        if isinstance(group_by, str):
+            group_by = (group_by,)
+        self.group_by = tuple(group_by or ())
+        self.sum_fields = tuple(sum_fields)
+        self.where = list(where or [])
+        self._lock = threading.Lock()
+        # 记录ID -> (分组键, 求和字段值)
+        self._contributions: Dict[str, Tuple[Any, Tuple[float, ...]]] = {}
+        # 分组键 -> [记录数, 各字段合计]
+        self._groups: Dict[Any, List[float]] = {}
+
+    @property
+    def pushed_down(self) -> bool:
+        """是否由仓储在存储中统计"""
+        return self.repository is not None and self.repository.pushdown_aggregates
+
+    def _contribution(self, record: Optional[BaseModel]) -> Optional[Tuple[Any, Tuple[float, ...]]]:
+        if record is None or not all(field_filter.matches(record) for field_filter in self.where):
+            return None
+        key = group_key(record, self.group_by)
+        return key, tuple(getattr(record, field, None) or 0 for field in self.sum_fields)
+
+    @staticmethod
+    def _apply(groups: Dict[Any, List[float]], contribution: Tuple[Any, Tuple[float, ...]], sign: int) -> None:
+        key, amounts = contribution
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [0] * (len(amounts) + 1)
+        group[0] += sign
+        for position, amount in enumerate(amounts, start=1):
+            group[position] += sign * amount
+        if group[0] == 0:
+            # 分组已无记录，丢弃浮点累加的残差
+            del groups[key]
+
+    def update(self, record_id: str, record: Optional[BaseModel]) -> None:
+        """记录写入或删除（record 为 None）时更新统计"""
+        contribution = self._contribution(record)
+        with self._lock:
+            previous = self._contributions.pop(record_id, None)
+            if previous is not None:
+                self._apply(self._groups, previous, -1)
+            if contribution is not None:
+                self._contributions[record_id] = contribution
+                self._apply(self._groups, contribution, 1)
+
+    def rebuild(self, records: Iterable[BaseModel]) -> bool:
+        """以全量记录重算统计，返回重算前的结果是否有偏差"""
+        contributions: Dict[str, Tuple[Any, Tuple[float, ...]]] = {}
+        groups: Dict[Any, List[float]] = {}
+        for record in records:
+            contribution = self._contribution(record)
+            if contribution is not None:
+                contributions[record.id] = contribution
+                self._apply(groups, contribution, 1)
+        with self._lock:
+            drifted = not self._same_groups(self._groups, groups)
+            self._contributions = contributions
+            self._groups = groups
+        return drifted
+
+    def ensure_built(self) -> None:
+        if not self.pushed_down:
+            super().ensure_built()
+
+    @staticmethod
+    def _same_groups(left: Dict[Any, List[float]], right: Dict[Any, List[float]]) -> bool:
+        if left.keys() != right.keys():
+            return False
+        return all(
+            all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) for a, b in zip(left[key], right[key]))
+            for key in left
+        )
+
+    def _summary(self, group: Optional[List[float]]) -> Dict[str, float]:
+        group = group or [0] * (len(self.sum_fields) + 1)
+        summary = {"count": group[0]}
+        summary.update(zip(self.sum_fields, group[1:]))
+        return summary
+
+    def _normalize_key(self, key: Any) -> Any:
+        if isinstance(key, tuple):
+            return tuple(to_document_value(item) for item in key)
+        return to_document_value(key)
+
+    def group(self, key: Any = None) -> Dict[str, float]:
+        """获取单个分组的统计 {"count": 记录数, 字段名: 合计}"""
+        key = self._normalize_key(key)
+        if self.pushed_down:
+            values = key if len(self.group_by) > 1 else (key,)
+            if len(values) == len(self.group_by) and all(
+                    value is not None and "__" not in spec for spec, value in zip(self.group_by, values)):
+                # 分组字段的等值条件走字段索引，只统计该分组的记录
+                filters = self.where + [FieldFilter(spec, "eq", value) for spec, value in zip(self.group_by, values)]
+                return self._summary(self.repository.summarize(self.group_by, self.sum_fields, filters).get(key))
+            return self._summary(self.repository.summarize(self.group_by, self.sum_fields, self.where).get(key))
+        self.ensure_built()
+        with self._lock:
+            return self._summary(self._groups.get(key))
+
+    def groups(self) -> Dict[Any, Dict[str, float]]:
+        """获取全部分组的统计"""
+        if self.pushed_down:
+            groups = self.repository.summarize(self.group_by, self.sum_fields, self.where)
+            return {key: self._summary(group) for key, group in groups.items()}
+        self.ensure_built()
+        with self._lock:
+            return {key: self._summary(group) for key, group in self._groups.items()}
+
+    def total(self) -> Dict[str, float]:
+        """所有分组合计，进程内维护时耗时与分组数相关，与记录数无关"""
+        if self.pushed_down:
+            return self._summary(self.repository.summarize((), self.sum_fields, self.where).get(None))
+        self.ensure_built()
+        with self._lock:
+            totals = [0] * (len(self.sum_fields) + 1)
+            for group in self._groups.values():
+                for position, value in enumerate(group):
+                    totals[position] += value
+            return self._summary(totals)
+
+
+class OrderedIndex(RepositoryView):
+    """按排序键维护满足条件的记录ID，与 Aggregate 一样随仓储写入更新、可全量重算
+
+    记录按 (排序键, 记录ID) 有序保存，范围查询用二分查找定位，耗时与范围内的记录数相关，
+    与仓储的记录总数无关；适合“未结清费用按到期日期”这类只占全量一小部分的有序集合。
+    sort_key 为字段名时注册到能下推统计的仓储（PostgreSQL）后，范围查询按字段索引在数据库中执行；
+    为函数时只能在进程内维护
+    """
+
+    def __init__(self, sort_key: Union[str, Callable[[BaseModel], Any]],
+                 where: Optional[List[FieldFilter]] = None):
+        super().__init__()
+        if isinstance(sort_key, str):
+            field = sort_key
+            self.sort_field: Optional[str] = field
+            self._sort_key = lambda record: getattr(record, field, None)
+        else:
+            self.sort_field = None
+            self._sort_key = sort_key
+        self.where = list(where or [])
+        self._lock = threading.Lock()
+        # (排序键, 记录ID) 有序列表及对应的排序键列表（二分查找用），记录ID -> 排序键
+        self._entries: List[Tuple[Any, str]] = []
+        self._sorted_keys: List[Any] = []
+        self._keys: Dict[str, Any] = {}
+
+    @property
+    def pushed_down(self) -> bool:
+        """是否由仓储在存储中查询"""
+        return self.sort_field is not None and self.repository is not None and self.repository.pushdown_aggregates
+
+    def _key(self, record: Optional[BaseModel]) -> Any:
+        if record is None or not all(field_filter.matches(record) for field_filter in self.where):
+            return None
+        return self._sort_key(record)
+
+    def update(self, record_id: str, record: Optional[BaseModel]) -> None:
+        """记录写入或删除（record 为 None）时更新索引，排序键为空的记录不计入"""
+        key = self._key(record)
+        with self._lock:
+            previous = self._keys.pop(record_id, None)
+            if previous is not None:
+                position = bisect.bisect_left(self._entries, (previous, record_id))
+                if position < len(self._entries) and self._entries[position] == (previous, record_id):
+                    del self._entries[position]
+                    del self._sorted_keys[position]
+            if key is not None:
+                self._keys[record_id] = key
+                position = bisect.bisect_left(self._entries, (key, record_id))
+                self._entries.insert(position, (key, record_id))
+                self._sorted_keys.insert(position, key)
+
+    def rebuild(self, records: Iterable[BaseModel]) -> bool:
+        """以全量记录重建索引，返回重建前的内容是否有偏差"""
+        keys = {}
+        for record in records:
+            key = self._key(record)
+            if key is not None:
+                keys[record.id] = key
+        entries = sorted((key, record_id) for record_id, key in keys.items())
+        with self._lock:
+            drifted = entries != self._entries
+            self._entries = entries
+            self._sorted_keys = [key for key, _ in entries]
+            self._keys = keys
+        return drifted
+
+    def ensure_built(self) -> None:
+        if not self.pushed_down:
+            super().ensure_built()
+
+    def range(self, lower: Any = None, upper: Any = None, include_upper: bool = True) -> List[str]:
+        """排序键在 [lower, upper]（include_upper 为False时为 [lower, upper)）内的记录ID，按排序键升序"""
+        if self.pushed_down:
+            filters = self.where + build_filters(**{
+                f"{self.sort_field}__gte": lower,
+                f"{self.sort_field}__{'lte' if include_upper else 'lt'}": upper,
+            })
+            if lower is None and upper is None:
+                # 排序键为空的记录不计入
+                filters.append(FieldFilter(self.sort_field, "ne", None))
+            return self.repository.find_ids(filters, order_by=self.sort_field)
+        self.ensure_built()
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_keys, lower) if lower is not None else 0
+            end = len(self._sorted_keys)
+            if upper is not None:
+                bound = bisect.bisect_right if include_upper else bisect.bisect_left
+                end = bound(self._sorted_keys, upper)
+            return [record_id for _, record_id in self._entries[start:end]]
+
+    def __len__(self) -> int:
+        if self.pushed_down:
+            return self.repository.count(self.where + [FieldFilter(self.sort_field, "ne", None)])
+        self.ensure_built()
+        return len(self._entries)
+
+
+def reconcile_all() -> Dict[str, List[str]]:
+    """校正全部仓储的增量统计，返回 {集合名: 有偏差的统计名}"""
+    drifted = {}
+    for repository in list(aggregated_repositories):
+        names = repository.reconcile_aggregates()
+        if names:
+            drifted[repository.collection] = names
+    return drifted
+
+
+class AggregateReconciler:
+    """后台线程按固定间隔校正增量统计"""
+
+    def __init__(self, interval: Optional[float] = None):
+        # 为None时在启动时按存储后端确定
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval is None:
+            self.interval = reconcile_interval()
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="aggregate-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                drifted = reconcile_all()
+            except Exception as e:
+                print(f"校正统计数据失败: {e}")
+                continue
+            for collection, names in drifted.items():
+                print(f"统计数据已校正: {collection} {', '.join(names)}")
+
+
+# 创建实例供导入使用
+aggregate_reconciler = AggregateReconciler()
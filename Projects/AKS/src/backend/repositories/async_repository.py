@@ -0,0 +1,105 @@
+# 异步文档仓储
+# 存储后端为postgresql且数据库可用时从 repo_<集合名> 文档表读取，否则回退到服务层的内存存储
+import sys
+import os
+import itertools
+from typing import Any, Callable, Generic, List, Optional, Tuple, Type, TypeVar
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import (
+    FieldFilter,
+    Repository,
+    document_table_name,
+    keyset_clause,
+    make_page,
+    order_expression
+)
+from utils.pagination import Page
+from utils.async_db_utils import async_db_connection
+from config.database import database_config
+
+ModelType = TypeVar("ModelType", bound=BaseModel)
+
+
+class AsyncDocumentRepository(Generic[ModelType]):
+    """异步文档仓储，按字段条件查询模型列表"""
+
+    def __init__(self, collection: str, model_class: Type[ModelType],
+                 fallback_store: Callable[[], Repository]):
+        self.collection = collection
+        self.table_name = document_table_name(collection)
+        self.model_class = model_class
+        # 返回内存存储的回调，数据库不可用时使用
+        self.fallback_store = fallback_store
+        self.use_database = database_config.get_repository_backend() == "postgresql"
+
+    def _acquire(self):
+        """借出异步连接，内存后端时直接返回None"""
+        return async_db_connection.acquire(enabled=self.use_database)
+
+    async def get(self, record_id: str) -> Optional[ModelType]:
+        """根据ID获取记录"""
+        async with self._acquire() as connection:
+            if connection is None:
+                return self.fallback_store().get(record_id)
+            row = await connection.fetchrow(
+                f"SELECT data FROM {self.table_name} WHERE id = $1", record_id
+            )
+            return self.model_class.model_validate(row["data"]) if row else None
+
+    async def find(self, filters: Optional[List[FieldFilter]] = None,
+                   order_by: Optional[str] = None, descending: bool = False,
+                   limit: Optional[int] = None, after: Optional[Tuple[Any, str]] = None) -> List[ModelType]:
+        """按过滤条件查询记录，after 为排序位置 (字段值, ID)"""
+        filters = filters or []
+        if order_by and order_by not in self.model_class.model_fields:
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        async with self._acquire() as connection:
+            if connection is None:
+                return self._find_in_memory(filters, order_by, descending, limit, after)
+
+            clauses = []
+            params: List[Any] = []
+            for field_filter in filters:
+                clause, param = field_filter.to_sql(f"${len(params) + 1}")
+                clauses.append(clause)
+                params.append(param)
+
+            expression = order_expression(self.model_class, order_by) if order_by else None
+            if expression and after is not None:
+                numbers = itertools.count(len(params) + 1)
+                clause, keyset_params = keyset_clause(expression, descending, after,
+                                                      lambda: f"${next(numbers)}")
+                clauses.append(clause)
+                params.extend(keyset_params)
+
+            sql = f"SELECT data FROM {self.table_name}"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            if expression:
+                direction = "DESC" if descending else "ASC"
+                sql += f" ORDER BY {expression} {direction}, id {direction}"
+            if limit is not None:
+                params.append(limit)
+                sql += f" LIMIT ${len(params)}"
+
+            rows = await connection.fetch(sql, *params)
+            return [self.model_class.model_validate(row["data"]) for row in rows]
+
+    async def find_page(self, filters: Optional[List[FieldFilter]] = None,
+                        order_by: Optional[str] = None, descending: bool = False,
+                        limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+        """按游标分页查询，规则与同步仓储的 find_page 一致"""
+        order_by = order_by or "id"
+        after = self.fallback_store().cursor_position(cursor, order_by, descending) if cursor else None
+        if limit is None:
+            return Page(await self.find(filters, order_by, descending, after=after))
+        records = await self.find(filters, order_by, descending, limit + 1, after)
+        return make_page(records, order_by, descending, limit)
+
+    def _find_in_memory(self, filters: List[FieldFilter], order_by: Optional[str],
+                        descending: bool, limit: Optional[int],
+                        after: Optional[Tuple[Any, str]] = None) -> List[ModelType]:
+        """在服务层存储中执行同样的查询（内存仓储走二级索引）"""
+        return self.fallback_store().find(filters, order_by, descending, limit, after=after)
@@ -0,0 +1,493 @@
+# 数据仓储基础定义
+# 业务记录以JSONB文档形式存储在 repo_<集合名> 表中，同步与异步仓储共用同一套表结构和过滤条件
+import typing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Type
+from collections.abc import MutableMapping
+from datetime import datetime, date
+from enum import Enum
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from utils.pagination import InvalidCursorError, Page, PageCursor
+
+# 文档表名前缀
+TABLE_PREFIX = "repo_"
+
+# 各集合需要建立索引的字段
+# PostgreSQL 中建立表达式索引；内存仓储中日期字段建立有序索引，其余字段建立哈希索引
+DOCUMENT_COLLECTIONS: Dict[str, List[str]] = {
+    # 基本信息
+    "townships": ["status"],
+    "villages": ["township_id", "status"],
+    "farmers": ["village_id", "id_card_number", "status"],
+    # 土地基础信息
+    "land_type_prices": ["land_type", "status"],
+    "land_base_info": ["village_id", "land_code", "land_type_id", "current_status"],
+    # 账户管理
+    "accounts": ["user_id", "account_status"],
+    "recharge_details": ["account_id", "user_id", "status", "recharge_time", "transaction_id"],
+    "expense_details": ["account_id", "user_id", "expense_type", "transaction_time"],
+    "account_transactions": ["account_id", "transaction_type", "transaction_time", "entry_id", "sequence"],
+    # 土地竞拍
+    "bidder_registrations": ["user_id", "id_card_number", "status", "create_time"],
+    "bidding_info": ["land_id", "status", "start_time"],
+    "deposit_transactions": ["bidding_id", "user_id", "status", "transaction_time"],
+    "bid_records": ["bidding_id", "user_id", "bid_time"],
+    "winning_payments": ["bidding_id", "user_id", "payment_status", "create_time"],
+    # 合同管理
+    "contracts": ["contract_code", "land_id", "bidder_id", "contract_status", "create_time"],
+    "contract_fees": ["contract_id", "status", "due_date", "fee_year"],
+    "contract_attachments": ["contract_id", "upload_time"],
+    # 费用管理
+    "fee_infos": ["user_id", "land_id", "contract_id", "status", "due_date"],
+    "reduction_infos": ["fee_id", "user_id", "status", "application_time"],
+    "payment_records": ["fee_id", "status", "transaction_id", "payment_time"],
+    "fee_overdue_notices": ["fee_id", "user_id", "township_id", "batch_id", "status"],
+    # 融资确权
+    "allocated_lands": ["land_code", "create_time"],
+    "mortgage_projects": ["borrower_id", "allocated_land_id", "project_status", "apply_time"],
+    "project_nodes": ["project_id", "status", "expected_time"],
+    "financing_project_events": ["project_id", "action", "event_time"],
+    "financing_ledgers": ["project_id", "record_type", "record_time"],
+    "post_investment_tasks": ["project_id", "status", "end_time"],
+    "digital_certificates": ["owner_id", "project_id", "status", "issue_date"],
+    "fund_supervisions": ["project_id", "transaction_time"],
+    "repayment_reminders": ["project_id", "status", "reminder_date"],
+    "repayment_reminder_cursors": [],
+    # 定时任务
+    "job_leases": [],
+    # 后台导出任务
+    "export_jobs": ["export_type", "fingerprint", "status", "create_time", "finish_time"],
+}
+
+# 各集合的联合索引（PostgreSQL），按字段组合等值查询时使用
+COMPOSITE_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    # 对账单按 (账户ID, 记账序号) 定位分录
+    "account_transactions": [("account_id", "sequence")],
+}
+
+# 各集合中取值唯一的字段（空值除外），PostgreSQL 中建立唯一索引，多进程并发写入相同键值时只有一个成功
+UNIQUE_FIELDS: Dict[str, List[str]] = {
+    "recharge_details": ["transaction_id"],
+    "payment_records": ["transaction_id"],
+}
+
+
+def document_table_name(collection: str) -> str:
+    """获取集合对应的文档表名"""
+    return f"{TABLE_PREFIX}{collection}"
+
+
+def document_table_ddl(collection: str, indexed_fields: Optional[List[str]] = None) -> List[str]:
+    """生成集合文档表及字段索引的建表语句"""
+    table = document_table_name(collection)
+    statements = [
+        f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id VARCHAR(64) PRIMARY KEY,
+            data JSONB NOT NULL,
+            update_time TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """
+    ]
+    for field in indexed_fields or []:
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ((data->>'{field}'));"
+        )
+    for fields in COMPOSITE_INDEXES.get(collection, []):
+        columns = ", ".join(f"(data->>'{field}')" for field in fields)
+        statements.append(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(fields)} ON {table} ({columns});"
+        )
+    for field in UNIQUE_FIELDS.get(collection, []):
+        statements.append(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uidx_{table}_{field} ON {table} ((data->>'{field}')) "
+            f"WHERE data->>'{field}' IS NOT NULL;"
+        )
+    return statements
+
+
+def to_document_value(value: Any) -> Any:
+    """将过滤值转换为文档中存储的JSON值"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class FieldFilter:
+    """字段过滤条件，支持 eq / ne / in / contains / gte / lte / lt"""
+
+    OPERATORS = ("eq", "ne", "in", "contains", "gte", "lte", "lt")
+
+    def __init__(self, field: str, op: str, value: Any):
+        if op not in self.OPERATORS:
+            raise ValueError(f"不支持的过滤操作: {op}")
+        self.field = field
+        self.op = op
+        self.value = list(value) if op == "in" else value
+
+    def matches(self, record: Any) -> bool:
+        """判断内存记录是否满足条件"""
+        current = getattr(record, self.field, None)
+        if self.op == "eq":
+            return current == self.value
+        if self.op == "ne":
+            return current != self.value
+        if self.op == "in":
+            return current in self.value
+        if current is None:
+            return False
+        if self.op == "contains":
+            return str(self.value) in str(current)
+        if self.op == "gte":
+            return current >= self.value
+        if self.op == "lt":
+            return current < self.value
+        return current <= self.value
+
+    def to_sql(self, placeholder: str) -> Tuple[str, Any]:
+        """转换为SQL条件片段和参数"""
+        column = f"data->>'{self.field}'"
+        if self.op == "contains":
+            return f"position({placeholder} in {column}) > 0", str(self.value)
+        if self.op == "in":
+            return f"{column} = ANY({placeholder})", [str(to_document_value(item)) for item in self.value]
+
+        value = self.value
+        if isinstance(value, datetime):
+            column = f"({column})::timestamp"
+        elif isinstance(value, date):
+            column = f"({column})::date"
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and self.op not in ("eq", "ne"):
+            column = f"({column})::numeric"
+        elif value is None:
+            # 与空值比较：eq 匹配空值，ne 匹配非空值
+            return f"{column} {'IS NOT DISTINCT FROM' if self.op == 'eq' else 'IS DISTINCT FROM'} {placeholder}", None
+        else:
+            value = to_document_value(value)
+            value = str(value).lower() if isinstance(value, bool) else str(value)
+
+        operator = {"eq": "=", "ne": "IS DISTINCT FROM", "gte": ">=", "lte": "<=", "lt": "<"}[self.op]
+        return f"{column} {operator} {placeholder}", value
+
+
+def build_filters(**conditions: Any) -> List[FieldFilter]:
+    """根据关键字参数构造过滤条件，值为None的条件忽略
+
+    关键字格式: 字段名 或 字段名__操作，例如 due_date__gte、status__in
+    空列表的 in 条件同样忽略
+    """
+    filters = []
+    for key, value in conditions.items():
+        field, _, op = key.partition("__")
+        if value is None or (op == "in" and not value):
+            continue
+        filters.append(FieldFilter(field, op or "eq", value))
+    return filters
+
+
+def order_expression(model_class: Type[BaseModel], field: str) -> str:
+    """获取排序字段的SQL表达式，日期和数值字段按原生类型排序而非按文本排序"""
+    column = f"data->>'{field}'"
+    model_field = model_class.model_fields.get(field)
+    if model_field is None:
+        return column
+    candidates = typing.get_args(model_field.annotation) or (model_field.annotation,)
+    for item in candidates:
+        if not isinstance(item, type) or issubclass(item, (bool, Enum)):
+            continue
+        if issubclass(item, datetime):
+            return f"({column})::timestamp"
+        if issubclass(item, date):
+            return f"({column})::date"
+        if issubclass(item, (int, float)):
+            return f"({column})::numeric"
+    return column
+
+
+def keyset_clause(expression: str, descending: bool, position: Tuple[Any, str],
+                  placeholder: Callable[[], str]) -> Tuple[str, List[Any]]:
+    """生成游标分页的SQL条件：取排序位置 (字段值, ID) 之后的记录
+
+    空值升序时排在最后、降序时排在最前，与 ORDER BY 默认的 NULLS LAST/FIRST 一致
+    """
+    value, record_id = position
+    if value is None:
+        if descending:
+            return f"(({expression} IS NULL AND id < {placeholder()}) OR {expression} IS NOT NULL)", [record_id]
+        return f"({expression} IS NULL AND id > {placeholder()})", [record_id]
+
+    operator = "<" if descending else ">"
+    clause = (f"({expression} {operator} {placeholder()}"
+              f" OR ({expression} = {placeholder()} AND id {operator} {placeholder()})")
+    if not descending:
+        clause += f" OR {expression} IS NULL"
+    return clause + ")", [value, value, record_id]
+
+
+def group_key(record: Any, group_by: Sequence[str]) -> Any:
+    """记录的分组键（文档中存储的值），分组字段写作 字段名__date 时取日期"""
+    values = []
+    for spec in group_by:
+        field, _, part = spec.partition("__")
+        value = getattr(record, field, None)
+        if part == "date" and isinstance(value, datetime):
+            value = value.date()
+        values.append(to_document_value(value))
+    if not values:
+        return None
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+def record_sort_key(record: Any, order_by: str) -> Tuple[bool, Any, str]:
+    """内存排序键 (是否为空, 字段值, ID)，与SQL排序规则一致"""
+    value = getattr(record, order_by, None)
+    return value is None, value, record.id
+
+
+# 注册了增量统计的仓储，供定期校正遍历
+aggregated_repositories: List["Repository"] = []
+
+
+class RepositoryUnavailableError(RuntimeError):
+    """存储后端不可用异常"""
+    pass
+
+
+class Repository(MutableMapping):
+    """数据仓储抽象基类
+
+    以 记录ID -> 模型 的字典接口对外提供访问，服务层原有的字典写法无需改动；
+    查询类操作通过 find() 下推到具体存储实现。
+    注意: 从仓储取出的模型修改后必须重新赋值写回（repo[id] = model）才会持久化。
+    """
+
+    # 分组统计和有序范围查询能否下推到存储执行（见 summarize、find_ids），能下推时 Aggregate、OrderedIndex 不在进程内维护
+    pushdown_aggregates = False
+
+    def __init__(self, collection: str, model_class: Type[BaseModel]):
+        self.collection = collection
+        self.model_class = model_class
+        # 增量统计，名称 -> Aggregate（见 repositories/aggregates.py）
+        self.aggregates: Dict[str, Any] = {}
+
+    def has_field(self, field: Optional[str]) -> bool:
+        """判断字段是否为模型字段，用于校验外部传入的排序字段"""
+        return field is not None and field in self.model_class.model_fields
+
+    def values(self) -> List[BaseModel]:
+        """获取全部记录"""
+        return [self[key] for key in list(self)]
+
+    def items(self) -> List[Tuple[str, BaseModel]]:
+        """获取全部 (ID, 记录)"""
+        return [(record.id, record) for record in self.values()]
+
+    def keys(self) -> List[str]:
+        """获取全部记录ID"""
+        return list(self)
+
+    # 增量统计
+    def add_aggregate(self, name: str, aggregate: Any) -> Any:
+        """注册增量统计，注册时不读取数据；进程内维护的统计在首次读取时以现有数据初始化，之后随每次写入更新"""
+        aggregate.attach(self)
+        self.aggregates[name] = aggregate
+        # 仓储是映射类型，in 会按内容比较，这里按对象判断
+        if not any(repository is self for repository in aggregated_repositories):
+            aggregated_repositories.append(self)
+        return aggregate
+
+    def build_aggregate(self, aggregate: Any) -> None:
+        """以现有数据初始化增量统计，之后的写入开始更新该统计"""
+        aggregate.rebuild(self.stream())
+        aggregate.built = True
+
+    def _track_write(self, record_id: str, record: Optional[BaseModel]) -> None:
+        """写入或删除（record 为 None）后更新已初始化的增量统计"""
+        for aggregate in self.aggregates.values():
+            if aggregate.built:
+                aggregate.update(record_id, record)
+
+    def reconcile_aggregates(self) -> List[str]:
+        """以全量数据重算已初始化的增量统计，返回有偏差的统计名"""
+        built = {name: aggregate for name, aggregate in self.aggregates.items() if aggregate.built}
+        if not built:
+            return []
+        records = list(self.stream())
+        return [name for name, aggregate in built.items() if aggregate.rebuild(records)]
+
+    def summarize(self, group_by: Sequence[str], sum_fields: Sequence[str],
+                  filters: Optional[List[FieldFilter]] = None) -> Dict[Any, List[float]]:
+        """按分组字段统计满足条件的记录，返回 {分组键: [记录数, 各字段合计]}
+
+        分组字段写作 字段名__date 时按日期分组；单个分组字段时分组键为字段值，多个时为元组，不分组时为None
+        """
+        groups: Dict[Any, List[float]] = {}
+        for record in self.stream(filters):
+            key = group_key(record, group_by)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0] * (len(sum_fields) + 1)
+            group[0] += 1
+            for position, field in enumerate(sum_fields, start=1):
+                group[position] += getattr(record, field, None) or 0
+        return groups
+
+    def find_ids(self, filters: Optional[List[FieldFilter]] = None,
+                 order_by: Optional[str] = None, descending: bool = False,
+                 limit: Optional[int] = None) -> List[str]:
+        """按条件查询记录ID"""
+        return [record.id for record in self.find(filters, order_by, descending, limit)]
+
+    def put(self, record: BaseModel) -> BaseModel:
+        """保存单条记录"""
+        self[record.id] = record
+        return record
+
+    def compare_and_set(self, record: BaseModel, field: str, expected: Any) -> bool:
+        """已保存记录的 field 仍等于 expected 时写入 record，返回是否写入（乐观并发控制）
+
+        默认实现先读后写，不是原子操作，具体存储应覆盖实现
+        """
+        current = self.get(record.id)
+        if current is None or getattr(current, field, None) != expected:
+            return False
+        self[record.id] = record
+        return True
+
+    def put_if_absent(self, record: BaseModel) -> bool:
+        """记录ID不存在时写入，返回是否写入；多个进程同时写入同一ID时只有一方成功
+
+        默认实现先读后写，不是原子操作，具体存储应覆盖实现
+        """
+        if record.id in self:
+            return False
+        self[record.id] = record
+        return True
+
+    def bulk_put(self, records: Iterable[BaseModel]) -> int:
+        """批量保存记录"""
+        count = 0
+        for record in records:
+            self[record.id] = record
+            count += 1
+        return count
+
+    def delete_many(self, record_ids: Iterable[str]) -> int:
+        """批量删除记录，返回实际删除数量"""
+        count = 0
+        for record_id in record_ids:
+            if record_id in self:
+                del self[record_id]
+                count += 1
+        return count
+
+    def find(self, filters: Optional[List[FieldFilter]] = None,
+             order_by: Optional[str] = None, descending: bool = False,
+             limit: Optional[int] = None, after: Optional[Tuple[Any, str]] = None) -> List[BaseModel]:
+        """按过滤条件查询记录
+
+        after 为排序位置 (字段值, ID)，只返回排在该位置之后的记录，需同时指定 order_by
+        """
+        filters = filters or []
+        records = [
+            record for record in self.values()
+            if all(field_filter.matches(record) for field_filter in filters)
+        ]
+        if order_by:
+            records.sort(key=lambda x: record_sort_key(x, order_by), reverse=descending)
+            if after is not None:
+                records = self._records_after(records, order_by, descending, after)
+        if limit is not None:
+            records = records[:limit]
+        return records
+
+    @staticmethod
+    def _records_after(records: List[BaseModel], order_by: str, descending: bool,
+                       after: Tuple[Any, str]) -> List[BaseModel]:
+        """从已排序的记录中截取排序位置之后的部分"""
+        value, record_id = after
+        position = (value is None, value, record_id)
+        if descending:
+            return [record for record in records if record_sort_key(record, order_by) < position]
+        return [record for record in records if record_sort_key(record, order_by) > position]
+
+    def find_page(self, filters: Optional[List[FieldFilter]] = None,
+                  order_by: Optional[str] = None, descending: bool = False,
+                  limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+        """按游标分页查询，返回一页记录及下一页游标
+
+        未指定排序字段时按ID排序，保证翻页顺序稳定；limit 为None时返回游标之后的全部记录
+        """
+        order_by = order_by or "id"
+        if not self.has_field(order_by):
+            raise ValueError(f"不支持的排序字段: {order_by}")
+        after = self.cursor_position(cursor, order_by, descending) if cursor else None
+        if limit is None:
+            return Page(self.find(filters, order_by, descending, after=after))
+        records = self.find(filters, order_by, descending, limit + 1, after=after)
+        return make_page(records, order_by, descending, limit)
+
+    def stream(self, filters: Optional[List[FieldFilter]] = None,
+               order_by: Optional[str] = None, descending: bool = False,
+               batch_size: int = 1000) -> Iterator[BaseModel]:
+        """按排序逐条产出满足条件的记录，内部按游标分批读取，内存占用与总量无关"""
+        cursor = None
+        while True:
+            page = self.find_page(filters, order_by, descending, batch_size, cursor)
+            yield from page
+            cursor = page.next_cursor
+            if not cursor:
+                return
+
+    def cursor_position(self, cursor: str, order_by: str, descending: bool) -> Tuple[Any, str]:
+        """解码游标，将其中的JSON值还原为模型字段类型，返回排序位置 (字段值, ID)"""
+        page_cursor = PageCursor.decode(cursor)
+        page_cursor.check(order_by, descending)
+        value = page_cursor.value
+        if value is not None:
+            annotation = self.model_class.model_fields[order_by].annotation
+            try:
+                value = TypeAdapter(annotation).validate_python(value)
+            except ValidationError as e:
+                raise InvalidCursorError(f"无效的分页游标: {cursor}") from e
+        return value, page_cursor.record_id
+
+    def existing_ids(self, record_ids: Iterable[str]) -> Set[str]:
+        """返回给定ID中已存在的记录ID，批量校验外键时一次解析"""
+        return {record_id for record_id in set(record_ids) if record_id in self}
+
+    def existing_values(self, field: str, values: Iterable[Any]) -> Set[Any]:
+        """返回给定值中已被记录占用的字段值，批量校验唯一字段时一次解析"""
+        values = set(values)
+        if not values:
+            return set()
+        records = self.find(build_filters(**{f"{field}__in": list(values)}))
+        return {getattr(record, field) for record in records}
+
+    def find_one(self, filters: Optional[List[FieldFilter]] = None) -> Optional[BaseModel]:
+        """查询第一条满足条件的记录"""
+        records = self.find(filters, limit=1)
+        return records[0] if records else None
+
+    def count(self, filters: Optional[List[FieldFilter]] = None) -> int:
+        """统计满足条件的记录数"""
+        if not filters:
+            return len(self)
+        return len(self.find(filters))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.collection})"
+
+
+def make_page(records: List[BaseModel], order_by: str, descending: bool, limit: int) -> Page:
+    """由多取一条的查询结果构造分页结果，多出的记录表示还有下一页"""
+    if len(records) <= limit:
+        return Page(records)
+    items = records[:limit]
+    last = items[-1]
+    next_cursor = PageCursor(
+        order_by, descending, to_document_value(getattr(last, order_by, None)), last.id
+    ).encode()
+    return Page(items, next_cursor)
@@ -0,0 +1,72 @@
+# 数据仓储工厂
+# 根据配置 repository_backend（memory / postgresql）创建服务层使用的仓储
+import sys
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Type
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import database_config
+from repositories.base import Repository, DOCUMENT_COLLECTIONS
+from repositories.memory_repository import InMemoryRepository
+
+# 内存存储下当前线程最外层事务的提交后回调
+_local = threading.local()
+
+
+def use_memory_backend() -> bool:
+    """当前是否使用内存存储"""
+    return database_config.get_repository_backend() != "postgresql"
+
+
+def create_repository(collection: str, model_class: Type[BaseModel]) -> Repository:
+    """创建指定集合的仓储"""
+    if collection not in DOCUMENT_COLLECTIONS:
+        raise ValueError(f"未注册的数据集合: {collection}")
+
+    if use_memory_backend():
+        return InMemoryRepository(collection, model_class)
+
+    # 延迟导入，内存模式下不依赖数据库驱动
+    from repositories.postgres_repository import PostgresRepository
+    return PostgresRepository(collection, model_class)
+
+
+@contextmanager
+def transaction():
+    """多个仓储的写入在同一事务中完成；内存存储写入前已完成校验，无需事务
+
+    期间用 after_commit 登记的回调在最外层事务成功结束（提交）后执行，事务中抛出异常时丢弃
+    """
+    if use_memory_backend():
+        if getattr(_local, "after_commit", None) is not None:
+            yield
+            return
+        callbacks = _local.after_commit = []
+        try:
+            yield
+        finally:
+            _local.after_commit = None
+        for callback in callbacks:
+            callback()
+        return
+
+    from utils.db_utils import db_connection
+    with db_connection.transaction():
+        yield
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """在当前线程最外层事务提交后执行 callback，不在事务中时立即执行"""
+    if use_memory_backend():
+        callbacks = getattr(_local, "after_commit", None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+        return
+
+    from utils.db_utils import db_connection
+    db_connection.after_commit(callback)
@@ -0,0 +1,402 @@
+# 内存数据仓储
+# 单进程开发与测试使用，数据保存在进程内字典中
+# 对 DOCUMENT_COLLECTIONS 中登记的字段维护二级索引：等值字段用哈希索引，日期字段用有序索引
+import sys
+import os
+import bisect
+import threading
+import typing
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import Repository, FieldFilter, DOCUMENT_COLLECTIONS, record_sort_key, to_document_value
+
+
+def _is_date_field(model_class: Type[BaseModel], field: str) -> bool:
+    """判断模型字段是否为日期/时间类型（含Optional）"""
+    model_field = model_class.model_fields.get(field)
+    if model_field is None:
+        return False
+    annotation = model_field.annotation
+    candidates = typing.get_args(annotation) or (annotation,)
+    return any(isinstance(item, type) and issubclass(item, date) for item in candidates)
+
+
+class SortedIndex:
+    """有序索引，按 (字段值, 记录ID) 排序，支持范围查询和有序遍历
+
+    索引项分块保存（每块有序，块按顺序排列，另记每块的最大项），插入和删除只移动所在块内的数据，
+    耗时与索引总条数基本无关；块超过 2*LOAD 条时对半拆分，删空时移除
+    """
+
+    # 每块的目标条数
+    LOAD = 512
+
+    def __init__(self):
+        self._blocks: List[List[Tuple[Any, str]]] = []
+        self._maxes: List[Tuple[Any, str]] = []
+        self._null_ids: Set[str] = set()
+
+    def add(self, value: Any, record_id: str) -> None:
+        if value is None:
+            self._null_ids.add(record_id)
+            return
+        entry = (value, record_id)
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+            return
+        block = bisect.bisect_left(self._maxes, entry)
+        if block == len(self._blocks):
+            # 大于全部已有项，追加到最后一块
+            block -= 1
+            self._blocks[block].append(entry)
+            self._maxes[block] = entry
+        else:
+            bisect.insort(self._blocks[block], entry)
+        entries = self._blocks[block]
+        if len(entries) > 2 * self.LOAD:
+            tail = entries[self.LOAD:]
+            del entries[self.LOAD:]
+            self._maxes[block] = entries[-1]
+            self._blocks.insert(block + 1, tail)
+            self._maxes.insert(block + 1, tail[-1])
+
+    def add_many(self, pairs: Iterable[Tuple[Any, str]]) -> None:
+        """批量加入索引项，与已有项合并后整体排序、重新分块一次，避免逐条插入的数据移动"""
+        entries = [entry for block in self._blocks for entry in block]
+        for value, record_id in pairs:
+            if value is None:
+                self._null_ids.add(record_id)
+            else:
+                entries.append((value, record_id))
+        entries.sort()
+        self._blocks = [entries[start:start + self.LOAD] for start in range(0, len(entries), self.LOAD)]
+        self._maxes = [block[-1] for block in self._blocks]
+
+    def remove(self, value: Any, record_id: str) -> None:
+        if value is None:
+            self._null_ids.discard(record_id)
+            return
+        entry = (value, record_id)
+        block = bisect.bisect_left(self._maxes, entry)
+        if block == len(self._blocks):
+            return
+        entries = self._blocks[block]
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+            if not entries:
+                del self._blocks[block]
+                del self._maxes[block]
+            elif position == len(entries):
+                self._maxes[block] = entries[-1]
+
+    def _locate(self, item: Tuple, right: bool = False) -> Tuple[int, int]:
+        """item 的插入位置 (块序号, 块内位置)，right 为True时位于相等项之后；超出末尾时为 (块数, 0)"""
+        bisector = bisect.bisect_right if right else bisect.bisect_left
+        block = bisector(self._maxes, item)
+        if block == len(self._blocks):
+            return block, 0
+        return block, bisector(self._blocks[block], item)
+
+    def _entries_from(self, block: int, position: int) -> Iterator[Tuple[Any, str]]:
+        """从位置 (block, position) 起升序遍历索引项"""
+        for current in range(block, len(self._blocks)):
+            entries = self._blocks[current]
+            for index in range(position if current == block else 0, len(entries)):
+                yield entries[index]
+
+    def _entries_before(self, block: int, position: int) -> Iterator[Tuple[Any, str]]:
+        """从位置 (block, position) 之前降序遍历索引项"""
+        if block == len(self._blocks):
+            if not self._blocks:
+                return
+            block -= 1
+            position = len(self._blocks[block])
+        for current in range(block, -1, -1):
+            entries = self._blocks[current]
+            for index in range((position if current == block else len(entries)) - 1, -1, -1):
+                yield entries[index]
+
+    def range(self, lower: Any = None, upper: Any = None) -> Set[str]:
+        """获取字段值在 [lower, upper] 区间内的记录ID"""
+        # (lower,) 排在所有 (lower, 记录ID) 之前
+        block, position = self._locate((lower,)) if lower is not None else (0, 0)
+        ids = set()
+        for value, record_id in self._entries_from(block, position):
+            if upper is not None and value > upper:
+                break
+            ids.add(record_id)
+        return ids
+
+    def ordered_ids(self, descending: bool = False, after: Optional[Tuple[Any, str]] = None) -> Iterator[str]:
+        """按字段值顺序遍历记录ID，空值升序时排在最后、降序时排在最前
+
+        after 为排序位置 (字段值, ID)，从该位置之后开始遍历
+        """
+        null_ids = sorted(self._null_ids, reverse=descending)
+        if after is None:
+            entries = self._entries_before(len(self._blocks), 0) if descending else self._entries_from(0, 0)
+        elif after[0] is None:
+            # 游标位于空值区间内
+            if descending:
+                null_ids = [record_id for record_id in null_ids if record_id < after[1]]
+                entries = self._entries_before(len(self._blocks), 0)
+            else:
+                null_ids = [record_id for record_id in null_ids if record_id > after[1]]
+                entries = iter(())
+        elif descending:
+            null_ids = []
+            entries = self._entries_before(*self._locate(after))
+        else:
+            entries = self._entries_from(*self._locate(after, right=True))
+
+        if descending:
+            yield from null_ids
+            for _, record_id in entries:
+                yield record_id
+        else:
+            for _, record_id in entries:
+                yield record_id
+            yield from null_ids
+
+
+class InMemoryRepository(Repository):
+    """基于字典的内存仓储，读写加锁保证线程安全
+
+    索引和增量统计在写入（赋值、批量写入、删除）时维护，原地修改的模型需写回仓储后才会更新。
+    """
+
+    # 批量写入超过该数量时，有序索引改为追加后整体排序
+    BULK_REINDEX_THRESHOLD = 256
+
+    def __init__(self, collection: str, model_class: Type[BaseModel]):
+        super().__init__(collection, model_class)
+        self._data: Dict[str, BaseModel] = {}
+        self._lock = threading.RLock()
+
+        self._hash_indexes: Dict[str, Dict[Any, Set[str]]] = {}
+        self._sorted_indexes: Dict[str, SortedIndex] = {}
+        for field in DOCUMENT_COLLECTIONS.get(collection, []):
+            if _is_date_field(model_class, field):
+                self._sorted_indexes[field] = SortedIndex()
+            elif field in model_class.model_fields:
+                self._hash_indexes[field] = {}
+        # 记录建立索引时的字段值，原地修改后写回时据此移除旧索引项
+        self._indexed_values: Dict[str, Dict[str, Any]] = {}
+
+    # 索引维护
+    def _index_record(self, record_id: str, record: BaseModel, sorted_pairs: Optional[Dict[str, list]] = None) -> None:
+        """为记录建立索引；传入 sorted_pairs 时有序索引项先收集，由调用方批量加入"""
+        snapshot = {}
+        for field, index in self._hash_indexes.items():
+            value = to_document_value(getattr(record, field, None))
+            index.setdefault(value, set()).add(record_id)
+            snapshot[field] = value
+        for field, index in self._sorted_indexes.items():
+            value = getattr(record, field, None)
+            if sorted_pairs is None:
+                index.add(value, record_id)
+            else:
+                sorted_pairs[field].append((value, record_id))
+            snapshot[field] = value
+        self._indexed_values[record_id] = snapshot
+
+    def _unindex_record(self, record_id: str) -> None:
+        snapshot = self._indexed_values.pop(record_id, None)
+        if snapshot is None:
+            return
+        for field, index in self._hash_indexes.items():
+            ids = index.get(snapshot[field])
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del index[snapshot[field]]
+        for field, index in self._sorted_indexes.items():
+            index.remove(snapshot[field], record_id)
+
+    def _store(self, record_id: str, record: BaseModel) -> None:
+        self._unindex_record(record_id)
+        self._data[record_id] = record
+        self._index_record(record_id, record)
+        self._track_write(record_id, record)
+
+    # 字典接口
+    def __getitem__(self, record_id: str) -> BaseModel:
+        return self._data[record_id]
+
+    def __setitem__(self, record_id: str, record: BaseModel) -> None:
+        with self._lock:
+            self._store(record_id, record)
+
+    def __delitem__(self, record_id: str) -> None:
+        with self._lock:
+            del self._data[record_id]
+            self._unindex_record(record_id)
+            self._track_write(record_id, None)
+
+    def __contains__(self, record_id: object) -> bool:
+        return record_id in self._data
+
+    def compare_and_set(self, record: BaseModel, field: str, expected: Any) -> bool:
+        """比较与写入在同一把锁内完成"""
+        with self._lock:
+            current = self._data.get(record.id)
+            if current is None or getattr(current, field, None) != expected:
+                return False
+            self._store(record.id, record)
+            return True
+
+    def put_if_absent(self, record: BaseModel) -> bool:
+        """判断与写入在同一把锁内完成"""
+        with self._lock:
+            if record.id in self._data:
+                return False
+            self._store(record.id, record)
+            return True
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def values(self) -> List[BaseModel]:
+        """获取全部记录（快照，迭代期间允许并发写入）"""
+        with self._lock:
+            return list(self._data.values())
+
+    def items(self) -> List[Tuple[str, BaseModel]]:
+        """获取全部 (ID, 记录)"""
+        with self._lock:
+            return list(self._data.items())
+
+    def bulk_put(self, records: Iterable[BaseModel]) -> int:
+        """批量保存记录"""
+        records = list(records)
+        with self._lock:
+            if len(records) < self.BULK_REINDEX_THRESHOLD:
+                for record in records:
+                    self._store(record.id, record)
+                return len(records)
+
+            # 同一批次内重复的ID以最后一条为准
+            latest = {record.id: record for record in records}
+            sorted_pairs: Dict[str, list] = {field: [] for field in self._sorted_indexes}
+            for record in latest.values():
+                self._unindex_record(record.id)
+                self._data[record.id] = record
+                self._index_record(record.id, record, sorted_pairs)
+                self._track_write(record.id, record)
+            for field, pairs in sorted_pairs.items():
+                self._sorted_indexes[field].add_many(pairs)
+        return len(records)
+
+    def delete_many(self, record_ids: Iterable[str]) -> int:
+        """批量删除记录，返回实际删除数量"""
+        count = 0
+        with self._lock:
+            for record_id in record_ids:
+                if self._data.pop(record_id, None) is not None:
+                    self._unindex_record(record_id)
+                    self._track_write(record_id, None)
+                    count += 1
+        return count
+
+    def build_aggregate(self, aggregate: Any) -> None:
+        """初始化期间持有写锁，初始化之后的写入全部计入增量更新"""
+        with self._lock:
+            aggregate.rebuild(list(self._data.values()))
+            aggregate.built = True
+
+    # 查询
+    def _candidate_ids(self, filters: List[FieldFilter]) -> Optional[Set[str]]:
+        """利用索引求候选记录ID，无可用索引时返回None（全量扫描）"""
+        candidates: Optional[Set[str]] = None
+        ranges: Dict[str, List[Any]] = {}
+        for field_filter in filters:
+            field, op = field_filter.field, field_filter.op
+            if op == "eq" and field in self._hash_indexes:
+                ids = self._hash_indexes[field].get(to_document_value(field_filter.value), set())
+            elif op == "in" and field in self._hash_indexes:
+                index = self._hash_indexes[field]
+                ids = set()
+                for value in field_filter.value:
+                    ids |= index.get(to_document_value(value), set())
+            elif op in ("eq", "gte", "lte", "lt") and field in self._sorted_indexes:
+                # lt 按闭区间取候选，边界上的记录由逐条过滤排除
+                bounds = ranges.setdefault(field, [None, None])
+                if op in ("eq", "gte"):
+                    bounds[0] = field_filter.value
+                if op in ("eq", "lte", "lt"):
+                    bounds[1] = field_filter.value
+                continue
+            else:
+                continue
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return candidates
+
+        for field, (lower, upper) in ranges.items():
+            try:
+                ids = self._sorted_indexes[field].range(lower, upper)
+            except TypeError:
+                # 过滤值类型与字段不可比较（如date与datetime），交由逐条过滤处理
+                continue
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return candidates
+        return candidates
+
+    def find(self, filters: Optional[List[FieldFilter]] = None,
+             order_by: Optional[str] = None, descending: bool = False,
+             limit: Optional[int] = None, after: Optional[Tuple[Any, str]] = None) -> List[BaseModel]:
+        """按过滤条件查询记录，等值与日期范围条件走索引，其余条件逐条过滤"""
+        filters = filters or []
+        with self._lock:
+            candidates = self._candidate_ids(filters)
+
+            # 无索引可用且排序字段有有序索引时，按索引顺序遍历，满足limit即停止
+            if candidates is None and order_by in self._sorted_indexes:
+                records = []
+                for record_id in self._sorted_indexes[order_by].ordered_ids(descending, after):
+                    record = self._data[record_id]
+                    if all(field_filter.matches(record) for field_filter in filters):
+                        records.append(record)
+                        if limit is not None and len(records) >= limit:
+                            break
+                return records
+
+            pool = self._data.values() if candidates is None else (self._data[record_id] for record_id in candidates)
+            records = [
+                record for record in pool
+                if all(field_filter.matches(record) for field_filter in filters)
+            ]
+
+        if order_by:
+            records.sort(key=lambda x: record_sort_key(x, order_by), reverse=descending)
+            if after is not None:
+                records = self._records_after(records, order_by, descending, after)
+        if limit is not None:
+            records = records[:limit]
+        return records
+
+    def stream(self, filters: Optional[List[FieldFilter]] = None,
+               order_by: Optional[str] = None, descending: bool = False,
+               batch_size: int = 1000) -> Iterator[BaseModel]:
+        """按排序逐条产出记录；记录本身已在内存中，一次查询得到引用列表后直接遍历"""
+        yield from self.find(filters, order_by or "id", descending)
+
+    def count(self, filters: Optional[List[FieldFilter]] = None) -> int:
+        """统计满足条件的记录数"""
+        if not filters:
+            return len(self)
+        # 全部为哈希索引上的等值/集合条件时，直接取索引交集大小
+        if all(f.op in ("eq", "in") and f.field in self._hash_indexes for f in filters):
+            with self._lock:
+                return len(self._candidate_ids(filters))
+        return len(self.find(filters))
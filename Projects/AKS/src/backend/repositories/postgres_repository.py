@@ -0,0 +1,286 @@
+# PostgreSQL数据仓储
+# 记录以JSONB文档形式保存在 repo_<集合名> 表中，多进程/多节点共享同一份数据
+import sys
+import os
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Type
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from psycopg2.extras import execute_values
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import (
+    Repository,
+    RepositoryUnavailableError,
+    FieldFilter,
+    document_table_name,
+    keyset_clause,
+    order_expression,
+    to_document_value
+)
+from utils.db_utils import db_connection
+
+
+class PostgresRepository(Repository):
+    """基于PostgreSQL JSONB文档表的仓储，分组统计和有序范围查询在数据库中执行，多个工作进程读到同一结果"""
+
+    pushdown_aggregates = True
+
+    def __init__(self, collection: str, model_class: Type[BaseModel]):
+        super().__init__(collection, model_class)
+        self.table_name = document_table_name(collection)
+
+    def _track_write(self, record_id: str, record: Optional[BaseModel]) -> None:
+        """事务中的写入在最外层事务提交后才计入进程内统计，回滚的写入不计入"""
+        db_connection.after_commit(lambda: Repository._track_write(self, record_id, record))
+
+    def _execute(self, sql: str, params: Optional[Tuple[Any, ...]] = None, fetch: str = "none"):
+        """执行SQL，fetch 为 none / one / all"""
+        with db_connection.get_cursor() as cursor:
+            if cursor is None:
+                raise RepositoryUnavailableError(f"数据库不可用，无法访问 {self.table_name}")
+            cursor.execute(sql, params)
+            if fetch == "one":
+                return cursor.fetchone()
+            if fetch == "all":
+                return cursor.fetchall()
+            return cursor.rowcount
+
+    def _to_document(self, record: BaseModel) -> str:
+        return json.dumps(record.model_dump(mode="json"), ensure_ascii=False)
+
+    def _to_model(self, data: Any) -> BaseModel:
+        if isinstance(data, str):
+            data = json.loads(data)
+        return self.model_class.model_validate(data)
+
+    def __getitem__(self, record_id: str) -> BaseModel:
+        row = self._execute(f"SELECT data FROM {self.table_name} WHERE id = %s", (record_id,), fetch="one")
+        if row is None:
+            raise KeyError(record_id)
+        return self._to_model(row["data"])
+
+    def __setitem__(self, record_id: str, record: BaseModel) -> None:
+        self._execute(
+            f"""
+            INSERT INTO {self.table_name} (id, data, update_time) VALUES (%s, %s::jsonb, NOW())
+            ON CONFLICT (id) DO UPDATE SET data = EXCLUDED.data, update_time = NOW()
+            """,
+            (record_id, self._to_document(record))
+        )
+        self._track_write(record_id, record)
+
+    def compare_and_set(self, record: BaseModel, field: str, expected: Any) -> bool:
+        """单条 UPDATE ... WHERE 完成比较与写入，多进程并发修改同一记录时只有一方成功"""
+        if not self.has_field(field):
+            raise ValueError(f"{self.model_class.__name__} 没有字段: {field}")
+        updated = self._execute(
+            f"""
+            UPDATE {self.table_name} SET data = %s::jsonb, update_time = NOW()
+            WHERE id = %s AND data->'{field}' = %s::jsonb
+            """,
+            (self._to_document(record), record.id, json.dumps(to_document_value(expected)))
+        )
+        if not updated:
+            return False
+        self._track_write(record.id, record)
+        return True
+
+    def put_if_absent(self, record: BaseModel) -> bool:
+        """INSERT ... ON CONFLICT DO NOTHING，多进程同时写入同一ID时只有一方成功"""
+        inserted = self._execute(
+            f"""
+            INSERT INTO {self.table_name} (id, data, update_time) VALUES (%s, %s::jsonb, NOW())
+            ON CONFLICT (id) DO NOTHING
+            """,
+            (record.id, self._to_document(record))
+        )
+        if not inserted:
+            return False
+        self._track_write(record.id, record)
+        return True
+
+    def __delitem__(self, record_id: str) -> None:
+        deleted = self._execute(f"DELETE FROM {self.table_name} WHERE id = %s", (record_id,))
+        if not deleted:
+            raise KeyError(record_id)
+        self._track_write(record_id, None)
+
+    def __contains__(self, record_id: object) -> bool:
+        row = self._execute(f"SELECT 1 AS found FROM {self.table_name} WHERE id = %s", (record_id,), fetch="one")
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._execute(f"SELECT id FROM {self.table_name} ORDER BY id", fetch="all")
+        return iter([row["id"] for row in rows])
+
+    def __len__(self) -> int:
+        row = self._execute(f"SELECT COUNT(*) AS total FROM {self.table_name}", fetch="one")
+        return row["total"]
+
+    def get(self, record_id: str, default: Any = None) -> Any:
+        try:
+            return self[record_id]
+        except KeyError:
+            return default
+
+    def values(self) -> List[BaseModel]:
+        """获取全部记录（单次查询）"""
+        rows = self._execute(f"SELECT data FROM {self.table_name}", fetch="all")
+        return [self._to_model(row["data"]) for row in rows]
+
+    def bulk_put(self, records: Iterable[BaseModel]) -> int:
+        """多行INSERT批量写入，同一事务内完成"""
+        records = list(records)
+        rows = [(record.id, self._to_document(record)) for record in records]
+        if not rows:
+            return 0
+        with db_connection.get_cursor() as cursor:
+            if cursor is None:
+                raise RepositoryUnavailableError(f"数据库不可用，无法写入 {self.table_name}")
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {self.table_name} (id, data, update_time) VALUES %s
+                ON CONFLICT (id) DO UPDATE SET data = EXCLUDED.data, update_time = NOW()
+                """,
+                rows,
+                template="(%s, %s::jsonb, NOW())",
+                page_size=1000
+            )
+        for record in records:
+            self._track_write(record.id, record)
+        return len(rows)
+
+    def existing_ids(self, record_ids: Iterable[str]) -> Set[str]:
+        """单次查询返回已存在的记录ID"""
+        record_ids = list(set(record_ids))
+        if not record_ids:
+            return set()
+        rows = self._execute(f"SELECT id FROM {self.table_name} WHERE id = ANY(%s)", (record_ids,), fetch="all")
+        return {row["id"] for row in rows}
+
+    def existing_values(self, field: str, values: Iterable[Any]) -> Set[Any]:
+        """单次查询返回已被占用的字段值（按文本比较）"""
+        if not self.has_field(field):
+            raise ValueError(f"{self.model_class.__name__} 没有字段: {field}")
+        values = list({str(value) for value in values})
+        if not values:
+            return set()
+        rows = self._execute(
+            f"SELECT DISTINCT data->>'{field}' AS value FROM {self.table_name} WHERE data->>'{field}' = ANY(%s)",
+            (values,),
+            fetch="all"
+        )
+        return {row["value"] for row in rows}
+
+    def delete_many(self, record_ids: Iterable[str]) -> int:
+        """批量删除记录"""
+        record_ids = list(record_ids)
+        if not record_ids:
+            return 0
+        deleted = self._execute(f"DELETE FROM {self.table_name} WHERE id = ANY(%s)", (record_ids,))
+        for record_id in record_ids:
+            self._track_write(record_id, None)
+        return deleted
+
+    @staticmethod
+    def _where(filters: Optional[List[FieldFilter]]) -> Tuple[List[str], List[Any]]:
+        clauses = []
+        params: List[Any] = []
+        for field_filter in filters or []:
+            clause, param = field_filter.to_sql("%s")
+            clauses.append(clause)
+            params.append(param)
+        return clauses, params
+
+    def find(self, filters: Optional[List[FieldFilter]] = None,
+             order_by: Optional[str] = None, descending: bool = False,
+             limit: Optional[int] = None, after: Optional[Tuple[Any, str]] = None) -> List[BaseModel]:
+        """将过滤、排序、游标位置和数量限制下推到SQL"""
+        rows = self._select("data", filters, order_by, descending, limit, after)
+        return [self._to_model(row["data"]) for row in rows]
+
+    def find_ids(self, filters: Optional[List[FieldFilter]] = None,
+                 order_by: Optional[str] = None, descending: bool = False,
+                 limit: Optional[int] = None) -> List[str]:
+        """只查询记录ID，不读取文档"""
+        return [row["id"] for row in self._select("id", filters, order_by, descending, limit)]
+
+    def _select(self, columns: str, filters: Optional[List[FieldFilter]], order_by: Optional[str],
+                descending: bool, limit: Optional[int], after: Optional[Tuple[Any, str]] = None) -> List[Any]:
+        clauses, params = self._where(filters)
+
+        expression = None
+        if order_by:
+            if not self.has_field(order_by):
+                raise ValueError(f"不支持的排序字段: {order_by}")
+            expression = order_expression(self.model_class, order_by)
+            if after is not None:
+                clause, keyset_params = keyset_clause(expression, descending, after, lambda: "%s")
+                clauses.append(clause)
+                params.extend(keyset_params)
+
+        sql = f"SELECT {columns} FROM {self.table_name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if expression:
+            direction = "DESC" if descending else "ASC"
+            sql += f" ORDER BY {expression} {direction}, id {direction}"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(limit)
+
+        return self._execute(sql, tuple(params), fetch="all")
+
+    def summarize(self, group_by: Sequence[str], sum_fields: Sequence[str],
+                  filters: Optional[List[FieldFilter]] = None) -> Dict[Any, List[float]]:
+        """GROUP BY 分组统计，分组字段使用字段索引的表达式，按日期分组时取日期部分"""
+        for spec in list(group_by) + list(sum_fields):
+            if not self.has_field(spec.partition("__")[0]):
+                raise ValueError(f"{self.model_class.__name__} 没有字段: {spec}")
+        keys = []
+        for spec in group_by:
+            field, _, part = spec.partition("__")
+            keys.append(f"substr(data->>'{field}', 1, 10)" if part == "date" else f"data->>'{field}'")
+        columns = [f"{key} AS k{position}" for position, key in enumerate(keys)]
+        columns.append("COUNT(*) AS total")
+        columns.extend(f"COALESCE(SUM((data->>'{field}')::numeric), 0) AS s{position}"
+                       for position, field in enumerate(sum_fields))
+
+        clauses, params = self._where(filters)
+        sql = f"SELECT {', '.join(columns)} FROM {self.table_name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if keys:
+            sql += " GROUP BY " + ", ".join(keys)
+
+        # 分组键以文本取出，按字段类型还原为文档值，与内存统计的分组键一致（如整数状态）
+        adapters = [None if "__" in spec else TypeAdapter(self.model_class.model_fields[spec].annotation)
+                    for spec in group_by]
+        groups: Dict[Any, List[float]] = {}
+        for row in self._execute(sql, tuple(params), fetch="all"):
+            if not row["total"]:
+                continue
+            values = tuple(self._group_value(adapter, row[f"k{position}"]) for position, adapter in enumerate(adapters))
+            key = (values[0] if len(values) == 1 else values) if values else None
+            groups[key] = [row["total"]] + [float(row[f"s{position}"]) for position in range(len(sum_fields))]
+        return groups
+
+    @staticmethod
+    def _group_value(adapter: Optional[TypeAdapter], text: Optional[str]) -> Any:
+        if adapter is None or text is None:
+            return text
+        try:
+            return to_document_value(adapter.validate_python(text))
+        except ValidationError:
+            return text
+
+    def count(self, filters: Optional[List[FieldFilter]] = None) -> int:
+        """在数据库中统计满足条件的记录数"""
+        clauses, params = self._where(filters)
+
+        sql = f"SELECT COUNT(*) AS total FROM {self.table_name}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        row = self._execute(sql, tuple(params), fetch="one")
+        return row["total"]
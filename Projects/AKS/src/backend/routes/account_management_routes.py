@@ -2,7 +2,7 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from datetime import datetime
 
 # 导入服务和模型
@@ -22,7 +22,11 @@ from models.account_management import (
     UpdateAccountTransactionRequest,
     AccountQueryRequest
 )
+from models.batch import BatchCreateResult
 from services.account_management_service import account_management_service
+from services.ledger_engine import LedgerError, LedgerConflictError
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -32,14 +36,25 @@ router = APIRouter(
 )
 
 
+def _ledger_http_error(error: LedgerError) -> HTTPException:
+    """记账异常转换为HTTP错误：并发冲突返回409，其余（账户不可用、余额不足、金额无效）返回400"""
+    if isinstance(error, LedgerConflictError):
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+
 # 账户信息管理路由
 @router.get("/accounts", response_model=List[AccountInfo])
 def get_accounts(
+    response: Response,
     user_id: Optional[str] = None,
-    account_status: Optional[int] = None
+    account_status: Optional[int] = None,
+    page: PageParams = Depends()
 ):
     """获取账户列表"""
-    return account_management_service.get_accounts(user_id, account_status)
+    return with_next_cursor(response, account_management_service.get_accounts(
+        user_id, account_status, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/accounts/{account_id}", response_model=AccountInfo)
@@ -92,14 +107,24 @@ def delete_account(account_id: str):
 # 充值明细管理路由
 @router.get("/recharges", response_model=List[RechargeDetail])
 def get_recharges(
+    response: Response,
     account_id: Optional[str] = None,
     recharge_no: Optional[str] = None,
     status: Optional[str] = None,
     recharge_date_from: Optional[datetime] = None,
-    recharge_date_to: Optional[datetime] = None
+    recharge_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取充值明细列表"""
-    return account_management_service.get_recharges(account_id, recharge_no, status, recharge_date_from, recharge_date_to)
+    return with_next_cursor(response, account_management_service.get_recharge_details(
+        account_id=account_id,
+        status=status,
+        start_date=recharge_date_from,
+        end_date=recharge_date_to,
+        transaction_id=recharge_no,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/recharges/{recharge_id}", response_model=RechargeDetail)
@@ -117,12 +142,10 @@ def get_recharge_by_id(recharge_id: str):
 @router.post("/recharges", response_model=RechargeDetail, status_code=status.HTTP_201_CREATED)
 def create_recharge(request: CreateRechargeDetailRequest):
     """创建充值明细"""
-    recharge = account_management_service.create_recharge(request)
-    if not recharge:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid account_id or failed to create recharge"
-        )
+    try:
+        recharge, _ = account_management_service.create_recharge(request)
+    except LedgerError as e:
+        raise _ledger_http_error(e)
     return recharge
 
 
@@ -141,14 +164,17 @@ def update_recharge(recharge_id: str, request: UpdateRechargeDetailRequest):
 # 支出明细管理路由
 @router.get("/expenses", response_model=List[ExpenseDetail])
 def get_expenses(
+    response: Response,
     account_id: Optional[str] = None,
-    expense_no: Optional[str] = None,
-    status: Optional[str] = None,
+    expense_type: Optional[str] = None,
     expense_date_from: Optional[datetime] = None,
-    expense_date_to: Optional[datetime] = None
+    expense_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取支出明细列表"""
-    return account_management_service.get_expenses(account_id, expense_no, status, expense_date_from, expense_date_to)
+    return with_next_cursor(response, account_management_service.get_expense_details(
+        account_id, expense_type, expense_date_from, expense_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/expenses/{expense_id}", response_model=ExpenseDetail)
@@ -166,12 +192,10 @@ def get_expense_by_id(expense_id: str):
 @router.post("/expenses", response_model=ExpenseDetail, status_code=status.HTTP_201_CREATED)
 def create_expense(request: CreateExpenseDetailRequest):
     """创建支出明细"""
-    expense = account_management_service.create_expense(request)
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid account_id, insufficient balance, or failed to create expense"
-        )
+    try:
+        expense, _ = account_management_service.create_expense(request)
+    except LedgerError as e:
+        raise _ledger_http_error(e)
     return expense
 
 
@@ -190,14 +214,17 @@ def update_expense(expense_id: str, request: UpdateExpenseDetailRequest):
 # 账户交易管理路由
 @router.get("/transactions", response_model=List[AccountTransaction])
 def get_transactions(
+    response: Response,
     account_id: Optional[str] = None,
     transaction_type: Optional[str] = None,
-    status: Optional[str] = None,
     transaction_date_from: Optional[datetime] = None,
-    transaction_date_to: Optional[datetime] = None
+    transaction_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取账户交易列表"""
-    return account_management_service.get_transactions(account_id, transaction_type, status, transaction_date_from, transaction_date_to)
+    return with_next_cursor(response, account_management_service.get_transactions(
+        account_id, transaction_type, transaction_date_from, transaction_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/transactions/{transaction_id}", response_model=AccountTransaction)
@@ -238,56 +265,81 @@ def update_transaction(transaction_id: str, request: UpdateAccountTransactionReq
 
 # 高级查询路由
 @router.post("/accounts/query", response_model=List[AccountInfo])
-def query_accounts(request: AccountQueryRequest):
+def query_accounts(request: AccountQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询账户信息"""
-    return account_management_service.query_accounts(request)
+    return with_next_cursor(response, account_management_service.query_accounts(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
-@router.post("/accounts/batch", status_code=status.HTTP_201_CREATED)
-def batch_create_accounts(requests: List[CreateAccountInfoRequest]):
-    """批量创建账户信息"""
-    created_accounts = []
-    for req in requests:
-        account = account_management_service.create_account(req)
-        if account:
-            created_accounts.append(account)
-    return {
-        "created_count": len(created_accounts),
-        "created_ids": [a.id for a in created_accounts]
-    }
+@router.post("/accounts/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_accounts(
+    requests: List[CreateAccountInfoRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量创建账户信息，一次校验整批数据并批量写入，返回逐行错误报告"""
+    result = account_management_service.batch_create_accounts(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
+
+
+@router.post("/recharges/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_recharges(
+    requests: List[CreateRechargeDetailRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量充值（POS终端、银行到账文件），按交易流水号去重，已入账的流水跳过并计入 duplicate_count"""
+    try:
+        result = account_management_service.batch_create_recharges(requests, atomic)
+    except LedgerError as e:
+        raise _ledger_http_error(e)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
 
 
 # 账户余额操作路由
 @router.post("/accounts/{account_id}/freeze")
-def freeze_account_balance(account_id: str, amount: float):
+def freeze_account_balance(account_id: str, amount: float, reason: str = Query("", description="冻结原因")):
     """冻结账户余额"""
-    success = account_management_service.freeze_account_balance(account_id, amount)
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to freeze balance for account {account_id}. Insufficient balance or invalid account."
-        )
+    try:
+        account_management_service.freeze_balance(account_id, amount, reason)
+    except LedgerError as e:
+        raise _ledger_http_error(e)
     return {"message": "Balance frozen successfully"}
 
 
 @router.post("/accounts/{account_id}/unfreeze")
-def unfreeze_account_balance(account_id: str, amount: float):
+def unfreeze_account_balance(account_id: str, amount: float, reason: str = Query("", description="解冻原因")):
     """解冻账户余额"""
-    success = account_management_service.unfreeze_account_balance(account_id, amount)
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to unfreeze balance for account {account_id}. Insufficient frozen balance or invalid account."
-        )
+    try:
+        account_management_service.unfreeze_balance(account_id, amount, reason)
+    except LedgerError as e:
+        raise _ledger_http_error(e)
     return {"message": "Balance unfrozen successfully"}
 
 
 # 数据统计路由
 @router.get("/statistics/accounts")
-def get_account_statistics():
+def get_account_statistics(account_id: Optional[str] = Query(None, description="账户ID，为空时返回全部账户的统计")):
     """获取账户统计信息"""
-    return account_management_service.get_account_statistics()
+    if not account_id:
+        return account_management_service.get_accounts_overview()
+    statistics = account_management_service.get_account_statistics(account_id)
+    if statistics is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Account with id {account_id} not found"
+        )
+    return statistics
 
 
 @router.get("/statistics/transactions")
@@ -314,56 +366,57 @@ def get_account_statement(
     account_id: str,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    page: int = 1,
-    page_size: int = 20
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=1000, description="每页数量")
 ):
-    """获取账户流水"""
-    if account_id not in account_management_service.accounts_db:
+    """获取账户流水，含期初、期末余额和时间段内的收支合计"""
+    statement = account_management_service.get_account_statement(account_id, start_date, end_date, page, page_size)
+    if statement is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Account with id {account_id} not found"
         )
-    
-    statement = account_management_service.get_account_statement(account_id, start_date, end_date, page, page_size)
     return statement
 
 
 # 导出数据路由
 @router.get("/export/accounts")
-def export_accounts():
-    """导出账户数据"""
-    file_path = account_management_service.export_accounts()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_accounts(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出账户数据，按 format 参数流式输出CSV或XLSX"""
+    records = account_management_service.export_accounts()
+    return export_response(records, AccountInfo, "accounts", file_format)
 
 
 @router.get("/export/recharges")
-def export_recharges():
-    """导出充值数据"""
-    file_path = account_management_service.export_recharges()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_recharges(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出充值数据，按 format 参数流式输出CSV或XLSX"""
+    records = account_management_service.export_recharges(time_from, time_to)
+    return export_response(records, RechargeDetail, "recharges", file_format)
 
 
 @router.get("/export/expenses")
-def export_expenses():
-    """导出支出数据"""
-    file_path = account_management_service.export_expenses()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_expenses(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出支出数据，按 format 参数流式输出CSV或XLSX"""
+    records = account_management_service.export_expenses(time_from, time_to)
+    return export_response(records, ExpenseDetail, "expenses", file_format)
 
 
 @router.get("/export/transactions")
-def export_transactions():
-    """导出交易数据"""
-    file_path = account_management_service.export_transactions()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
\ No newline at end of file
+def export_transactions(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出交易数据，按 format 参数流式输出CSV或XLSX"""
+    records = account_management_service.export_transactions(time_from, time_to)
+    return export_response(records, AccountTransaction, "transactions", file_format)
\ No newline at end of file
@@ -2,7 +2,7 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from datetime import datetime
 
 # 导入服务和模型
@@ -19,7 +19,10 @@ from models.basic_info import (
     UpdateFarmerInfoRequest,
     FarmerQueryRequest
 )
+from models.batch import BatchCreateResult
 from services.basic_info_service import basic_info_service
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -32,12 +35,16 @@ router = APIRouter(
 # 乡镇基本信息管理路由
 @router.get("/townships", response_model=List[TownshipBaseInfo])
 def get_townships(
+    response: Response,
     township_name: Optional[str] = None,
     township_code: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[int] = None,
+    page: PageParams = Depends()
 ):
     """获取乡镇列表"""
-    return basic_info_service.get_townships(township_name, township_code, status)
+    return with_next_cursor(response, basic_info_service.get_townships(
+        township_name, township_code, status, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/townships/{township_id}", response_model=TownshipBaseInfo)
@@ -84,13 +91,22 @@ def delete_township(township_id: str):
 # 村基本信息管理路由
 @router.get("/villages", response_model=List[VillageBaseInfo])
 def get_villages(
+    response: Response,
     village_name: Optional[str] = None,
     village_code: Optional[str] = None,
     township_id: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[int] = None,
+    page: PageParams = Depends()
 ):
     """获取村列表"""
-    return basic_info_service.get_villages(village_name, village_code, township_id, status)
+    return with_next_cursor(response, basic_info_service.get_villages(
+        township_id=township_id,
+        status=status,
+        name=village_name,
+        code=village_code,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/villages/{village_id}", response_model=VillageBaseInfo)
@@ -142,14 +158,18 @@ def delete_village(village_id: str):
 
 # 农户信息管理路由
 @router.get("/users", response_model=List[FarmerInfo])
-def get_users(
+async def get_users(
+    response: Response,
     user_name: Optional[str] = None,
     id_card: Optional[str] = None,
     village_id: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[int] = None,
+    page: PageParams = Depends()
 ):
     """获取用户列表"""
-    return basic_info_service.get_users(user_name, id_card, village_id, status)
+    return with_next_cursor(response, await basic_info_service.get_users_async(
+        user_name, id_card, village_id, status, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/users/{user_id}", response_model=FarmerInfo)
@@ -201,9 +221,11 @@ def delete_user(user_id: str):
 
 # 高级查询路由
 @router.post("/users/query", response_model=List[FarmerInfo])
-def query_users(request: FarmerQueryRequest):
+def query_users(request: FarmerQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询用户信息"""
-    return basic_info_service.query_users(request)
+    return with_next_cursor(response, basic_info_service.query_users(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
@@ -234,18 +256,19 @@ def batch_create_villages(requests: List[CreateVillageBaseInfoRequest]):
     }
 
 
-@router.post("/users/batch", status_code=status.HTTP_201_CREATED)
-def batch_create_users(requests: List[CreateFarmerInfoRequest]):
-    """批量创建用户信息"""
-    created_users = []
-    for req in requests:
-        user = basic_info_service.create_user(req)
-        if user:
-            created_users.append(user)
-    return {
-        "created_count": len(created_users),
-        "created_ids": [u.id for u in created_users]
-    }
+@router.post("/users/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_users(
+    requests: List[CreateFarmerInfoRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量创建用户信息，一次校验整批数据并批量写入，返回逐行错误报告"""
+    result = basic_info_service.batch_create_users(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
 
 
 # 数据统计路由
@@ -293,33 +316,30 @@ def get_farmers_by_village_statistics(village_id: str):
 
 # 导出数据路由
 @router.get("/export/townships")
-def export_townships():
-    """导出乡镇数据"""
-    file_path = basic_info_service.export_townships()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_townships(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出乡镇数据，按 format 参数流式输出CSV或XLSX"""
+    records = basic_info_service.export_townships()
+    return export_response(records, TownshipBaseInfo, "townships", file_format)
 
 
 @router.get("/export/villages")
-def export_villages():
-    """导出村数据"""
-    file_path = basic_info_service.export_villages()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_villages(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出村数据，按 format 参数流式输出CSV或XLSX"""
+    records = basic_info_service.export_villages()
+    return export_response(records, VillageBaseInfo, "villages", file_format)
 
 
 @router.get("/export/farmers")
-def export_farmers():
-    """导出农户数据"""
-    file_path = basic_info_service.export_farmers()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_farmers(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出农户数据，按 format 参数流式输出CSV或XLSX"""
+    records = basic_info_service.export_farmers()
+    return export_response(records, FarmerInfo, "farmers", file_format)
 
 
 # 关系查询路由
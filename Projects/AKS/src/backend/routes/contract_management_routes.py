@@ -2,7 +2,7 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
 from datetime import datetime
 
 # 导入服务和模型
@@ -25,7 +25,12 @@ from models.contract_management import (
     PaymentStatusEnum, 
     ReviewStatusEnum
 )
+from models.batch import BatchCreateResult
+from services.basic_info_service import basic_info_service
 from services.contract_management_service import contract_management_service
+from services.fee_plan import FeePlanError
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -38,16 +43,28 @@ router = APIRouter(
 # 合同管理路由
 @router.get("/contracts", response_model=List[Contract])
 def get_contracts(
+    response: Response,
     contract_no: Optional[str] = None,
     land_id: Optional[str] = None,
-    party_a: Optional[str] = None,
+    bidder_id: Optional[str] = None,
     party_b: Optional[str] = None,
     status: Optional[str] = None,
     create_time_from: Optional[datetime] = None,
-    create_time_to: Optional[datetime] = None
+    create_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取合同列表"""
-    return contract_management_service.get_contracts(contract_no, land_id, party_a, party_b, status, create_time_from, create_time_to)
+    return with_next_cursor(response, contract_management_service.get_contracts(
+        contract_code=contract_no,
+        land_id=land_id,
+        bidder_id=bidder_id,
+        contractor_name=party_b,
+        contract_status=status,
+        create_time_from=create_time_from,
+        create_time_to=create_time_to,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/contracts/{contract_id}", response_model=Contract)
@@ -65,7 +82,10 @@ def get_contract_by_id(contract_id: str):
 @router.post("/contracts", response_model=Contract, status_code=status.HTTP_201_CREATED)
 def create_contract(request: CreateContractRequest):
     """创建合同信息"""
-    contract = contract_management_service.create_contract(request)
+    try:
+        contract = contract_management_service.create_contract(request)
+    except FeePlanError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not contract:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -77,7 +97,10 @@ def create_contract(request: CreateContractRequest):
 @router.put("/contracts/{contract_id}", response_model=Contract)
 def update_contract(contract_id: str, request: UpdateContractRequest):
     """更新合同信息"""
-    contract = contract_management_service.update_contract(contract_id, request)
+    try:
+        contract = contract_management_service.update_contract(contract_id, request)
+    except FeePlanError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not contract:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,14 +122,16 @@ def delete_contract(contract_id: str):
 
 # 合同费用管理路由
 @router.get("/contracts/{contract_id}/fees", response_model=List[ContractFee])
-def get_contract_fees(contract_id: str):
+def get_contract_fees(contract_id: str, response: Response, page: PageParams = Depends()):
     """获取合同相关费用列表"""
     if contract_id not in contract_management_service.contracts_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Contract with id {contract_id} not found"
         )
-    return contract_management_service.get_contract_fees(contract_id)
+    return with_next_cursor(response, contract_management_service.get_contract_fees(
+        contract_id, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/fees/{fee_id}", response_model=ContractFee)
@@ -167,14 +192,16 @@ def delete_contract_fee(fee_id: str):
 
 # 合同附件管理路由
 @router.get("/contracts/{contract_id}/attachments", response_model=List[ContractAttachment])
-def get_contract_attachments(contract_id: str):
+def get_contract_attachments(contract_id: str, response: Response, page: PageParams = Depends()):
     """获取合同相关附件列表"""
     if contract_id not in contract_management_service.contracts_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Contract with id {contract_id} not found"
         )
-    return contract_management_service.get_contract_attachments(contract_id)
+    return with_next_cursor(response, contract_management_service.get_contract_attachments(
+        contract_id, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/attachments/{attachment_id}", response_model=ContractAttachment)
@@ -318,9 +345,9 @@ def confirm_fee_payment(fee_id: str):
 
 
 # 合同费用计划生成路由
-@router.post("/contracts/{contract_id}/generate-fee-plan")
-def generate_fee_plan(contract_id: str):
-    """为合同生成费用计划"""
+@router.post("/contracts/{contract_id}/generate-fee-plan", response_model=List[ContractFee])
+def generate_fee_plan(contract_id: str, fee_year: Optional[int] = Query(None, description="只生成该费用年度")):
+    """为合同生成费用计划，已支付或部分支付的费用保持不变"""
     contract = contract_management_service.get_contract_by_id(contract_id)
     if not contract:
         raise HTTPException(
@@ -328,35 +355,56 @@ def generate_fee_plan(contract_id: str):
             detail=f"Contract with id {contract_id} not found"
         )
     
-    fees = contract_management_service.generate_fee_plan(contract_id)
-    if not fees:
+    try:
+        fees = contract_management_service.generate_fee_plan(contract_id, fee_year)
+    except FeePlanError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # 合同在生成前被删除时返回None；金额为零的合同没有计划费用，返回空列表
+    if fees is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to generate fee plan for contract with id {contract_id}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Contract with id {contract_id} not found"
         )
     return fees
 
 
+@router.post("/fee-plans/regenerate")
+def regenerate_township_fee_year(
+    township_id: str = Query(..., description="乡镇ID"),
+    fee_year: int = Query(..., ge=1900, le=9999, description="费用年度")
+):
+    """按费用年度批量重新生成乡镇内全部已生效合同的承包费，重复执行结果不变"""
+    if township_id not in basic_info_service.townships_db:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Township with id {township_id} not found"
+        )
+    return contract_management_service.regenerate_township_fee_year(township_id, fee_year)
+
+
 # 高级查询路由
 @router.post("/contracts/query", response_model=List[Contract])
-def query_contracts(request: ContractQueryRequest):
+def query_contracts(request: ContractQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询合同信息"""
-    return contract_management_service.query_contracts(request)
+    return with_next_cursor(response, contract_management_service.query_contracts(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
-@router.post("/contracts/batch", status_code=status.HTTP_201_CREATED)
-def batch_create_contracts(requests: List[CreateContractRequest]):
-    """批量创建合同信息"""
-    created_contracts = []
-    for req in requests:
-        contract = contract_management_service.create_contract(req)
-        if contract:
-            created_contracts.append(contract)
-    return {
-        "created_count": len(created_contracts),
-        "created_ids": [c.id for c in created_contracts]
-    }
+@router.post("/contracts/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_contracts(
+    requests: List[CreateContractRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量创建合同信息，一次校验整批数据并批量写入，返回逐行错误报告"""
+    result = contract_management_service.batch_create_contracts(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
 
 
 # 合同统计路由
@@ -396,30 +444,31 @@ def get_contract_performance(contract_id: str):
 
 # 导出数据路由
 @router.get("/export/contracts")
-def export_contracts():
-    """导出合同数据"""
-    file_path = contract_management_service.export_contracts()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_contracts(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出合同数据，按 format 参数流式输出CSV或XLSX"""
+    records = contract_management_service.export_contracts(time_from, time_to)
+    return export_response(records, Contract, "contracts", file_format)
 
 
 @router.get("/export/fees")
-def export_fees():
-    """导出费用数据"""
-    file_path = contract_management_service.export_fees()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_fees(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出费用数据，按 format 参数流式输出CSV或XLSX"""
+    records = contract_management_service.export_fees(time_from, time_to)
+    return export_response(records, ContractFee, "contract_fees", file_format)
 
 
 @router.get("/export/attachments")
-def export_attachments():
-    """导出附件数据"""
-    file_path = contract_management_service.export_attachments()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
\ No newline at end of file
+def export_attachments(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出附件数据，按 format 参数流式输出CSV或XLSX"""
+    records = contract_management_service.export_attachments()
+    return export_response(records, ContractAttachment, "contract_attachments", file_format)
\ No newline at end of file
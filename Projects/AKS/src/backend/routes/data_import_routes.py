@@ -0,0 +1,93 @@
+# 数据导入API路由
+import sys
+import os
+import uuid
+from typing import Optional
+from fastapi import APIRouter, File, Header, HTTPException, Query, UploadFile, status
+
+# 导入服务和模型
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.data_import import ImportResult
+from services.data_import_service import data_import_service
+from utils.export_utils import EXPORT_MEDIA_TYPES, ExportFormat, file_range_response
+from utils.import_utils import ImportFormatError
+
+# 创建路由实例
+router = APIRouter(
+    prefix="/api/imports",
+    tags=["Data Import"],
+    responses={404: {"description": "Not found"}}
+)
+
+
+def _import(import_type: str, file: UploadFile, dry_run: bool) -> ImportResult:
+    """执行导入，文件格式或表头错误返回400"""
+    try:
+        return data_import_service.import_file(import_type, file.file, file.filename, dry_run)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        file.file.close()
+
+
+# 数据导入路由
+@router.post("/farmers", response_model=ImportResult)
+def import_farmers(
+    file: UploadFile = File(..., description="CSV或XLSX文件，表头为字段名或字段描述"),
+    dry_run: bool = Query(False, description="仅校验不写入")
+):
+    """导入种植户信息"""
+    return _import("farmers", file, dry_run)
+
+
+@router.post("/lands", response_model=ImportResult)
+def import_lands(
+    file: UploadFile = File(..., description="CSV或XLSX文件，表头为字段名或字段描述"),
+    dry_run: bool = Query(False, description="仅校验不写入")
+):
+    """导入土地基础信息"""
+    return _import("lands", file, dry_run)
+
+
+@router.post("/contracts", response_model=ImportResult)
+def import_contracts(
+    file: UploadFile = File(..., description="CSV或XLSX文件，表头为字段名或字段描述"),
+    dry_run: bool = Query(False, description="仅校验不写入")
+):
+    """导入承包合同信息"""
+    return _import("contracts", file, dry_run)
+
+
+@router.post("/recharges", response_model=ImportResult)
+def import_recharges(
+    file: UploadFile = File(..., description="CSV或XLSX文件，表头为字段名或字段描述"),
+    dry_run: bool = Query(False, description="仅校验不写入")
+):
+    """导入充值流水（银行到账文件、POS终端导出），已入账的交易流水号跳过"""
+    return _import("recharges", file, dry_run)
+
+
+@router.post("/payments", response_model=ImportResult)
+def import_payments(
+    file: UploadFile = File(..., description="CSV或XLSX文件，表头为字段名或字段描述"),
+    dry_run: bool = Query(False, description="仅校验不写入")
+):
+    """导入费用支付流水（POS收费、银行代收文件），已入账的交易流水号跳过"""
+    return _import("payments", file, dry_run)
+
+
+@router.get("/{import_id}/errors")
+def download_import_errors(
+    import_id: uuid.UUID,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range")
+):
+    """下载导入错误明细表（CSV），包含失败行的原始数据和错误信息"""
+    path = data_import_service.get_error_sheet(str(import_id))
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Error sheet of import {import_id} not found"
+        )
+    return file_range_response(path, f"import_errors_{import_id}.csv",
+                               EXPORT_MEDIA_TYPES[ExportFormat.CSV], range_header, if_range)
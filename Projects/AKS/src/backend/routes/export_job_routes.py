@@ -0,0 +1,87 @@
+# 后台导出任务API路由
+import sys
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, status
+
+# 导入服务和模型
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.export_job import ExportJob, ExportJobStatusEnum, CreateExportJobRequest
+from services.export_job_service import export_job_service, ExportJobError
+from utils.export_utils import EXPORT_MEDIA_TYPES, file_range_response
+
+# 创建路由实例
+router = APIRouter(
+    prefix="/api/exports",
+    tags=["Export Jobs"],
+    responses={404: {"description": "Not found"}}
+)
+
+
+# 导出任务管理路由
+@router.post("/jobs", response_model=ExportJob, status_code=status.HTTP_202_ACCEPTED)
+def create_export_job(request: CreateExportJobRequest):
+    """提交后台导出任务，相同请求在执行中或刚完成时返回已有任务"""
+    try:
+        return export_job_service.submit_job(request)
+    except ExportJobError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/jobs", response_model=List[ExportJob])
+def get_export_jobs(
+    job_status: Optional[ExportJobStatusEnum] = None,
+    export_type: Optional[str] = None
+):
+    """获取导出任务列表"""
+    return export_job_service.get_jobs(job_status, export_type)
+
+
+@router.get("/jobs/{job_id}", response_model=ExportJob)
+def get_export_job(job_id: str):
+    """获取导出任务状态和进度"""
+    job = export_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Export job with id {job_id} not found"
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range")
+):
+    """下载导出文件，支持 Range 断点续传"""
+    job = export_job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Export job with id {job_id} not found"
+        )
+    if job.status not in (ExportJobStatusEnum.COMPLETED, ExportJobStatusEnum.EXPIRED):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job {job_id} is not completed (status: {job.status.value})"
+        )
+    path = export_job_service.get_job_file(job_id)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Export file of job {job_id} has been removed by retention policy"
+        )
+    return file_range_response(path, job.file_name, EXPORT_MEDIA_TYPES[job.file_format], range_header, if_range)
+
+
+@router.delete("/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_export_job(job_id: str):
+    """删除导出任务及导出文件"""
+    success = export_job_service.delete_job(job_id)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Export job with id {job_id} not found"
+        )
@@ -2,7 +2,7 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from datetime import datetime
 
 # 导入服务和模型
@@ -18,12 +18,16 @@ from models.fee_management import (
     CreatePaymentRecordRequest, 
     UpdatePaymentRecordRequest,
     FeeQueryRequest,
+    FeeOverdueNotice,
     FeeTypeEnum, 
     FeeStatusEnum, 
     ReductionStatusEnum, 
     PaymentStatusEnum
 )
+from models.batch import BatchCreateResult
 from services.fee_management_service import fee_management_service
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -35,16 +39,21 @@ router = APIRouter(
 
 # 费用信息管理路由
 @router.get("/fees", response_model=List[FeeInfo])
-def get_fees(
-    fee_name: Optional[str] = None,
+async def get_fees(
+    response: Response,
+    user_id: Optional[str] = None,
+    land_id: Optional[str] = None,
+    contract_id: Optional[str] = None,
     fee_type: Optional[FeeTypeEnum] = None,
     status: Optional[FeeStatusEnum] = None,
-    related_id: Optional[str] = None,
-    create_time_from: Optional[datetime] = None,
-    create_time_to: Optional[datetime] = None
+    due_date_from: Optional[datetime] = None,
+    due_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取费用信息列表"""
-    return fee_management_service.get_fees(fee_name, fee_type, status, related_id, create_time_from, create_time_to)
+    return with_next_cursor(response, await fee_management_service.get_fee_infos_async(
+        user_id, land_id, contract_id, fee_type, status, due_date_from, due_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/fees/{fee_id}", response_model=FeeInfo)
@@ -97,14 +106,24 @@ def delete_fee(fee_id: str):
 # 减免信息管理路由
 @router.get("/reductions", response_model=List[ReductionInfo])
 def get_reductions(
+    response: Response,
     fee_id: Optional[str] = None,
-    reduction_type: Optional[str] = None,
+    user_id: Optional[str] = None,
     status: Optional[ReductionStatusEnum] = None,
     apply_time_from: Optional[datetime] = None,
-    apply_time_to: Optional[datetime] = None
+    apply_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取减免信息列表"""
-    return fee_management_service.get_reductions(fee_id, reduction_type, status, apply_time_from, apply_time_to)
+    return with_next_cursor(response, fee_management_service.get_reduction_infos(
+        fee_id=fee_id,
+        user_id=user_id,
+        status=status,
+        application_time_from=apply_time_from,
+        application_time_to=apply_time_to,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/reductions/{reduction_id}", response_model=ReductionInfo)
@@ -165,14 +184,24 @@ def delete_reduction(reduction_id: str):
 # 支付记录管理路由
 @router.get("/payments", response_model=List[PaymentRecord])
 def get_payment_records(
+    response: Response,
     fee_id: Optional[str] = None,
     payment_no: Optional[str] = None,
     status: Optional[PaymentStatusEnum] = None,
     payment_time_from: Optional[datetime] = None,
-    payment_time_to: Optional[datetime] = None
+    payment_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取支付记录列表"""
-    return fee_management_service.get_payment_records(fee_id, payment_no, status, payment_time_from, payment_time_to)
+    return with_next_cursor(response, fee_management_service.get_payment_records(
+        fee_id=fee_id,
+        status=status,
+        payment_time_from=payment_time_from,
+        payment_time_to=payment_time_to,
+        transaction_id=payment_no,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/payments/{payment_id}", response_model=PaymentRecord)
@@ -192,7 +221,7 @@ def create_payment_record(request: CreatePaymentRecordRequest):
     """创建支付记录"""
     # 检查费用是否存在
     fee_id = request.fee_id
-    fee = fee_management_service.get_fee_by_id(fee_id)
+    fee = fee_management_service.get_fee_info_by_id(fee_id)
     if not fee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -200,7 +229,7 @@ def create_payment_record(request: CreatePaymentRecordRequest):
         )
     
     # 检查支付金额是否超过剩余未支付金额
-    remaining_amount = fee.total_amount - fee.paid_amount
+    remaining_amount = fee.amount - fee.paid_amount
     if request.amount > remaining_amount:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -320,24 +349,49 @@ def apply_reduction(reduction_id: str):
 
 # 高级查询路由
 @router.post("/fees/query", response_model=List[FeeInfo])
-def query_fees(request: FeeQueryRequest):
+def query_fees(request: FeeQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询费用信息"""
-    return fee_management_service.query_fees(request)
+    return with_next_cursor(response, fee_management_service.query_fees(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
-@router.post("/fees/batch", status_code=status.HTTP_201_CREATED)
-def batch_create_fees(requests: List[CreateFeeInfoRequest]):
-    """批量创建费用信息"""
-    created_fees = []
-    for req in requests:
-        fee = fee_management_service.create_fee(req)
-        if fee:
-            created_fees.append(fee)
-    return {
-        "created_count": len(created_fees),
-        "created_ids": [f.id for f in created_fees]
-    }
+@router.post("/fees/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_fees(
+    requests: List[CreateFeeInfoRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量创建费用信息，一次校验整批数据并批量写入，返回逐行错误报告"""
+    result = fee_management_service.batch_create_fee_infos(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
+
+
+@router.post("/payments/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_payments(
+    requests: List[CreatePaymentRecordRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量入账支付记录（POS收费、银行代收文件），按交易流水号去重，每个费用的状态只重算一次"""
+    result = fee_management_service.batch_create_payment_records(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
+
+
+# 数据维护路由
+@router.post("/maintenance/verify-totals")
+def verify_fee_totals(repair: bool = Query(False, description="为true时修正不一致的费用")):
+    """校验费用的已支付金额和状态与支付记录一致"""
+    return fee_management_service.verify_fee_totals(repair)
 
 
 # 费用统计路由
@@ -366,6 +420,23 @@ def get_overdue_fees(days_overdue: int = 0):
     return fee_management_service.get_overdue_fees(days_overdue)
 
 
+@router.post("/overdue-fees/process")
+def process_overdue_fees():
+    """立即执行逾期处理：标记新逾期费用、计提滞纳金并按乡镇生成逾期通知"""
+    return fee_management_service.run_overdue_job()
+
+
+@router.get("/overdue-notices", response_model=List[FeeOverdueNotice])
+def get_overdue_notices(
+    township_id: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    notice_status: Optional[str] = Query(None, alias="status", description="通知状态")
+):
+    """获取逾期通知，可按乡镇或批次筛选"""
+    return fee_management_service.get_overdue_notices(township_id, batch_id, user_id, notice_status)
+
+
 # 费用结清路由
 @router.post("/fees/{fee_id}/settle")
 def settle_fee(fee_id: str):
@@ -422,33 +493,36 @@ def settle_fee(fee_id: str):
 
 # 导出数据路由
 @router.get("/export/fees")
-def export_fees():
-    """导出费用数据"""
-    file_path = fee_management_service.export_fees()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_fees(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出费用数据，按 format 参数流式输出CSV或XLSX"""
+    records = fee_management_service.export_fees(time_from, time_to)
+    return export_response(records, FeeInfo, "fees", file_format)
 
 
 @router.get("/export/payments")
-def export_payments():
-    """导出支付记录数据"""
-    file_path = fee_management_service.export_payments()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_payments(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出支付记录数据，按 format 参数流式输出CSV或XLSX"""
+    records = fee_management_service.export_payments(time_from, time_to)
+    return export_response(records, PaymentRecord, "payments", file_format)
 
 
 @router.get("/export/reductions")
-def export_reductions():
-    """导出减免信息数据"""
-    file_path = fee_management_service.export_reductions()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_reductions(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出减免信息数据，按 format 参数流式输出CSV或XLSX"""
+    records = fee_management_service.export_reductions(time_from, time_to)
+    return export_response(records, ReductionInfo, "reductions", file_format)
 
 
 # 用户费用汇总路由
@@ -2,8 +2,8 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from datetime import date, datetime, timedelta
 
 # 导入服务和模型
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -33,6 +33,8 @@ from models.financing_management import (
     CreateRepaymentAlertRequest, 
     UpdateRepaymentAlertRequest,
     FinancingProjectQueryRequest,
+    FinancingProjectEvent,
+    FinancingProjectTransitionRequest,
     ProjectStatusEnum, 
 
     TaskStatusEnum,
@@ -41,6 +43,9 @@ from models.financing_management import (
     RecordTypeEnum
 )
 from services.financing_management_service import financing_management_service
+from services.financing_workflow import InvalidTransitionError, WorkflowConflictError
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -53,14 +58,18 @@ router = APIRouter(
 # 确权地块信息管理路由
 @router.get("/allocated-lands", response_model=List[AllocatedLandInfo])
 def get_allocated_lands(
-    land_id: Optional[str] = None,
-    farmer_id: Optional[str] = None,
+    response: Response,
+    land_code: Optional[str] = None,
+    land_type: Optional[str] = None,
     status: Optional[str] = None,
-    allocation_date_from: Optional[datetime] = None,
-    allocation_date_to: Optional[datetime] = None
+    create_time_from: Optional[datetime] = None,
+    create_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取确权地块信息列表"""
-    return financing_management_service.get_allocated_lands(land_id, farmer_id, status, allocation_date_from, allocation_date_to)
+    return with_next_cursor(response, financing_management_service.get_allocated_lands(
+        land_code, land_type, status, create_time_from, create_time_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/allocated-lands/{land_id}", response_model=AllocatedLandInfo)
@@ -113,20 +122,24 @@ def delete_allocated_land(land_id: str):
 # 抵押融资项目管理路由
 @router.get("/projects", response_model=List[MortgageFinancingProject])
 def get_projects(
+    response: Response,
     project_name: Optional[str] = None,
     farmer_id: Optional[str] = None,
     status: Optional[str] = None,
     start_date_from: Optional[datetime] = None,
-    start_date_to: Optional[datetime] = None
+    start_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取抵押融资项目列表"""
-    return financing_management_service.get_projects(project_name, farmer_id, status, start_date_from, start_date_to)
+    return with_next_cursor(response, financing_management_service.get_mortgage_projects(
+        project_name, farmer_id, status, start_date_from, start_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/projects/{project_id}", response_model=MortgageFinancingProject)
 def get_project_by_id(project_id: str):
     """根据ID获取抵押融资项目"""
-    project = financing_management_service.get_project_by_id(project_id)
+    project = financing_management_service.get_mortgage_project_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -138,31 +151,25 @@ def get_project_by_id(project_id: str):
 @router.post("/projects", response_model=MortgageFinancingProject, status_code=status.HTTP_201_CREATED)
 def create_project(request: CreateMortgageFinancingProjectRequest):
     """创建抵押融资项目"""
-    # 检查关联的确权地块是否存在
-    for land_id in request.land_ids:
-        if not financing_management_service.get_allocated_land_by_id(land_id):
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Allocated land with id {land_id} not found"
-            )
-    
-    project = financing_management_service.create_project(request)
+    project = financing_management_service.create_mortgage_project(request)
     if not project:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to create mortgage financing project"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Allocated land with id {request.allocated_land_id} not found"
         )
-    
-    # 自动创建项目节点
-    financing_management_service.generate_project_nodes(project.id)
-    
     return project
 
 
 @router.put("/projects/{project_id}", response_model=MortgageFinancingProject)
 def update_project(project_id: str, request: UpdateMortgageFinancingProjectRequest):
     """更新抵押融资项目"""
-    project = financing_management_service.update_project(project_id, request)
+    try:
+        project = financing_management_service.update_mortgage_project(project_id, request)
+    except (InvalidTransitionError, WorkflowConflictError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -174,7 +181,12 @@ def update_project(project_id: str, request: UpdateMortgageFinancingProjectReque
 @router.delete("/projects/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_project(project_id: str):
     """删除抵押融资项目"""
-    success = financing_management_service.delete_project(project_id)
+    if project_id not in financing_management_service.mortgage_projects_db:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {project_id} not found"
+        )
+    success = financing_management_service.delete_mortgage_project(project_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -182,16 +194,77 @@ def delete_project(project_id: str):
         )
 
 
+@router.get("/projects/{project_id}/dependents")
+def get_project_dependents(project_id: str):
+    """获取项目各类关联数据的数量，删除项目时这些数据一并删除"""
+    if project_id not in financing_management_service.mortgage_projects_db:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {project_id} not found"
+        )
+    return financing_management_service.get_project_dependents(project_id)
+
+
+# 项目流程路由
+@router.post("/projects/{project_id}/transitions/{action}", response_model=MortgageFinancingProject)
+def transition_project(project_id: str, action: str, request: FinancingProjectTransitionRequest):
+    """执行项目流程动作（提交审批、批准、驳回、放款等）"""
+    try:
+        project = financing_management_service.transition_project(
+            project_id, action, request.operator_id, request.remark)
+    except (InvalidTransitionError, WorkflowConflictError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {project_id} not found"
+        )
+    return project
+
+
+@router.get("/projects/{project_id}/events", response_model=List[FinancingProjectEvent])
+def get_project_events(project_id: str):
+    """获取项目的流程事件"""
+    if project_id not in financing_management_service.mortgage_projects_db:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Project with id {project_id} not found"
+        )
+    return financing_management_service.get_project_events(project_id)
+
+
+@router.get("/workflow/board")
+def get_workflow_board():
+    """获取各项目状态的项目数和最早进入该状态的时间"""
+    return financing_management_service.get_workflow_board()
+
+
+@router.get("/workflow/stuck")
+def get_stuck_projects(
+    project_status: str = Query("审批中", description="项目状态"),
+    older_than_days: int = Query(7, ge=0, description="停留天数超过该值"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="最多返回条数")
+):
+    """获取在某状态停留过久的项目"""
+    return financing_management_service.get_stuck_projects(
+        project_status, timedelta(days=older_than_days), limit)
+
+
 # 项目节点管理路由
 @router.get("/projects/{project_id}/nodes", response_model=List[FinancingProjectNode])
-def get_project_nodes(project_id: str):
+def get_project_nodes(project_id: str, response: Response, page: PageParams = Depends()):
     """获取项目相关节点列表"""
-    if project_id not in financing_management_service.projects_db:
+    if project_id not in financing_management_service.mortgage_projects_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Project with id {project_id} not found"
         )
-    return financing_management_service.get_project_nodes(project_id)
+    return with_next_cursor(response, financing_management_service.get_project_nodes(
+        project_id, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/nodes/{node_id}", response_model=FinancingProjectNode)
@@ -265,13 +338,17 @@ def update_node_status(node_id: str, status: str, remark: Optional[str] = None):
 # 台账管理路由
 @router.get("/ledgers", response_model=List[FinancingProjectLedger])
 def get_ledgers(
+    response: Response,
     project_id: Optional[str] = None,
     ledger_type: Optional[str] = None,
     create_time_from: Optional[datetime] = None,
-    create_time_to: Optional[datetime] = None
+    create_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取台账列表"""
-    return financing_management_service.get_ledgers(project_id, ledger_type, create_time_from, create_time_to)
+    return with_next_cursor(response, financing_management_service.get_ledgers(
+        project_id, ledger_type, create_time_from, create_time_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/ledgers/{ledger_id}", response_model=FinancingProjectLedger)
@@ -321,13 +398,17 @@ def update_ledger(ledger_id: str, request: UpdateFinancingProjectLedgerRequest):
 # 投后确权任务管理路由
 @router.get("/post-investment-tasks", response_model=List[PostInvestmentRightTask])
 def get_post_investment_tasks(
+    response: Response,
     project_id: Optional[str] = None,
     status: Optional[str] = None,
     due_date_from: Optional[datetime] = None,
-    due_date_to: Optional[datetime] = None
+    due_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取投后确权任务列表"""
-    return financing_management_service.get_post_investment_tasks(project_id, status, due_date_from, due_date_to)
+    return with_next_cursor(response, financing_management_service.get_post_investment_tasks(
+        project_id, status, due_date_from, due_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/post-investment-tasks/{task_id}", response_model=PostInvestmentRightTask)
@@ -377,14 +458,18 @@ def update_post_investment_task(task_id: str, request: UpdatePostInvestmentRight
 # 数字证书管理路由
 @router.get("/certificates", response_model=List[DigitalCertificate])
 def get_digital_certificates(
-    project_id: Optional[str] = None,
+    response: Response,
     farmer_id: Optional[str] = None,
+    certificate_type: Optional[str] = None,
     status: Optional[str] = None,
     issue_date_from: Optional[datetime] = None,
-    issue_date_to: Optional[datetime] = None
+    issue_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取数字证书列表"""
-    return financing_management_service.get_digital_certificates(project_id, farmer_id, status, issue_date_from, issue_date_to)
+    return with_next_cursor(response, financing_management_service.get_digital_certificates(
+        farmer_id, certificate_type, status, issue_date_from, issue_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/certificates/{certificate_id}", response_model=DigitalCertificate)
@@ -434,13 +519,17 @@ def update_digital_certificate(certificate_id: str, request: UpdateDigitalCertif
 # 资金监管管理路由
 @router.get("/fund-supervisions", response_model=List[FundSupervision])
 def get_fund_supervisions(
+    response: Response,
     project_id: Optional[str] = None,
     is_abnormal: Optional[bool] = None,
     start_time_from: Optional[datetime] = None,
-    start_time_to: Optional[datetime] = None
+    start_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取资金监管列表"""
-    return financing_management_service.get_fund_supervisions(project_id, is_abnormal, start_time_from, start_time_to)
+    return with_next_cursor(response, financing_management_service.get_fund_supervisions(
+        project_id, is_abnormal, start_time_from, start_time_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/fund-supervisions/{supervision_id}", response_model=FundSupervision)
@@ -543,11 +632,35 @@ def update_repayment_alert(alert_id: str, request: UpdateRepaymentAlertRequest):
     return alert
 
 
+# 还款提醒调度路由
+@router.get("/repayment-reminders/due")
+def get_due_repayment_reminders(
+    until: Optional[datetime] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="最多返回条数")
+):
+    """获取已到提醒日期、尚未发送的还款提醒"""
+    return financing_management_service.get_due_repayment_reminders(until, limit)
+
+
+@router.post("/repayment-reminders/dispatch")
+def dispatch_repayment_reminders():
+    """立即发送全部到期的还款提醒"""
+    return financing_management_service.reminder_scheduler.dispatch()
+
+
+@router.get("/repayment-reminders/scheduler")
+def get_repayment_reminder_scheduler_status():
+    """获取还款提醒调度状态"""
+    return financing_management_service.reminder_scheduler.status()
+
+
 # 高级查询路由
 @router.post("/projects/query", response_model=List[MortgageFinancingProject])
-def query_projects(request: FinancingProjectQueryRequest):
+def query_projects(request: FinancingProjectQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询项目信息"""
-    return financing_management_service.query_projects(request)
+    return with_next_cursor(response, financing_management_service.query_projects(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
@@ -573,58 +686,89 @@ def get_project_statistics():
 
 
 @router.get("/statistics/farmers")
-def get_farmer_financing_summary():
+def get_farmer_financing_summary(farmer_id: Optional[str] = Query(None, description="农户ID，为空时返回各借款人汇总")):
     """获取农户融资汇总信息"""
-    return financing_management_service.get_farmer_financing_summary()
+    if farmer_id:
+        return financing_management_service.get_farmer_financing_summary(farmer_id)
+    return financing_management_service.get_borrower_statistics()
+
+
+@router.get("/statistics/portfolio")
+def get_portfolio_dashboard(
+    statuses: Optional[List[str]] = Query(None, description="计入敞口的项目状态，默认为已放款、已逾期、已违约"),
+    as_of: Optional[date] = Query(None, description="到期阶梯的计算日期，默认为当天")
+):
+    """获取组合风险看板"""
+    return financing_management_service.get_portfolio_dashboard(statuses, as_of)
 
 
 # 生成还款计划路由
 @router.post("/projects/{project_id}/generate-repayment-schedule")
 def generate_repayment_schedule(project_id: str):
     """为项目生成还款计划"""
-    project = financing_management_service.get_project_by_id(project_id)
+    project = financing_management_service.get_mortgage_project_by_id(project_id)
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Project with id {project_id} not found"
         )
     
-    # 生成还款计划并创建还款提醒
-    alerts = financing_management_service.generate_repayment_schedule(project_id)
-    if not alerts:
+    # 生成还款计划
+    schedule = financing_management_service.generate_repayment_schedule(project_id)
+    if not schedule:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to generate repayment schedule for project {project_id}"
         )
-    return alerts
+    return schedule
+
+
+@router.post("/projects/repayment-schedules")
+def generate_repayment_schedules(project_ids: List[str]):
+    """批量生成还款计划，返回 {项目ID: 各期还款}，不存在的项目不出现在结果中"""
+    return financing_management_service.generate_repayment_schedules(project_ids)
+
+
+# 贷款组合现金流预测路由
+@router.get("/portfolio/cash-flow")
+def get_portfolio_cash_flow(
+    months: int = Query(12, ge=1, le=360, description="预测月数"),
+    start_month: Optional[date] = Query(None, description="起始月份（取该日期所在月），默认本月"),
+    statuses: Optional[List[str]] = Query(None, description="计入的项目状态，默认为已放款和已逾期")
+):
+    """按月预测贷款组合应收的本金和利息"""
+    return financing_management_service.project_cash_flow(months, start_month, statuses)
 
 
 # 导出数据路由
 @router.get("/export/projects")
-def export_projects():
-    """导出项目数据"""
-    file_path = financing_management_service.export_projects()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_projects(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出项目数据，按 format 参数流式输出CSV或XLSX"""
+    records = financing_management_service.export_projects(time_from, time_to)
+    return export_response(records, MortgageFinancingProject, "projects", file_format)
 
 
 @router.get("/export/allocated-lands")
-def export_allocated_lands():
-    """导出确权地块数据"""
-    file_path = financing_management_service.export_allocated_lands()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_allocated_lands(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出确权地块数据，按 format 参数流式输出CSV或XLSX"""
+    records = financing_management_service.export_allocated_lands(time_from, time_to)
+    return export_response(records, AllocatedLandInfo, "allocated_lands", file_format)
 
 
 @router.get("/export/ledgers")
-def export_ledgers():
-    """导出台账数据"""
-    file_path = financing_management_service.export_ledgers()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
\ No newline at end of file
+def export_ledgers(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出台账数据，按 format 参数流式输出CSV或XLSX"""
+    records = financing_management_service.export_ledgers(time_from, time_to)
+    return export_response(records, FinancingProjectLedger, "ledgers", file_format)
\ No newline at end of file
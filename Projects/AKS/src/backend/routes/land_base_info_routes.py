@@ -2,7 +2,7 @@
 import sys
 import os
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from datetime import datetime
 
 # 导入服务和模型
@@ -16,7 +16,10 @@ from models.land_base_info import (
     UpdateLandBaseInfoRequest,
     LandQueryRequest
 )
+from models.batch import BatchCreateResult
 from services.land_base_info_service import land_base_info_service
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
 
 # 创建路由实例
 router = APIRouter(
@@ -29,13 +32,22 @@ router = APIRouter(
 # 土地类型价格管理路由
 @router.get("/type-prices", response_model=List[LandTypePrice])
 def get_land_type_prices(
+    response: Response,
     land_type: Optional[str] = None,
-    region: Optional[str] = None,
+    land_code: Optional[str] = None,
     effective_date_from: Optional[datetime] = None,
-    effective_date_to: Optional[datetime] = None
+    effective_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取土地类型价格列表"""
-    return land_base_info_service.get_land_type_prices(land_type, region, effective_date_from, effective_date_to)
+    return with_next_cursor(response, land_base_info_service.get_land_type_prices(
+        land_type=land_type,
+        land_code=land_code,
+        effective_date_from=effective_date_from,
+        effective_date_to=effective_date_to,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/type-prices/{price_id}", response_model=LandTypePrice)
@@ -81,16 +93,19 @@ def delete_land_type_price(price_id: str):
 
 # 土地基础信息管理路由
 @router.get("/lands", response_model=List[LandBaseInfo])
-def get_lands(
+async def get_lands(
+    response: Response,
     land_code: Optional[str] = None,
     land_name: Optional[str] = None,
     land_type: Optional[str] = None,
     village_id: Optional[str] = None,
     status: Optional[str] = None,
-    farmer_id: Optional[str] = None
+    page: PageParams = Depends()
 ):
     """获取土地基础信息列表"""
-    return land_base_info_service.get_lands(land_code, land_name, land_type, village_id, status, farmer_id)
+    return with_next_cursor(response, await land_base_info_service.get_land_base_info_async(
+        land_code, land_name, land_type, village_id, status, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/lands/{land_id}", response_model=LandBaseInfo)
@@ -142,9 +157,11 @@ def delete_land(land_id: str):
 
 # 高级查询路由
 @router.post("/lands/query", response_model=List[LandBaseInfo])
-def query_lands(request: LandQueryRequest):
+def query_lands(request: LandQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询土地信息"""
-    return land_base_info_service.query_lands(request)
+    return with_next_cursor(response, land_base_info_service.query_lands(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
@@ -161,18 +178,19 @@ def batch_create_land_type_prices(requests: List[CreateLandTypePriceRequest]):
     }
 
 
-@router.post("/lands/batch", status_code=status.HTTP_201_CREATED)
-def batch_create_lands(requests: List[CreateLandBaseInfoRequest]):
-    """批量创建土地基础信息"""
-    created_lands = []
-    for req in requests:
-        land = land_base_info_service.create_land(req)
-        if land:
-            created_lands.append(land)
-    return {
-        "created_count": len(created_lands),
-        "created_ids": [l.id for l in created_lands]
-    }
+@router.post("/lands/batch", response_model=BatchCreateResult, status_code=status.HTTP_201_CREATED)
+def batch_create_lands(
+    requests: List[CreateLandBaseInfoRequest],
+    atomic: bool = Query(True, description="为true时任一行校验失败则整批不写入")
+):
+    """批量创建土地基础信息，一次校验整批数据并批量写入，返回逐行错误报告"""
+    result = land_base_info_service.batch_create_land_base_info(requests, atomic)
+    if result.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=result.model_dump()
+        )
+    return result
 
 
 # 数据统计路由
@@ -214,23 +232,21 @@ def get_lands_by_village_statistics(village_id: str):
 
 # 导出数据路由
 @router.get("/export/type-prices")
-def export_land_type_prices():
-    """导出土地类型价格数据"""
-    file_path = land_base_info_service.export_land_type_prices()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_land_type_prices(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出土地类型价格数据，按 format 参数流式输出CSV或XLSX"""
+    records = land_base_info_service.export_land_type_prices()
+    return export_response(records, LandTypePrice, "type_prices", file_format)
 
 
 @router.get("/export/lands")
-def export_lands():
-    """导出土地基础信息数据"""
-    file_path = land_base_info_service.export_lands()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_lands(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出土地基础信息数据，按 format 参数流式输出CSV或XLSX"""
+    records = land_base_info_service.export_lands()
+    return export_response(records, LandBaseInfo, "lands", file_format)
 
 
 # 关系查询路由
@@ -3,7 +3,10 @@ import sys
 import os
 from typing import List, Optional, Union
 from enum import Enum
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 
@@ -24,9 +27,17 @@ from models.land_bidding import (
     WinningPaymentRequest,
     CreateWinningPaymentRequest,
     BiddingReviewRequest,
-    CreateBiddingReviewRequest
+    CreateBiddingReviewRequest,
+    BiddingQueryRequest
 )
-from services.land_bidding_service import land_bidding_service, CreateDepositTransactionRequest
+from services.land_bidding_service import land_bidding_service, bidding_topic, CreateDepositTransactionRequest
+from services.auction_engine import BidRejectedError
+from utils.pagination import PageParams, with_next_cursor
+from utils.export_utils import ExportFormat, export_response
+from utils.pubsub import Subscription, pubsub_hub
+
+# 实时推送无事件时发送倒计时心跳的间隔（秒）
+HEARTBEAT_SECONDS = 15
 
 # 保证金交易更新请求（本地定义，因为models中没有）
 class UpdateDepositTransactionRequest(BaseModel):
@@ -65,16 +76,6 @@ class UpdateBiddingReviewRequest(BaseModel):
     status: Optional[str] = Field(None, description="审核状态", enum=["已通过", "已拒绝"])
     remark: Optional[str] = Field(None, description="审核备注")
 
-# 竞价查询请求（本地定义，因为models中没有）
-class BiddingQueryRequest(BaseModel):
-    land_id: Optional[str] = Field(None, description="土地ID")
-    title: Optional[str] = Field(None, description="竞拍标题")
-    status: Optional[str] = Field(None, description="竞拍状态")
-    start_time_from: Optional[datetime] = Field(None, description="开始时间范围起始")
-    start_time_to: Optional[datetime] = Field(None, description="开始时间范围结束")
-    end_time_from: Optional[datetime] = Field(None, description="结束时间范围起始")
-    end_time_to: Optional[datetime] = Field(None, description="结束时间范围结束")
-
 # 竞价状态枚举（本地定义，因为models中没有）
 class BiddingStatusEnum(str, Enum):
     PENDING = "待开始"
@@ -112,13 +113,22 @@ router = APIRouter(
 # 竞价人注册管理路由
 @router.get("/bidders", response_model=List[BidderRegistration])
 def get_bidders(
+    response: Response,
     name: Optional[str] = None,
     id_number: Optional[str] = None,
     phone: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    page: PageParams = Depends()
 ):
     """获取竞价人注册列表"""
-    return land_bidding_service.get_bidders(name, id_number, phone, status)
+    return with_next_cursor(response, land_bidding_service.get_bidder_registrations(
+        status=status,
+        real_name=name,
+        id_card_number=id_number,
+        phone_number=phone,
+        limit=page.limit,
+        cursor=page.cursor
+    ))
 
 
 @router.get("/bidders/{bidder_id}", response_model=BidderRegistration)
@@ -171,14 +181,17 @@ def delete_bidder(bidder_id: str):
 # 竞价信息管理路由
 @router.get("/biddings", response_model=List[BiddingInfo])
 def get_biddings(
+    response: Response,
     land_id: Optional[str] = None,
-    bidding_no: Optional[str] = None,
     status: Optional[str] = None,
     start_time_from: Optional[datetime] = None,
-    start_time_to: Optional[datetime] = None
+    end_time_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取竞价信息列表"""
-    return land_bidding_service.get_biddings(land_id, bidding_no, status, start_time_from, start_time_to)
+    return with_next_cursor(response, land_bidding_service.get_bidding_info(
+        land_id, status, start_time_from, end_time_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/biddings/{bidding_id}", response_model=BiddingInfo)
@@ -244,15 +257,19 @@ def review_bidder(bidder_id: str, approved: bool, remark: Optional[str] = None):
 # 竞价保证金交易管理路由
 @router.get("/deposits", response_model=List[DepositTransaction])
 def get_deposits(
+    response: Response,
     bidder_id: Optional[str] = None,
     bidding_id: Optional[str] = None,
     transaction_no: Optional[str] = None,
     status: Optional[str] = None,
     transaction_date_from: Optional[datetime] = None,
-    transaction_date_to: Optional[datetime] = None
+    transaction_date_to: Optional[datetime] = None,
+    page: PageParams = Depends()
 ):
     """获取保证金交易列表"""
-    return land_bidding_service.get_deposits(bidder_id, bidding_id, transaction_no, status, transaction_date_from, transaction_date_to)
+    return with_next_cursor(response, land_bidding_service.get_deposits(
+        bidder_id, bidding_id, transaction_no, status, transaction_date_from, transaction_date_to, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/deposits/{deposit_id}", response_model=DepositTransaction)
@@ -307,11 +324,15 @@ def confirm_deposit_payment(deposit_id: str):
 # 竞价记录管理路由
 @router.get("/bid-records", response_model=List[BidRecord])
 def get_bid_records(
+    response: Response,
     bidding_id: Optional[str] = None,
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None,
+    page: PageParams = Depends()
 ):
     """获取竞价记录列表"""
-    return land_bidding_service.get_bid_records(bidding_id, user_id)
+    return with_next_cursor(response, land_bidding_service.get_bid_records(
+        bidding_id, user_id, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/bid-records/{bid_record_id}", response_model=BidRecord)
@@ -341,19 +362,19 @@ def create_bid_record(request: CreateBidRecordRequest):
         )
     
     # 创建竞价记录
-    # 设置用户ID
     bid_request = CreateBidRequest(
         bidding_id=request.bidding_id,
         bid_price=request.bid_price
     )
-    bid_record = land_bidding_service.create_bid_record(bid_request)
+    try:
+        bid_record = land_bidding_service.create_bid_record(bid_request, user_id)
+    except BidRejectedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     if not bid_record:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to create bid record"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Bidding with id {bidding_id} not found"
         )
-    # 设置用户ID
-    bid_record.user_id = user_id
     
     return bid_record
 
@@ -373,14 +394,16 @@ def update_bid_record(bid_record_id: str, request: UpdateBidRecordRequest):
 # 成交支付管理路由
 @router.get("/winning-payments", response_model=List[WinningPayment])
 def get_winning_payments(
+    response: Response,
     bidding_id: Optional[str] = None,
     bidder_id: Optional[str] = None,
     status: Optional[PaymentStatusEnum] = None,
-    payment_date_from: Optional[datetime] = None,
-    payment_date_to: Optional[datetime] = None
+    page: PageParams = Depends()
 ):
     """获取成交支付列表"""
-    return land_bidding_service.get_winning_payments(bidding_id, bidder_id, status, payment_date_from, payment_date_to)
+    return with_next_cursor(response, land_bidding_service.get_winning_payments(
+        bidding_id, bidder_id, status, limit=page.limit, cursor=page.cursor
+    ))
 
 
 @router.get("/winning-payments/{payment_id}", response_model=WinningPayment)
@@ -495,9 +518,11 @@ def update_bidding_review(review_id: str, request: UpdateBiddingReviewRequest):
 
 # 高级查询路由
 @router.post("/biddings/query", response_model=List[BiddingInfo])
-def query_biddings(request: BiddingQueryRequest):
+def query_biddings(request: BiddingQueryRequest, response: Response, page: PageParams = Depends()):
     """高级查询竞价信息"""
-    return land_bidding_service.query_biddings(request)
+    return with_next_cursor(response, land_bidding_service.query_biddings(
+        request, limit=page.limit, cursor=page.cursor
+    ))
 
 
 # 批量操作路由
@@ -519,26 +544,17 @@ def batch_create_bidders(requests: List[CreateBidderRegistrationRequest]):
 @router.get("/biddings/{bidding_id}/status")
 def get_bidding_status(bidding_id: str):
     """获取竞价当前状态"""
-    bidding = land_bidding_service.get_bidding_by_id(bidding_id)
-    if not bidding:
+    status_info = land_bidding_service.get_bidding_status(bidding_id)
+    if not status_info:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Bidding with id {bidding_id} not found"
         )
     
-    current_time = datetime.now()
-    status_info = {
-        "bidding_id": bidding_id,
-        "status": bidding.status,
-        "current_price": land_bidding_service.get_current_bidding_price(bidding_id),
-        "remaining_time": None,
-        "participant_count": land_bidding_service.get_bidding_participant_count(bidding_id),
-        "bid_count": land_bidding_service.get_bidding_bid_count(bidding_id)
-    }
-    
     # 计算剩余时间
-    if bidding.status == BiddingStatusEnum.ACTIVE:
-        remaining = bidding.end_time - current_time
+    status_info["remaining_time"] = None
+    if status_info["status"] == BiddingStatusEnum.ACTIVE:
+        remaining = status_info["end_time"] - datetime.now()
         if remaining.total_seconds() > 0:
             status_info["remaining_time"] = str(remaining)
         else:
@@ -551,7 +567,7 @@ def get_bidding_status(bidding_id: str):
 @router.get("/biddings/{bidding_id}/history")
 def get_bidding_history(bidding_id: str):
     """获取竞价历史记录"""
-    if bidding_id not in land_bidding_service.biddings_db:
+    if not land_bidding_service.get_bidding_info_by_id(bidding_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Bidding with id {bidding_id} not found"
@@ -561,32 +577,102 @@ def get_bidding_history(bidding_id: str):
     return history
 
 
+# 竞价实时推送
+async def _bidding_events(bidding_id: str, subscription: Subscription):
+    """依次产出竞价的初始快照、新出价、延时和结束事件，无事件时产出 tick 心跳（含剩余秒数）
+
+    读取快照在线程池中执行，不阻塞事件循环；竞价已被删除（快照为None）时结束
+    """
+    snapshot = await run_in_threadpool(land_bidding_service.get_bidding_event, bidding_id)
+    if snapshot is None:
+        return
+    yield snapshot
+    while True:
+        events = await subscription.get(HEARTBEAT_SECONDS)
+        if not events:
+            events = [await run_in_threadpool(land_bidding_service.get_bidding_event, bidding_id, "tick")]
+        for event in events:
+            # 消费过慢丢弃了事件时，补发一次完整快照
+            if event is not None and event["type"] == "lagged":
+                yield event
+                event = await run_in_threadpool(land_bidding_service.get_bidding_event, bidding_id)
+            if event is None:
+                return
+            yield event
+            if event["type"] == "closed":
+                return
+
+
+@router.websocket("/biddings/{bidding_id}/ws")
+async def bidding_websocket(websocket: WebSocket, bidding_id: str):
+    """通过WebSocket订阅竞价实时状态"""
+    if not await run_in_threadpool(land_bidding_service.get_bidding_info_by_id, bidding_id):
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    # 先订阅再读取快照，避免遗漏两者之间的出价
+    subscription = pubsub_hub.subscribe(bidding_topic(bidding_id))
+    try:
+        async for event in _bidding_events(bidding_id, subscription):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+
+@router.get("/biddings/{bidding_id}/events")
+async def bidding_event_stream(bidding_id: str):
+    """通过SSE（text/event-stream）订阅竞价实时状态"""
+    if not await run_in_threadpool(land_bidding_service.get_bidding_info_by_id, bidding_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Bidding with id {bidding_id} not found"
+        )
+
+    async def stream():
+        subscription = pubsub_hub.subscribe(bidding_topic(bidding_id))
+        try:
+            async for event in _bidding_events(bidding_id, subscription):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # 导出数据路由
 @router.get("/export/bidders")
-def export_bidders():
-    """导出竞价人数据"""
-    file_path = land_bidding_service.export_bidders()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_bidders(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式")
+):
+    """导出竞价人数据，按 format 参数流式输出CSV或XLSX"""
+    records = land_bidding_service.export_bidders()
+    return export_response(records, BidderRegistration, "bidders", file_format)
 
 
 @router.get("/export/biddings")
-def export_biddings():
-    """导出竞价信息数据"""
-    file_path = land_bidding_service.export_biddings()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
+def export_biddings(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出竞价信息数据，按 format 参数流式输出CSV或XLSX"""
+    records = land_bidding_service.export_biddings(time_from, time_to)
+    return export_response(records, BiddingInfo, "biddings", file_format)
 
 
 @router.get("/export/bid-records")
-def export_bid_records():
-    """导出竞价记录数据"""
-    file_path = land_bidding_service.export_bid_records()
-    return {
-        "file_path": file_path,
-        "download_url": f"/download/{file_path.split('/')[-1]}"
-    }
\ No newline at end of file
+def export_bid_records(
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="导出格式"),
+    time_from: Optional[datetime] = None,
+    time_to: Optional[datetime] = None
+):
+    """导出竞价记录数据，按 format 参数流式输出CSV或XLSX"""
+    records = land_bidding_service.export_bid_records(time_from, time_to)
+    return export_response(records, BidRecord, "bid_records", file_format)
\ No newline at end of file
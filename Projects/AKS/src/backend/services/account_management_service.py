@@ -1,7 +1,8 @@
 # 账户业务管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Iterator
+from contextlib import nullcontext
 from datetime import datetime
 import uuid
 
@@ -15,19 +16,42 @@ from models.account_management import (
     CreateAccountInfoRequest,
     UpdateAccountInfoRequest,
     CreateRechargeDetailRequest,
-    CreateExpenseDetailRequest
+    CreateExpenseDetailRequest,
+    AccountQueryRequest
 )
+from models.batch import BatchCreateResult
+from repositories.aggregates import Aggregate
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend, transaction
+from services.account_statement import AccountStatements
+from services.ledger_engine import (
+    LedgerEngine,
+    LedgerError,
+    AccountUnavailableError,
+    ACTIVE_ACCOUNT_STATUS,
+    PRIMARY_LEG_FILTERS,
+    to_amount
+)
+from utils.batch_utils import BatchErrors, UniqueKeyClaims
 
 
 class AccountManagementService:
     def __init__(self):
-        # 模拟数据库存储
-        self.accounts_db: Dict[str, AccountInfo] = {}
-        self.recharge_details_db: Dict[str, RechargeDetail] = {}
-        self.expense_details_db: Dict[str, ExpenseDetail] = {}
-        self.transactions_db: Dict[str, AccountTransaction] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.accounts_db: Repository = create_repository("accounts", AccountInfo)
+        self.recharge_details_db: Repository = create_repository("recharge_details", RechargeDetail)
+        self.expense_details_db: Repository = create_repository("expense_details", ExpenseDetail)
+        self.transactions_db: Repository = create_repository("account_transactions", AccountTransaction)
+        # 余额变动统一经记账引擎处理，分录上记录余额检查点，对账单据此查询
+        self.ledger = LedgerEngine(self.accounts_db, self.transactions_db)
+        self.statements = AccountStatements(self.transactions_db)
+        # 充值交易流水号的去重检查与写入在占用期间完成，同一流水号只入账一次
+        self.recharge_transaction_ids = UniqueKeyClaims(
+            lambda values: self.recharge_details_db.existing_values("transaction_id", values))
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
+        self._register_aggregates()
     
     def _init_test_data(self):
         # 初始化账户数据
@@ -60,16 +84,28 @@ class AccountManagementService:
     # 账户信息管理
     def get_accounts(self, 
                     user_id: Optional[str] = None, 
-                    account_status: Optional[int] = None) -> List[AccountInfo]:
+                    account_status: Optional[int] = None,
+                    limit: Optional[int] = None,
+                    cursor: Optional[str] = None) -> List[AccountInfo]:
         """获取所有账户信息"""
-        accounts = list(self.accounts_db.values())
-        
-        if user_id:
-            accounts = [a for a in accounts if a.user_id == user_id]
-        if account_status is not None:
-            accounts = [a for a in accounts if a.account_status == account_status]
-            
-        return accounts
+        return self.accounts_db.find_page(build_filters(user_id=user_id, account_status=account_status),
+                                          limit=limit, cursor=cursor)
+    
+    def query_accounts(self, request: AccountQueryRequest,
+                       limit: Optional[int] = None, cursor: Optional[str] = None) -> List[AccountInfo]:
+        """高级账户查询，按ID游标分页
+
+        账户信息中没有账户名称字段，account_name 条件不参与过滤
+        """
+        account_status = request.status
+        if account_status is not None and account_status.isdigit():
+            account_status = int(account_status)
+        filters = build_filters(
+            user_id=request.holder_id,
+            user_type=request.account_type,
+            account_status=account_status
+        )
+        return self.accounts_db.find_page(filters, limit=limit, cursor=cursor)
     
     def get_account_by_id(self, account_id: str) -> Optional[AccountInfo]:
         """根据ID获取账户信息"""
@@ -77,10 +113,7 @@ class AccountManagementService:
     
     def get_account_by_user_id(self, user_id: str) -> Optional[AccountInfo]:
         """根据用户ID获取账户信息"""
-        for account in self.accounts_db.values():
-            if account.user_id == user_id:
-                return account
-        return None
+        return self.accounts_db.find_one(build_filters(user_id=user_id))
     
     def create_account(self, request: CreateAccountInfoRequest) -> AccountInfo:
         """创建账户信息"""
@@ -89,58 +122,82 @@ class AccountManagementService:
         if existing_account:
             return existing_account
         
+        now = datetime.now()
         account = AccountInfo(
             id=str(uuid.uuid4()),
             user_id=request.user_id,
             user_type=request.user_type,
-            account_balance=request.account_balance or 0.0,
-            frozen_balance=request.frozen_balance or 0.0,
+            account_balance=float(to_amount(request.account_balance or 0)),
+            frozen_balance=float(to_amount(request.frozen_balance or 0)),
             currency="元",
             account_status=request.account_status,
-            create_time=datetime.now(),
-            update_time=datetime.now()
+            create_time=now,
+            update_time=now
         )
-        self.accounts_db[account.id] = account
         
-        # 记录交易
-        if request.account_balance and request.account_balance > 0:
-            self._record_transaction(
-                account_id=account.id,
-                transaction_type="recharge",
-                amount=request.account_balance,
-                description="账户初始化充值"
-            )
+        # 账户和初始余额的分录一起写入
+        with transaction():
+            self.accounts_db[account.id] = account
+            self.transactions_db.bulk_put(self.ledger.opening_entries(account, now))
         
         return account
     
+    def batch_create_accounts(self, requests: List[CreateAccountInfoRequest],
+                              atomic: bool = True) -> BatchCreateResult:
+        """批量创建账户信息
+
+        已有账户的用户一次性查出，每个用户只能有一个账户；账户和初始充值交易在同一事务中写入，
+        atomic 为True时任一行有错误则全部不写入
+        """
+        errors = BatchErrors()
+        users_with_account = self.accounts_db.existing_values("user_id", (req.user_id for req in requests))
+        errors.check_unique([req.user_id for req in requests], "user_id", users_with_account)
+        if errors and atomic:
+            return errors.result([])
+
+        now = datetime.now()
+        accounts = []
+        transactions = []
+        for index, req in enumerate(requests):
+            if index in errors:
+                continue
+            account = AccountInfo(
+                id=str(uuid.uuid4()),
+                user_id=req.user_id,
+                user_type=req.user_type,
+                account_balance=float(to_amount(req.account_balance or 0)),
+                frozen_balance=float(to_amount(req.frozen_balance or 0)),
+                currency="元",
+                account_status=req.account_status,
+                create_time=now,
+                update_time=now
+            )
+            accounts.append(account)
+            transactions.extend(self.ledger.opening_entries(account, now))
+
+        with transaction():
+            self.accounts_db.bulk_put(accounts)
+            self.transactions_db.bulk_put(transactions)
+        return errors.result([account.id for account in accounts])
+    
     def update_account(self, account_id: str, request: UpdateAccountInfoRequest) -> Optional[AccountInfo]:
         """更新账户信息"""
-        if account_id not in self.accounts_db:
-            return None
-        
-        account = self.accounts_db[account_id]
-        if request.user_id is not None:
-            account.user_id = request.user_id
-        if request.user_type is not None:
-            account.user_type = request.user_type
-        if request.account_status is not None:
-            account.account_status = request.account_status
-        account.update_time = datetime.now()
-        
-        self.accounts_db[account_id] = account
-        return account
+        # 经记账引擎修改，避免与并发的余额变动互相覆盖
+        return self.ledger.update(account_id, request.model_dump(exclude_none=True))
     
     def delete_account(self, account_id: str) -> bool:
         """删除账户信息"""
-        if account_id not in self.accounts_db:
-            return False
-        
-        # 检查账户余额是否为0
-        account = self.accounts_db[account_id]
-        if account.account_balance != 0 or account.frozen_balance != 0:
-            return False
-        
-        del self.accounts_db[account_id]
+        with self.ledger.account_lock(account_id):
+            account = self.accounts_db.get(account_id)
+            if account is None:
+                return False
+            
+            # 检查账户余额是否为0
+            if account.account_balance != 0 or account.frozen_balance != 0:
+                return False
+            
+            del self.accounts_db[account_id]
+        self.ledger.forget(account_id)
         return True
     
     # 充值管理
@@ -148,124 +205,180 @@ class AccountManagementService:
                             account_id: Optional[str] = None, 
                             status: Optional[str] = None, 
                             start_date: Optional[datetime] = None, 
-                            end_date: Optional[datetime] = None) -> List[RechargeDetail]:
+                            end_date: Optional[datetime] = None, 
+                            transaction_id: Optional[str] = None,
+                            limit: Optional[int] = None,
+                            cursor: Optional[str] = None) -> List[RechargeDetail]:
         """获取所有充值明细"""
-        details = list(self.recharge_details_db.values())
-        
-        if account_id is not None:
-            details = [d for d in details if d.account_id == account_id]
-        if status is not None:
-            details = [d for d in details if d.status == status]
-        if start_date is not None:
-            details = [d for d in details if d.recharge_time >= start_date]
-        if end_date is not None:
-            details = [d for d in details if d.recharge_time <= end_date]
-            
+        filters = build_filters(
+            account_id=account_id,
+            status=status,
+            transaction_id=transaction_id,
+            recharge_time__gte=start_date,
+            recharge_time__lte=end_date
+        )
         # 按时间倒序排序
-        details.sort(key=lambda x: x.recharge_time, reverse=True)
-        return details
+        return self.recharge_details_db.find_page(filters, order_by="recharge_time", descending=True,
+                                                  limit=limit, cursor=cursor)
     
     def get_recharge_detail_by_id(self, recharge_id: str) -> Optional[RechargeDetail]:
         """根据ID获取充值明细"""
         return self.recharge_details_db.get(recharge_id)
     
-    def create_recharge(self, request: CreateRechargeDetailRequest) -> Optional[Tuple[RechargeDetail, AccountInfo]]:
-        """创建充值记录"""
+    def create_recharge(self, request: CreateRechargeDetailRequest) -> Tuple[RechargeDetail, AccountInfo]:
+        """创建充值记录
+
+        充值记录、账户余额和分录在同一事务中写入；账户不存在或不可用、金额无效、交易流水号已入账时抛出 LedgerError
+        """
         # 检查账户是否存在
         account = self.get_account_by_id(request.account_id)
-        if not account or account.account_status != 1:
-            return None
+        if not account:
+            raise AccountUnavailableError(f"Account {request.account_id} not found")
+        amount = to_amount(request.amount)
         
         # 创建充值记录
         recharge = RechargeDetail(
             id=str(uuid.uuid4()),
             account_id=request.account_id,
             user_id=account.user_id,
-            recharge_amount=request.amount,
+            recharge_amount=float(amount),
             payment_method=request.payment_method,
-            transaction_id=request.remark,
+            transaction_id=request.transaction_id,
             status="已支付",  # 模拟充值成功
             recharge_time=datetime.now(),
             remark=request.remark
         )
-        self.recharge_details_db[recharge.id] = recharge
-        
-        # 更新账户余额
-        account.account_balance += request.amount
-        account.update_time = datetime.now()
-        self.accounts_db[account.id] = account
         
-        # 记录交易
-        self._record_transaction(
-            account_id=account.id,
-            transaction_type="recharge",
-            amount=request.amount,
-            description=f"充值 {request.amount}元"
-        )
+        # 更新账户余额并记账
+        with self.recharge_transaction_ids.claim([recharge.transaction_id]) as processed:
+            if processed:
+                raise LedgerError(f"Transaction {recharge.transaction_id} has already been processed")
+            account, _ = self.ledger.recharge(
+                account.id, amount, "充值", recharge.id, f"充值 {amount}元",
+                write=lambda updated: self.recharge_details_db.put(recharge)
+            )
         
         return recharge, account
     
+    def batch_create_recharges(self, requests: List[CreateRechargeDetailRequest],
+                               atomic: bool = True,
+                               dry_run: bool = False) -> BatchCreateResult:
+        """批量充值（POS终端、银行到账文件）
+
+        按交易流水号去重，已入账、批次内重复或正由其他请求入账的行跳过；账户一次性校验，同一账户的多笔充值
+        逐笔记账、账户只写入一次。atomic 为True时任一行有错误则全部不写入，校验在全部账户的锁内进行，
+        各账户在同一事务中写入；dry_run 为True时只校验不写入
+        """
+        errors = BatchErrors()
+        account_ids = {req.account_id for req in requests}
+        # 流水号占用到写入结束，并发提交的相同流水号只有一个入账
+        with self.recharge_transaction_ids.claim(req.transaction_id for req in requests) as processed, \
+                (self.ledger.accounts_locked(self.accounts_db.existing_ids(account_ids)) if atomic else nullcontext()):
+            errors.skip_duplicates([req.transaction_id for req in requests], processed)
+            accounts = {account_id: self.accounts_db.get(account_id) for account_id in account_ids}
+            for index, req in enumerate(requests):
+                if index in errors:
+                    continue
+                account = accounts[req.account_id]
+                if account is None:
+                    errors.add(index, f"Account {req.account_id} not found", "account_id")
+                elif account.account_status != ACTIVE_ACCOUNT_STATUS:
+                    errors.add(index, f"Account {req.account_id} is not active", "account_id")
+                if req.amount <= 0:
+                    errors.add(index, "amount must be greater than 0", "amount")
+            if dry_run or (errors and atomic):
+                return errors.result([])
+
+            # 按账户分组
+            now = datetime.now()
+            by_account: Dict[str, List[Tuple[int, RechargeDetail]]] = {}
+            for index, req in enumerate(requests):
+                if index in errors:
+                    continue
+                by_account.setdefault(req.account_id, []).append((index, RechargeDetail(
+                    id=str(uuid.uuid4()),
+                    account_id=req.account_id,
+                    user_id=accounts[req.account_id].user_id,
+                    recharge_amount=float(to_amount(req.amount)),
+                    payment_method=req.payment_method,
+                    transaction_id=req.transaction_id,
+                    status="已支付",
+                    recharge_time=now,
+                    remark=req.remark
+                )))
+
+            created_ids = []
+            # atomic 为True时账户已在锁内校验，记账失败（其他进程修改了账户）时抛出异常，整个事务回滚
+            with transaction() if atomic else nullcontext():
+                for account_id, rows in by_account.items():
+                    recharges = [recharge for _, recharge in rows]
+                    try:
+                        self.ledger.recharge_many(
+                            account_id,
+                            [(r.recharge_amount, "充值", r.id, f"充值 {to_amount(r.recharge_amount)}元") for r in recharges],
+                            write=lambda updated, recharges=recharges: self.recharge_details_db.bulk_put(recharges)
+                        )
+                    except LedgerError as e:
+                        if atomic:
+                            raise
+                        # 校验之后账户被停用或删除，该账户的充值整体不写入
+                        for index, _ in rows:
+                            errors.add(index, str(e), "account_id")
+                        continue
+                    created_ids.extend(recharge.id for recharge in recharges)
+        return errors.result(created_ids)
+    
     # 支出管理
     def get_expense_details(self, 
                            account_id: Optional[str] = None, 
                            expense_type: Optional[str] = None, 
                            start_date: Optional[datetime] = None, 
-                           end_date: Optional[datetime] = None) -> List[ExpenseDetail]:
+                           end_date: Optional[datetime] = None,
+                           limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[ExpenseDetail]:
         """获取所有支出明细"""
-        details = list(self.expense_details_db.values())
-        
-        if account_id is not None:
-            details = [d for d in details if d.account_id == account_id]
-        if expense_type is not None:
-            details = [d for d in details if d.expense_type == expense_type]
-        if start_date is not None:
-            details = [d for d in details if d.transaction_time >= start_date]
-        if end_date is not None:
-            details = [d for d in details if d.transaction_time <= end_date]
-            
+        filters = build_filters(
+            account_id=account_id,
+            expense_type=expense_type,
+            transaction_time__gte=start_date,
+            transaction_time__lte=end_date
+        )
         # 按时间倒序排序
-        details.sort(key=lambda x: x.transaction_time, reverse=True)
-        return details
+        return self.expense_details_db.find_page(filters, order_by="transaction_time", descending=True,
+                                                 limit=limit, cursor=cursor)
     
     def get_expense_detail_by_id(self, expense_id: str) -> Optional[ExpenseDetail]:
         """根据ID获取支出明细"""
         return self.expense_details_db.get(expense_id)
     
-    def create_expense(self, request: CreateExpenseDetailRequest) -> Optional[Tuple[ExpenseDetail, AccountInfo]]:
-        """创建支出记录"""
+    def create_expense(self, request: CreateExpenseDetailRequest) -> Tuple[ExpenseDetail, AccountInfo]:
+        """创建支出记录
+
+        余额检查在账户锁内进行，支出记录、账户余额和分录在同一事务中写入；
+        账户不存在或不可用、余额不足时抛出 LedgerError
+        """
         # 检查账户是否存在
         account = self.get_account_by_id(request.account_id)
-        if not account or account.account_status != 1:
-            return None
-        
-        # 检查余额是否足够
-        if account.account_balance < request.expense_amount:
-            return None
+        if not account:
+            raise AccountUnavailableError(f"Account {request.account_id} not found")
+        amount = to_amount(request.expense_amount)
         
         # 创建支出记录
         expense = ExpenseDetail(
             id=str(uuid.uuid4()),
             account_id=request.account_id,
             user_id=account.user_id,
-            expense_amount=request.expense_amount,
+            expense_amount=float(amount),
             expense_type=request.expense_type,
             related_business_id=request.related_business_id,
             transaction_time=datetime.now(),
             remark=request.remark
         )
-        self.expense_details_db[expense.id] = expense
-        
-        # 更新账户余额
-        account.account_balance -= request.expense_amount
-        account.update_time = datetime.now()
-        self.accounts_db[account.id] = account
         
-        # 记录交易
-        self._record_transaction(
-            account_id=account.id,
-            transaction_type="expense",
-            amount=request.expense_amount,
-            description=f"{request.expense_type}支出 {request.expense_amount}元"
+        # 检查余额、更新账户余额并记账
+        account, _ = self.ledger.debit(
+            account.id, amount, request.expense_type, expense.id, f"{request.expense_type}支出 {amount}元",
+            write=lambda updated: self.expense_details_db.put(expense)
         )
         
         return expense, account
@@ -275,108 +388,68 @@ class AccountManagementService:
                         account_id: Optional[str] = None, 
                         transaction_type: Optional[str] = None, 
                         start_date: Optional[datetime] = None, 
-                        end_date: Optional[datetime] = None) -> List[AccountTransaction]:
+                        end_date: Optional[datetime] = None,
+                        limit: Optional[int] = None,
+                        cursor: Optional[str] = None) -> List[AccountTransaction]:
         """获取所有账户交易记录"""
-        transactions = list(self.transactions_db.values())
-        
-        if account_id is not None:
-            transactions = [t for t in transactions if t.account_id == account_id]
-        if transaction_type is not None:
-            transactions = [t for t in transactions if t.transaction_type == transaction_type]
-        if start_date is not None:
-            transactions = [t for t in transactions if t.transaction_time >= start_date]
-        if end_date is not None:
-            transactions = [t for t in transactions if t.transaction_time <= end_date]
-            
+        filters = build_filters(
+            account_id=account_id,
+            transaction_type=transaction_type,
+            transaction_time__gte=start_date,
+            transaction_time__lte=end_date
+        )
         # 按时间倒序排序
-        transactions.sort(key=lambda x: x.transaction_time, reverse=True)
-        return transactions
+        return self.transactions_db.find_page(filters, order_by="transaction_time", descending=True,
+                                              limit=limit, cursor=cursor)
     
     def get_transaction_by_id(self, transaction_id: str) -> Optional[AccountTransaction]:
         """根据ID获取账户交易记录"""
         return self.transactions_db.get(transaction_id)
     
-    def _record_transaction(self, 
-                           account_id: str, 
-                           transaction_type: str, 
-                           amount: float, 
-                           description: str) -> AccountTransaction:
-        """记录账户交易"""
-        # 获取交易前后余额
+    # 账户流水
+    def get_account_statement(self,
+                              account_id: str,
+                              start_date: Optional[datetime] = None,
+                              end_date: Optional[datetime] = None,
+                              page: int = 1,
+                              page_size: int = 20) -> Optional[Dict]:
+        """获取账户对账单：时间段内的流水（含每条之后的余额）、期初期末余额和收支合计，账户不存在时返回None"""
         account = self.get_account_by_id(account_id)
-        balance_before = account.account_balance - (amount if transaction_type == "recharge" else -amount)
-        balance_after = account.account_balance
-        
-        transaction = AccountTransaction(
-            id=str(uuid.uuid4()),
-            account_id=account_id,
-            transaction_type=transaction_type,
-            amount=amount,
-            balance_before=balance_before,
-            balance_after=balance_after,
-            transaction_time=datetime.now(),
-            business_type=description,
-            business_id=None,
-            remark=description
-        )
-        self.transactions_db[transaction.id] = transaction
-        return transaction
+        if not account:
+            return None
+        return self.statements.statement(account, start_date, end_date, page, page_size)
     
     # 冻结和解冻余额
-    def freeze_balance(self, account_id: str, amount: float, reason: str) -> Optional[AccountInfo]:
-        """冻结账户余额"""
-        # 检查账户是否存在
-        account = self.get_account_by_id(account_id)
-        if not account or account.account_status != 1:
-            return None
-        
-        # 检查余额是否足够
-        if account.account_balance < amount:
-            return None
-        
-        # 冻结余额
-        account.account_balance -= amount
-        account.frozen_balance += amount
-        account.update_time = datetime.now()
-        self.accounts_db[account.id] = account
-        
-        # 记录交易
-        self._record_transaction(
-            account_id=account.id,
-            transaction_type="freeze",
-            amount=amount,
-            description=f"冻结余额 {amount}元: {reason}"
-        )
-        
+    def freeze_balance(self, account_id: str, amount: float, reason: str) -> AccountInfo:
+        """冻结账户余额，账户不可用或余额不足时抛出 LedgerError"""
+        account, _ = self.ledger.freeze(account_id, amount, f"冻结余额 {to_amount(amount)}元: {reason}")
         return account
     
-    def unfreeze_balance(self, account_id: str, amount: float, reason: str) -> Optional[AccountInfo]:
-        """解冻账户余额"""
-        # 检查账户是否存在
-        account = self.get_account_by_id(account_id)
-        if not account:
-            return None
-        
-        # 检查冻结余额是否足够
-        if account.frozen_balance < amount:
-            return None
-        
-        # 解冻余额
-        account.frozen_balance -= amount
-        account.account_balance += amount
-        account.update_time = datetime.now()
-        self.accounts_db[account.id] = account
-        
-        # 记录交易
-        self._record_transaction(
-            account_id=account.id,
-            transaction_type="unfreeze",
-            amount=amount,
-            description=f"解冻余额 {amount}元: {reason}"
-        )
-        
+    def unfreeze_balance(self, account_id: str, amount: float, reason: str) -> AccountInfo:
+        """解冻账户余额，账户不存在或冻结余额不足时抛出 LedgerError"""
+        account, _ = self.ledger.unfreeze(account_id, amount, f"解冻余额 {to_amount(amount)}元: {reason}")
         return account
     
+    # 增量统计
+    def _register_aggregates(self) -> None:
+        """注册统计接口使用的增量统计，随账户、充值、支出和交易记录的写入更新"""
+        self.account_stats_by_status = self.accounts_db.add_aggregate(
+            "by_status", Aggregate("account_status", ["account_balance", "frozen_balance"]))
+        self.account_stats_by_user_type = self.accounts_db.add_aggregate(
+            "by_user_type", Aggregate("user_type", ["account_balance"]))
+        self.recharge_stats_by_status = self.recharge_details_db.add_aggregate(
+            "by_status", Aggregate("status", ["recharge_amount"]))
+        self.recharge_stats_by_method = self.recharge_details_db.add_aggregate(
+            "by_method", Aggregate("payment_method", ["recharge_amount"], where=build_filters(status="已支付")))
+        self.recharge_stats_by_account = self.recharge_details_db.add_aggregate(
+            "paid_by_account", Aggregate("account_id", ["recharge_amount"], where=build_filters(status="已支付")))
+        self.expense_stats_by_type = self.expense_details_db.add_aggregate(
+            "by_type", Aggregate("expense_type", ["expense_amount"]))
+        self.expense_stats_by_account = self.expense_details_db.add_aggregate(
+            "by_account", Aggregate("account_id", ["expense_amount"]))
+        self.transaction_stats_by_type = self.transactions_db.add_aggregate(
+            "by_type", Aggregate("transaction_type", ["amount"], where=PRIMARY_LEG_FILTERS))
+
     # 账户统计
     def get_account_statistics(self, account_id: str) -> Optional[Dict]:
         """获取账户统计信息"""
@@ -391,30 +464,21 @@ class AccountManagementService:
         
         # 本月充值总额
         monthly_recharge = sum(
-            r.recharge_amount for r in self.recharge_details_db.values()
-            if r.account_id == account_id and 
-               r.status == "已支付" and 
-               r.recharge_time >= month_start
+            r.recharge_amount for r in self.recharge_details_db.find(
+                build_filters(account_id=account_id, status="已支付", recharge_time__gte=month_start)
+            )
         )
         
         # 本月支出总额
         monthly_expense = sum(
-            e.expense_amount for e in self.expense_details_db.values()
-            if e.account_id == account_id and 
-               e.transaction_time >= month_start
+            e.expense_amount for e in self.expense_details_db.find(
+                build_filters(account_id=account_id, transaction_time__gte=month_start)
+            )
         )
         
-        # 累计充值总额
-        total_recharge = sum(
-            r.recharge_amount for r in self.recharge_details_db.values()
-            if r.account_id == account_id and r.status == "已支付"
-        )
-        
-        # 累计支出总额
-        total_expense = sum(
-            e.expense_amount for e in self.expense_details_db.values()
-            if e.account_id == account_id
-        )
+        # 累计充值、支出总额
+        total_recharge = self.recharge_stats_by_account.group(account_id)["recharge_amount"]
+        total_expense = self.expense_stats_by_account.group(account_id)["expense_amount"]
         
         return {
             "account_id": account_id,
@@ -425,6 +489,82 @@ class AccountManagementService:
             "total_recharge": total_recharge,
             "total_expense": total_expense
         }
+    
+    def get_accounts_overview(self) -> Dict:
+        """获取全部账户的统计信息"""
+        by_status = self.account_stats_by_status.groups()
+        by_user_type = self.account_stats_by_user_type.groups()
+        totals = self.account_stats_by_status.total()
+
+        return {
+            "total_accounts": totals["count"],
+            "total_balance": totals["account_balance"],
+            "total_frozen_balance": totals["frozen_balance"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "user_type_count": {key: group["count"] for key, group in by_user_type.items()},
+            "user_type_balance": {key: group["account_balance"] for key, group in by_user_type.items()}
+        }
+
+    def get_transaction_statistics(self) -> Dict:
+        """获取交易统计信息"""
+        by_type = self.transaction_stats_by_type.groups()
+        return {
+            "total_transactions": self.transaction_stats_by_type.total()["count"],
+            "type_count": {key: group["count"] for key, group in by_type.items()},
+            "type_amount": {key: group["amount"] for key, group in by_type.items()}
+        }
+
+    def get_recharge_statistics(self) -> Dict:
+        """获取充值统计信息"""
+        by_status = self.recharge_stats_by_status.groups()
+        by_method = self.recharge_stats_by_method.groups()
+        paid = self.recharge_stats_by_status.group("已支付")
+        return {
+            "total_recharges": self.recharge_stats_by_status.total()["count"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_amount": {key: group["recharge_amount"] for key, group in by_status.items()},
+            "method_count": {key: group["count"] for key, group in by_method.items()},
+            "method_amount": {key: group["recharge_amount"] for key, group in by_method.items()},
+            "paid_count": paid["count"],
+            "total_paid_amount": paid["recharge_amount"]
+        }
+
+    def get_expense_statistics(self) -> Dict:
+        """获取支出统计信息"""
+        by_type = self.expense_stats_by_type.groups()
+        totals = self.expense_stats_by_type.total()
+        return {
+            "total_expenses": totals["count"],
+            "total_expense_amount": totals["expense_amount"],
+            "type_count": {key: group["count"] for key, group in by_type.items()},
+            "type_amount": {key: group["expense_amount"] for key, group in by_type.items()}
+        }
+    
+    # 数据导出
+    def export_accounts(self) -> Iterator[AccountInfo]:
+        """导出账户信息，逐条产出供流式导出"""
+        return self.accounts_db.stream()
+    
+    def export_recharges(self,
+                         time_from: Optional[datetime] = None,
+                         time_to: Optional[datetime] = None) -> Iterator[RechargeDetail]:
+        """导出充值明细，按充值时间倒序，逐条产出供流式导出"""
+        filters = build_filters(recharge_time__gte=time_from, recharge_time__lte=time_to)
+        return self.recharge_details_db.stream(filters, order_by="recharge_time", descending=True)
+    
+    def export_expenses(self,
+                        time_from: Optional[datetime] = None,
+                        time_to: Optional[datetime] = None) -> Iterator[ExpenseDetail]:
+        """导出支出明细，按交易时间倒序，逐条产出供流式导出"""
+        filters = build_filters(transaction_time__gte=time_from, transaction_time__lte=time_to)
+        return self.expense_details_db.stream(filters, order_by="transaction_time", descending=True)
+    
+    def export_transactions(self,
+                            time_from: Optional[datetime] = None,
+                            time_to: Optional[datetime] = None) -> Iterator[AccountTransaction]:
+        """导出账户交易记录，按交易时间倒序，逐条产出供流式导出"""
+        filters = build_filters(transaction_time__gte=time_from, transaction_time__lte=time_to)
+        return self.transactions_db.stream(filters, order_by="transaction_time", descending=True)
 
 
 # 创建服务实例供导入使用
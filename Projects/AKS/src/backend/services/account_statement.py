@@ -0,0 +1,109 @@
+# 账户对账单
+# 记账引擎在每条分录上记录本分录后的可用余额、冻结余额以及可用余额的累计转入、转出金额，每条分录即一个余额检查点；
+# 同一账户的分录序号从1起连续编号、记账时间随序号单调不减，对账单按序号二分查找时间段的起止分录，
+# 每次查找是一次 (账户ID, 记账序号) 的索引查询，期初、期末余额和收支合计取自起止分录前后的检查点，
+# 再按序号取出一页分录；查询次数为 O(log n)，与账户的历史流水量无关，也不在进程内缓存流水
+import sys
+import os
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.account_management import AccountInfo, AccountTransaction
+from repositories.base import Repository, build_filters
+from services.ledger_engine import ZERO, to_amount
+
+
+class AccountStatements:
+    """按分录上记录的余额检查点生成账户对账单"""
+
+    def __init__(self, transactions_db: Repository):
+        self.transactions_db = transactions_db
+
+    def _entry(self, account_id: str, sequence: int) -> List[AccountTransaction]:
+        """账户第 sequence 个分录中本账户的记录（可用余额、冻结余额各至多一条）"""
+        return self.transactions_db.find(build_filters(sequence=sequence, account_id=account_id))
+
+    def _entries_before(self, account: AccountInfo, moment: datetime, inclusive: bool) -> int:
+        """记账时间早于（inclusive 时不晚于）moment 的分录数"""
+        low, high = 0, account.entry_sequence
+        while low < high:
+            middle = (low + high) // 2
+            records = self._entry(account.id, middle + 1)
+            time = records[0].transaction_time if records else None
+            if time is not None and (time <= moment if inclusive else time < moment):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @staticmethod
+    def _after(records: List[AccountTransaction]) -> Dict[str, Decimal]:
+        """分录后的余额和累计金额"""
+        record = records[0]
+        return {"available": to_amount(record.running_balance), "frozen": to_amount(record.running_frozen_balance),
+                "credits": to_amount(record.total_credit), "debits": to_amount(record.total_debit)}
+
+    @classmethod
+    def _before(cls, records: List[AccountTransaction]) -> Dict[str, Decimal]:
+        """分录前的余额和累计金额，由分录后的检查点减去本分录的变动得到"""
+        balances = cls._after(records)
+        for record in records:
+            if record.balance_before is None:
+                continue
+            if record.balance_type == "frozen":
+                balances["frozen"] = to_amount(record.balance_before)
+                continue
+            balances["available"] = to_amount(record.balance_before)
+            side = "credits" if record.entry_side == "credit" else "debits"
+            balances[side] -= to_amount(record.amount)
+        return balances
+
+    def _balances(self, account: AccountInfo, position: int) -> Dict[str, Decimal]:
+        """前 position 个分录之后的余额和累计金额；position 为0时取首个分录之前，账户无分录时为账户当前余额"""
+        if position > 0:
+            records = self._entry(account.id, position)
+            if records:
+                return self._after(records)
+        elif account.entry_sequence > 0:
+            records = self._entry(account.id, 1)
+            if records:
+                return self._before(records)
+        return {"available": to_amount(account.account_balance), "frozen": to_amount(account.frozen_balance),
+                "credits": ZERO, "debits": ZERO}
+
+    def statement(self, account: AccountInfo, start_date: Optional[datetime], end_date: Optional[datetime],
+                  page: int, page_size: int) -> Dict[str, Any]:
+        """时间段 [start_date, end_date] 的对账单，按分录分页，冻结、解冻分录含可用余额和冻结余额两条记录"""
+        low = self._entries_before(account, start_date, inclusive=False) if start_date is not None else 0
+        if end_date is not None:
+            high = max(low, self._entries_before(account, end_date, inclusive=True))
+        else:
+            high = account.entry_sequence
+        opening = self._balances(account, low)
+        closing = self._balances(account, high)
+
+        first = min(low + (page - 1) * page_size, high)
+        last = min(first + page_size, high)
+        records = []
+        if last > first:
+            records = self.transactions_db.find(
+                build_filters(sequence__in=list(range(first + 1, last + 1)), account_id=account.id),
+                order_by="sequence"
+            )
+        return {
+            "account_id": account.id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "opening_balance": float(opening["available"]),
+            "opening_frozen_balance": float(opening["frozen"]),
+            "closing_balance": float(closing["available"]),
+            "closing_frozen_balance": float(closing["frozen"]),
+            "total_credit": float(closing["credits"] - opening["credits"]),
+            "total_debit": float(closing["debits"] - opening["debits"]),
+            "total": high - low,
+            "page": page,
+            "page_size": page_size,
+            "transactions": [record.model_dump() for record in records]
+        }
@@ -0,0 +1,182 @@
+# 贷款还款计划计算
+# 以 NumPy 数组一次计算多笔贷款的还款计划：各贷款的还款期展开为一维数组（贷款序号、期次一一对应），
+# 本金、利息和还款日均按数组整体运算，不逐期循环；还款日按放款日逐月顺延，
+# 当月没有对应日期（如1月31日放款）时取当月最后一天。
+# 资产组合的现金流按月分组求和，贷款分块计算，内存占用与单块的还款期数相关，与贷款总数无关
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 还款方式
+EQUAL_INSTALLMENT = "等额本息"
+EQUAL_PRINCIPAL = "等额本金"
+REPAYMENT_METHODS = [EQUAL_INSTALLMENT, EQUAL_PRINCIPAL]
+# 组合现金流分块计算时，每块最多展开的还款期数
+CHUNK_PERIODS = 2_000_000
+# 1970-01-01 的序数日，datetime64[D] 以该日为0
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class LoanBook:
+    """一组贷款的列数据：本金、年利率（百分比）、期数（月）、还款方式、起息日"""
+
+    def __init__(self, principal: Sequence[float], annual_rate: Sequence[float], terms: Sequence[int],
+                 methods: Sequence[str], start_dates: Sequence[Any]):
+        self.principal = np.asarray(principal, dtype=np.float64)
+        # 年利率为百分比（4.2 表示 4.2%），换算为月利率
+        self.monthly_rate = np.asarray(annual_rate, dtype=np.float64) / 100 / 12
+        self.terms = np.maximum(np.asarray(terms, dtype=np.int64), 0)
+        self.equal_principal = np.asarray([method == EQUAL_PRINCIPAL for method in methods], dtype=bool)
+        # 经序数日转换为 datetime64[D]，比逐个解析 date 对象快一个数量级
+        ordinals = np.fromiter((value.toordinal() for value in start_dates), dtype=np.int64, count=len(self.principal))
+        self.start_dates = (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+    def __len__(self) -> int:
+        return len(self.principal)
+
+    def take(self, index: np.ndarray) -> "LoanBook":
+        """按序号取部分贷款"""
+        book = LoanBook.__new__(LoanBook)
+        book.principal = self.principal[index]
+        book.monthly_rate = self.monthly_rate[index]
+        book.terms = self.terms[index]
+        book.equal_principal = self.equal_principal[index]
+        book.start_dates = self.start_dates[index]
+        return book
+
+
+def add_months(start_dates: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """日期逐月顺延 months 个月，目标月份没有对应日期时取该月最后一天"""
+    start_months = start_dates.astype("datetime64[M]")
+    day_offset = (start_dates - start_months.astype("datetime64[D]")).astype(np.int64)
+    target_months = start_months + months.astype("timedelta64[M]")
+    month_starts = target_months.astype("datetime64[D]")
+    month_lengths = ((target_months + 1).astype("datetime64[D]") - month_starts).astype(np.int64)
+    return month_starts + np.minimum(day_offset, month_lengths - 1).astype("timedelta64[D]")
+
+
+def _installment(principal: np.ndarray, rate: np.ndarray, terms: np.ndarray) -> np.ndarray:
+    """等额本息的每期还款额，零利率时为本金平均分摊"""
+    terms = np.maximum(terms, 1)
+    growth = np.power(1 + rate, terms)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = principal * rate * growth / (growth - 1)
+    return np.where(rate > 0, payment, principal / terms)
+
+
+def _expand(book: LoanBook, first_period: Optional[np.ndarray] = None,
+            last_period: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """将每笔贷款的第 first_period 至 last_period 期（默认为全部各期）展开，
+    返回贷款序号、期次（从1开始）和未舍入的本金、利息；各期金额按公式直接计算，不依赖前一期
+    """
+    terms = book.terms
+    first_period = np.ones_like(terms) if first_period is None else first_period
+    last_period = terms if last_period is None else last_period
+    counts = np.maximum(last_period - first_period + 1, 0)
+    loan = np.repeat(np.arange(len(book)), counts)
+    offsets = np.cumsum(counts) - counts
+    period = np.arange(len(loan), dtype=np.int64) - np.repeat(offsets - first_period, counts)
+
+    principal = book.principal[loan]
+    rate = book.monthly_rate[loan]
+    term = terms[loan].astype(np.float64)
+    # 等额本息：第 k 期期初余额 B = P(1+r)^(k-1) - A((1+r)^(k-1)-1)/r
+    payment = _installment(book.principal, book.monthly_rate, terms)[loan]
+    growth = np.power(1 + rate, period - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity_balance = np.where(rate > 0, principal * growth - payment * (growth - 1) / rate,
+                                   principal - payment * (period - 1))
+    # 等额本金：每期本金相同，期初余额按已还期数递减
+    linear_balance = principal - principal / term * (period - 1)
+
+    equal_principal = book.equal_principal[loan]
+    balance = np.where(equal_principal, linear_balance, annuity_balance)
+    interest = balance * rate
+    principal_paid = np.where(equal_principal, principal / term, payment - interest)
+    return {"loan": loan, "period": period, "offsets": offsets,
+            "principal": principal_paid, "interest": interest}
+
+
+def amortize(book: LoanBook) -> Dict[str, np.ndarray]:
+    """计算全部贷款的还款计划
+
+    返回一维数组：loan（贷款序号）、period（期次）、due_date（还款日）、principal、interest、payment、
+    remaining（本期后剩余本金），金额舍入到分，最后一期本金取剩余本金，各期本金之和与贷款本金相等
+    """
+    rows = _expand(book)
+    loan, offsets = rows["loan"], rows["offsets"]
+    principal = np.round(rows["principal"], 2)
+    interest = np.round(rows["interest"], 2)
+
+    # 每笔贷款已还本金的累计值，最后一期的本金用贷款本金减去之前各期的合计
+    repaid = np.cumsum(principal)
+    repaid_before = np.concatenate(([0.0], repaid))[offsets][loan]
+    repaid = repaid - repaid_before
+    loan_principal = np.round(book.principal, 2)[loan]
+    last = rows["period"] == book.terms[loan]
+    principal = np.where(last, np.round(loan_principal - (repaid - principal), 2), principal)
+    remaining = np.where(last, 0.0, np.round(loan_principal - repaid, 2))
+
+    return {
+        "loan": loan,
+        "period": rows["period"],
+        "due_date": add_months(book.start_dates[loan], rows["period"]),
+        "principal": principal,
+        "interest": interest,
+        "payment": np.round(principal + interest, 2),
+        "remaining": remaining
+    }
+
+
+def schedule_rows(schedule: Dict[str, np.ndarray], loan_index: int = 0) -> List[Dict[str, Any]]:
+    """取出单笔贷款的还款计划行"""
+    positions = np.flatnonzero(schedule["loan"] == loan_index)
+    due_dates = schedule["due_date"][positions].astype("datetime64[s]").tolist()
+    return [
+        {
+            "month": int(period),
+            "due_date": due_date,
+            "monthly_payment": float(payment),
+            "principal_payment": float(principal),
+            "interest_payment": float(interest),
+            "remaining_principal": float(remaining)
+        }
+        for period, due_date, payment, principal, interest, remaining in zip(
+            schedule["period"][positions].tolist(), due_dates,
+            schedule["payment"][positions].tolist(), schedule["principal"][positions].tolist(),
+            schedule["interest"][positions].tolist(), schedule["remaining"][positions].tolist())
+    ]
+
+
+def monthly_cash_flow(book: LoanBook, start_month: date, months: int,
+                      chunk_periods: int = CHUNK_PERIODS) -> Dict[str, np.ndarray]:
+    """组合现金流：从 start_month 所在月份起 months 个月内，每月应收的本金、利息和还款笔数
+
+    每笔贷款只展开落在统计区间内的各期；贷款按展开期数分块计算，各块按月分组求和后累加
+    """
+    first = np.datetime64(start_month, "M")
+    principal = np.zeros(months)
+    interest = np.zeros(months)
+    count = np.zeros(months, dtype=np.int64)
+
+    # 第 k 期还款日在起息月之后第 k 个月，统计区间 [0, months) 对应的期次为 [first, last]
+    start_offset = (book.start_dates.astype("datetime64[M]") - first).astype(np.int64)
+    first_period = np.maximum(1, -start_offset)
+    last_period = np.minimum(book.terms, months - 1 - start_offset)
+    overlapping = np.flatnonzero(last_period >= first_period)
+    if len(overlapping) == 0:
+        return {"month": first + np.arange(months), "principal": principal, "interest": interest, "count": count}
+
+    # 按累计展开期数切分，每块展开的期数不超过 chunk_periods
+    cumulative = np.cumsum(last_period[overlapping] - first_period[overlapping] + 1)
+    boundaries = np.searchsorted(cumulative, np.arange(chunk_periods, cumulative[-1], chunk_periods), side="right")
+    for chunk in np.split(overlapping, np.unique(boundaries)):
+        if len(chunk) == 0:
+            continue
+        rows = _expand(book.take(chunk), first_period[chunk], last_period[chunk])
+        month = start_offset[chunk][rows["loan"]] + rows["period"]
+        principal += np.bincount(month, weights=rows["principal"], minlength=months)
+        interest += np.bincount(month, weights=rows["interest"], minlength=months)
+        count += np.bincount(month, minlength=months)
+    return {"month": first + np.arange(months), "principal": principal, "interest": interest, "count": count}
@@ -0,0 +1,260 @@
+# 实时竞拍引擎
+# 每场竞拍在进程内保存当前最高价、最高出价人、加价规则和结束时间，出价在该场竞拍的锁内校验并接受，
+# 不同竞拍之间互不阻塞；状态首次使用时从仓储加载，之后随出价和竞拍信息的修改同步更新
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.land_bidding import BiddingInfo, BidRecord
+
+# 竞拍进行中的状态
+ACTIVE_STATUS = "进行中"
+# 结束前该时间内有新出价则延长结束时间（防止最后时刻抢拍）
+EXTEND_WINDOW = timedelta(minutes=5)
+EXTENSION = timedelta(minutes=5)
+# 出价金额比较的容差，避免浮点误差导致刚好等于最低价的出价被拒绝
+PRICE_TOLERANCE = 1e-6
+# 资格缓存条目的有效时间（秒），其他进程修改注册、保证金后最多滞后该时间
+ELIGIBILITY_CACHE_SECONDS = float(os.getenv("AKS_ELIGIBILITY_CACHE_SECONDS", "10"))
+
+
+class BidRejectedError(ValueError):
+    """出价不符合竞拍规则异常"""
+    pass
+
+
+class AuctionState:
+    """单场竞拍的实时状态，字段只在持有 lock 时修改"""
+
+    __slots__ = ("bidding_id", "lock", "status", "starting_price", "increment", "start_time", "end_time",
+                 "high_price", "high_bidder", "bid_count", "bidders", "last_bid_time", "extension_count")
+
+    def __init__(self, bidding: BiddingInfo, bids: Iterable[BidRecord] = ()):
+        self.bidding_id = bidding.id
+        self.lock = threading.Lock()
+        self.high_price: Optional[float] = None
+        self.high_bidder: Optional[str] = None
+        self.bid_count = 0
+        self.bidders: Set[str] = set()
+        self.last_bid_time: Optional[datetime] = None
+        self.extension_count = 0
+        self.apply_bidding(bidding)
+        # 已有出价按时间顺序重放，同价时先出价者为最高出价人
+        for bid in sorted(bids, key=lambda x: x.bid_time):
+            self.bid_count += 1
+            self.bidders.add(bid.user_id)
+            self.last_bid_time = bid.bid_time
+            if self.high_price is None or bid.bid_price > self.high_price:
+                self.high_price = bid.bid_price
+                self.high_bidder = bid.user_id
+
+    def apply_bidding(self, bidding: BiddingInfo) -> None:
+        """同步竞拍信息中的状态、时间和加价规则"""
+        self.status = bidding.status
+        self.starting_price = bidding.starting_price
+        self.increment = bidding.increment
+        self.start_time = bidding.start_time
+        self.end_time = bidding.end_time
+
+    @property
+    def minimum_price(self) -> float:
+        """下一次出价的最低金额：无出价时为起拍价，否则为当前最高价加一个加价幅度"""
+        if self.high_price is None:
+            return self.starting_price
+        return self.high_price + self.increment
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态的只读副本"""
+        return {
+            "bidding_id": self.bidding_id,
+            "status": self.status,
+            "current_price": self.high_price if self.high_price is not None else self.starting_price,
+            "highest_bidder": self.high_bidder,
+            "minimum_price": self.minimum_price,
+            "end_time": self.end_time,
+            "bid_count": self.bid_count,
+            "participant_count": len(self.bidders),
+            "extension_count": self.extension_count
+        }
+
+
+class AuctionEngine:
+    """实时竞拍引擎，出价校验与接受为O(1)，同一竞拍的并发出价按锁顺序串行处理"""
+
+    def __init__(self, extend_window: timedelta = EXTEND_WINDOW, extension: timedelta = EXTENSION,
+                 on_bid: Optional[Callable[[AuctionState, bool], None]] = None):
+        self.extend_window = extend_window
+        self.extension = extension
+        # 出价被接受后在竞拍锁内回调 on_bid(状态, 是否延长了结束时间)，保证通知顺序与出价顺序一致
+        self.on_bid = on_bid
+        self._auctions: Dict[str, AuctionState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, bidding_id: str) -> Optional[AuctionState]:
+        """获取已加载的竞拍状态"""
+        return self._auctions.get(bidding_id)
+
+    def ensure(self, bidding_id: str,
+               loader: Callable[[str], Optional[AuctionState]]) -> Optional[AuctionState]:
+        """获取竞拍状态，未加载时调用 loader 从仓储构建，竞拍不存在时返回None"""
+        state = self._auctions.get(bidding_id)
+        if state is not None:
+            return state
+        with self._lock:
+            state = self._auctions.get(bidding_id)
+            if state is None:
+                state = loader(bidding_id)
+                if state is not None:
+                    self._auctions[bidding_id] = state
+            return state
+
+    def sync(self, bidding: BiddingInfo) -> None:
+        """竞拍信息修改后同步已加载的状态"""
+        state = self._auctions.get(bidding.id)
+        if state is not None:
+            with state.lock:
+                state.apply_bidding(bidding)
+
+    def remove(self, bidding_id: str) -> None:
+        """竞拍删除后移除状态"""
+        with self._lock:
+            self._auctions.pop(bidding_id, None)
+
+    def close(self, state: AuctionState, status: str, now: Optional[datetime] = None) -> bool:
+        """到达结束时间时将竞拍状态置为 status，之后的出价均被拒绝
+
+        结束时间已因最后时刻出价而延长时不结束，返回False
+        """
+        with state.lock:
+            now = now or datetime.now()
+            if now < state.end_time:
+                return False
+            state.status = status
+            return True
+
+    def place_bid(self, state: AuctionState, user_id: str, price: float,
+                  persist: Callable[[float, datetime, Optional[datetime]], Any],
+                  now: Optional[datetime] = None) -> Any:
+        """在竞拍锁内校验并接受出价
+
+        persist(出价金额, 出价时间, 延长后的结束时间或None) 负责保存出价记录，
+        保存成功后才更新内存状态，保存失败时异常直接抛出、状态保持不变；返回 persist 的返回值
+        """
+        with state.lock:
+            now = now or datetime.now()
+            if state.status != ACTIVE_STATUS:
+                raise BidRejectedError(f"Bidding {state.bidding_id} is not active")
+            if now < state.start_time or now > state.end_time:
+                raise BidRejectedError(f"Bidding {state.bidding_id} is not open for bids at this time")
+            if user_id == state.high_bidder:
+                raise BidRejectedError(f"User {user_id} already holds the highest bid")
+            minimum = state.minimum_price
+            if price < minimum - PRICE_TOLERANCE:
+                raise BidRejectedError(f"Bid price {price} is lower than the minimum {minimum}")
+
+            # 最后5分钟内出价，结束时间延长5分钟
+            new_end_time = None
+            if state.end_time - now <= self.extend_window:
+                new_end_time = state.end_time + self.extension
+
+            result = persist(price, now, new_end_time)
+
+            state.high_price = price
+            state.high_bidder = user_id
+            state.bid_count += 1
+            state.bidders.add(user_id)
+            state.last_bid_time = now
+            if new_end_time is not None:
+                state.end_time = new_end_time
+                state.extension_count += 1
+            if self.on_bid is not None:
+                self.on_bid(state, new_end_time is not None)
+            return result
+
+
+class EligibilityCache:
+    """竞拍资格缓存
+
+    按用户缓存所对应的注册及其审核结果，按 (用户ID, 竞拍ID) 缓存保证金缴纳情况；
+    注册、审核、保证金变化时由服务层使相应条目失效，条目另有有效时间，其他进程的修改在有效时间后生效。
+    用户对应的注册可能按身份证号查到，失效按注册ID进行：清除查到该注册的用户和尚未查到注册的用户。
+    竞拍状态和时间直接读取竞拍引擎，不做缓存
+    """
+
+    def __init__(self, ttl: float = ELIGIBILITY_CACHE_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # 用户ID -> (注册ID，无注册时为None, 注册是否已通过, 过期时间)
+        self._registrations: Dict[str, Tuple[Optional[str], bool, float]] = {}
+        # 注册ID -> 缓存了该注册的用户ID
+        self._registration_users: Dict[str, Set[str]] = {}
+        # (用户ID, 竞拍ID) -> (是否已缴保证金, 过期时间)
+        self._deposits: Dict[Tuple[str, str], Tuple[bool, float]] = {}
+        # 竞拍ID -> 缓存了保证金的用户ID，竞拍结束时整体清除
+        self._bidding_users: Dict[str, Set[str]] = {}
+        # 每次失效加一；加载期间发生过失效时不写入缓存，避免旧数据覆盖
+        self._generation = 0
+
+    def registration(self, user_id: str,
+                     loader: Callable[[str], Tuple[Optional[str], bool]]) -> Tuple[bool, bool]:
+        """获取 (是否已注册, 注册是否已通过)，未缓存或已过期时调用 loader 加载 (注册ID, 是否已通过)"""
+        cached = self._registrations.get(user_id)
+        if cached is None or cached[2] <= time.monotonic():
+            generation = self._generation
+            registration_id, approved = loader(user_id)
+            cached = (registration_id, approved, time.monotonic() + self.ttl)
+            with self._lock:
+                if generation == self._generation:
+                    self._forget_user(user_id)
+                    self._registrations[user_id] = cached
+                    self._registration_users.setdefault(registration_id, set()).add(user_id)
+        return cached[0] is not None, cached[1]
+
+    def _forget_user(self, user_id: str) -> None:
+        previous = self._registrations.pop(user_id, None)
+        if previous is None:
+            return
+        users = self._registration_users.get(previous[0])
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._registration_users[previous[0]]
+
+    def deposit(self, user_id: str, bidding_id: str, loader: Callable[[str, str], bool]) -> bool:
+        """获取保证金缴纳情况，未缓存时调用 loader 加载"""
+        key = (user_id, bidding_id)
+        cached = self._deposits.get(key)
+        if cached is None or cached[1] <= time.monotonic():
+            generation = self._generation
+            cached = (loader(user_id, bidding_id), time.monotonic() + self.ttl)
+            with self._lock:
+                if generation == self._generation:
+                    self._deposits[key] = cached
+                    self._bidding_users.setdefault(bidding_id, set()).add(user_id)
+        return cached[0]
+
+    def invalidate_registration(self, registration_id: str) -> None:
+        """注册信息或审核结果变化：清除查到该注册的用户，以及尚未查到注册的用户（新注册或身份证号变更后可能查到）"""
+        with self._lock:
+            self._generation += 1
+            users: List[str] = list(self._registration_users.get(registration_id, ()))
+            users.extend(self._registration_users.get(None, ()))
+            for user_id in users:
+                self._forget_user(user_id)
+
+    def invalidate_deposit(self, user_id: str, bidding_id: str) -> None:
+        """保证金交易变化"""
+        with self._lock:
+            self._generation += 1
+            self._deposits.pop((user_id, bidding_id), None)
+
+    def invalidate_bidding(self, bidding_id: str) -> None:
+        """竞拍结束或删除，清除该竞拍的全部保证金缓存"""
+        with self._lock:
+            self._generation += 1
+            for user_id in self._bidding_users.pop(bidding_id, ()):
+                self._deposits.pop((user_id, bidding_id), None)
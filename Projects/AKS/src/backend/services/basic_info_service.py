@@ -1,7 +1,7 @@
 # 基本信息管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict
+from typing import List, Optional, Iterator
 from datetime import datetime
 import uuid
 
@@ -16,18 +16,27 @@ from models.basic_info import (
     CreateVillageBaseInfoRequest as CreateVillageRequest,
     UpdateVillageBaseInfoRequest as UpdateVillageRequest,
     CreateFarmerInfoRequest as CreateFarmerRequest,
-    UpdateFarmerInfoRequest as UpdateFarmerRequest
+    UpdateFarmerInfoRequest as UpdateFarmerRequest,
+    FarmerQueryRequest
 )
+from models.batch import BatchCreateResult
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend
+from repositories.async_repository import AsyncDocumentRepository
+from utils.batch_utils import BatchErrors
 
 
 class BasicInfoService:
     def __init__(self):
-        # 模拟数据库存储
-        self.townships_db: Dict[str, TownshipBaseInfo] = {}
-        self.villages_db: Dict[str, VillageBaseInfo] = {}
-        self.farmers_db: Dict[str, FarmerInfo] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.townships_db: Repository = create_repository("townships", TownshipBaseInfo)
+        self.villages_db: Repository = create_repository("villages", VillageBaseInfo)
+        self.farmers_db: Repository = create_repository("farmers", FarmerInfo)
+        # 异步读取仓储，供高频查询接口使用
+        self.farmers_async_repo = AsyncDocumentRepository("farmers", FarmerInfo, lambda: self.farmers_db)
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
     
     def _init_test_data(self):
         # 初始化乡镇数据
@@ -84,11 +93,15 @@ class BasicInfoService:
         self.farmers_db[farmer1.id] = farmer1
     
     # 乡镇信息管理
-    def get_townships(self, status: Optional[int] = None) -> List[TownshipBaseInfo]:
+    def get_townships(self, 
+                      name: Optional[str] = None, 
+                      code: Optional[str] = None, 
+                      status: Optional[int] = None,
+                      limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> List[TownshipBaseInfo]:
         """获取所有乡镇信息"""
-        if status is not None:
-            return [t for t in self.townships_db.values() if t.status == status]
-        return list(self.townships_db.values())
+        return self.townships_db.find_page(build_filters(name__contains=name, code=code, status=status),
+                                           limit=limit, cursor=cursor)
     
     def get_township_by_id(self, township_id: str) -> Optional[TownshipBaseInfo]:
         """根据ID获取乡镇信息"""
@@ -151,9 +164,7 @@ class BasicInfoService:
             return False
         
         # 检查是否有关联的村庄
-        has_related_villages = any(
-            village.township_id == township_id for village in self.villages_db.values()
-        )
+        has_related_villages = self.villages_db.find_one(build_filters(township_id=township_id)) is not None
         
         if has_related_villages:
             # 如果有关联的村庄，不允许删除
@@ -163,16 +174,21 @@ class BasicInfoService:
         return True
     
     # 村庄信息管理
-    def get_villages(self, township_id: Optional[str] = None, status: Optional[int] = None) -> List[VillageBaseInfo]:
+    def get_villages(self, 
+                     township_id: Optional[str] = None, 
+                     status: Optional[int] = None, 
+                     name: Optional[str] = None, 
+                     code: Optional[str] = None,
+                     limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> List[VillageBaseInfo]:
         """获取所有村庄信息"""
-        villages = list(self.villages_db.values())
-        
-        if township_id:
-            villages = [v for v in villages if v.township_id == township_id]
-        if status is not None:
-            villages = [v for v in villages if v.status == status]
-            
-        return villages
+        filters = build_filters(
+            township_id=township_id or None,
+            status=status,
+            name__contains=name,
+            code=code
+        )
+        return self.villages_db.find_page(filters, limit=limit, cursor=cursor)
     
     def get_village_by_id(self, village_id: str) -> Optional[VillageBaseInfo]:
         """根据ID获取村庄信息"""
@@ -242,9 +258,7 @@ class BasicInfoService:
             return False
         
         # 检查是否有关联的农户
-        has_related_farmers = any(
-            farmer.village_id == village_id for farmer in self.farmers_db.values()
-        )
+        has_related_farmers = self.farmers_db.find_one(build_filters(village_id=village_id)) is not None
         
         if has_related_farmers:
             # 如果有关联的农户，不允许删除
@@ -254,16 +268,37 @@ class BasicInfoService:
         return True
     
     # 农户信息管理
-    def get_users(self, village_id: Optional[str] = None, status: Optional[int] = None) -> List[FarmerInfo]:
+    def get_users(self, village_id: Optional[str] = None, status: Optional[int] = None,
+                  limit: Optional[int] = None, cursor: Optional[str] = None) -> List[FarmerInfo]:
         """获取所有用户信息"""
-        farmers = list(self.farmers_db.values())
-        
-        if village_id:
-            farmers = [f for f in farmers if f.village_id == village_id]
-        if status is not None:
-            farmers = [f for f in farmers if f.status == status]
-            
-        return farmers
+        return self.farmers_db.find_page(build_filters(village_id=village_id or None, status=status),
+                                         limit=limit, cursor=cursor)
+    
+    async def get_users_async(self,
+                              user_name: Optional[str] = None,
+                              id_card: Optional[str] = None,
+                              village_id: Optional[str] = None,
+                              status: Optional[int] = None,
+                              limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> List[FarmerInfo]:
+        """异步获取用户信息，不阻塞事件循环"""
+        filters = build_filters(
+            farmer_name__contains=user_name,
+            id_card_number=id_card,
+            village_id=village_id,
+            status=status
+        )
+        return await self.farmers_async_repo.find_page(filters, limit=limit, cursor=cursor)
+    
+    def query_users(self, request: FarmerQueryRequest,
+                    limit: Optional[int] = None, cursor: Optional[str] = None) -> List[FarmerInfo]:
+        """高级用户查询，按ID游标分页"""
+        filters = build_filters(
+            farmer_name__contains=request.farmer_name,
+            village_id=request.village_id,
+            status=request.status
+        )
+        return self.farmers_db.find_page(filters, limit=limit, cursor=cursor)
     
     def get_user_by_id(self, user_id: str) -> Optional[FarmerInfo]:
         """根据ID获取用户信息"""
@@ -321,7 +356,7 @@ class BasicInfoService:
             farmer.status = request.status
         farmer.update_time = datetime.now()
         
-        self.farmers_db[farmer_id] = farmer
+        self.farmers_db[user_id] = farmer
         return farmer
     
     def delete_user(self, user_id: str) -> bool:
@@ -331,6 +366,44 @@ class BasicInfoService:
         
         del self.farmers_db[user_id]
         return True
+    
+    # 批量导入
+    def batch_create_users(self, requests: List[CreateFarmerRequest], atomic: bool = True,
+                           dry_run: bool = False) -> BatchCreateResult:
+        """批量创建用户信息
+
+        所属村庄和身份证号一次性校验，通过校验的记录批量写入；atomic 为True时任一行有错误则全部不写入，
+        dry_run 为True时只校验不写入
+        """
+        errors = BatchErrors()
+        existing_villages = self.villages_db.existing_ids(req.village_id for req in requests)
+        taken_id_cards = self.farmers_db.existing_values("id_card_number", (req.id_card_number for req in requests))
+        for index, req in enumerate(requests):
+            errors.check_exists(index, "village_id", req.village_id, existing_villages, "Village")
+        errors.check_unique([req.id_card_number for req in requests], "id_card_number", taken_id_cards)
+        if dry_run or (errors and atomic):
+            return errors.result([])
+
+        now = datetime.now()
+        users = [
+            FarmerInfo(id=str(uuid.uuid4()), **req.model_dump(), create_time=now, update_time=now)
+            for index, req in enumerate(requests) if index not in errors
+        ]
+        self.farmers_db.bulk_put(users)
+        return errors.result([user.id for user in users])
+    
+    # 数据导出
+    def export_townships(self) -> Iterator[TownshipBaseInfo]:
+        """导出乡镇信息，逐条产出供流式导出"""
+        return self.townships_db.stream()
+    
+    def export_villages(self) -> Iterator[VillageBaseInfo]:
+        """导出村庄信息，逐条产出供流式导出"""
+        return self.villages_db.stream()
+    
+    def export_farmers(self) -> Iterator[FarmerInfo]:
+        """导出农户信息，逐条产出供流式导出"""
+        return self.farmers_db.stream()
 
 
 # 创建服务实例供导入使用
@@ -1,7 +1,7 @@
 # 承包合同管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Iterator
 from datetime import datetime, timedelta
 import uuid
 
@@ -19,18 +19,30 @@ from models.contract_management import (
     UpdateContractFeeRequest,
     CreateContractAttachmentRequest,
     UpdateContractAttachmentRequest,
-    ContractQueryRequest
+    ContractQueryRequest,
+    ContractStatusEnum
 )
+from models.fee_management import FeeStatusEnum, FeeTypeEnum
+from models.batch import BatchCreateResult
+from repositories.aggregates import Aggregate
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, transaction, use_memory_backend
+from services.basic_info_service import basic_info_service
+from services.fee_plan import FeePlanError, build_plan, frequency_of, items_in_year, plan_fee_id
+from services.land_base_info_service import land_base_info_service
+from utils.batch_utils import BatchErrors
 
 
 class ContractManagementService:
     def __init__(self):
-        # 模拟数据库存储
-        self.contracts_db: Dict[str, Contract] = {}
-        self.contract_fees_db: Dict[str, ContractFee] = {}
-        self.contract_attachments_db: Dict[str, ContractAttachment] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.contracts_db: Repository = create_repository("contracts", Contract)
+        self.contract_fees_db: Repository = create_repository("contract_fees", ContractFee)
+        self.contract_attachments_db: Repository = create_repository("contract_attachments", ContractAttachment)
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
+        self._register_aggregates()
     
     def _init_test_data(self):
         # 初始化合同数据
@@ -66,89 +78,107 @@ class ContractManagementService:
     
     # 合同管理
     def get_contracts(self, 
-                     farmer_id: Optional[str] = None, 
+                     contract_code: Optional[str] = None, 
                      land_id: Optional[str] = None, 
+                     bidder_id: Optional[str] = None, 
+                     contractor_name: Optional[str] = None, 
                      contract_status: Optional[str] = None, 
-                     start_date: Optional[datetime] = None, 
-                     end_date: Optional[datetime] = None) -> List[Contract]:
+                     create_time_from: Optional[datetime] = None, 
+                     create_time_to: Optional[datetime] = None,
+                     limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> List[Contract]:
         """获取所有合同信息"""
-        contracts = list(self.contracts_db.values())
-        
-        if farmer_id:
-            contracts = [c for c in contracts if c.farmer_id == farmer_id]
-        if land_id:
-            contracts = [c for c in contracts if c.land_id == land_id]
-        if contract_status:
-            contracts = [c for c in contracts if c.contract_status == contract_status]
-        if start_date:
-            contracts = [c for c in contracts if c.start_date >= start_date]
-        if end_date:
-            contracts = [c for c in contracts if c.end_date <= end_date]
-            
+        filters = build_filters(
+            contract_code__contains=contract_code,
+            land_id=land_id,
+            bidder_id=bidder_id,
+            contractor_name__contains=contractor_name,
+            contract_status=contract_status,
+            create_time__gte=create_time_from,
+            create_time__lte=create_time_to
+        )
         # 按创建时间倒序排序
-        contracts.sort(key=lambda x: x.create_time, reverse=True)
-        return contracts
+        return self.contracts_db.find_page(filters, order_by="create_time", descending=True,
+                                           limit=limit, cursor=cursor)
     
     def get_contract_by_id(self, contract_id: str) -> Optional[Contract]:
         """根据ID获取合同信息"""
         return self.contracts_db.get(contract_id)
     
     def create_contract(self, request: CreateContractRequest) -> Contract:
-        """创建合同信息"""
-        # 生成合同编号
-        contract_code = f"CONTRACT-{datetime.now().year}-{str(len(self.contracts_db) + 1).zfill(4)}"
-        
+        """创建合同信息，付款期限不支持时抛出 FeePlanError"""
+        now = datetime.now()
         contract = Contract(
             id=str(uuid.uuid4()),
-            user_id=request.user_id,
-            land_id=request.land_id,
-            contract_code=contract_code,
-            contract_name=request.contract_name,
-            start_date=request.start_date,
-            end_date=request.end_date,
-            total_amount=request.total_amount,
-            payment_method=request.payment_method,
-            payment_frequency=request.payment_frequency,
-            contract_status="pending_review",
-            create_time=datetime.now(),
-            update_time=datetime.now()
+            **request.model_dump(),
+            contract_status=ContractStatusEnum.PENDING,
+            create_time=now,
+            update_time=now
         )
-        self.contracts_db[contract.id] = contract
-        
-        # 根据支付频率生成费用计划
-        self._generate_contract_fees(contract)
+        # 先计算费用计划，付款期限不支持时不保存合同
+        plan = self._plan_fees(contract)
+        with transaction():
+            self.contracts_db[contract.id] = contract
+            # 根据付款期限生成费用计划
+            self._apply_fee_plans({contract.id: plan})
         
         return contract
     
+    def batch_create_contracts(self, requests: List[CreateContractRequest],
+                               atomic: bool = True,
+                               dry_run: bool = False) -> BatchCreateResult:
+        """批量创建合同信息
+
+        土地和合同编号一次性校验，通过校验的合同以待审核状态批量写入；atomic 为True时任一行有错误则全部不写入，
+        dry_run 为True时只校验不写入
+        """
+        errors = BatchErrors()
+        existing_lands = land_base_info_service.land_base_info_db.existing_ids(req.land_id for req in requests)
+        taken_codes = self.contracts_db.existing_values("contract_code", (req.contract_code for req in requests))
+        for index, req in enumerate(requests):
+            errors.check_exists(index, "land_id", req.land_id, existing_lands, "Land")
+            if req.end_date <= req.start_date:
+                errors.add(index, "end_date must be later than start_date", "end_date")
+        errors.check_unique([req.contract_code for req in requests], "contract_code", taken_codes)
+        if dry_run or (errors and atomic):
+            return errors.result([])
+
+        now = datetime.now()
+        contracts = [
+            Contract(
+                id=str(uuid.uuid4()),
+                **req.model_dump(),
+                contract_status=ContractStatusEnum.PENDING,
+                create_time=now,
+                update_time=now
+            )
+            for index, req in enumerate(requests) if index not in errors
+        ]
+        self.contracts_db.bulk_put(contracts)
+        return errors.result([contract.id for contract in contracts])
+    
     def update_contract(self, contract_id: str, request: UpdateContractRequest) -> Optional[Contract]:
         """更新合同信息"""
         if contract_id not in self.contracts_db:
             return None
         
         contract = self.contracts_db[contract_id]
+        changes = request.model_dump(exclude_none=True)
         # 只有在合同未审核通过时才能修改关键信息
-        if contract.contract_status == "pending_review":
-            if request.contract_name:
-                contract.contract_name = request.contract_name
-            if request.start_date:
-                contract.start_date = request.start_date
-            if request.end_date:
-                contract.end_date = request.end_date
-            if request.total_amount is not None:
-                contract.total_amount = request.total_amount
-            if request.payment_method:
-                contract.payment_method = request.payment_method
-            if request.payment_frequency:
-                contract.payment_frequency = request.payment_frequency
-                # 更新费用计划
-                self._regenerate_contract_fees(contract)
-        
-        if request.contract_status:
-            contract.contract_status = request.contract_status
-        contract.update_time = datetime.now()
-        
-        self.contracts_db[contract_id] = contract
-        return contract
+        if contract.contract_status != ContractStatusEnum.PENDING:
+            changes = {key: value for key, value in changes.items() if key == "contract_status"}
+        updated = contract.model_copy(update=dict(changes, update_time=datetime.now()))
+
+        # 合同期、总金额或付款期限变化时更新费用计划
+        plan_fields = ("start_date", "end_date", "total_amount", "payment_term")
+        if any(getattr(updated, field) != getattr(contract, field) for field in plan_fields):
+            plan = self._plan_fees(updated)
+            with transaction():
+                self.contracts_db[contract_id] = updated
+                self._apply_fee_plans({contract_id: plan})
+        else:
+            self.contracts_db[contract_id] = updated
+        return updated
     
     def delete_contract(self, contract_id: str) -> bool:
         """删除合同信息"""
@@ -211,20 +241,14 @@ class ContractManagementService:
     def get_contract_fees(self, 
                          contract_id: Optional[str] = None, 
                          fee_type: Optional[str] = None, 
-                         status: Optional[str] = None) -> List[ContractFee]:
+                         status: Optional[str] = None,
+                         limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> List[ContractFee]:
         """获取所有合同费用信息"""
-        fees = list(self.contract_fees_db.values())
-        
-        if contract_id:
-            fees = [f for f in fees if f.contract_id == contract_id]
-        if fee_type:
-            fees = [f for f in fees if f.fee_type == fee_type]
-        if status:
-            fees = [f for f in fees if f.status == status]
-            
+        filters = build_filters(contract_id=contract_id, fee_type=fee_type, status=status)
         # 按到期日期排序
-        fees.sort(key=lambda x: x.due_date)
-        return fees
+        return self.contract_fees_db.find_page(filters, order_by="due_date",
+                                               limit=limit, cursor=cursor)
     
     def get_contract_fee_by_id(self, fee_id: str) -> Optional[ContractFee]:
         """根据ID获取合同费用信息"""
@@ -242,10 +266,10 @@ class ContractManagementService:
             fee_type=request.fee_type,
             amount=request.amount,
             due_date=request.due_date,
-            payment_status="pending",
-            payment_date=None,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            status=FeeStatusEnum.PENDING,
+            payment_time=None,
+            create_time=datetime.now(),
+            update_time=datetime.now()
         )
         self.contract_fees_db[contract_fee.id] = contract_fee
         return contract_fee
@@ -262,10 +286,8 @@ class ContractManagementService:
             contract_fee.amount = request.amount
         if request.due_date:
             contract_fee.due_date = request.due_date
-        if request.payment_status:
-            contract_fee.payment_status = request.payment_status
-        if request.payment_date:
-            contract_fee.payment_date = request.payment_date
+        if request.status:
+            contract_fee.status = request.status
         contract_fee.update_time = datetime.now()
         
         self.contract_fees_db[fee_id] = contract_fee
@@ -278,7 +300,7 @@ class ContractManagementService:
         
         # 检查费用状态
         contract_fee = self.contract_fees_db[fee_id]
-        if contract_fee.payment_status != "pending":
+        if contract_fee.status != FeeStatusEnum.PENDING:
             return False
         
         del self.contract_fees_db[fee_id]
@@ -287,18 +309,14 @@ class ContractManagementService:
     # 合同附件管理
     def get_contract_attachments(self, 
                                 contract_id: Optional[str] = None, 
-                                attachment_type: Optional[str] = None) -> List[ContractAttachment]:
+                                attachment_type: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> List[ContractAttachment]:
         """获取所有合同附件信息"""
-        attachments = list(self.contract_attachments_db.values())
-        
-        if contract_id:
-            attachments = [a for a in attachments if a.contract_id == contract_id]
-        if attachment_type:
-            attachments = [a for a in attachments if a.attachment_type == attachment_type]
-            
-        # 按创建时间倒序排序
-        attachments.sort(key=lambda x: x.create_time, reverse=True)
-        return attachments
+        filters = build_filters(contract_id=contract_id, file_type=attachment_type)
+        # 按上传时间倒序排序
+        return self.contract_attachments_db.find_page(filters, order_by="upload_time", descending=True,
+                                                      limit=limit, cursor=cursor)
     
     def get_contract_attachment_by_id(self, attachment_id: str) -> Optional[ContractAttachment]:
         """根据ID获取合同附件信息"""
@@ -352,124 +370,148 @@ class ContractManagementService:
         return True
     
     # 合同查询
-    def query_contracts(self, request: ContractQueryRequest) -> List[Contract]:
-        """高级合同查询"""
-        contracts = list(self.contracts_db.values())
-        
-        # 应用查询条件
-        if request.farmer_id:
-            contracts = [c for c in contracts if c.farmer_id == request.farmer_id]
-        if request.land_id:
-            contracts = [c for c in contracts if c.land_id == request.land_id]
-        if request.contract_codes:
-            contracts = [c for c in contracts if c.contract_code in request.contract_codes]
-        if request.contract_statuses:
-            contracts = [c for c in contracts if c.contract_status in request.contract_statuses]
-        if request.start_date_from:
-            contracts = [c for c in contracts if c.start_date >= request.start_date_from]
-        if request.start_date_to:
-            contracts = [c for c in contracts if c.start_date <= request.start_date_to]
-        if request.end_date_from:
-            contracts = [c for c in contracts if c.end_date >= request.end_date_from]
-        if request.end_date_to:
-            contracts = [c for c in contracts if c.end_date <= request.end_date_to]
-        if request.amount_from is not None:
-            contracts = [c for c in contracts if c.total_amount >= request.amount_from]
-        if request.amount_to is not None:
-            contracts = [c for c in contracts if c.total_amount <= request.amount_to]
-        if request.payment_methods:
-            contracts = [c for c in contracts if c.payment_method in request.payment_methods]
-        
-        # 排序
-        if request.sort_by:
-            try:
-                contracts.sort(key=lambda x: getattr(x, request.sort_by), reverse=request.sort_descending)
-            except AttributeError:
-                # 如果排序字段不存在，按创建时间倒序排序
-                contracts.sort(key=lambda x: x.created_at, reverse=True)
-        else:
-            # 默认按创建时间倒序排序
-            contracts.sort(key=lambda x: x.created_at, reverse=True)
-        
-        # 分页
-        if request.page and request.page_size:
-            start = (request.page - 1) * request.page_size
-            end = start + request.page_size
-            contracts = contracts[start:end]
-        
-        return contracts
+    def query_contracts(self, request: ContractQueryRequest,
+                        limit: Optional[int] = None, cursor: Optional[str] = None) -> List[Contract]:
+        """高级合同查询，按创建时间倒序游标分页"""
+        filters = build_filters(
+            id=request.contract_id,
+            land_id=request.land_id,
+            bidder_id=request.bidder_id,
+            contract_status=request.status,
+            start_date__gte=request.start_date,
+            end_date__lte=request.end_date
+        )
+        return self.contracts_db.find_page(filters, order_by="create_time", descending=True,
+                                           limit=limit, cursor=cursor)
     
-    # 生成合同费用计划
-    def _generate_contract_fees(self, contract: Contract) -> None:
-        """根据合同信息生成费用计划"""
-        # 清除已有的费用计划
-        self._delete_contract_related_fees(contract.id)
-        
-        # 根据支付频率生成费用计划
-        if contract.payment_frequency == "yearly":
-            # 计算合同年限
-            years = (contract.end_date.year - contract.start_date.year) + 1
-            # 计算每年费用
-            yearly_amount = contract.total_amount / years if years > 0 else 0
-            
-            # 生成每年的费用记录
-            for i in range(years):
-                due_date = datetime(contract.start_date.year + i, 12, 31)
-                self.create_contract_fee(
-                    CreateContractFeeRequest(
-                        contract_id=contract.id,
-                        fee_type="rent",
-                        amount=yearly_amount,
-                        due_date=due_date
-                    )
-                )
-        elif contract.payment_frequency == "quarterly":
-            # 简化实现，实际应按季度生成
-            pass
-        elif contract.payment_frequency == "monthly":
-            # 简化实现，实际应按月生成
-            pass
-        elif contract.payment_frequency == "one_time":
-            # 一次性支付
-            self.create_contract_fee(
-                CreateContractFeeRequest(
-                    contract_id=contract.id,
-                    fee_type="rent",
-                    amount=contract.total_amount,
-                    due_date=contract.start_date
-                )
+    # 合同费用计划
+    def _plan_fees(self, contract: Contract, fee_year: Optional[int] = None) -> List[ContractFee]:
+        """按合同付款期限计算费用计划（fee_year 不为空时只含该年度），付款期限不支持时抛出 FeePlanError"""
+        now = datetime.now()
+        items = build_plan(contract.start_date, contract.end_date, contract.total_amount,
+                           frequency_of(contract.payment_term))
+        return [
+            ContractFee(
+                id=plan_fee_id(contract.id, item.period),
+                contract_id=contract.id,
+                fee_type=FeeTypeEnum.LAND_CONTRACT_FEE,
+                amount=item.amount,
+                due_date=datetime.combine(item.due_date, datetime.min.time()),
+                status=FeeStatusEnum.PENDING,
+                plan_period=item.period,
+                period_start=datetime.combine(item.period_start, datetime.min.time()),
+                period_end=datetime.combine(item.period_end, datetime.min.time()),
+                fee_year=item.fee_year,
+                create_time=now,
+                update_time=now
             )
-    
-    # 重新生成合同费用计划
-    def _regenerate_contract_fees(self, contract: Contract) -> None:
-        """重新生成合同费用计划"""
-        self._generate_contract_fees(contract)
+            for item in items_in_year(items, fee_year)
+        ]
+
+    def _apply_fee_plans(self, plans: Dict[str, List[ContractFee]], fee_year: Optional[int] = None) -> Dict:
+        """将费用计划（合同ID -> 计划费用）写入费用仓储
+
+        一次查询取出这些合同（fee_year 不为空时只取该年度）已有的计划费用，与计划逐条比较：新的期间批量写入，
+        待支付且金额、到期日有变化的更新，已不在计划中的待支付费用删除；已支付、部分支付等已有业务发生的费用
+        和手工录入的费用不修改。费用ID由合同和期间确定，重复执行结果不变
+        """
+        result = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0, "locked": 0}
+        if not plans:
+            return result
+        existing = {
+            fee.id: fee
+            for fee in self.contract_fees_db.find(build_filters(contract_id__in=list(plans), fee_year=fee_year))
+            if fee.plan_period is not None
+        }
+        writes: List[ContractFee] = []
+        for fees in plans.values():
+            for fee in fees:
+                current = existing.pop(fee.id, None)
+                if current is None:
+                    writes.append(fee)
+                    result["created"] += 1
+                elif current.status != FeeStatusEnum.PENDING:
+                    result["locked"] += 1
+                elif (current.amount, current.due_date, current.period_start, current.period_end) == \
+                        (fee.amount, fee.due_date, fee.period_start, fee.period_end):
+                    result["unchanged"] += 1
+                else:
+                    writes.append(fee.model_copy(update={"create_time": current.create_time}))
+                    result["updated"] += 1
+        # 剩余的是已不在计划中的期间（如合同期缩短、付款期限改变）
+        stale = [fee.id for fee in existing.values() if fee.status == FeeStatusEnum.PENDING]
+        result["locked"] += len(existing) - len(stale)
+        result["deleted"] = len(stale)
+        with transaction():
+            self.contract_fees_db.bulk_put(writes)
+            self.contract_fees_db.delete_many(stale)
+        return result
+
+    def generate_fee_plan(self, contract_id: str, fee_year: Optional[int] = None) -> Optional[List[ContractFee]]:
+        """重新生成合同的费用计划（fee_year 不为空时只生成该年度），返回计划内的费用，合同不存在时返回None"""
+        contract = self.contracts_db.get(contract_id)
+        if contract is None:
+            return None
+        self._apply_fee_plans({contract_id: self._plan_fees(contract, fee_year)}, fee_year)
+        fees = self.contract_fees_db.find(build_filters(contract_id=contract_id, fee_year=fee_year), order_by="due_date")
+        return [fee for fee in fees if fee.plan_period is not None]
+
+    def regenerate_township_fee_year(self, township_id: str, fee_year: int) -> Dict:
+        """按费用年度重新生成乡镇内全部已生效合同的承包费
+
+        乡镇 -> 村队 -> 土地 -> 合同逐级按索引批量查询，合同期与该年度有交集的已生效合同一次性计算费用计划，
+        已有费用一次查询取出并比较，变化的费用在同一事务中批量写入；付款期限不支持的合同记录在 errors 中
+        """
+        result = {"township_id": township_id, "fee_year": fee_year, "contracts": 0,
+                  "created": 0, "updated": 0, "unchanged": 0, "deleted": 0, "locked": 0, "errors": []}
+        village_ids = [village.id for village in basic_info_service.villages_db.find(
+            build_filters(township_id=township_id))]
+        # 空列表的 __in 条件会被 build_filters 忽略，没有村队或土地时直接返回
+        if not village_ids:
+            return result
+        land_ids = [land.id for land in land_base_info_service.land_base_info_db.find(
+            build_filters(village_id__in=village_ids))]
+        if not land_ids:
+            return result
+        contracts = self.contracts_db.find(build_filters(
+            land_id__in=land_ids,
+            contract_status=ContractStatusEnum.EFFECTIVE,
+            start_date__lte=datetime(fee_year, 12, 31, 23, 59, 59),
+            end_date__gte=datetime(fee_year, 1, 1)
+        ))
+
+        plans: Dict[str, List[ContractFee]] = {}
+        for contract in contracts:
+            try:
+                plans[contract.id] = self._plan_fees(contract, fee_year)
+            except FeePlanError as e:
+                result["errors"].append({"contract_id": contract.id, "contract_code": contract.contract_code,
+                                         "error": str(e)})
+        result["contracts"] = len(plans)
+        result.update(self._apply_fee_plans(plans, fee_year))
+        return result
     
     # 删除合同相关的费用
     def _delete_contract_related_fees(self, contract_id: str) -> None:
         """删除合同相关的所有费用"""
         # 找出所有相关的费用ID
         fee_ids_to_delete = [
-            fee_id for fee_id, fee in self.contract_fees_db.items()
-            if fee.contract_id == contract_id
+            fee.id for fee in self.contract_fees_db.find(build_filters(contract_id=contract_id))
         ]
         
         # 删除相关的费用
-        for fee_id in fee_ids_to_delete:
-            del self.contract_fees_db[fee_id]
+        self.contract_fees_db.delete_many(fee_ids_to_delete)
     
     # 删除合同相关的附件
     def _delete_contract_related_attachments(self, contract_id: str) -> None:
         """删除合同相关的所有附件"""
         # 找出所有相关的附件ID
         attachment_ids_to_delete = [
-            attachment_id for attachment_id, attachment in self.contract_attachments_db.items()
-            if attachment.contract_id == contract_id
+            attachment.id for attachment in self.contract_attachments_db.find(build_filters(contract_id=contract_id))
         ]
         
         # 删除相关的附件
-        for attachment_id in attachment_ids_to_delete:
-            del self.contract_attachments_db[attachment_id]
+        self.contract_attachments_db.delete_many(attachment_ids_to_delete)
     
     # 删除合同相关的数据
     def _delete_contract_related_data(self, contract_id: str) -> None:
@@ -477,37 +519,64 @@ class ContractManagementService:
         self._delete_contract_related_fees(contract_id)
         self._delete_contract_related_attachments(contract_id)
     
+    # 增量统计
+    def _register_aggregates(self) -> None:
+        """注册统计接口使用的增量统计，随合同和承包费用的写入更新"""
+        self.contract_stats_by_status = self.contracts_db.add_aggregate(
+            "by_status", Aggregate("contract_status", ["total_amount"]))
+        self.fee_stats_by_status = self.contract_fees_db.add_aggregate(
+            "by_status", Aggregate("status", ["amount"]))
+        self.fee_stats_by_type = self.contract_fees_db.add_aggregate(
+            "by_type", Aggregate("fee_type", ["amount"]))
+
     # 合同统计
     def get_contract_statistics(self) -> Dict:
         """获取合同统计信息"""
-        # 计算各状态的合同数量
-        status_count = {}
-        for contract in self.contracts_db.values():
-            status_count[contract.contract_status] = status_count.get(contract.contract_status, 0) + 1
-        
-        # 计算总金额
-        total_amount = sum(contract.total_amount for contract in self.contracts_db.values())
-        
-        # 计算待支付费用总额
-        pending_fees_amount = sum(
-            fee.amount for fee in self.contract_fees_db.values()
-            if fee.payment_status == "pending"
-        )
-        
-        # 计算已支付费用总额
-        paid_fees_amount = sum(
-            fee.amount for fee in self.contract_fees_db.values()
-            if fee.payment_status == "paid"
-        )
-        
+        by_status = self.contract_stats_by_status.groups()
+        totals = self.contract_stats_by_status.total()
+
         return {
-            "total_contracts": len(self.contracts_db),
-            "status_count": status_count,
-            "total_amount": total_amount,
-            "pending_fees_amount": pending_fees_amount,
-            "paid_fees_amount": paid_fees_amount
+            "total_contracts": totals["count"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "total_amount": totals["total_amount"],
+            "pending_fees_amount": self.fee_stats_by_status.group(FeeStatusEnum.PENDING)["amount"],
+            "paid_fees_amount": self.fee_stats_by_status.group(FeeStatusEnum.PAID)["amount"]
         }
 
+    def get_fee_statistics(self) -> Dict:
+        """获取承包费用统计信息"""
+        by_status = self.fee_stats_by_status.groups()
+        by_type = self.fee_stats_by_type.groups()
+        totals = self.fee_stats_by_status.total()
+
+        return {
+            "total_fees": totals["count"],
+            "total_fee_amount": totals["amount"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_amount": {key: group["amount"] for key, group in by_status.items()},
+            "type_count": {key: group["count"] for key, group in by_type.items()},
+            "type_amount": {key: group["amount"] for key, group in by_type.items()}
+        }
+    
+    # 数据导出
+    def export_contracts(self,
+                         time_from: Optional[datetime] = None,
+                         time_to: Optional[datetime] = None) -> Iterator[Contract]:
+        """导出合同信息，按创建时间倒序，逐条产出供流式导出"""
+        filters = build_filters(create_time__gte=time_from, create_time__lte=time_to)
+        return self.contracts_db.stream(filters, order_by="create_time", descending=True)
+    
+    def export_fees(self,
+                    time_from: Optional[datetime] = None,
+                    time_to: Optional[datetime] = None) -> Iterator[ContractFee]:
+        """导出合同费用，按到期日期排序，逐条产出供流式导出"""
+        filters = build_filters(due_date__gte=time_from, due_date__lte=time_to)
+        return self.contract_fees_db.stream(filters, order_by="due_date")
+    
+    def export_attachments(self) -> Iterator[ContractAttachment]:
+        """导出合同附件信息，按上传时间倒序，逐条产出供流式导出"""
+        return self.contract_attachments_db.stream(order_by="upload_time", descending=True)
+
 
 # 创建服务实例供导入使用
 contract_management_service = ContractManagementService()
\ No newline at end of file
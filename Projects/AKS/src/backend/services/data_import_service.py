@@ -0,0 +1,220 @@
+# 数据导入服务
+# 上传文件逐行解析，按块校验后交给各模块的批量创建方法写入；
+# 失败行连同原始数据和错误信息写入错误明细表（CSV），供下载修改后重新导入
+import sys
+import os
+import csv
+import time
+import uuid
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Type
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel, ValidationError
+from models.basic_info import CreateFarmerInfoRequest
+from models.land_base_info import CreateLandBaseInfoRequest
+from models.contract_management import CreateContractRequest
+from models.account_management import CreateRechargeDetailRequest
+from models.fee_management import CreatePaymentRecordRequest
+from models.batch import BatchCreateResult
+from models.data_import import ImportResult, ImportRowError
+from services.basic_info_service import basic_info_service
+from services.land_base_info_service import land_base_info_service
+from services.contract_management_service import contract_management_service
+from services.account_management_service import account_management_service
+from services.fee_management_service import fee_management_service
+from utils.import_utils import ColumnMapping, ImportFormatError, detect_format, iter_upload_rows
+
+# 错误明细表目录
+IMPORT_DIR = os.getenv(
+    "AKS_IMPORT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "imports")
+)
+# 错误明细表保留时间（小时）
+IMPORT_ERROR_SHEET_MAX_AGE_HOURS = float(os.getenv("AKS_IMPORT_ERROR_SHEET_MAX_AGE_HOURS", "24"))
+# 每块校验、写入的行数
+IMPORT_CHUNK_SIZE = 5000
+# 导入结果中返回的错误条数上限，完整错误见错误明细表
+ERROR_SAMPLE_LIMIT = 100
+
+
+class ImportTarget:
+    """可导入的数据：行数据按 request_model 校验后交给 batch_create 写入，unique_field 在整个文件内不可重复
+
+    unique_field 为空时由 batch_create 自行去重（按流水号幂等入账的数据，重复行跳过而不是报错）
+    """
+
+    def __init__(self, request_model: Type[BaseModel],
+                 batch_create: Callable[..., BatchCreateResult], unique_field: Optional[str]):
+        self.request_model = request_model
+        self.batch_create = batch_create
+        self.unique_field = unique_field
+
+
+IMPORT_TARGETS: Dict[str, ImportTarget] = {
+    "farmers": ImportTarget(CreateFarmerInfoRequest, basic_info_service.batch_create_users, "id_card_number"),
+    "lands": ImportTarget(CreateLandBaseInfoRequest, land_base_info_service.batch_create_land_base_info, "land_code"),
+    "contracts": ImportTarget(CreateContractRequest, contract_management_service.batch_create_contracts, "contract_code"),
+    "recharges": ImportTarget(CreateRechargeDetailRequest, account_management_service.batch_create_recharges, None),
+    "payments": ImportTarget(CreatePaymentRecordRequest, fee_management_service.batch_create_payment_records, None),
+}
+
+
+class _ErrorSheet:
+    """错误明细表，出现第一条错误时创建，失败行逐行追加写入"""
+
+    def __init__(self, path: str, header: List[str]):
+        self.path = path
+        self.header = header
+        self._file = None
+        self._writer = None
+
+    def write(self, row_number: int, cells: List[str], messages: List[str]) -> None:
+        if self._writer is None:
+            self._file = open(self.path, "w", encoding="utf-8-sig", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["行号", *self.header, "错误信息"])
+        cells = list(cells) + [""] * (len(self.header) - len(cells))
+        self._writer.writerow([row_number, *cells, "；".join(messages)])
+
+    @property
+    def created(self) -> bool:
+        return self._writer is not None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class DataImportService:
+    """数据导入服务"""
+
+    def __init__(self, import_dir: str = IMPORT_DIR,
+                 chunk_size: int = IMPORT_CHUNK_SIZE,
+                 error_sheet_max_age_hours: float = IMPORT_ERROR_SHEET_MAX_AGE_HOURS):
+        self.import_dir = import_dir
+        self.chunk_size = chunk_size
+        self.error_sheet_max_age = error_sheet_max_age_hours * 3600
+        os.makedirs(self.import_dir, exist_ok=True)
+
+    def error_sheet_path(self, import_id: str) -> str:
+        """错误明细表的存放路径"""
+        return os.path.join(self.import_dir, f"{import_id}.csv")
+
+    def get_error_sheet(self, import_id: str) -> Optional[str]:
+        """获取错误明细表路径，不存在或已清理时返回None"""
+        path = self.error_sheet_path(import_id)
+        return path if os.path.exists(path) else None
+
+    def import_file(self, import_type: str, file: BinaryIO, file_name: Optional[str],
+                    dry_run: bool = False) -> ImportResult:
+        """导入上传文件
+
+        文件逐行读取，每 chunk_size 行校验一次并批量写入，已写入的块不因后续块的错误回滚；
+        需要整体校验时先以 dry_run 导入，确认无误后再正式导入
+        """
+        target = IMPORT_TARGETS.get(import_type)
+        if target is None:
+            raise ImportFormatError(f"Unsupported import type: {import_type}")
+        rows = iter_upload_rows(file, detect_format(file_name))
+        header = next(rows, None)
+        if header is None:
+            raise ImportFormatError("Import file is empty")
+        mapping = ColumnMapping(target.request_model, header)
+
+        self.cleanup_error_sheets()
+        result = ImportResult(import_id=str(uuid.uuid4()), import_type=import_type, dry_run=dry_run)
+        error_sheet = _ErrorSheet(self.error_sheet_path(result.import_id), list(header))
+        # 唯一字段值 -> 首次出现的行号，检查整个文件内的重复
+        seen_keys: Dict[Any, int] = {}
+        try:
+            chunk: List[Tuple[int, List[str]]] = []
+            # 表头为第1行
+            for row_number, cells in enumerate(rows, start=2):
+                if not any(cell.strip() for cell in cells):
+                    continue
+                chunk.append((row_number, cells))
+                if len(chunk) >= self.chunk_size:
+                    self._import_chunk(target, mapping, chunk, seen_keys, dry_run, result, error_sheet)
+                    chunk = []
+            if chunk:
+                self._import_chunk(target, mapping, chunk, seen_keys, dry_run, result, error_sheet)
+        finally:
+            error_sheet.close()
+
+        if error_sheet.created:
+            result.error_sheet_url = f"/api/imports/{result.import_id}/errors"
+        return result
+
+    def _import_chunk(self, target: ImportTarget, mapping: ColumnMapping,
+                      chunk: List[Tuple[int, List[str]]], seen_keys: Dict[Any, int],
+                      dry_run: bool, result: ImportResult, error_sheet: _ErrorSheet) -> None:
+        """校验并写入一块数据"""
+        row_errors: Dict[int, List[ImportRowError]] = {}
+        requests = []
+        request_rows = []
+        for row_number, cells in chunk:
+            try:
+                request = target.request_model(**mapping.to_data(cells))
+            except ValidationError as e:
+                row_errors[row_number] = [
+                    ImportRowError(
+                        row=row_number,
+                        field=str(error["loc"][0]) if error["loc"] else None,
+                        message=error["msg"]
+                    )
+                    for error in e.errors()
+                ]
+                continue
+            if target.unique_field is not None:
+                key = getattr(request, target.unique_field)
+                if key in seen_keys:
+                    row_errors[row_number] = [ImportRowError(
+                        row=row_number,
+                        field=target.unique_field,
+                        message=f"{target.unique_field} {key} duplicates row {seen_keys[key]}"
+                    )]
+                    continue
+                seen_keys[key] = row_number
+            requests.append(request)
+            request_rows.append(row_number)
+
+        batch_result = target.batch_create(requests, atomic=False, dry_run=dry_run) if requests else BatchCreateResult()
+        for error in batch_result.errors:
+            row_number = request_rows[error.index]
+            row_errors.setdefault(row_number, []).append(
+                ImportRowError(row=row_number, field=error.field, message=error.message)
+            )
+
+        result.total_rows += len(chunk)
+        result.valid_rows += len(requests) - batch_result.failed_count
+        result.created_count += batch_result.created_count
+        result.duplicate_count += batch_result.duplicate_count
+        result.failed_count += len(row_errors)
+        for row_number, cells in chunk:
+            errors = row_errors.get(row_number)
+            if not errors:
+                continue
+            messages = [f"{error.field}: {error.message}" if error.field else error.message for error in errors]
+            error_sheet.write(row_number, cells, messages)
+            remaining = ERROR_SAMPLE_LIMIT - len(result.errors)
+            if remaining > 0:
+                result.errors.extend(errors[:remaining])
+
+    def cleanup_error_sheets(self) -> int:
+        """删除超过保留时间的错误明细表，返回删除数量"""
+        removed = 0
+        cutoff = time.time() - self.error_sheet_max_age
+        for name in os.listdir(self.import_dir):
+            path = os.path.join(self.import_dir, name)
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+# 创建服务实例供导入使用
+data_import_service = DataImportService()
@@ -0,0 +1,372 @@
+# 后台导出任务服务
+# 任务记录保存在仓储中，多进程部署时任一进程都可查询和下载；导出请求进入提交进程的本地线程池排队执行，
+# 文件写入导出目录（多进程部署时应为共享目录）后按任务ID下载；
+# 相同请求（类型、格式、时间范围一致）复用同一任务，导出文件按存放时长和总大小清理
+import sys
+import os
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Type
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel
+from models.export_job import ExportJob, ExportJobStatusEnum, CreateExportJobRequest
+from models.account_management import AccountInfo, RechargeDetail, ExpenseDetail, AccountTransaction
+from models.basic_info import TownshipBaseInfo, VillageBaseInfo, FarmerInfo
+from models.contract_management import Contract, ContractFee, ContractAttachment
+from models.fee_management import FeeInfo, PaymentRecord, ReductionInfo
+from models.financing_management import MortgageFinancingProject, AllocatedLandInfo, FinancingProjectLedger
+from models.land_base_info import LandTypePrice, LandBaseInfo
+from models.land_bidding import BidderRegistration, BiddingInfo, BidRecord
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository
+from services.account_management_service import account_management_service
+from services.basic_info_service import basic_info_service
+from services.contract_management_service import contract_management_service
+from services.fee_management_service import fee_management_service
+from services.financing_management_service import financing_management_service
+from services.land_base_info_service import land_base_info_service
+from services.land_bidding_service import land_bidding_service
+from utils.export_utils import export_body
+
+# 导出文件目录
+EXPORT_DIR = os.getenv(
+    "AKS_EXPORT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exports")
+)
+# 导出工作线程数
+EXPORT_WORKERS = int(os.getenv("AKS_EXPORT_WORKERS", "2"))
+# 导出文件最长保留时间（小时）
+EXPORT_MAX_AGE_HOURS = float(os.getenv("AKS_EXPORT_MAX_AGE_HOURS", "24"))
+# 导出文件总大小上限（MB）
+EXPORT_MAX_TOTAL_MB = float(os.getenv("AKS_EXPORT_MAX_TOTAL_MB", "1024"))
+# 已完成任务在该时间（秒）内可被相同请求复用，超过后重新导出最新数据
+EXPORT_REUSE_SECONDS = int(os.getenv("AKS_EXPORT_REUSE_SECONDS", "600"))
+# 每导出多少行更新一次进度
+PROGRESS_INTERVAL = 1000
+# 执行中的任务超过该时间（秒）未更新进度，视为执行进程已退出
+EXPORT_STALE_SECONDS = int(os.getenv("AKS_EXPORT_STALE_SECONDS", "300"))
+
+# 导出中的临时文件后缀，完成后改名为正式文件
+PART_SUFFIX = ".part"
+
+
+class ExportSource:
+    """可导出的数据源：记录来源于服务的 export_* 方法，time_field 为时间范围过滤字段"""
+
+    def __init__(self, model_class: Type[BaseModel], open_records: Callable[..., Iterator[BaseModel]],
+                 repository: Repository, time_field: Optional[str] = None):
+        self.model_class = model_class
+        self.open_records = open_records
+        self.repository = repository
+        self.time_field = time_field
+
+    def open(self, time_from: Optional[datetime] = None, time_to: Optional[datetime] = None) -> Iterator[BaseModel]:
+        if self.time_field:
+            return self.open_records(time_from, time_to)
+        return self.open_records()
+
+    def count(self, time_from: Optional[datetime] = None, time_to: Optional[datetime] = None) -> int:
+        """统计待导出记录数，用于计算进度"""
+        if not self.time_field:
+            return self.repository.count()
+        return self.repository.count(build_filters(**{
+            f"{self.time_field}__gte": time_from,
+            f"{self.time_field}__lte": time_to,
+        }))
+
+
+# 导出类型 -> 数据源，类型名与同步导出接口的文件名一致
+EXPORT_SOURCES: Dict[str, ExportSource] = {
+    "accounts": ExportSource(AccountInfo, account_management_service.export_accounts,
+                             account_management_service.accounts_db),
+    "recharges": ExportSource(RechargeDetail, account_management_service.export_recharges,
+                              account_management_service.recharge_details_db, "recharge_time"),
+    "expenses": ExportSource(ExpenseDetail, account_management_service.export_expenses,
+                             account_management_service.expense_details_db, "transaction_time"),
+    "transactions": ExportSource(AccountTransaction, account_management_service.export_transactions,
+                                 account_management_service.transactions_db, "transaction_time"),
+    "townships": ExportSource(TownshipBaseInfo, basic_info_service.export_townships,
+                              basic_info_service.townships_db),
+    "villages": ExportSource(VillageBaseInfo, basic_info_service.export_villages,
+                             basic_info_service.villages_db),
+    "farmers": ExportSource(FarmerInfo, basic_info_service.export_farmers,
+                            basic_info_service.farmers_db),
+    "contracts": ExportSource(Contract, contract_management_service.export_contracts,
+                              contract_management_service.contracts_db, "create_time"),
+    "contract_fees": ExportSource(ContractFee, contract_management_service.export_fees,
+                                  contract_management_service.contract_fees_db, "due_date"),
+    "contract_attachments": ExportSource(ContractAttachment, contract_management_service.export_attachments,
+                                         contract_management_service.contract_attachments_db),
+    "fees": ExportSource(FeeInfo, fee_management_service.export_fees,
+                         fee_management_service.fee_infos_db, "due_date"),
+    "payments": ExportSource(PaymentRecord, fee_management_service.export_payments,
+                             fee_management_service.payment_records_db, "payment_time"),
+    "reductions": ExportSource(ReductionInfo, fee_management_service.export_reductions,
+                               fee_management_service.reduction_infos_db, "application_time"),
+    "projects": ExportSource(MortgageFinancingProject, financing_management_service.export_projects,
+                             financing_management_service.mortgage_projects_db, "apply_time"),
+    "allocated_lands": ExportSource(AllocatedLandInfo, financing_management_service.export_allocated_lands,
+                                    financing_management_service.allocated_lands_db, "create_time"),
+    "ledgers": ExportSource(FinancingProjectLedger, financing_management_service.export_ledgers,
+                            financing_management_service.ledgers_db, "record_time"),
+    "type_prices": ExportSource(LandTypePrice, land_base_info_service.export_land_type_prices,
+                                land_base_info_service.land_type_prices_db),
+    "lands": ExportSource(LandBaseInfo, land_base_info_service.export_lands,
+                          land_base_info_service.land_base_info_db),
+    "bidders": ExportSource(BidderRegistration, land_bidding_service.export_bidders,
+                            land_bidding_service.bidder_registrations_db),
+    "biddings": ExportSource(BiddingInfo, land_bidding_service.export_biddings,
+                             land_bidding_service.bidding_info_db, "start_time"),
+    "bid_records": ExportSource(BidRecord, land_bidding_service.export_bid_records,
+                                land_bidding_service.bid_records_db, "bid_time"),
+}
+
+
+class ExportJobError(ValueError):
+    """导出任务参数无效异常"""
+    pass
+
+
+class ExportJobService:
+    """导出任务服务，任务记录保存在 export_jobs 仓储中，导出文件写入 EXPORT_DIR，只有执行线程池在进程内"""
+
+    def __init__(self, export_dir: str = EXPORT_DIR, max_workers: int = EXPORT_WORKERS,
+                 max_age: timedelta = timedelta(hours=EXPORT_MAX_AGE_HOURS),
+                 max_total_bytes: int = int(EXPORT_MAX_TOTAL_MB * 1024 * 1024),
+                 reuse_window: timedelta = timedelta(seconds=EXPORT_REUSE_SECONDS),
+                 stale_after: timedelta = timedelta(seconds=EXPORT_STALE_SECONDS)):
+        self.export_dir = export_dir
+        self.max_age = max_age
+        self.max_total_bytes = max_total_bytes
+        self.reuse_window = reuse_window
+        self.stale_after = stale_after
+        self.jobs_db: Repository = create_repository("export_jobs", ExportJob)
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export-job")
+        os.makedirs(self.export_dir, exist_ok=True)
+
+    # 任务管理
+    def file_path(self, job: ExportJob) -> str:
+        """任务导出文件的存放路径"""
+        return os.path.join(self.export_dir, f"{job.id}.{job.file_format.value}")
+
+    @staticmethod
+    def fingerprint(request: CreateExportJobRequest) -> str:
+        """请求指纹，类型、格式、时间范围一致的请求指纹相同"""
+        parts = [
+            request.export_type,
+            request.file_format.value,
+            request.time_from.isoformat() if request.time_from else "",
+            request.time_to.isoformat() if request.time_to else "",
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _stale(self, job: ExportJob, now: datetime) -> bool:
+        """执行中的任务长时间未更新进度（执行进程已退出）"""
+        return (job.status == ExportJobStatusEnum.RUNNING
+                and now - (job.update_time or job.create_time) > self.stale_after)
+
+    def _reusable(self, job: ExportJob, now: datetime) -> bool:
+        """判断已有任务能否复用于相同请求"""
+        if job.status in (ExportJobStatusEnum.PENDING, ExportJobStatusEnum.RUNNING):
+            return not self._stale(job, now)
+        return (
+            job.status == ExportJobStatusEnum.COMPLETED
+            and job.finish_time is not None
+            and now - job.finish_time <= self.reuse_window
+            and os.path.exists(self.file_path(job))
+        )
+
+    def submit_job(self, request: CreateExportJobRequest) -> ExportJob:
+        """提交导出任务，相同请求已在排队、执行中或刚完成时直接返回该任务"""
+        source = EXPORT_SOURCES.get(request.export_type)
+        if source is None:
+            raise ExportJobError(f"Unsupported export type: {request.export_type}")
+        if (request.time_from or request.time_to) and not source.time_field:
+            raise ExportJobError(f"Export type {request.export_type} does not support time range")
+        if request.time_from and request.time_to and request.time_from > request.time_to:
+            raise ExportJobError("time_from must not be later than time_to")
+
+        fingerprint = self.fingerprint(request)
+        now = datetime.now()
+        with self._lock:
+            for job in self.jobs_db.find(build_filters(fingerprint=fingerprint), order_by="create_time",
+                                         descending=True):
+                if self._reusable(job, now):
+                    return job
+
+            job = ExportJob(
+                id=str(uuid.uuid4()),
+                export_type=request.export_type,
+                file_format=request.file_format,
+                time_from=request.time_from,
+                time_to=request.time_to,
+                fingerprint=fingerprint,
+                status=ExportJobStatusEnum.PENDING,
+                create_time=now,
+                update_time=now
+            )
+            self.jobs_db.put(job)
+        self._executor.submit(self._run_job, job.id)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        """获取导出任务"""
+        return self.jobs_db.get(job_id)
+
+    def get_jobs(self, status: Optional[ExportJobStatusEnum] = None,
+                 export_type: Optional[str] = None) -> List[ExportJob]:
+        """获取导出任务列表，按创建时间倒序"""
+        return self.jobs_db.find(build_filters(status=status, export_type=export_type),
+                                 order_by="create_time", descending=True)
+
+    def get_job_file(self, job_id: str) -> Optional[str]:
+        """获取已完成任务的导出文件路径，文件已被清理时返回None"""
+        job = self.jobs_db.get(job_id)
+        if not job or job.status != ExportJobStatusEnum.COMPLETED:
+            return None
+        path = self.file_path(job)
+        if not os.path.exists(path):
+            self._mark_expired(job)
+            return None
+        return path
+
+    def delete_job(self, job_id: str) -> bool:
+        """删除导出任务及其文件；执行中的任务在下次写入进度时终止"""
+        job = self.jobs_db.get(job_id)
+        if not job or not self.jobs_db.delete_many([job_id]):
+            return False
+        self._remove_file(self.file_path(job))
+        return True
+
+    def shutdown(self) -> None:
+        """停止接收新任务，等待执行中的任务结束"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _update(self, job: ExportJob, **changes: Any) -> Optional[ExportJob]:
+        """按状态比较写入任务，任务已被删除或状态已被其他进程改变时返回None"""
+        updated = job.model_copy(update=dict(changes, update_time=datetime.now()))
+        if not self.jobs_db.compare_and_set(updated, "status", job.status):
+            return None
+        return updated
+
+    # 任务执行
+    def _run_job(self, job_id: str) -> None:
+        job = self.jobs_db.get(job_id)
+        if not job or job.status != ExportJobStatusEnum.PENDING:
+            return
+        source = EXPORT_SOURCES[job.export_type]
+        path = self.file_path(job)
+        part_path = path + PART_SUFFIX
+        job = self._update(job, status=ExportJobStatusEnum.RUNNING, start_time=datetime.now(),
+                           total_rows=source.count(job.time_from, job.time_to))
+        if job is None:
+            return
+        progress = {"job": job, "cancelled": False}
+        try:
+            records = self._track_progress(progress, source.open(job.time_from, job.time_to))
+            body = export_body(records, source.model_class, job.export_type, job.file_format)
+            with open(part_path, "wb") as f:
+                for chunk in body:
+                    f.write(chunk)
+            job = progress["job"]
+            if progress["cancelled"]:
+                self._remove_file(part_path)
+                return
+            os.replace(part_path, path)
+
+            finished = self._update(
+                job,
+                file_name=f"{job.export_type}_{job.create_time.strftime('%Y%m%d%H%M%S')}.{job.file_format.value}",
+                file_size=os.path.getsize(path),
+                total_rows=job.processed_rows,
+                progress=100.0,
+                status=ExportJobStatusEnum.COMPLETED,
+                finish_time=datetime.now()
+            )
+            # 导出期间任务被删除
+            if finished is None:
+                self._remove_file(path)
+        except Exception as e:
+            self._remove_file(part_path)
+            self._update(progress["job"], status=ExportJobStatusEnum.FAILED, error=str(e),
+                         finish_time=datetime.now())
+            print(f"导出任务 {job_id} 失败: {e}")
+        finally:
+            self.enforce_retention()
+
+    def _track_progress(self, progress: Dict[str, Any], records: Iterator[BaseModel]) -> Iterator[BaseModel]:
+        """逐条转发记录并累计进度，每 PROGRESS_INTERVAL 行写入一次任务，任务被删除时停止导出"""
+        processed = 0
+        for record in records:
+            processed += 1
+            if processed % PROGRESS_INTERVAL == 0:
+                job = progress["job"]
+                # 导出期间可能有新增记录，完成前进度最多显示99%
+                percent = min(round(processed * 100.0 / job.total_rows, 2), 99.0) if job.total_rows else job.progress
+                updated = self._update(job, processed_rows=processed, progress=percent)
+                if updated is None:
+                    progress["cancelled"] = True
+                    return
+                progress["job"] = updated
+            yield record
+        progress["job"] = progress["job"].model_copy(update={"processed_rows": processed})
+
+    # 文件清理
+    def enforce_retention(self) -> int:
+        """清理超过保留时间的导出文件，总大小超限时从最旧的文件开始删除，返回删除的文件数"""
+        now = datetime.now()
+        with self._lock:
+            files = []
+            for name in os.listdir(self.export_dir):
+                path = os.path.join(self.export_dir, name)
+                if name.endswith(PART_SUFFIX) or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, name, path))
+            files.sort()
+
+            removed = 0
+            total_bytes = sum(size for _, size, _, _ in files)
+            for mtime, size, name, path in files:
+                expired = now - datetime.fromtimestamp(mtime) > self.max_age
+                if not expired and total_bytes <= self.max_total_bytes:
+                    continue
+                self._remove_file(path)
+                total_bytes -= size
+                removed += 1
+                # 文件名为 任务ID.格式
+                job = self.jobs_db.get(name.rsplit(".", 1)[0])
+                if job:
+                    self._mark_expired(job)
+
+            # 执行进程已退出的任务记为失败
+            for job in self.jobs_db.find(build_filters(status=ExportJobStatusEnum.RUNNING)):
+                if self._stale(job, now):
+                    self._update(job, status=ExportJobStatusEnum.FAILED, error="Export worker stopped",
+                                 finish_time=now)
+            # 失败、过期任务的记录保留与文件相同的时长
+            self.jobs_db.delete_many(job.id for job in self.jobs_db.find(build_filters(
+                status__in=[ExportJobStatusEnum.FAILED, ExportJobStatusEnum.EXPIRED],
+                finish_time__lte=now - self.max_age
+            )))
+        return removed
+
+    def _mark_expired(self, job: ExportJob) -> None:
+        self._update(job, status=ExportJobStatusEnum.EXPIRED, file_size=None)
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# 创建服务实例供导入使用
+export_job_service = ExportJobService()
@@ -1,7 +1,7 @@
 # 费用信息管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict, Tuple
+from typing import Any, Callable, List, Optional, Dict, Tuple, Iterable, Iterator
 from datetime import datetime, timedelta
 import uuid
 
@@ -19,21 +19,67 @@ from models.fee_management import (
     UpdatePaymentRecordRequest,
     FeeQueryRequest,
     PaymentRecordQueryRequest,
+    FeeOverdueNotice,
     FeeTypeEnum,
     FeeStatusEnum,
     PaymentStatusEnum,
     ReductionStatusEnum
 )
+from models.batch import BatchCreateResult
+from repositories.aggregates import Aggregate, OrderedIndex
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend, transaction
+from repositories.async_repository import AsyncDocumentRepository
+from services.basic_info_service import basic_info_service
+from services.contract_management_service import contract_management_service
+from services.job_lease import JobLease, JobLeases
+from services.land_base_info_service import land_base_info_service
+from utils.batch_utils import BatchErrors, UniqueKeyClaims
+from utils.scheduler import TimerScheduler
+
+# 未结清的费用状态，到期后计入逾期
+OPEN_FEE_STATUSES = [FeeStatusEnum.PENDING, FeeStatusEnum.PARTIAL_PAID, FeeStatusEnum.OVERDUE]
+# 尚未标记逾期的未结清状态，逾期处理只扫描这些费用
+UNMARKED_FEE_STATUSES = [FeeStatusEnum.PENDING, FeeStatusEnum.PARTIAL_PAID]
+# 由支付记录决定的费用状态，校验时只核对这些状态
+PAYMENT_DERIVED_STATUSES = [FeeStatusEnum.PENDING, FeeStatusEnum.PARTIAL_PAID, FeeStatusEnum.PAID,
+                            FeeStatusEnum.OVERDUE]
+# 滞纳金日费率（按未缴金额计），默认万分之五
+FEE_PENALTY_DAILY_RATE = float(os.getenv("AKS_FEE_PENALTY_DAILY_RATE", "0.0005"))
+# 每日逾期处理的执行时刻（小时）
+OVERDUE_JOB_HOUR = int(os.getenv("AKS_FEE_OVERDUE_JOB_HOUR", "1"))
+# 逾期处理租约的有效期（秒），多进程部署时同一时间只有一个进程执行逾期处理
+OVERDUE_JOB_LEASE_SECONDS = int(os.getenv("AKS_FEE_OVERDUE_LEASE_SECONDS", "3600"))
+OVERDUE_JOB_LEASE = "fee-overdue"
+# 费用比较写入冲突（其他请求或进程同时修改了费用）时的最大尝试次数
+FEE_WRITE_ATTEMPTS = 5
+# 逾期通知的类型和初始状态，由通知发送方按批次发送
+OVERDUE_NOTICE_TYPE = "站内信"
+OVERDUE_NOTICE_STATUS = "待发送"
+# 校验结果中返回的不一致费用条数上限
+VERIFY_SAMPLE_LIMIT = 100
 
 
 class FeeManagementService:
     def __init__(self):
-        # 模拟数据库存储
-        self.fee_infos_db: Dict[str, FeeInfo] = {}
-        self.reduction_infos_db: Dict[str, ReductionInfo] = {}
-        self.payment_records_db: Dict[str, PaymentRecord] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.fee_infos_db: Repository = create_repository("fee_infos", FeeInfo)
+        self.reduction_infos_db: Repository = create_repository("reduction_infos", ReductionInfo)
+        self.payment_records_db: Repository = create_repository("payment_records", PaymentRecord)
+        self.overdue_notices_db: Repository = create_repository("fee_overdue_notices", FeeOverdueNotice)
+        self.job_leases = JobLeases(create_repository("job_leases", JobLease))
+        # 支付交易流水号的去重检查与写入在占用期间完成，同一流水号只入账一次
+        self.payment_transaction_ids = UniqueKeyClaims(
+            lambda values: self.payment_records_db.existing_values("transaction_id", values))
+        # 异步读取仓储，供高频查询接口使用
+        self.fee_infos_async_repo = AsyncDocumentRepository("fee_infos", FeeInfo, lambda: self.fee_infos_db)
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
+        self._register_aggregates()
+        # 每日逾期处理定时任务，由 main 在服务启动时启动调度线程；启动后先执行一次，多进程时由租约保证只有一个进程执行
+        self.scheduler = TimerScheduler("fee-overdue")
+        self.scheduler.schedule("overdue", datetime.now(), self._run_scheduled_overdue_job)
     
     def _init_test_data(self):
         # 初始化费用信息数据
@@ -46,8 +92,9 @@ class FeeManagementService:
             amount=7750.0,
             original_amount=7750.0,
             reduction_amount=0.0,
+            paid_amount=3000.0,
             due_date=datetime(2023, 12, 31),
-            status=FeeStatusEnum.PENDING,
+            status=FeeStatusEnum.PARTIAL_PAID,
             create_time=datetime.now(),
             update_time=datetime.now()
         )
@@ -72,26 +119,43 @@ class FeeManagementService:
                      fee_type: Optional[str] = None, 
                      status: Optional[str] = None, 
                      due_date_from: Optional[datetime] = None, 
-                     due_date_to: Optional[datetime] = None) -> List[FeeInfo]:
+                     due_date_to: Optional[datetime] = None,
+                     limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> List[FeeInfo]:
         """获取所有费用信息"""
-        fees = list(self.fee_infos_db.values())
-        
-        if user_id:
-            fees = [f for f in fees if f.user_id == user_id]
-        if land_id:
-            fees = [f for f in fees if f.land_id == land_id]
-        if fee_type:
-            fees = [f for f in fees if f.fee_type == fee_type]
-        if status:
-            fees = [f for f in fees if f.status == status]
-        if due_date_from:
-            fees = [f for f in fees if f.due_date >= due_date_from]
-        if due_date_to:
-            fees = [f for f in fees if f.due_date <= due_date_to]
-            
+        filters = build_filters(
+            user_id=user_id,
+            land_id=land_id,
+            fee_type=fee_type,
+            status=status,
+            due_date__gte=due_date_from,
+            due_date__lte=due_date_to
+        )
         # 按到期日期排序
-        fees.sort(key=lambda x: x.due_date)
-        return fees
+        return self.fee_infos_db.find_page(filters, order_by="due_date", limit=limit, cursor=cursor)
+    
+    async def get_fee_infos_async(self,
+                                  user_id: Optional[str] = None,
+                                  land_id: Optional[str] = None,
+                                  contract_id: Optional[str] = None,
+                                  fee_type: Optional[str] = None,
+                                  status: Optional[str] = None,
+                                  due_date_from: Optional[datetime] = None,
+                                  due_date_to: Optional[datetime] = None,
+                                  limit: Optional[int] = None,
+                                  cursor: Optional[str] = None) -> List[FeeInfo]:
+        """异步获取费用信息，按到期日期排序"""
+        filters = build_filters(
+            user_id=user_id,
+            land_id=land_id,
+            contract_id=contract_id,
+            fee_type=fee_type,
+            status=status,
+            due_date__gte=due_date_from,
+            due_date__lte=due_date_to
+        )
+        return await self.fee_infos_async_repo.find_page(filters, order_by="due_date",
+                                                         limit=limit, cursor=cursor)
     
     def get_fee_info_by_id(self, fee_id: str) -> Optional[FeeInfo]:
         """根据ID获取费用信息"""
@@ -120,6 +184,39 @@ class FeeManagementService:
         
         return fee_info
     
+    def batch_create_fee_infos(self, requests: List[CreateFeeInfoRequest],
+                               atomic: bool = True) -> BatchCreateResult:
+        """批量创建费用信息
+
+        合同和土地一次性校验，通过校验的费用批量写入；atomic 为True时任一行有错误则全部不写入
+        """
+        errors = BatchErrors()
+        existing_contracts = contract_management_service.contracts_db.existing_ids(req.contract_id for req in requests)
+        existing_lands = land_base_info_service.land_base_info_db.existing_ids(req.land_id for req in requests)
+        for index, req in enumerate(requests):
+            errors.check_exists(index, "contract_id", req.contract_id, existing_contracts, "Contract")
+            errors.check_exists(index, "land_id", req.land_id, existing_lands, "Land")
+            if req.amount <= 0:
+                errors.add(index, "amount must be greater than 0", "amount")
+        if errors and atomic:
+            return errors.result([])
+
+        now = datetime.now()
+        fee_infos = [
+            FeeInfo(
+                id=str(uuid.uuid4()),
+                **req.model_dump(),
+                original_amount=req.amount,
+                reduction_amount=0.0,
+                status=FeeStatusEnum.PENDING,
+                create_time=now,
+                update_time=now
+            )
+            for index, req in enumerate(requests) if index not in errors
+        ]
+        self.fee_infos_db.bulk_put(fee_infos)
+        return errors.result([fee_info.id for fee_info in fee_infos])
+    
     def update_fee_info(self, fee_id: str, request: UpdateFeeInfoRequest) -> Optional[FeeInfo]:
         """更新费用信息"""
         if fee_id not in self.fee_infos_db:
@@ -167,22 +264,23 @@ class FeeManagementService:
                            fee_id: Optional[str] = None, 
                            user_id: Optional[str] = None, 
                            reduction_reason: Optional[str] = None, 
-                           status: Optional[str] = None) -> List[ReductionInfo]:
+                           status: Optional[str] = None, 
+                           application_time_from: Optional[datetime] = None, 
+                           application_time_to: Optional[datetime] = None,
+                           limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[ReductionInfo]:
         """获取所有减免信息"""
-        reductions = list(self.reduction_infos_db.values())
-        
-        if fee_id:
-            reductions = [r for r in reductions if r.fee_id == fee_id]
-        if user_id:
-            reductions = [r for r in reductions if r.user_id == user_id]
-        if reduction_reason:
-            reductions = [r for r in reductions if reduction_reason in r.reduction_reason]
-        if status:
-            reductions = [r for r in reductions if r.status == status]
-            
+        filters = build_filters(
+            fee_id=fee_id,
+            user_id=user_id,
+            reduction_reason__contains=reduction_reason,
+            status=status,
+            application_time__gte=application_time_from,
+            application_time__lte=application_time_to
+        )
         # 按申请时间倒序排序
-        reductions.sort(key=lambda x: x.application_time, reverse=True)
-        return reductions
+        return self.reduction_infos_db.find_page(filters, order_by="application_time", descending=True,
+                                                 limit=limit, cursor=cursor)
     
     def get_reduction_info_by_id(self, reduction_id: str) -> Optional[ReductionInfo]:
         """根据ID获取减免信息"""
@@ -253,29 +351,28 @@ class FeeManagementService:
                            fee_id: Optional[str] = None, 
                            status: Optional[str] = None, 
                            payment_time_from: Optional[datetime] = None, 
-                           payment_time_to: Optional[datetime] = None) -> List[PaymentRecord]:
+                           payment_time_to: Optional[datetime] = None, 
+                           transaction_id: Optional[str] = None,
+                           limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> List[PaymentRecord]:
         """获取所有支付记录"""
-        payments = list(self.payment_records_db.values())
-        
-        if fee_id:
-            payments = [p for p in payments if p.fee_id == fee_id]
-        if status:
-            payments = [p for p in payments if p.status == status]
-        if payment_time_from:
-            payments = [p for p in payments if p.payment_time >= payment_time_from]
-        if payment_time_to:
-            payments = [p for p in payments if p.payment_time <= payment_time_to]
-            
+        filters = build_filters(
+            fee_id=fee_id,
+            status=status,
+            transaction_id=transaction_id,
+            payment_time__gte=payment_time_from,
+            payment_time__lte=payment_time_to
+        )
         # 按支付时间倒序排序
-        payments.sort(key=lambda x: x.payment_time, reverse=True)
-        return payments
+        return self.payment_records_db.find_page(filters, order_by="payment_time", descending=True,
+                                                 limit=limit, cursor=cursor)
     
     def get_payment_record_by_id(self, payment_id: str) -> Optional[PaymentRecord]:
         """根据ID获取支付记录"""
         return self.payment_records_db.get(payment_id)
     
     def create_payment_record(self, request: CreatePaymentRecordRequest) -> Optional[PaymentRecord]:
-        """创建支付记录"""
+        """创建支付记录，费用不存在、已支付或交易流水号已入账时返回None"""
         # 检查费用是否存在
         if request.fee_id not in self.fee_infos_db:
             return None
@@ -285,8 +382,9 @@ class FeeManagementService:
         if fee_info.status == FeeStatusEnum.PAID:
             return None
         
-        # 生成交易ID
-        transaction_id = f"TXN-{datetime.now().strftime('%Y%m%d')}-{str(len(self.payment_records_db) + 1).zfill(4)}"
+        # 未提供交易流水号时生成
+        transaction_id = request.transaction_id or \
+            f"TXN-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:12].upper()}"
         
         payment_record = PaymentRecord(
             id=str(uuid.uuid4()),
@@ -295,45 +393,96 @@ class FeeManagementService:
             payment_method=request.payment_method,
             transaction_id=transaction_id,
             payment_time=request.payment_time or datetime.now(),
-            status=request.status or PaymentStatusEnum.PROCESSING
+            status=request.status or PaymentStatusEnum.PROCESSING,
+            update_time=datetime.now()
         )
-        self.payment_records_db[payment_record.id] = payment_record
-        
-        # 更新费用状态
-        self._update_fee_status(fee_info.id)
+        with self.payment_transaction_ids.claim([transaction_id]) as processed:
+            if processed:
+                return None
+            # 支付记录与费用的已支付金额在同一事务中写入
+            with transaction():
+                self.payment_records_db[payment_record.id] = payment_record
+                self._apply_paid_amounts({fee_info.id: self._success_amount(payment_record)})
         
         return payment_record
     
+    def batch_create_payment_records(self, requests: List[CreatePaymentRecordRequest],
+                                     atomic: bool = True,
+                                     dry_run: bool = False,
+                                     default_status: PaymentStatusEnum = PaymentStatusEnum.SUCCESS) -> BatchCreateResult:
+        """批量入账支付记录（POS收费、银行代收文件）
+
+        按交易流水号去重，已入账、批次内重复或正由其他请求入账的行跳过；费用一次性校验，支付记录批量写入后
+        每个涉及的费用只重算一次状态。批量入账的支付均已结算，未指定状态时记为 default_status。
+        atomic 为True时任一行有错误则全部不写入，dry_run 为True时只校验不写入
+        """
+        errors = BatchErrors()
+        # 流水号占用到写入结束，并发提交的相同流水号只有一个入账
+        with self.payment_transaction_ids.claim(req.transaction_id for req in requests) as processed:
+            errors.skip_duplicates([req.transaction_id for req in requests], processed)
+            fees = {fee_id: self.fee_infos_db.get(fee_id) for fee_id in {req.fee_id for req in requests}}
+            for index, req in enumerate(requests):
+                if index in errors:
+                    continue
+                fee_info = fees[req.fee_id]
+                if fee_info is None:
+                    errors.add(index, f"Fee {req.fee_id} not found", "fee_id")
+                elif fee_info.status == FeeStatusEnum.PAID:
+                    errors.add(index, f"Fee {req.fee_id} is already paid", "fee_id")
+                if req.amount <= 0:
+                    errors.add(index, "amount must be greater than 0", "amount")
+            if dry_run or (errors and atomic):
+                return errors.result([])
+
+            now = datetime.now()
+            payment_records = [
+                PaymentRecord(
+                    id=str(uuid.uuid4()),
+                    fee_id=req.fee_id,
+                    amount=req.amount,
+                    payment_method=req.payment_method,
+                    transaction_id=req.transaction_id or f"TXN-{now.strftime('%Y%m%d')}-{uuid.uuid4().hex[:12].upper()}",
+                    payment_time=req.payment_time or now,
+                    status=req.status or default_status,
+                    update_time=now
+                )
+                for index, req in enumerate(requests) if index not in errors
+            ]
+            paid: Dict[str, float] = {}
+            for record in payment_records:
+                paid[record.fee_id] = paid.get(record.fee_id, 0) + self._success_amount(record)
+            with transaction():
+                self.payment_records_db.bulk_put(payment_records)
+                self._apply_paid_amounts(paid)
+        return errors.result([record.id for record in payment_records])
+    
     def update_payment_record(self, payment_id: str, request: UpdatePaymentRecordRequest) -> Optional[PaymentRecord]:
-        """更新支付记录"""
-        if payment_id not in self.payment_records_db:
+        """更新支付记录，记录不存在或交易流水号已被其他支付使用时返回None
+
+        支付记录按更新时间比较写入，成功支付金额的变化与支付记录在同一事务中计入费用的已支付金额
+        """
+        payment_record = self.payment_records_db.get(payment_id)
+        if payment_record is None:
             return None
         
-        payment_record = self.payment_records_db[payment_id]
-        
-        if request.amount is not None:
-            old_amount = payment_record.amount
-            payment_record.amount = request.amount
-            # 如果金额有变化，更新费用状态
-            if old_amount != request.amount:
-                self._update_fee_status(payment_record.fee_id)
-        if request.payment_time:
-            payment_record.payment_time = request.payment_time
-        if request.payment_method:
-            payment_record.payment_method = request.payment_method
-        if request.status:
-            old_status = payment_record.status
-            payment_record.status = request.status
-            # 如果状态有变化，更新费用状态
-            if old_status != request.status:
-                self._update_fee_status(payment_record.fee_id)
-        if request.transaction_id:
-            payment_record.transaction_id = request.transaction_id
-        if request.remark:
-            payment_record.remark = request.remark
-        
-        self.payment_records_db[payment_id] = payment_record
-        return payment_record
+        # 修改为其他交易流水号时同样去重，流水号已入账时返回None
+        transaction_id = request.transaction_id if request.transaction_id != payment_record.transaction_id else None
+        changes = {field: value for field, value in request.model_dump(exclude_none=True).items() if value != ""}
+        with self.payment_transaction_ids.claim([transaction_id]) as processed:
+            if processed:
+                return None
+            # 其他请求或进程同时修改该支付记录时重新读取，以最新的记录计算已支付金额的变化
+            while True:
+                updated = payment_record.model_copy(update=dict(changes, update_time=datetime.now()))
+                with transaction():
+                    if self.payment_records_db.compare_and_set(updated, "update_time", payment_record.update_time):
+                        delta = self._success_amount(updated) - self._success_amount(payment_record)
+                        if delta:
+                            self._apply_paid_amounts({updated.fee_id: delta})
+                        return updated
+                payment_record = self.payment_records_db.get(payment_id)
+                if payment_record is None:
+                    return None
     
     def delete_payment_record(self, payment_id: str) -> bool:
         """删除支付记录"""
@@ -345,97 +494,48 @@ class FeeManagementService:
         if payment_record.status == PaymentStatusEnum.SUCCESS:
             return False
         
-        # 获取费用ID
-        fee_id = payment_record.fee_id
-        
+        # 未成功的支付不计入已支付金额，删除后费用无需更新
         del self.payment_records_db[payment_id]
         
-        # 更新费用状态
-        self._update_fee_status(fee_id)
-        
         return True
     
     # 费用查询
-    def query_fees(self, request: FeeQueryRequest) -> List[FeeInfo]:
-        """高级费用查询"""
-        fees = list(self.fee_infos_db.values())
-        
-        # 应用查询条件
-        if request.user_id:
-            fees = [f for f in fees if f.user_id == request.user_id]
-        if request.land_id:
-            fees = [f for f in fees if f.land_id == request.land_id]
-        if request.contract_id:
-            fees = [f for f in fees if f.contract_id == request.contract_id]
-        if request.fee_type:
-            fees = [f for f in fees if f.fee_type == request.fee_type]
-        if request.status:
-            fees = [f for f in fees if f.status == request.status]
-        if request.start_date:
-            fees = [f for f in fees if f.due_date >= request.start_date]
-        if request.end_date:
-            fees = [f for f in fees if f.due_date <= request.end_date]
-        
-        # 排序
-        if request.sort_by:
-            try:
-                fees.sort(key=lambda x: getattr(x, request.sort_by), reverse=request.sort_descending)
-            except AttributeError:
-                # 如果排序字段不存在，按到期日期排序
-                fees.sort(key=lambda x: x.due_date)
-        else:
-            # 默认按到期日期排序
-            fees.sort(key=lambda x: x.due_date)
-        
-        # 分页
-        if request.page and request.page_size:
-            start = (request.page - 1) * request.page_size
-            end = start + request.page_size
-            fees = fees[start:end]
-        
-        return fees
+    def query_fees(self, request: FeeQueryRequest,
+                   limit: Optional[int] = None, cursor: Optional[str] = None) -> List[FeeInfo]:
+        """高级费用查询，按到期日期游标分页"""
+        filters = build_filters(
+            user_id=request.user_id,
+            land_id=request.land_id,
+            contract_id=request.contract_id,
+            fee_type=request.fee_type,
+            status=request.status,
+            due_date__gte=request.start_date,
+            due_date__lte=request.end_date
+        )
+        return self.fee_infos_db.find_page(filters, order_by="due_date", limit=limit, cursor=cursor)
     
     # 支付记录查询
-    def query_payment_records(self, request: PaymentRecordQueryRequest) -> List[PaymentRecord]:
-        """高级支付记录查询"""
-        payments = list(self.payment_records_db.values())
-        
-        # 应用查询条件
-        if request.fee_ids:
-            payments = [p for p in payments if p.fee_id in request.fee_ids]
-        if request.payment_methods:
-            payments = [p for p in payments if p.payment_method in request.payment_methods]
-        if request.statuses:
-            payments = [p for p in payments if p.status in request.statuses]
-        if request.transaction_ids:
-            payments = [p for p in payments if p.transaction_id in request.transaction_ids]
-        if request.payment_time_from:
-            payments = [p for p in payments if p.payment_time >= request.payment_time_from]
-        if request.payment_time_to:
-            payments = [p for p in payments if p.payment_time <= request.payment_time_to]
-        if request.amount_from is not None:
-            payments = [p for p in payments if p.amount >= request.amount_from]
-        if request.amount_to is not None:
-            payments = [p for p in payments if p.amount <= request.amount_to]
-        
-        # 排序
-        if request.sort_by:
-            try:
-                payments.sort(key=lambda x: getattr(x, request.sort_by), reverse=request.sort_descending)
-            except AttributeError:
-                # 如果排序字段不存在，按支付时间倒序排序
-                payments.sort(key=lambda x: x.payment_time, reverse=True)
-        else:
-            # 默认按支付时间倒序排序
-            payments.sort(key=lambda x: x.payment_time, reverse=True)
-        
-        # 分页
-        if request.page and request.page_size:
-            start = (request.page - 1) * request.page_size
-            end = start + request.page_size
-            payments = payments[start:end]
-        
-        return payments
+    def query_payment_records(self, request: PaymentRecordQueryRequest,
+                              limit: Optional[int] = None, cursor: Optional[str] = None) -> List[PaymentRecord]:
+        """高级支付记录查询，按指定字段游标分页"""
+        filters = build_filters(
+            fee_id__in=request.fee_ids,
+            payment_method__in=request.payment_methods,
+            status__in=request.payment_statuses,
+            transaction_id__in=request.transaction_ids,
+            payment_time__gte=request.payment_date_from,
+            payment_time__lte=request.payment_date_to,
+            amount__gte=request.amount_from,
+            amount__lte=request.amount_to
+        )
+        
+        # 排序，排序字段不存在时按支付时间倒序排序
+        if self.payment_records_db.has_field(request.sort_by):
+            return self.payment_records_db.find_page(filters, order_by=request.sort_by,
+                                                     descending=request.sort_descending,
+                                                     limit=limit, cursor=cursor)
+        return self.payment_records_db.find_page(filters, order_by="payment_time", descending=True,
+                                                 limit=limit, cursor=cursor)
     
     # 应用减免
     def _apply_reduction(self, reduction_info: ReductionInfo) -> None:
@@ -459,137 +559,406 @@ class FeeManagementService:
     
     # 更新费用状态
     def _update_fee_status(self, fee_id: str) -> None:
-        """根据支付记录更新费用状态"""
-        if fee_id not in self.fee_infos_db:
-            return
-        
-        fee_info = self.fee_infos_db[fee_id]
-        
-        # 获取所有与该费用相关的已完成支付记录
-        completed_payments = [
-            p for p in self.payment_records_db.values()
-            if p.fee_id == fee_id and p.status == PaymentStatusEnum.SUCCESS
-        ]
-        
-        # 计算已支付总额
-        paid_amount = sum(p.amount for p in completed_payments)
-        
-        # 更新费用状态
+        """费用金额变化后按已支付金额重新确定状态"""
+        self._apply_paid_amounts({fee_id: 0})
+    
+    @staticmethod
+    def _success_amount(payment_record: PaymentRecord) -> float:
+        """支付记录计入已支付金额的部分，只有成功的支付计入"""
+        return payment_record.amount if payment_record.status == PaymentStatusEnum.SUCCESS else 0
+    
+    def _apply_paid_amounts(self, deltas: Dict[str, float]) -> None:
+        """将成功支付金额的变化（费用ID -> 增减金额）计入费用的已支付金额，并重新确定状态
+
+        在费用当前保存的已支付金额上增减，不依赖本进程的统计，多个工作进程同时入账时结果正确；
+        费用按更新时间比较写入，冲突时重新读取后再计入。每次冲突都说明其他写入已经成功，重试不会无限进行，
+        已支付金额的变化不会因冲突丢失
+        """
+        now = datetime.now()
+        for fee_id, delta in deltas.items():
+            while True:
+                fee_info = self.fee_infos_db.get(fee_id)
+                if fee_info is None:
+                    break
+                paid_amount = round(fee_info.paid_amount + delta, 2)
+                updated = fee_info.model_copy(update={
+                    "paid_amount": paid_amount,
+                    "status": self._derive_status(fee_info, paid_amount),
+                    "update_time": now
+                })
+                if self.fee_infos_db.compare_and_set(updated, "update_time", fee_info.update_time):
+                    break
+
+    def _write_fees(self, fee_ids: Iterable[str], change: Callable[[FeeInfo], Optional[Dict[str, Any]]],
+                    now: datetime) -> List[FeeInfo]:
+        """逐个读取费用，按 change 返回的修改按更新时间比较写入，返回写入的费用
+
+        change 返回None时不修改；其他请求或进程在读取之后修改了费用时重新读取并重算，
+        FEE_WRITE_ATTEMPTS 次仍冲突的费用本次不写入，由下次写入或 verify_fee_totals 修正
+        """
+        written = []
+        for fee_id in fee_ids:
+            for _ in range(FEE_WRITE_ATTEMPTS):
+                fee_info = self.fee_infos_db.get(fee_id)
+                if fee_info is None:
+                    break
+                updates = change(fee_info)
+                if updates is None:
+                    break
+                updated = fee_info.model_copy(update=dict(updates, update_time=now))
+                if self.fee_infos_db.compare_and_set(updated, "update_time", fee_info.update_time):
+                    written.append(updated)
+                    break
+            else:
+                print(f"费用 {fee_id} 被并发修改，本次未写入")
+        return written
+    
+    def _paid_amount(self, fee_id: str) -> float:
+        """费用的成功支付合计（取自支付统计，用于校验），舍去增量累加的浮点残差"""
+        return round(self.paid_by_fee.group(fee_id)["amount"], 2)
+    
+    @staticmethod
+    def _derive_status(fee_info: FeeInfo, paid_amount: float) -> FeeStatusEnum:
+        """由已支付金额确定费用状态，已标记逾期的费用付清前保持逾期"""
         if paid_amount >= fee_info.amount:
-            fee_info.status = FeeStatusEnum.PAID
-        elif paid_amount > 0:
-            fee_info.status = FeeStatusEnum.PARTIAL_PAID
-        else:
-            fee_info.status = FeeStatusEnum.PENDING
-        
-        fee_info.update_time = datetime.now()
-        self.fee_infos_db[fee_id] = fee_info
+            return FeeStatusEnum.PAID
+        if fee_info.status == FeeStatusEnum.OVERDUE:
+            return FeeStatusEnum.OVERDUE
+        if paid_amount > 0:
+            return FeeStatusEnum.PARTIAL_PAID
+        return FeeStatusEnum.PENDING
+    
+    def verify_fee_totals(self, repair: bool = False) -> Dict:
+        """校验费用的已支付金额和状态
+
+        先以全量数据重算支付、费用的增量统计，再逐个核对费用保存的已支付金额和由支付决定的状态，
+        repair 为True时批量修正不一致的费用
+        """
+        drifted = self.payment_records_db.reconcile_aggregates() + self.fee_infos_db.reconcile_aggregates()
+        checked = 0
+        mismatched = []
+        samples = []
+        for fee_info in self.fee_infos_db.stream():
+            checked += 1
+            paid_amount = self._paid_amount(fee_info.id)
+            expected_status = fee_info.status
+            if fee_info.status in PAYMENT_DERIVED_STATUSES:
+                expected_status = self._derive_status(fee_info, paid_amount)
+            if paid_amount == fee_info.paid_amount and expected_status == fee_info.status:
+                continue
+            if len(samples) < VERIFY_SAMPLE_LIMIT:
+                samples.append({
+                    "fee_id": fee_info.id,
+                    "paid_amount": fee_info.paid_amount,
+                    "expected_paid_amount": paid_amount,
+                    "status": fee_info.status,
+                    "expected_status": expected_status
+                })
+            mismatched.append(fee_info.model_copy(update={
+                "paid_amount": paid_amount,
+                "status": expected_status,
+                "update_time": datetime.now()
+            }))
+        if repair and mismatched:
+            self.fee_infos_db.bulk_put(mismatched)
+        return {
+            "checked_fees": checked,
+            "drifted_aggregates": drifted,
+            "mismatched_fees": len(mismatched),
+            "repaired": repair and bool(mismatched),
+            "samples": samples
+        }
     
     # 删除费用相关的数据
     def _delete_fee_related_data(self, fee_id: str) -> None:
         """删除费用相关的所有数据"""
         # 删除相关的减免信息
-        reduction_ids_to_delete = [
-            reduction_id for reduction_id, reduction in self.reduction_infos_db.items()
-            if reduction.fee_id == fee_id and reduction.status == ReductionStatusEnum.PENDING_REVIEW
-        ]
-        for reduction_id in reduction_ids_to_delete:
-            del self.reduction_infos_db[reduction_id]
+        pending_reductions = self.reduction_infos_db.find(
+            build_filters(fee_id=fee_id, status=ReductionStatusEnum.PENDING)
+        )
+        self.reduction_infos_db.delete_many(r.id for r in pending_reductions)
         
         # 删除相关的支付记录
-        payment_ids_to_delete = [
-            payment_id for payment_id, payment in self.payment_records_db.items()
-            if payment.fee_id == fee_id and payment.status != PaymentStatusEnum.SUCCESS
-        ]
-        for payment_id in payment_ids_to_delete:
-            del self.payment_records_db[payment_id]
+        unfinished_payments = self.payment_records_db.find(
+            build_filters(fee_id=fee_id, status__in=[PaymentStatusEnum.FAILED, PaymentStatusEnum.PROCESSING])
+        )
+        self.payment_records_db.delete_many(p.id for p in unfinished_payments)
     
+    # 增量统计
+    def _register_aggregates(self) -> None:
+        """注册统计接口使用的增量统计，随费用、支付、核减记录的写入更新"""
+        self.fee_stats_by_status = self.fee_infos_db.add_aggregate(
+            "by_status", Aggregate("status", ["amount"]))
+        self.fee_stats_by_type = self.fee_infos_db.add_aggregate(
+            "by_type", Aggregate("fee_type", ["amount"]))
+        # 未结清费用按到期日期分组，逾期统计只需累加今天之前的分组
+        self.open_fee_stats_by_due_date = self.fee_infos_db.add_aggregate(
+            "open_by_due_date",
+            Aggregate("due_date__date", ["amount"], where=build_filters(status__in=OPEN_FEE_STATUSES)))
+        # 未结清费用、尚未标记逾期的费用按到期日期排序，逾期查询和逾期处理按到期日期范围读取
+        self.open_fees_by_due_date = self.fee_infos_db.add_aggregate(
+            "open_due_index", OrderedIndex("due_date", where=build_filters(status__in=OPEN_FEE_STATUSES)))
+        self.unmarked_fees_by_due_date = self.fee_infos_db.add_aggregate(
+            "unmarked_due_index", OrderedIndex("due_date", where=build_filters(status__in=UNMARKED_FEE_STATUSES)))
+        self.payment_stats_by_status = self.payment_records_db.add_aggregate(
+            "by_status", Aggregate("status", ["amount"]))
+        self.payment_stats_by_method = self.payment_records_db.add_aggregate(
+            "by_method", Aggregate("payment_method", ["amount"], where=build_filters(status=PaymentStatusEnum.SUCCESS)))
+        # 每个费用的成功支付合计，只用于 verify_fee_totals 核对费用保存的已支付金额
+        self.paid_by_fee = self.payment_records_db.add_aggregate(
+            "paid_by_fee", Aggregate("fee_id", ["amount"], where=build_filters(status=PaymentStatusEnum.SUCCESS)))
+        # 按 (用户, 状态) 汇总费用金额和已支付金额，用户费用汇总直接读取
+        self.fee_stats_by_user_status = self.fee_infos_db.add_aggregate(
+            "by_user_status", Aggregate(["user_id", "status"], ["amount", "paid_amount"]))
+        self.reduction_stats_by_status = self.reduction_infos_db.add_aggregate(
+            "by_status", Aggregate("status", ["reduction_amount"]))
+
+    def _overdue_summary(self) -> Tuple[int, float]:
+        """逾期费用数量和金额：今天之前到期的分组直接累加，今天到期的按时间查询"""
+        now = datetime.now()
+        today = now.date().isoformat()
+        overdue_count = 0
+        overdue_amount = 0
+        for due_date, group in self.open_fee_stats_by_due_date.groups().items():
+            if due_date < today:
+                overdue_count += group["count"]
+                overdue_amount += group["amount"]
+        due_today = self._fees(self.open_fees_by_due_date.range(
+            datetime.combine(now.date(), datetime.min.time()), now, include_upper=False))
+        overdue_count += len(due_today)
+        overdue_amount += sum(fee.amount for fee in due_today)
+        return overdue_count, overdue_amount
+
+    def _fees(self, fee_ids: Iterable[str]) -> List[FeeInfo]:
+        """按ID读取费用，保持ID的顺序，跳过已删除的费用"""
+        fees = (self.fee_infos_db.get(fee_id) for fee_id in fee_ids)
+        return [fee for fee in fees if fee is not None]
+
+    # 逾期费用
+    def get_overdue_fees(self, days_overdue: int = 0) -> List[FeeInfo]:
+        """获取逾期超过 days_overdue 天的未结清费用，按到期日期排序"""
+        cutoff = datetime.now() - timedelta(days=days_overdue)
+        return self._fees(self.open_fees_by_due_date.range(upper=cutoff, include_upper=False))
+
+    def get_overdue_notices(self, township_id: Optional[str] = None, batch_id: Optional[str] = None,
+                            user_id: Optional[str] = None, status: Optional[str] = None) -> List[FeeOverdueNotice]:
+        """获取逾期通知"""
+        filters = build_filters(township_id=township_id, batch_id=batch_id, user_id=user_id, status=status)
+        return self.overdue_notices_db.find(filters, order_by="create_time")
+
+    def run_overdue_job(self, now: Optional[datetime] = None) -> Dict:
+        """逾期处理：标记新逾期的费用、计提滞纳金、按乡镇生成逾期通知
+
+        新逾期的费用取自未标记逾期费用的到期日期索引，滞纳金按未缴金额和上次计提以来的整天数累加；
+        费用逐个按更新时间比较写入，只为本次由未逾期改为逾期的费用生成通知，同一乡镇的通知使用同一批次号。
+        执行前获取租约，其他进程正在执行时跳过（skipped 为True）
+        """
+        now = now or datetime.now()
+        if not self.job_leases.acquire(OVERDUE_JOB_LEASE, OVERDUE_JOB_LEASE_SECONDS):
+            return {"run_time": now, "skipped": True, "newly_overdue": 0, "overdue_fees": 0,
+                    "penalty_accrued": 0.0, "notice_count": 0, "batches": {}}
+        try:
+            return self._mark_overdue_fees(now)
+        finally:
+            self.job_leases.release(OVERDUE_JOB_LEASE)
+
+    def _mark_overdue_fees(self, now: datetime) -> Dict:
+        today = datetime.combine(now.date(), datetime.min.time())
+        # 新逾期的费用在前，与已标记逾期的费用一起计提滞纳金
+        fee_ids = list(dict.fromkeys(
+            self.unmarked_fees_by_due_date.range(upper=now, include_upper=False)
+            + self.open_fees_by_due_date.range(upper=now, include_upper=False)
+        ))
+        # 费用ID -> (本次是否标记逾期, 计提的滞纳金)，比较写入重试时按最新读取的费用覆盖
+        accrued: Dict[str, Tuple[bool, float]] = {}
+
+        def change(fee: FeeInfo) -> Optional[Dict[str, Any]]:
+            # 读取时已付清、已核减或到期日被修改的费用不处理
+            if fee.status not in OPEN_FEE_STATUSES or fee.due_date >= now:
+                return None
+            updates = {}
+            if fee.status in UNMARKED_FEE_STATUSES:
+                updates["status"] = FeeStatusEnum.OVERDUE
+            accrued_from = fee.penalty_accrued_to or datetime.combine(fee.due_date.date(), datetime.min.time())
+            days = (today - accrued_from).days
+            unpaid = max(fee.amount - fee.paid_amount, 0)
+            penalty = 0.0
+            if days > 0:
+                penalty = round(unpaid * FEE_PENALTY_DAILY_RATE * days, 2)
+                updates["penalty_amount"] = round(fee.penalty_amount + penalty, 2)
+                updates["penalty_accrued_to"] = today
+            accrued[fee.id] = ("status" in updates, penalty)
+            return updates or None
+
+        with transaction():
+            written = self._write_fees(fee_ids, change, now)
+            newly_overdue = [fee for fee in written if accrued[fee.id][0]]
+            notices = self._overdue_notices(newly_overdue, now)
+            self.overdue_notices_db.bulk_put(notices)
+
+        batches: Dict[str, int] = {}
+        for notice in notices:
+            batches[notice.batch_id] = batches.get(notice.batch_id, 0) + 1
+        return {
+            "run_time": now,
+            "skipped": False,
+            "newly_overdue": len(newly_overdue),
+            "overdue_fees": len(fee_ids),
+            "penalty_accrued": round(sum(accrued[fee.id][1] for fee in written), 2),
+            "notice_count": len(notices),
+            "batches": batches
+        }
+
+    def _overdue_notices(self, fees: List[FeeInfo], now: datetime) -> List[FeeOverdueNotice]:
+        """为新逾期的费用生成通知，费用所属乡镇经土地、村队确定，每个土地和村队只读取一次"""
+        townships_by_village: Dict[str, Optional[str]] = {}
+        townships_by_land: Dict[str, Optional[str]] = {}
+
+        def township_of(land_id: str) -> Optional[str]:
+            if land_id not in townships_by_land:
+                land = land_base_info_service.land_base_info_db.get(land_id)
+                village_id = land.village_id if land is not None else None
+                if village_id is not None and village_id not in townships_by_village:
+                    village = basic_info_service.villages_db.get(village_id)
+                    townships_by_village[village_id] = village.township_id if village is not None else None
+                townships_by_land[land_id] = townships_by_village.get(village_id)
+            return townships_by_land[land_id]
+
+        notices = []
+        for fee in fees:
+            township_id = township_of(fee.land_id)
+            unpaid = max(fee.amount - fee.paid_amount, 0)
+            notices.append(FeeOverdueNotice(
+                id=str(uuid.uuid4()),
+                fee_id=fee.id,
+                user_id=fee.user_id,
+                notice_type=OVERDUE_NOTICE_TYPE,
+                content=f"您的{fee.fee_type.value}已于{fee.due_date:%Y-%m-%d}到期，尚有{unpaid:.2f}元未缴纳，"
+                        f"逾期将按日加收万分之{FEE_PENALTY_DAILY_RATE * 10000:g}的滞纳金，请尽快缴纳。",
+                status=OVERDUE_NOTICE_STATUS,
+                township_id=township_id,
+                batch_id=f"OVERDUE-{now:%Y%m%d%H%M%S}-{township_id or 'UNKNOWN'}",
+                create_time=now
+            ))
+        return notices
+
+    def _run_scheduled_overdue_job(self) -> None:
+        """定时执行逾期处理，完成后安排次日的执行"""
+        try:
+            result = self.run_overdue_job()
+            if result["newly_overdue"] or result["penalty_accrued"]:
+                print(f"逾期处理完成: 新逾期 {result['newly_overdue']} 笔，"
+                      f"计提滞纳金 {result['penalty_accrued']} 元，生成通知 {result['notice_count']} 条")
+        finally:
+            next_run = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+            self.scheduler.schedule("overdue", next_run.replace(hour=OVERDUE_JOB_HOUR),
+                                    self._run_scheduled_overdue_job)
+
     # 计算费用统计
     def get_fee_statistics(self) -> Dict:
         """获取费用统计信息"""
-        # 计算各状态的费用数量和金额
-        status_count = {}
-        status_amount = {}
-        for fee in self.fee_infos_db.values():
-            status_count[fee.status] = status_count.get(fee.status, 0) + 1
-            status_amount[fee.status] = status_amount.get(fee.status, 0) + fee.amount
-        
-        # 计算各类型的费用数量和金额
-        type_count = {}
-        type_amount = {}
-        for fee in self.fee_infos_db.values():
-            type_count[fee.fee_type] = type_count.get(fee.fee_type, 0) + 1
-            type_amount[fee.fee_type] = type_amount.get(fee.fee_type, 0) + fee.amount
-        
-        # 计算逾期费用
-        today = datetime.now()
-        overdue_fees = [
-            fee for fee in self.fee_infos_db.values()
-            if fee.due_date < today and fee.status in [FeeStatusEnum.PENDING, FeeStatusEnum.PARTIAL_PAID]
-        ]
-        overdue_count = len(overdue_fees)
-        overdue_amount = sum(fee.amount for fee in overdue_fees)
-        
-        # 计算已完成支付总额
-        completed_payments = [
-            p for p in self.payment_records_db.values()
-            if p.status == PaymentStatusEnum.SUCCESS
-        ]
-        total_paid_amount = sum(p.amount for p in completed_payments)
-        
+        by_status = self.fee_stats_by_status.groups()
+        by_type = self.fee_stats_by_type.groups()
+        totals = self.fee_stats_by_status.total()
+        overdue_count, overdue_amount = self._overdue_summary()
+
         return {
-            "total_fees": len(self.fee_infos_db),
-            "total_fee_amount": sum(fee.amount for fee in self.fee_infos_db.values()),
-            "status_count": status_count,
-            "status_amount": status_amount,
-            "type_count": type_count,
-            "type_amount": type_amount,
+            "total_fees": totals["count"],
+            "total_fee_amount": totals["amount"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_amount": {key: group["amount"] for key, group in by_status.items()},
+            "type_count": {key: group["count"] for key, group in by_type.items()},
+            "type_amount": {key: group["amount"] for key, group in by_type.items()},
             "overdue_count": overdue_count,
             "overdue_amount": overdue_amount,
-            "total_paid_amount": total_paid_amount
+            "total_paid_amount": self.payment_stats_by_status.group(PaymentStatusEnum.SUCCESS)["amount"]
         }
-    
+
+    def get_payment_statistics(self) -> Dict:
+        """获取支付统计信息"""
+        by_status = self.payment_stats_by_status.groups()
+        by_method = self.payment_stats_by_method.groups()
+        success = self.payment_stats_by_status.group(PaymentStatusEnum.SUCCESS)
+
+        return {
+            "total_payments": self.payment_stats_by_status.total()["count"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_amount": {key: group["amount"] for key, group in by_status.items()},
+            "method_count": {key: group["count"] for key, group in by_method.items()},
+            "method_amount": {key: group["amount"] for key, group in by_method.items()},
+            "success_count": success["count"],
+            "total_paid_amount": success["amount"]
+        }
+
+    def get_reduction_statistics(self) -> Dict:
+        """获取核减统计信息"""
+        by_status = self.reduction_stats_by_status.groups()
+        totals = self.reduction_stats_by_status.total()
+
+        return {
+            "total_reductions": totals["count"],
+            "total_reduction_amount": totals["reduction_amount"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_amount": {key: group["reduction_amount"] for key, group in by_status.items()},
+            "approved_amount": self.reduction_stats_by_status.group(ReductionStatusEnum.APPROVED)["reduction_amount"]
+        }
+
     # 计算用户费用汇总
     def get_user_fee_summary(self, user_id: str) -> Dict:
-        """获取用户费用汇总信息"""
-        # 获取用户的所有费用
-        user_fees = [f for f in self.fee_infos_db.values() if f.user_id == user_id]
-        
-        # 计算各状态的费用数量和金额
+        """获取用户费用汇总信息，各状态的数量和金额取自增量统计，逾期费用按索引查询该用户未结清的到期费用"""
         status_count = {}
         status_amount = {}
-        for fee in user_fees:
-            status_count[fee.status] = status_count.get(fee.status, 0) + 1
-            status_amount[fee.status] = status_amount.get(fee.status, 0) + fee.amount
+        total_fees = 0
+        total_fee_amount = 0
+        total_paid_amount = 0
+        for fee_status in FeeStatusEnum:
+            group = self.fee_stats_by_user_status.group((user_id, fee_status.value))
+            if not group["count"]:
+                continue
+            status_count[fee_status] = group["count"]
+            status_amount[fee_status] = group["amount"]
+            total_fees += group["count"]
+            total_fee_amount += group["amount"]
+            total_paid_amount += group["paid_amount"]
         
         # 计算逾期费用
         today = datetime.now()
-        overdue_fees = [
-            fee for fee in user_fees
-            if fee.due_date < today and fee.status in [FeeStatusEnum.PENDING, FeeStatusEnum.PARTIAL_PAID]
-        ]
-        overdue_count = len(overdue_fees)
-        overdue_amount = sum(fee.amount for fee in overdue_fees)
-        
-        # 计算已完成支付总额
-        # 首先获取用户的所有费用ID
-        user_fee_ids = [fee.id for fee in user_fees]
-        # 然后获取与这些费用相关的所有成功支付记录
-        user_payments = [
-            p for p in self.payment_records_db.values()
-            if p.fee_id in user_fee_ids and p.status == PaymentStatusEnum.SUCCESS
-        ]
-        total_paid_amount = sum(p.amount for p in user_payments)
+        overdue_fees = self.fee_infos_db.find(
+            build_filters(user_id=user_id, status__in=OPEN_FEE_STATUSES, due_date__lte=today)
+        )
+        overdue_fees = [fee for fee in overdue_fees if fee.due_date < today]
         
         return {
-            "total_fees": len(user_fees),
-            "total_fee_amount": sum(fee.amount for fee in user_fees),
+            "total_fees": total_fees,
+            "total_fee_amount": total_fee_amount,
             "status_count": status_count,
             "status_amount": status_amount,
-            "overdue_count": overdue_count,
-            "overdue_amount": overdue_amount,
-            "total_paid_amount": total_paid_amount
+            "overdue_count": len(overdue_fees),
+            "overdue_amount": sum(fee.amount for fee in overdue_fees),
+            "total_paid_amount": round(total_paid_amount, 2)
         }
+    
+    # 数据导出
+    def export_fees(self,
+                    time_from: Optional[datetime] = None,
+                    time_to: Optional[datetime] = None) -> Iterator[FeeInfo]:
+        """导出费用信息，按到期日期排序，逐条产出供流式导出"""
+        filters = build_filters(due_date__gte=time_from, due_date__lte=time_to)
+        return self.fee_infos_db.stream(filters, order_by="due_date")
+    
+    def export_payments(self,
+                        time_from: Optional[datetime] = None,
+                        time_to: Optional[datetime] = None) -> Iterator[PaymentRecord]:
+        """导出支付记录，按支付时间倒序，逐条产出供流式导出"""
+        filters = build_filters(payment_time__gte=time_from, payment_time__lte=time_to)
+        return self.payment_records_db.stream(filters, order_by="payment_time", descending=True)
+    
+    def export_reductions(self,
+                          time_from: Optional[datetime] = None,
+                          time_to: Optional[datetime] = None) -> Iterator[ReductionInfo]:
+        """导出减免信息，按申请时间倒序，逐条产出供流式导出"""
+        filters = build_filters(application_time__gte=time_from, application_time__lte=time_to)
+        return self.reduction_infos_db.stream(filters, order_by="application_time", descending=True)
 
 
 # 创建服务实例供导入使用
@@ -0,0 +1,131 @@
+# 承包费用计划计算
+# 合同总金额按合同期内的天数平均分摊到各缴费期：缴费期为自然月、自然季度或自然年，与合同期的交集即该期的
+# 计费天数，合同首尾不足一期的按天数折算；各期金额为按累计天数折算并舍入到分的累计金额之差，不会为负，
+# 各期合计等于合同总金额，金额为零的期间（总金额过小）不生成费用。
+# 每期有固定的期间标识（如 2024-03、2024Q1、2024），同一合同同一期重复生成时费用ID相同，可按年度幂等地重新生成
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+# 缴费频率
+MONTHLY = "monthly"
+QUARTERLY = "quarterly"
+YEARLY = "yearly"
+ONE_TIME = "one_time"
+FREQUENCIES = [MONTHLY, QUARTERLY, YEARLY, ONE_TIME]
+# 合同付款期限 -> 缴费频率
+PAYMENT_TERM_FREQUENCIES: Dict[str, str] = {
+    "一月一付": MONTHLY,
+    "按月支付": MONTHLY,
+    "一季一付": QUARTERLY,
+    "按季支付": QUARTERLY,
+    "一年一付": YEARLY,
+    "按年支付": YEARLY,
+    "一次性付清": ONE_TIME,
+    "一次性支付": ONE_TIME,
+}
+# 各频率一期的月数
+_PERIOD_MONTHS = {MONTHLY: 1, QUARTERLY: 3, YEARLY: 12}
+CENT = Decimal("0.01")
+
+
+class FeePlanError(ValueError):
+    """费用计划无法生成异常"""
+    pass
+
+
+def frequency_of(payment_term: str) -> str:
+    """付款期限对应的缴费频率，付款期限也可以直接是频率（monthly 等）"""
+    if payment_term in FREQUENCIES:
+        return payment_term
+    frequency = PAYMENT_TERM_FREQUENCIES.get(payment_term)
+    if frequency is None:
+        raise FeePlanError(f"Unsupported payment term: {payment_term}")
+    return frequency
+
+
+class FeePlanItem:
+    """费用计划中的一期"""
+
+    __slots__ = ("period", "period_start", "period_end", "days", "amount", "due_date")
+
+    def __init__(self, period: str, period_start: date, period_end: date, days: int, amount: float, due_date: date):
+        self.period = period
+        self.period_start = period_start
+        self.period_end = period_end
+        self.days = days
+        self.amount = amount
+        self.due_date = due_date
+
+    @property
+    def fee_year(self) -> int:
+        return self.period_start.year
+
+
+def _period_label(frequency: str, start: date) -> str:
+    if frequency == MONTHLY:
+        return f"{start:%Y-%m}"
+    if frequency == QUARTERLY:
+        return f"{start.year}Q{(start.month - 1) // 3 + 1}"
+    return str(start.year)
+
+
+def _periods(frequency: str, start: date, end: date) -> List[Tuple[date, date]]:
+    """[start, end] 按自然月、季度或年切分的各期 (期初, 期末)，首尾两期截取到合同期内"""
+    months = _PERIOD_MONTHS[frequency]
+    # 起始日所在自然期的第一个月
+    month = (start.month - 1) // months * months + 1
+    cursor = date(start.year, month, 1)
+    periods = []
+    while cursor <= end:
+        next_month = cursor.month - 1 + months
+        following = date(cursor.year + next_month // 12, next_month % 12 + 1, 1)
+        periods.append((max(cursor, start), min(following - timedelta(days=1), end)))
+        cursor = following
+    return periods
+
+
+def build_plan(start_date: datetime, end_date: datetime, total_amount: float, frequency: str) -> List[FeePlanItem]:
+    """按缴费频率生成合同期内的全部费用计划
+
+    合同期为 start_date 至 end_date（含两端）；每期在期末（不晚于合同结束日）到期，一次性付清的在合同开始日到期。
+    第 i 期金额 = round(总金额 × 前 i 期累计天数 / 总天数) - round(总金额 × 前 i-1 期累计天数 / 总天数)
+    """
+    start, end = start_date.date(), end_date.date()
+    if end < start:
+        raise FeePlanError(f"Contract end date {end} is earlier than start date {start}")
+    total = Decimal(str(total_amount)).quantize(CENT, rounding=ROUND_HALF_UP)
+    total_days = (end - start).days + 1
+    if frequency == ONE_TIME:
+        return [FeePlanItem("ONE_TIME", start, end, total_days, float(total), start)] if total > 0 else []
+    if frequency not in _PERIOD_MONTHS:
+        raise FeePlanError(f"Unsupported payment frequency: {frequency}")
+
+    items = []
+    elapsed_days = 0
+    allocated = Decimal("0")
+    for period_start, period_end in _periods(frequency, start, end):
+        days = (period_end - period_start).days + 1
+        elapsed_days += days
+        # 最后一期累计天数等于总天数，累计金额即总金额
+        cumulative = (total * elapsed_days / total_days).quantize(CENT, rounding=ROUND_HALF_UP)
+        amount = cumulative - allocated
+        allocated = cumulative
+        if amount <= 0:
+            continue
+        items.append(FeePlanItem(_period_label(frequency, period_start), period_start, period_end,
+                                 days, float(amount), period_end))
+    return items
+
+
+def plan_fee_id(contract_id: str, period: str) -> str:
+    """合同某一期计划费用的ID，同一合同同一期重复生成时ID相同"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"contract-fee-plan:{contract_id}:{period}"))
+
+
+def items_in_year(items: List[FeePlanItem], fee_year: Optional[int]) -> List[FeePlanItem]:
+    """属于费用年度（按期初所在年份）的计划，fee_year 为None时返回全部"""
+    if fee_year is None:
+        return items
+    return [item for item in items if item.fee_year == fee_year]
@@ -1,10 +1,12 @@
 # 融资及确权管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict, Tuple
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Tuple, Iterator
+from datetime import date, datetime, timedelta
 import uuid
 
+import numpy as np
+
 # 导入模型
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.financing_management import (
@@ -29,7 +31,19 @@ from models.financing_management import (
     UpdateDigitalCertificateRequest,
     CreateFundSupervisionRequest,
     UpdateFundSupervisionRequest,
+    FinancingProjectQueryRequest,
+    FinancingProjectEvent,
+)
+from repositories.aggregates import Aggregate
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend, transaction
+from services.amortization import LoanBook, amortize, monthly_cash_flow, schedule_rows
+from services.basic_info_service import basic_info_service
+from services.portfolio_analytics import EXPOSURE_STATUSES, ProjectColumns, RegionMap, portfolio_dashboard
+from services.repayment_reminders import (
+    CANCELLED, PENDING, REMINDER_LEAD_DAYS, ReminderDispatchCursor, RepaymentReminderScheduler, reminder_id
 )
+from services.financing_workflow import FinancingWorkflow, InvalidTransitionError, WorkflowConflictError, find_action
 
 # 临时定义RepaymentReminder相关类，因为模型层中不存在这些类
 from pydantic import BaseModel, Field
@@ -43,7 +57,10 @@ class RepaymentReminder(BaseModel):
     reminder_date: datetime = Field(..., description="提醒日期")
     due_date: datetime = Field(..., description="到期日期")
     reminder_amount: float = Field(..., description="提醒金额")
-    status: str = Field(..., description="状态")
+    period: Optional[int] = Field(None, description="还款期次，按还款计划生成的提醒")
+    status: str = Field(..., description="状态", enum=["待发送", "发送中", "已发送", "已取消"])
+    batch_id: Optional[str] = Field(None, description="发送批次号")
+    sent_time: Optional[datetime] = Field(None, description="发送时间")
     created_at: datetime = Field(..., description="创建时间")
     updated_at: datetime = Field(..., description="更新时间")
 
@@ -59,7 +76,7 @@ class UpdateRepaymentReminderRequest(BaseModel):
     reminder_date: Optional[datetime] = Field(None, description="提醒日期")
     due_date: Optional[datetime] = Field(None, description="到期日期")
     reminder_amount: Optional[float] = Field(None, description="提醒金额")
-    status: Optional[str] = Field(None, description="状态")
+    status: Optional[str] = Field(None, description="状态", enum=["待发送", "已发送", "已取消"])
 
 class ProjectQueryRequest(BaseModel):
     farmer_ids: Optional[List[str]] = Field(None, description="农户ID列表")
@@ -69,19 +86,43 @@ class ProjectQueryRequest(BaseModel):
     application_date_to: Optional[datetime] = Field(None, description="申请日期结束")
 
 
+# 计入组合现金流预测的项目状态（已放款、正在还款的贷款）
+CASH_FLOW_PROJECT_STATUSES = ["已放款", "已逾期"]
+# 可以删除的项目状态（尚未审批或已驳回）
+DELETABLE_PROJECT_STATUSES = ["待审批", "已驳回"]
+# 已结束的项目状态，不再阻止删除其抵押的确权地块
+FINISHED_PROJECT_STATUSES = ["已还款"]
+# 进入后按还款计划生成还款提醒的项目状态
+REMINDER_PROJECT_STATUSES = ["已放款"]
+# 进入后取消未发送还款提醒的项目状态
+REMINDER_CLOSED_STATUSES = ["已还款", "已违约"]
+
+
 class FinancingManagementService:
     def __init__(self):
-        # 模拟数据库存储
-        self.allocated_lands_db: Dict[str, AllocatedLandInfo] = {}
-        self.mortgage_projects_db: Dict[str, MortgageFinancingProject] = {}
-        self.project_nodes_db: Dict[str, FinancingProjectNode] = {}
-        self.ledgers_db: Dict[str, FinancingProjectLedger] = {}
-        self.post_investment_tasks_db: Dict[str, PostInvestmentRightTask] = {}
-        self.digital_certificates_db: Dict[str, DigitalCertificate] = {}
-        self.fund_supervisions_db: Dict[str, FundSupervision] = {}
-        self.repayment_reminders_db: Dict[str, RepaymentReminder] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.allocated_lands_db: Repository = create_repository("allocated_lands", AllocatedLandInfo)
+        self.mortgage_projects_db: Repository = create_repository("mortgage_projects", MortgageFinancingProject)
+        self.project_nodes_db: Repository = create_repository("project_nodes", FinancingProjectNode)
+        self.ledgers_db: Repository = create_repository("financing_ledgers", FinancingProjectLedger)
+        self.post_investment_tasks_db: Repository = create_repository("post_investment_tasks", PostInvestmentRightTask)
+        self.digital_certificates_db: Repository = create_repository("digital_certificates", DigitalCertificate)
+        self.fund_supervisions_db: Repository = create_repository("fund_supervisions", FundSupervision)
+        self.repayment_reminders_db: Repository = create_repository("repayment_reminders", RepaymentReminder)
+        self.project_events_db: Repository = create_repository("financing_project_events", FinancingProjectEvent)
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
+        self._register_aggregates()
+        # 项目状态经流程引擎变化，当前状态表随项目写入更新；放款后生成还款提醒，结清或违约后取消
+        self.workflow = FinancingWorkflow(self.mortgage_projects_db, self.project_events_db,
+                                          on_transition=self._on_project_transition)
+        # 还款提醒按提醒日期调度发送，首次启动时为已放款项目补生成提醒
+        self.reminder_scheduler = RepaymentReminderScheduler(
+            self.repayment_reminders_db,
+            create_repository("repayment_reminder_cursors", ReminderDispatchCursor),
+            backfill=self._backfill_repayment_reminders
+        )
     
     def _init_test_data(self):
         # 初始化分配土地信息数据
@@ -121,22 +162,24 @@ class FinancingManagementService:
     
     # 分配土地信息管理
     def get_allocated_lands(self, 
-                          user_id: Optional[str] = None, 
-                          land_id: Optional[str] = None, 
-                          land_status: Optional[str] = None) -> List[AllocatedLandInfo]:
+                          land_code: Optional[str] = None, 
+                          land_type: Optional[str] = None, 
+                          digitization_status: Optional[str] = None, 
+                          create_time_from: Optional[datetime] = None, 
+                          create_time_to: Optional[datetime] = None,
+                          limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> List[AllocatedLandInfo]:
         """获取所有分配土地信息"""
-        allocated_lands = list(self.allocated_lands_db.values())
-        
-        if user_id:
-            allocated_lands = [a for a in allocated_lands if a.user_id == user_id]
-        if land_id:
-            allocated_lands = [a for a in allocated_lands if a.land_id == land_id]
-        if land_status:
-            allocated_lands = [a for a in allocated_lands if a.land_status == land_status]
-            
-        # 按分配日期倒序排序
-        allocated_lands.sort(key=lambda x: x.allocation_date, reverse=True)
-        return allocated_lands
+        filters = build_filters(
+            land_code=land_code,
+            land_type=land_type,
+            digitization_status=digitization_status,
+            create_time__gte=create_time_from,
+            create_time__lte=create_time_to
+        )
+        # 按创建时间倒序排序
+        return self.allocated_lands_db.find_page(filters, order_by="create_time", descending=True,
+                                                 limit=limit, cursor=cursor)
     
     def get_allocated_land_by_id(self, allocated_land_id: str) -> Optional[AllocatedLandInfo]:
         """根据ID获取分配土地信息"""
@@ -183,101 +226,84 @@ class FinancingManagementService:
         if allocated_land_id not in self.allocated_lands_db:
             return False
         
-        # 检查是否有相关的融资项目
-        for project in self.mortgage_projects_db.values():
-            if project.allocated_land_id == allocated_land_id and project.project_status != "completed":
-                return False
+        # 检查是否有未结束的融资项目抵押该地块（按地块ID索引查询）
+        if self.allocated_land_has_active_projects(allocated_land_id):
+            return False
         
         del self.allocated_lands_db[allocated_land_id]
         return True
     
     # 抵押融资项目管理
     def get_mortgage_projects(self, 
-                            user_id: Optional[str] = None, 
-                            allocated_land_id: Optional[str] = None, 
+                            project_name: Optional[str] = None, 
+                            borrower_id: Optional[str] = None, 
                             project_status: Optional[str] = None, 
-                            application_date_from: Optional[datetime] = None, 
-                            application_date_to: Optional[datetime] = None) -> List[MortgageFinancingProject]:
+                            apply_time_from: Optional[datetime] = None, 
+                            apply_time_to: Optional[datetime] = None,
+                            limit: Optional[int] = None,
+                            cursor: Optional[str] = None) -> List[MortgageFinancingProject]:
         """获取所有抵押融资项目"""
-        projects = list(self.mortgage_projects_db.values())
-        
-        if user_id:
-            projects = [p for p in projects if p.user_id == user_id]
-        if allocated_land_id:
-            projects = [p for p in projects if p.allocated_land_id == allocated_land_id]
-        if project_status:
-            projects = [p for p in projects if p.project_status == project_status]
-        if application_date_from:
-            projects = [p for p in projects if p.application_date >= application_date_from]
-        if application_date_to:
-            projects = [p for p in projects if p.application_date <= application_date_to]
-            
-        # 按申请日期倒序排序
-        projects.sort(key=lambda x: x.application_date, reverse=True)
-        return projects
+        filters = build_filters(
+            project_name__contains=project_name,
+            borrower_id=borrower_id,
+            project_status=project_status,
+            apply_time__gte=apply_time_from,
+            apply_time__lte=apply_time_to
+        )
+        # 按申请时间倒序排序
+        return self.mortgage_projects_db.find_page(filters, order_by="apply_time", descending=True,
+                                                   limit=limit, cursor=cursor)
     
     def get_mortgage_project_by_id(self, project_id: str) -> Optional[MortgageFinancingProject]:
         """根据ID获取抵押融资项目"""
         return self.mortgage_projects_db.get(project_id)
     
-    def create_mortgage_project(self, request: CreateMortgageFinancingProjectRequest) -> Optional[MortgageFinancingProject]:
-        """创建抵押融资项目"""
-        # 检查分配土地信息是否存在且状态为已分配
-        if request.allocated_land_id not in self.allocated_lands_db:
-            return None
-        
-        allocated_land = self.allocated_lands_db[request.allocated_land_id]
-        if allocated_land.land_status != "allocated":
+    def create_mortgage_project(self, request: CreateMortgageFinancingProjectRequest,
+                                operator_id: Optional[str] = None) -> Optional[MortgageFinancingProject]:
+        """创建抵押融资项目，状态为待审批并记录创建事件；抵押的确权地块不存在时返回None"""
+        if request.allocated_land_id and request.allocated_land_id not in self.allocated_lands_db:
             return None
         
-        # 生成项目编号
-        project_code = f"PROJ-{datetime.now().year}-{str(len(self.mortgage_projects_db) + 1).zfill(4)}"
-        
+        now = datetime.now()
         project = MortgageFinancingProject(
             id=str(uuid.uuid4()),
-            project_code=project_code,
-            user_id=request.user_id,
-            allocated_land_id=request.allocated_land_id,
-            project_name=request.project_name,
-            application_date=request.application_date or datetime.now(),
-            financing_amount=request.financing_amount,
-            financing_term=request.financing_term,
-            interest_rate=request.interest_rate,
-            project_status="pending_review",
-            create_time=datetime.now(),
-            update_time=datetime.now()
+            **request.model_dump(),
+            project_status="待审批",
+            apply_time=now,
+            create_time=now,
+            update_time=now
         )
-        self.mortgage_projects_db[project.id] = project
-        
-        # 创建项目初始节点
-        self._create_initial_project_nodes(project.id)
-        
-        return project
+        return self.workflow.create(project, operator_id)[0]
     
-    def update_mortgage_project(self, project_id: str, request: UpdateMortgageFinancingProjectRequest) -> Optional[MortgageFinancingProject]:
-        """更新抵押融资项目"""
-        if project_id not in self.mortgage_projects_db:
+    def update_mortgage_project(self, project_id: str, request: UpdateMortgageFinancingProjectRequest,
+                                operator_id: Optional[str] = None) -> Optional[MortgageFinancingProject]:
+        """更新抵押融资项目，项目状态的修改按流程动作执行，不允许的状态变化抛出 InvalidTransitionError"""
+        project = self.mortgage_projects_db.get(project_id)
+        if project is None:
             return None
         
-        project = self.mortgage_projects_db[project_id]
-        
-        if request.project_name:
-            project.project_name = request.project_name
-        if request.financing_amount is not None:
-            project.financing_amount = request.financing_amount
-        if request.financing_term is not None:
-            project.financing_term = request.financing_term
-        if request.interest_rate is not None:
-            project.interest_rate = request.interest_rate
-        if request.project_status:
-            project.project_status = request.project_status
-            # 更新项目状态时，创建相应的项目节点
-            self._create_project_node(project.id, request.project_status)
-        if request.remark:
-            project.remark = request.remark
-        project.update_time = datetime.now()
-        
-        self.mortgage_projects_db[project_id] = project
+        changes = request.model_dump(exclude_unset=True, exclude_none=True)
+        target_status = changes.pop("project_status", None)
+        if target_status is not None and target_status != project.project_status:
+            action = find_action(project.project_status, target_status)
+            if action is None:
+                raise InvalidTransitionError(
+                    f"Project {project_id} cannot change from {project.project_status} to {target_status}")
+            result = self.workflow.transition(project_id, action, operator_id)
+            if result is None:
+                return None
+            project = result[0]
+        
+        if changes:
+            with self.workflow.project_lock(project_id):
+                project = self.mortgage_projects_db.get(project_id)
+                if project is None:
+                    return None
+                updated = project.model_copy(update=dict(changes, update_time=datetime.now()))
+                # 按流程版本号比较写入，不覆盖其他进程同时执行的状态变化
+                if not self.mortgage_projects_db.compare_and_set(updated, "workflow_version", project.workflow_version):
+                    raise WorkflowConflictError(f"Project {project_id} was modified concurrently, please retry")
+                project = updated
         return project
     
     def delete_mortgage_project(self, project_id: str) -> bool:
@@ -287,33 +313,48 @@ class FinancingManagementService:
         
         # 检查项目状态
         project = self.mortgage_projects_db[project_id]
-        if project.project_status not in ["pending_review", "rejected"]:
+        if project.project_status not in DELETABLE_PROJECT_STATUSES:
             return False
         
-        # 删除相关的项目节点、台账、投后确权任务等
-        self._delete_project_related_data(project_id)
-        
-        del self.mortgage_projects_db[project_id]
+        # 删除相关的项目节点、台账、投后确权任务等，与项目在同一事务中删除
+        with transaction():
+            self._delete_project_related_data(project_id)
+            del self.mortgage_projects_db[project_id]
+        self.workflow.forget(project_id)
         return True
     
+    def allocated_land_has_active_projects(self, allocated_land_id: str) -> bool:
+        """确权地块是否被未结束的融资项目抵押"""
+        projects = self.mortgage_projects_db.find(build_filters(allocated_land_id=allocated_land_id))
+        return any(project.project_status not in FINISHED_PROJECT_STATUSES for project in projects)
+    
+    def _project_child_repositories(self) -> List[Repository]:
+        """以 project_id 关联到项目的子数据仓储，project_id 均已建立索引"""
+        return [self.project_nodes_db, self.ledgers_db, self.post_investment_tasks_db,
+                self.digital_certificates_db, self.fund_supervisions_db, self.repayment_reminders_db,
+                self.project_events_db]
+    
+    def get_project_dependents(self, project_id: str) -> Dict[str, int]:
+        """项目各类子数据的数量 {集合名: 记录数}，只统计有记录的集合"""
+        counts = {}
+        for repository in self._project_child_repositories():
+            count = repository.count(build_filters(project_id=project_id))
+            if count:
+                counts[repository.collection] = count
+        return counts
+    
     # 项目节点管理
     def get_project_nodes(self, 
                          project_id: Optional[str] = None, 
                          node_type: Optional[str] = None, 
-                         status: Optional[str] = None) -> List[FinancingProjectNode]:
+                         status: Optional[str] = None,
+                         limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> List[FinancingProjectNode]:
         """获取所有项目节点"""
-        nodes = list(self.project_nodes_db.values())
-        
-        if project_id:
-            nodes = [n for n in nodes if n.project_id == project_id]
-        if node_type:
-            nodes = [n for n in nodes if n.node_type == node_type]
-        if status:
-            nodes = [n for n in nodes if n.status == status]
-            
-        # 按创建时间排序
-        nodes.sort(key=lambda x: x.create_time)
-        return nodes
+        filters = build_filters(project_id=project_id, node_type=node_type, status=status)
+        # 按预计时间排序
+        return self.project_nodes_db.find_page(filters, order_by="expected_time",
+                                               limit=limit, cursor=cursor)
     
     def get_project_node_by_id(self, node_id: str) -> Optional[FinancingProjectNode]:
         """根据ID获取项目节点"""
@@ -364,22 +405,19 @@ class FinancingManagementService:
                    project_id: Optional[str] = None, 
                    ledger_type: Optional[str] = None, 
                    record_date_from: Optional[datetime] = None, 
-                   record_date_to: Optional[datetime] = None) -> List[FinancingProjectLedger]:
+                   record_date_to: Optional[datetime] = None,
+                   limit: Optional[int] = None,
+                   cursor: Optional[str] = None) -> List[FinancingProjectLedger]:
         """获取所有台账记录"""
-        ledgers = list(self.ledgers_db.values())
-        
-        if project_id:
-            ledgers = [l for l in ledgers if l.project_id == project_id]
-        if ledger_type:
-            ledgers = [l for l in ledgers if l.record_type == ledger_type]
-        if record_date_from:
-            ledgers = [l for l in ledgers if l.record_time >= record_date_from]
-        if record_date_to:
-            ledgers = [l for l in ledgers if l.record_time <= record_date_to]
-            
+        filters = build_filters(
+            project_id=project_id,
+            record_type=ledger_type,
+            record_time__gte=record_date_from,
+            record_time__lte=record_date_to
+        )
         # 按记录日期倒序排序
-        ledgers.sort(key=lambda x: x.record_time, reverse=True)
-        return ledgers
+        return self.ledgers_db.find_page(filters, order_by="record_time", descending=True,
+                                         limit=limit, cursor=cursor)
     
     def get_ledger_by_id(self, ledger_id: str) -> Optional[FinancingProjectLedger]:
         """根据ID获取台账记录"""
@@ -424,27 +462,23 @@ class FinancingManagementService:
     # 投后确权任务管理
     def get_post_investment_tasks(self, 
                                 project_id: Optional[str] = None, 
-                                task_type: Optional[str] = None, 
-                                task_status: Optional[str] = None, 
+                                status: Optional[str] = None, 
                                 due_date_from: Optional[datetime] = None, 
-                                due_date_to: Optional[datetime] = None) -> List[PostInvestmentRightTask]:
+                                due_date_to: Optional[datetime] = None, 
+                                task_type: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> List[PostInvestmentRightTask]:
         """获取所有投后确权任务"""
-        tasks = list(self.post_investment_tasks_db.values())
-        
-        if project_id:
-            tasks = [t for t in tasks if t.project_id == project_id]
-        if task_type:
-            tasks = [t for t in tasks if t.task_type == task_type]
-        if task_status:
-            tasks = [t for t in tasks if t.task_status == task_status]
-        if due_date_from:
-            tasks = [t for t in tasks if t.due_date >= due_date_from]
-        if due_date_to:
-            tasks = [t for t in tasks if t.due_date <= due_date_to]
-            
-        # 按到期日期排序
-        tasks.sort(key=lambda x: x.due_date)
-        return tasks
+        filters = build_filters(
+            project_id=project_id,
+            status=status,
+            task_type=task_type,
+            end_time__gte=due_date_from,
+            end_time__lte=due_date_to
+        )
+        # 按截止时间排序
+        return self.post_investment_tasks_db.find_page(filters, order_by="end_time",
+                                                       limit=limit, cursor=cursor)
     
     def get_post_investment_task_by_id(self, task_id: str) -> Optional[PostInvestmentRightTask]:
         """根据ID获取投后确权任务"""
@@ -497,22 +531,24 @@ class FinancingManagementService:
     
     # 数字证书管理
     def get_digital_certificates(self, 
-                               project_id: Optional[str] = None, 
-                               farmer_id: Optional[str] = None, 
-                               certificate_status: Optional[str] = None) -> List[DigitalCertificate]:
+                               owner_id: Optional[str] = None, 
+                               certificate_type: Optional[str] = None, 
+                               status: Optional[str] = None, 
+                               issue_date_from: Optional[datetime] = None, 
+                               issue_date_to: Optional[datetime] = None,
+                               limit: Optional[int] = None,
+                               cursor: Optional[str] = None) -> List[DigitalCertificate]:
         """获取所有数字证书"""
-        certificates = list(self.digital_certificates_db.values())
-        
-        if project_id:
-            certificates = [c for c in certificates if c.project_id == project_id]
-        if farmer_id:
-            certificates = [c for c in certificates if c.farmer_id == farmer_id]
-        if certificate_status:
-            certificates = [c for c in certificates if c.certificate_status == certificate_status]
-            
+        filters = build_filters(
+            owner_id=owner_id,
+            certificate_type=certificate_type,
+            status=status,
+            issue_date__gte=issue_date_from,
+            issue_date__lte=issue_date_to
+        )
         # 按颁发日期倒序排序
-        certificates.sort(key=lambda x: x.issue_date, reverse=True)
-        return certificates
+        return self.digital_certificates_db.find_page(filters, order_by="issue_date", descending=True,
+                                                      limit=limit, cursor=cursor)
     
     def get_digital_certificate_by_id(self, certificate_id: str) -> Optional[DigitalCertificate]:
         """根据ID获取数字证书"""
@@ -561,21 +597,21 @@ class FinancingManagementService:
     # 资金监管管理
     def get_fund_supervisions(self, 
                              project_id: Optional[str] = None, 
-                             supervision_type: Optional[str] = None, 
-                             status: Optional[str] = None) -> List[FundSupervision]:
+                             is_abnormal: Optional[bool] = None, 
+                             transaction_time_from: Optional[datetime] = None, 
+                             transaction_time_to: Optional[datetime] = None,
+                             limit: Optional[int] = None,
+                             cursor: Optional[str] = None) -> List[FundSupervision]:
         """获取所有资金监管记录"""
-        supervisions = list(self.fund_supervisions_db.values())
-        
-        if project_id:
-            supervisions = [s for s in supervisions if s.project_id == project_id]
-        if supervision_type:
-            supervisions = [s for s in supervisions if s.supervision_type == supervision_type]
-        if status:
-            supervisions = [s for s in supervisions if s.status == status]
-            
-        # 按监管日期倒序排序
-        supervisions.sort(key=lambda x: x.supervision_date, reverse=True)
-        return supervisions
+        filters = build_filters(
+            project_id=project_id,
+            is_abnormal=is_abnormal,
+            transaction_time__gte=transaction_time_from,
+            transaction_time__lte=transaction_time_to
+        )
+        # 按交易时间倒序排序
+        return self.fund_supervisions_db.find_page(filters, order_by="transaction_time", descending=True,
+                                                   limit=limit, cursor=cursor)
     
     def get_fund_supervision_by_id(self, supervision_id: str) -> Optional[FundSupervision]:
         """根据ID获取资金监管记录"""
@@ -623,20 +659,14 @@ class FinancingManagementService:
     def get_repayment_reminders(self, 
                               project_id: Optional[str] = None, 
                               reminder_type: Optional[str] = None, 
-                              status: Optional[str] = None) -> List[RepaymentReminder]:
+                              status: Optional[str] = None,
+                              limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> List[RepaymentReminder]:
         """获取所有还款提醒"""
-        reminders = list(self.repayment_reminders_db.values())
-        
-        if project_id:
-            reminders = [r for r in reminders if r.project_id == project_id]
-        if reminder_type:
-            reminders = [r for r in reminders if r.reminder_type == reminder_type]
-        if status:
-            reminders = [r for r in reminders if r.status == status]
-            
+        filters = build_filters(project_id=project_id, reminder_type=reminder_type, status=status)
         # 按提醒日期倒序排序
-        reminders.sort(key=lambda x: x.reminder_date, reverse=True)
-        return reminders
+        return self.repayment_reminders_db.find_page(filters, order_by="reminder_date", descending=True,
+                                                     limit=limit, cursor=cursor)
     
     def get_repayment_reminder_by_id(self, reminder_id: str) -> Optional[RepaymentReminder]:
         """根据ID获取还款提醒"""
@@ -655,11 +685,12 @@ class FinancingManagementService:
             reminder_date=request.reminder_date or datetime.now(),
             due_date=request.due_date,
             reminder_amount=request.reminder_amount,
-            status="pending",
+            status=PENDING,
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
         self.repayment_reminders_db[reminder.id] = reminder
+        self.reminder_scheduler.enqueue([reminder])
         return reminder
     
     def update_repayment_reminder(self, reminder_id: str, request: UpdateRepaymentReminderRequest) -> Optional[RepaymentReminder]:
@@ -678,173 +709,170 @@ class FinancingManagementService:
             reminder.reminder_amount = request.reminder_amount
         if request.status:
             reminder.status = request.status
-        if request.sent_time:
-            reminder.sent_time = request.sent_time
         reminder.updated_at = datetime.now()
         
         self.repayment_reminders_db[reminder_id] = reminder
+        # 提醒日期提前或恢复为待发送时重新入队，推后或取消的在出队时处理
+        self.reminder_scheduler.enqueue([reminder])
         return reminder
     
-    # 项目查询
-    def query_projects(self, request: ProjectQueryRequest) -> List[MortgageFinancingProject]:
-        """高级项目查询"""
-        projects = list(self.mortgage_projects_db.values())
-        
-        # 应用查询条件
-        if request.farmer_ids:
-            projects = [p for p in projects if p.farmer_id in request.farmer_ids]
-        if request.project_codes:
-            projects = [p for p in projects if p.project_code in request.project_codes]
-        if request.project_statuses:
-            projects = [p for p in projects if p.project_status in request.project_statuses]
-        if request.application_date_from:
-            projects = [p for p in projects if p.application_date >= request.application_date_from]
-        if request.application_date_to:
-            projects = [p for p in projects if p.application_date <= request.application_date_to]
-        if request.amount_from is not None:
-            projects = [p for p in projects if p.financing_amount >= request.amount_from]
-        if request.amount_to is not None:
-            projects = [p for p in projects if p.financing_amount <= request.amount_to]
-        if request.term_from is not None:
-            projects = [p for p in projects if p.financing_term >= request.term_from]
-        if request.term_to is not None:
-            projects = [p for p in projects if p.financing_term <= request.term_to]
-        
-        # 排序
-        if request.sort_by:
-            try:
-                projects.sort(key=lambda x: getattr(x, request.sort_by), reverse=request.sort_descending)
-            except AttributeError:
-                # 如果排序字段不存在，按申请日期倒序排序
-                projects.sort(key=lambda x: x.application_date, reverse=True)
-        else:
-            # 默认按申请日期倒序排序
-            projects.sort(key=lambda x: x.application_date, reverse=True)
-        
-        # 分页
-        if request.page and request.page_size:
-            start = (request.page - 1) * request.page_size
-            end = start + request.page_size
-            projects = projects[start:end]
-        
-        return projects
-    
-    # 创建项目初始节点
-    def _create_initial_project_nodes(self, project_id: str) -> None:
-        """创建项目的初始节点"""
-        # 创建申请提交节点
-        self.create_project_node(
-            CreateFinancingProjectNodeRequest(
+    def get_due_repayment_reminders(self, until: Optional[datetime] = None,
+                                    limit: Optional[int] = None) -> List[RepaymentReminder]:
+        """获取提醒日期不晚于 until（默认当前时间）的待发送提醒，按提醒日期升序"""
+        filters = build_filters(status=PENDING, reminder_date__lte=until or datetime.now())
+        return self.repayment_reminders_db.find(filters, order_by="reminder_date", limit=limit)
+    
+    def _on_project_transition(self, project: MortgageFinancingProject, event: FinancingProjectEvent) -> None:
+        """项目状态变化后生成或取消还款提醒"""
+        if event.to_status in REMINDER_PROJECT_STATUSES:
+            self.reminder_scheduler.enqueue(self.generate_repayment_reminders([project]))
+        elif event.to_status in REMINDER_CLOSED_STATUSES:
+            self.cancel_repayment_reminders(project.id)
+    
+    def generate_repayment_reminders(self, projects: List[MortgageFinancingProject],
+                                     now: Optional[datetime] = None) -> List[RepaymentReminder]:
+        """按还款计划为项目生成尚未到期各期的到期提醒，提醒日期为还款日前 REMINDER_LEAD_DAYS 天；
+        同一期提醒的ID固定，已生成的不重复生成，返回新生成的提醒
+        """
+        now = now or datetime.now()
+        schedules = self.generate_repayment_schedules([project.id for project in projects])
+        reminders = [
+            RepaymentReminder(
+                id=reminder_id(project_id, row["month"]),
                 project_id=project_id,
-                node_type="application_submitted",
-                status="completed",
-                start_time=datetime.now(),
-                end_time=datetime.now()
+                reminder_type="到期提醒",
+                reminder_date=row["due_date"] - timedelta(days=REMINDER_LEAD_DAYS),
+                due_date=row["due_date"],
+                reminder_amount=row["monthly_payment"],
+                period=row["month"],
+                status=PENDING,
+                created_at=now,
+                updated_at=now
             )
-        )
-        
-        # 创建待审核节点
-        self.create_project_node(
-            CreateFinancingProjectNodeRequest(
-                project_id=project_id,
-                node_type="pending_review",
-                status="pending",
-                start_time=datetime.now()
-            )
-        )
+            for project_id, rows in schedules.items()
+            for row in rows
+            if row["due_date"] >= now
+        ]
+        existing = self.repayment_reminders_db.existing_ids(reminder.id for reminder in reminders)
+        reminders = [reminder for reminder in reminders if reminder.id not in existing]
+        self.repayment_reminders_db.bulk_put(reminders)
+        return reminders
     
-    # 创建项目节点
-    def _create_project_node(self, project_id: str, node_type: str) -> None:
-        """根据项目状态创建相应的项目节点"""
-        # 查找当前项目的所有节点
-        project_nodes = [n for n in self.project_nodes_db.values() if n.project_id == project_id]
-        
-        # 查找当前处于pending状态的节点
-        pending_nodes = [n for n in project_nodes if n.status == "pending"]
-        
-        # 结束所有pending状态的节点
-        for node in pending_nodes:
-            node.status = "completed"
-            node.end_time = datetime.now()
-            node.updated_at = datetime.now()
-            self.project_nodes_db[node.id] = node
-        
-        # 创建新的节点
-        if node_type != "completed" and node_type != "rejected":
-            self.create_project_node(
-                CreateFinancingProjectNodeRequest(
-                    project_id=project_id,
-                    node_type=node_type,
-                    status="pending",
-                    start_time=datetime.now()
-                )
-            )
+    def cancel_repayment_reminders(self, project_id: str) -> int:
+        """取消项目未发送的还款提醒，返回取消数"""
+        now = datetime.now()
+        reminders = self.repayment_reminders_db.find(build_filters(project_id=project_id, status=PENDING))
+        return self.repayment_reminders_db.bulk_put(
+            reminder.model_copy(update={"status": CANCELLED, "updated_at": now}) for reminder in reminders)
+    
+    def _backfill_repayment_reminders(self) -> List[RepaymentReminder]:
+        """为已放款、逾期的项目补生成还款提醒"""
+        projects = self.mortgage_projects_db.find(build_filters(project_status__in=CASH_FLOW_PROJECT_STATUSES))
+        return self.generate_repayment_reminders(projects)
+    
+    # 项目查询
+    def query_projects(self, request: FinancingProjectQueryRequest,
+                       limit: Optional[int] = None, cursor: Optional[str] = None) -> List[MortgageFinancingProject]:
+        """高级项目查询，按申请时间倒序游标分页"""
+        filters = build_filters(
+            project_name__contains=request.project_name,
+            project_code=request.project_code,
+            borrower_id=request.borrower_id,
+            project_status=request.project_status,
+            apply_time__gte=request.start_date,
+            apply_time__lte=request.end_date
+        )
+        return self.mortgage_projects_db.find_page(filters, order_by="apply_time", descending=True,
+                                                   limit=limit, cursor=cursor)
+    
+    # 项目流程
+    def transition_project(self, project_id: str, action: str, operator_id: Optional[str] = None,
+                           remark: Optional[str] = None) -> Optional[MortgageFinancingProject]:
+        """执行项目流程动作，项目不存在时返回None"""
+        result = self.workflow.transition(project_id, action, operator_id, remark)
+        return result[0] if result is not None else None
+    
+    def get_project_events(self, project_id: str) -> List[FinancingProjectEvent]:
+        """获取项目的流程事件，按发生顺序排列"""
+        return self.workflow.history(project_id)
+    
+    def get_workflow_board(self) -> Dict[str, Dict]:
+        """各项目状态的项目数和最早进入该状态的时间，读取当前状态表"""
+        return self.workflow.states.board()
+    
+    def get_stuck_projects(self, project_status: str, older_than: timedelta,
+                           limit: Optional[int] = None) -> List[Dict]:
+        """在某状态停留超过 older_than 的项目，按进入该状态的时间升序"""
+        now = datetime.now()
+        return [
+            dict(state.snapshot(), stuck_days=(now - state.entered_at).days)
+            for state in self.workflow.states.stuck(project_status, now - older_than, limit)
+        ]
     
     # 删除项目相关的数据
     def _delete_project_related_data(self, project_id: str) -> None:
-        """删除项目相关的所有数据"""
-        # 删除相关的项目节点
-        node_ids_to_delete = [n.id for n in self.project_nodes_db.values() if n.project_id == project_id]
-        for node_id in node_ids_to_delete:
-            del self.project_nodes_db[node_id]
-        
-        # 删除相关的台账记录
-        ledger_ids_to_delete = [l.id for l in self.ledgers_db.values() if l.project_id == project_id]
-        for ledger_id in ledger_ids_to_delete:
-            del self.ledgers_db[ledger_id]
-        
-        # 删除相关的投后确权任务
-        task_ids_to_delete = [t.id for t in self.post_investment_tasks_db.values() if t.project_id == project_id]
-        for task_id in task_ids_to_delete:
-            del self.post_investment_tasks_db[task_id]
-        
-        # 删除相关的数字证书
-        certificate_ids_to_delete = [c.id for c in self.digital_certificates_db.values() if c.project_id == project_id]
-        for certificate_id in certificate_ids_to_delete:
-            del self.digital_certificates_db[certificate_id]
-        
-        # 删除相关的资金监管记录
-        supervision_ids_to_delete = [s.id for s in self.fund_supervisions_db.values() if s.project_id == project_id]
-        for supervision_id in supervision_ids_to_delete:
-            del self.fund_supervisions_db[supervision_id]
-        
-        # 删除相关的还款提醒
-        reminder_ids_to_delete = [r.id for r in self.repayment_reminders_db.values() if r.project_id == project_id]
-        for reminder_id in reminder_ids_to_delete:
-            del self.repayment_reminders_db[reminder_id]
-    
+        """删除项目相关的所有数据，各子数据按 project_id 索引查找，只读取该项目的记录"""
+        filters = build_filters(project_id=project_id)
+        for repository in self._project_child_repositories():
+            repository.delete_many(record.id for record in repository.find(filters))
+    
+    # 增量统计
+    def _register_aggregates(self) -> None:
+        """注册统计接口使用的增量统计，随融资项目的写入更新"""
+        self.project_stats_by_status = self.mortgage_projects_db.add_aggregate(
+            "by_status", Aggregate("project_status", ["loan_amount", "loan_term", "interest_rate"]))
+        self.project_stats_by_borrower = self.mortgage_projects_db.add_aggregate(
+            "by_borrower", Aggregate("borrower_id", ["loan_amount"]))
+        # 组合风险看板使用的列存，借款人所属地区按借款人缓存
+        self.project_columns = self.mortgage_projects_db.add_aggregate("columns", ProjectColumns())
+        self.borrower_regions = RegionMap(self._borrower_region)
+
     # 计算项目统计
     def get_project_statistics(self) -> Dict:
         """获取项目统计信息"""
-        # 计算各状态的项目数量
-        status_count = {}
-        for project in self.mortgage_projects_db.values():
-            status_count[project.project_status] = status_count.get(project.project_status, 0) + 1
-        
-        # 计算总融资金额
-        total_amount = sum(project.financing_amount for project in self.mortgage_projects_db.values())
-        
-        # 计算平均融资期限和平均利率
-        if len(self.mortgage_projects_db) > 0:
-            avg_term = sum(project.financing_term for project in self.mortgage_projects_db.values()) / len(self.mortgage_projects_db)
-            avg_rate = sum(project.interest_rate for project in self.mortgage_projects_db.values()) / len(self.mortgage_projects_db)
-        else:
-            avg_term = 0
-            avg_rate = 0
-        
+        by_status = self.project_stats_by_status.groups()
+        totals = self.project_stats_by_status.total()
+        count = totals["count"]
+
         return {
-            "total_projects": len(self.mortgage_projects_db),
-            "status_count": status_count,
-            "total_amount": total_amount,
-            "avg_term": avg_term,
-            "avg_rate": avg_rate
+            "total_projects": count,
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "total_amount": totals["loan_amount"],
+            "avg_term": totals["loan_term"] / count if count else 0,
+            "avg_rate": totals["interest_rate"] / count if count else 0
+        }
+
+    def get_borrower_statistics(self) -> Dict:
+        """获取各借款人的融资项目数量和贷款金额"""
+        by_borrower = self.project_stats_by_borrower.groups()
+        return {
+            "total_borrowers": len(by_borrower),
+            "borrowers": [
+                {"borrower_id": key, "project_count": group["count"], "total_amount": group["loan_amount"]}
+                for key, group in by_borrower.items()
+            ]
         }
+
+    def get_portfolio_dashboard(self, statuses: Optional[List[str]] = None,
+                                as_of: Optional[date] = None) -> Dict:
+        """组合风险看板：按乡镇、村队、抵押物类型的敞口，抵押覆盖率，到期阶梯，借款人集中度"""
+        return portfolio_dashboard(self.project_columns.snapshot(), as_of or date.today(),
+                                   self.borrower_regions, statuses or EXPOSURE_STATUSES)
+    
+    @staticmethod
+    def _borrower_region(borrower_id: str) -> Tuple[Optional[str], Optional[str]]:
+        """借款人（农户）所属的村队ID和乡镇ID，未登记的借款人均为None"""
+        farmer = basic_info_service.farmers_db.get(borrower_id)
+        if farmer is None:
+            return None, None
+        village = basic_info_service.villages_db.get(farmer.village_id)
+        return farmer.village_id, village.township_id if village is not None else None
     
     # 计算农户融资汇总
     def get_farmer_financing_summary(self, farmer_id: str) -> Dict:
         """获取农户融资汇总信息"""
-        # 获取农户的所有融资项目
-        farmer_projects = [p for p in self.mortgage_projects_db.values() if p.farmer_id == farmer_id]
+        # 获取农户（借款人）的所有融资项目
+        farmer_projects = self.mortgage_projects_db.find(build_filters(borrower_id=farmer_id))
         
         # 计算各状态的项目数量
         status_count = {}
@@ -852,11 +880,11 @@ class FinancingManagementService:
             status_count[project.project_status] = status_count.get(project.project_status, 0) + 1
         
         # 计算总融资金额
-        total_amount = sum(project.financing_amount for project in farmer_projects)
+        total_amount = sum(project.loan_amount for project in farmer_projects)
         
-        # 计算已完成和进行中的项目数量
-        completed_count = sum(1 for project in farmer_projects if project.project_status == "completed")
-        in_progress_count = sum(1 for project in farmer_projects if project.project_status not in ["completed", "rejected"])
+        # 计算已还款和进行中的项目数量
+        completed_count = sum(1 for project in farmer_projects if project.project_status == "已还款")
+        in_progress_count = sum(1 for project in farmer_projects if project.project_status not in ["已还款", "已违约"])
         
         return {
             "total_projects": len(farmer_projects),
@@ -867,48 +895,76 @@ class FinancingManagementService:
         }
     
     # 生成还款计划
+    @staticmethod
+    def _loan_book(projects: List[MortgageFinancingProject]) -> LoanBook:
+        """项目转为还款计划计算使用的列数据，起息日依次取放款、批准、申请时间"""
+        return LoanBook(
+            [project.loan_amount for project in projects],
+            [project.interest_rate for project in projects],
+            [project.loan_term for project in projects],
+            [project.repayment_method for project in projects],
+            [project.loan_time or project.approval_time or project.apply_time for project in projects]
+        )
+
     def generate_repayment_schedule(self, project_id: str) -> List[Dict]:
-        """为项目生成还款计划"""
-        if project_id not in self.mortgage_projects_db:
-            return []
-        
-        project = self.mortgage_projects_db[project_id]
-        schedule = []
-        
-        # 简化的等额本息还款计划生成
-        principal = project.financing_amount
-        monthly_rate = project.interest_rate / 12
-        months = project.financing_term
-        
-        # 计算每月还款额
-        if monthly_rate > 0:
-            monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
-        else:
-            monthly_payment = principal / months
-        
-        # 生成每月还款计划
-        remaining_principal = principal
-        for i in range(months):
-            # 计算利息
-            interest_payment = remaining_principal * monthly_rate
-            # 计算本金
-            principal_payment = monthly_payment - interest_payment
-            # 更新剩余本金
-            remaining_principal -= principal_payment
-            
-            # 计算还款日
-            due_date = (datetime.now() + timedelta(days=30 * (i + 1))).replace(day=28)  # 简化为每月28日
-            
-            schedule.append({
-                "month": i + 1,
-                "due_date": due_date,
-                "monthly_payment": round(monthly_payment, 2),
-                "principal_payment": round(principal_payment, 2),
-                "interest_payment": round(interest_payment, 2),
-                "remaining_principal": round(remaining_principal, 2)
-            })
-        
-        return schedule
+        """为项目生成还款计划，项目不存在时返回空列表"""
+        return self.generate_repayment_schedules([project_id]).get(project_id, [])
+
+    def generate_repayment_schedules(self, project_ids: List[str]) -> Dict[str, List[Dict]]:
+        """批量生成还款计划 {项目ID: 各期还款}，全部项目一次计算，不存在的项目忽略"""
+        projects = [self.mortgage_projects_db.get(project_id) for project_id in dict.fromkeys(project_ids)]
+        projects = [project for project in projects if project is not None]
+        if not projects:
+            return {}
+        schedule = amortize(self._loan_book(projects))
+        return {project.id: schedule_rows(schedule, index) for index, project in enumerate(projects)}
+
+    def project_cash_flow(self, months: int = 12, start_month: Optional[date] = None,
+                          statuses: Optional[List[str]] = None) -> Dict:
+        """贷款组合的月度现金流预测：从 start_month（默认本月）起每月应收的本金、利息和还款笔数
+
+        statuses 为计入的项目状态，默认为已放款和已逾期的项目
+        """
+        start_month = (start_month or date.today()).replace(day=1)
+        projects = self.mortgage_projects_db.find(
+            build_filters(project_status__in=statuses or CASH_FLOW_PROJECT_STATUSES))
+        flow = monthly_cash_flow(self._loan_book(projects), start_month, months)
+        principal = np.round(flow["principal"], 2)
+        interest = np.round(flow["interest"], 2)
+        return {
+            "start_month": start_month,
+            "months": months,
+            "project_count": len(projects),
+            "total_principal": round(float(principal.sum()), 2),
+            "total_interest": round(float(interest.sum()), 2),
+            "cash_flows": [
+                {"month": f"{month:%Y-%m}", "principal": p, "interest": i, "total": round(p + i, 2), "payment_count": c}
+                for month, p, i, c in zip(flow["month"].tolist(), principal.tolist(), interest.tolist(),
+                                          flow["count"].tolist())
+            ]
+        }
+    
+    # 数据导出
+    def export_projects(self,
+                        time_from: Optional[datetime] = None,
+                        time_to: Optional[datetime] = None) -> Iterator[MortgageFinancingProject]:
+        """导出抵押融资项目，按申请时间倒序，逐条产出供流式导出"""
+        filters = build_filters(apply_time__gte=time_from, apply_time__lte=time_to)
+        return self.mortgage_projects_db.stream(filters, order_by="apply_time", descending=True)
+    
+    def export_allocated_lands(self,
+                               time_from: Optional[datetime] = None,
+                               time_to: Optional[datetime] = None) -> Iterator[AllocatedLandInfo]:
+        """导出确权地块信息，按创建时间倒序，逐条产出供流式导出"""
+        filters = build_filters(create_time__gte=time_from, create_time__lte=time_to)
+        return self.allocated_lands_db.stream(filters, order_by="create_time", descending=True)
+    
+    def export_ledgers(self,
+                       time_from: Optional[datetime] = None,
+                       time_to: Optional[datetime] = None) -> Iterator[FinancingProjectLedger]:
+        """导出项目台账，按记录时间倒序，逐条产出供流式导出"""
+        filters = build_filters(record_time__gte=time_from, record_time__lte=time_to)
+        return self.ledgers_db.stream(filters, order_by="record_time", descending=True)
 
 
 # 创建服务实例供导入使用
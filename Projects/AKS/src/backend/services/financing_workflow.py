@@ -0,0 +1,230 @@
+# 融资项目流程引擎
+# 项目状态只能按 TRANSITIONS 中的动作变化；每次变化在项目锁内校验，项目（状态、流程版本号加一）与一条
+# 只追加的流程事件在同一事务中写入，项目按流程版本号比较写入，其他进程已修改时拒绝并重新加载。
+# 紧凑的当前状态表（每个项目的状态、进入时间、版本号）和按 (状态, 进入时间) 排序的索引注册在项目仓储上，
+# 状态看板和“某状态停留过久”的查询直接读取，不再遍历项目节点
+import sys
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.financing_management import FinancingProjectEvent, MortgageFinancingProject
+from repositories.aggregates import OrderedIndex, RepositoryView
+from repositories.base import Repository, build_filters
+from repositories.factory import transaction
+
+# 项目创建时的动作和初始状态
+CREATE_ACTION = "创建"
+INITIAL_STATUS = "待审批"
+
+# 流程动作 -> (允许的当前状态, 变化后状态)
+TRANSITIONS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "提交审批": (("待审批",), "审批中"),
+    "退回": (("审批中",), "待审批"),
+    "批准": (("审批中",), "已批准"),
+    "驳回": (("审批中",), "已驳回"),
+    "放款": (("已批准",), "已放款"),
+    "逾期": (("已放款",), "已逾期"),
+    "逾期还清": (("已逾期",), "已放款"),
+    "结清": (("已放款", "已逾期"), "已还款"),
+    "违约": (("已逾期",), "已违约"),
+}
+
+# 进入状态时记录到项目对应时间字段
+STATUS_TIME_FIELDS = {"已批准": "approval_time", "已放款": "loan_time", "已还款": "repayment_time"}
+
+
+class WorkflowError(ValueError):
+    """流程操作失败异常"""
+    pass
+
+
+class InvalidTransitionError(WorkflowError):
+    """当前状态不允许该动作异常"""
+    pass
+
+
+class WorkflowConflictError(WorkflowError):
+    """项目被并发修改异常"""
+    pass
+
+
+def find_action(current_status: str, target_status: str) -> Optional[str]:
+    """从当前状态到目标状态的动作，不存在时返回None"""
+    for action, (sources, target) in TRANSITIONS.items():
+        if target == target_status and current_status in sources:
+            return action
+    return None
+
+
+class ProjectState:
+    """当前状态表中的一行"""
+
+    __slots__ = ("id", "status", "entered_at", "version")
+
+    def __init__(self, project_id: str, status: str, entered_at: datetime, version: int):
+        self.id = project_id
+        self.status = status
+        self.entered_at = entered_at
+        self.version = version
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"project_id": self.id, "status": self.status, "entered_at": self.entered_at,
+                "version": self.version}
+
+
+class ProjectStateTable(RepositoryView):
+    """融资项目的当前状态表（项目ID -> 状态、进入状态时间、流程版本号）及按 (状态, 进入时间) 排序的索引
+
+    以增量统计的方式注册到项目仓储，首次读取时加载，之后随项目的每次写入、删除更新，可全量重算
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._states: Dict[str, ProjectState] = {}
+        self._by_status = OrderedIndex(lambda state: (state.status, state.entered_at))
+
+    @staticmethod
+    def _state_of(project: MortgageFinancingProject) -> ProjectState:
+        entered_at = project.status_time or project.update_time or project.apply_time
+        return ProjectState(project.id, project.project_status, entered_at, project.workflow_version)
+
+    def update(self, record_id: str, record: Optional[MortgageFinancingProject]) -> None:
+        state = self._state_of(record) if record is not None else None
+        with self._lock:
+            if state is None:
+                self._states.pop(record_id, None)
+            else:
+                self._states[record_id] = state
+            self._by_status.update(record_id, state)
+
+    def rebuild(self, records: Iterable[MortgageFinancingProject]) -> bool:
+        """以全量项目重建状态表，返回重建前的内容是否有偏差"""
+        states = {record.id: self._state_of(record) for record in records}
+        with self._lock:
+            drifted = {key: state.snapshot() for key, state in states.items()} != \
+                {key: state.snapshot() for key, state in self._states.items()}
+            self._states = states
+            self._by_status.rebuild(states.values())
+        return drifted
+
+    def get(self, project_id: str) -> Optional[ProjectState]:
+        self.ensure_built()
+        return self._states.get(project_id)
+
+    def board(self) -> Dict[str, Dict[str, Any]]:
+        """各状态的项目数和最早进入该状态的时间"""
+        board: Dict[str, Dict[str, Any]] = {}
+        self.ensure_built()
+        with self._lock:
+            states = list(self._states.values())
+        for state in states:
+            item = board.setdefault(state.status, {"count": 0, "oldest_entered_at": state.entered_at})
+            item["count"] += 1
+            if state.entered_at < item["oldest_entered_at"]:
+                item["oldest_entered_at"] = state.entered_at
+        return board
+
+    def stuck(self, status: str, entered_before: datetime, limit: Optional[int] = None) -> List[ProjectState]:
+        """进入 status 状态的时间早于 entered_before 且仍处于该状态的项目，按进入时间升序"""
+        self.ensure_built()
+        project_ids = self._by_status.range((status, datetime.min), (status, entered_before), include_upper=False)
+        if limit is not None:
+            project_ids = project_ids[:limit]
+        states = (self._states.get(project_id) for project_id in project_ids)
+        return [state for state in states if state is not None]
+
+
+class FinancingWorkflow:
+    """融资项目流程引擎，状态表注册在项目仓储上，流程之外写入的项目同样反映到状态表"""
+
+    def __init__(self, projects_db: Repository, events_db: Repository,
+                 on_transition: Optional[Callable[[MortgageFinancingProject, FinancingProjectEvent], None]] = None):
+        self.projects_db = projects_db
+        self.events_db = events_db
+        # 状态变化写入后在项目锁内回调 on_transition(项目, 事件)，回调顺序与状态变化顺序一致
+        self.on_transition = on_transition
+        self.states: ProjectStateTable = projects_db.add_aggregate("workflow_states", ProjectStateTable())
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def project_lock(self, project_id: str) -> threading.Lock:
+        """获取项目锁，同一项目的状态变化按锁顺序串行处理"""
+        lock = self._locks.get(project_id)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(project_id, threading.Lock())
+        return lock
+
+    def forget(self, project_id: str) -> None:
+        """项目删除后释放项目锁"""
+        with self._locks_guard:
+            self._locks.pop(project_id, None)
+
+    # 状态变化
+    def create(self, project: MortgageFinancingProject, operator_id: Optional[str] = None,
+               remark: Optional[str] = None) -> Tuple[MortgageFinancingProject, FinancingProjectEvent]:
+        """保存新项目并记录创建事件，项目状态为初始状态"""
+        now = datetime.now()
+        project = project.model_copy(update={"project_status": INITIAL_STATUS, "status_time": now,
+                                             "workflow_version": 1})
+        event = self._event(project.id, 1, CREATE_ACTION, None, INITIAL_STATUS, operator_id, remark, now)
+        with self.project_lock(project.id):
+            with transaction():
+                self.projects_db.put(project)
+                self.events_db.put(event)
+        return project, event
+
+    def transition(self, project_id: str, action: str, operator_id: Optional[str] = None,
+                   remark: Optional[str] = None) -> Optional[Tuple[MortgageFinancingProject, FinancingProjectEvent]]:
+        """执行流程动作，项目不存在时返回None，当前状态不允许该动作时抛出 InvalidTransitionError"""
+        if action not in TRANSITIONS:
+            raise InvalidTransitionError(f"Unknown workflow action: {action}")
+        sources, target = TRANSITIONS[action]
+        with self.project_lock(project_id):
+            project = self.projects_db.get(project_id)
+            if project is None:
+                return None
+            if project.project_status not in sources:
+                raise InvalidTransitionError(
+                    f"Project {project_id} in status {project.project_status} cannot perform {action}")
+
+            now = datetime.now()
+            version = project.workflow_version + 1
+            changes = {"project_status": target, "status_time": now, "workflow_version": version,
+                       "update_time": now}
+            if target in STATUS_TIME_FIELDS:
+                changes[STATUS_TIME_FIELDS[target]] = now
+            updated = project.model_copy(update=changes)
+            event = self._event(project_id, version, action, project.project_status, target, operator_id, remark, now)
+            # 其他进程已修改该项目时比较写入失败，事务回滚，不写入事件
+            with transaction():
+                if not self.projects_db.compare_and_set(updated, "workflow_version", project.workflow_version):
+                    raise WorkflowConflictError(f"Project {project_id} was modified concurrently, please retry")
+                self.events_db.put(event)
+            if self.on_transition is not None:
+                self.on_transition(updated, event)
+            return updated, event
+
+    def history(self, project_id: str) -> List[FinancingProjectEvent]:
+        """项目的流程事件，按序号排列"""
+        return self.events_db.find(build_filters(project_id=project_id), order_by="sequence")
+
+    @staticmethod
+    def _event(project_id: str, sequence: int, action: str, from_status: Optional[str], to_status: str,
+               operator_id: Optional[str], remark: Optional[str], now: datetime) -> FinancingProjectEvent:
+        return FinancingProjectEvent(
+            id=str(uuid.uuid4()),
+            project_id=project_id,
+            sequence=sequence,
+            action=action,
+            from_status=from_status,
+            to_status=to_status,
+            operator_id=operator_id,
+            remark=remark,
+            event_time=now
+        )
@@ -0,0 +1,53 @@
+# 定时任务租约
+# 多进程部署时每个进程都会安排同一个定时任务；执行前在仓储中获取以任务名为ID的租约，
+# 首次创建按ID插入、之后按到期时间比较写入，同一时间只有一个进程持有，其余进程跳过本次执行。
+# 持有者异常退出时租约到期后可由其他进程获取
+import sys
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import Repository
+
+
+class JobLease(BaseModel):
+    id: str = Field(..., description="任务名")
+    owner: Optional[str] = Field(None, description="持有租约的进程，已释放时为空")
+    expires_at: datetime = Field(..., description="租约到期时间")
+    update_time: Optional[datetime] = Field(None, description="更新时间")
+
+
+class JobLeases:
+    """定时任务租约，owner 标识当前进程"""
+
+    def __init__(self, leases_db: Repository, owner: Optional[str] = None):
+        self.leases_db = leases_db
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, name: str, ttl_seconds: float) -> bool:
+        """获取租约，其他进程持有且未到期时返回False；本进程已持有时续期"""
+        now = datetime.now()
+        lease = JobLease(id=name, owner=self.owner, expires_at=now + timedelta(seconds=ttl_seconds), update_time=now)
+        if self.leases_db.put_if_absent(lease):
+            return True
+        current = self.leases_db.get(name)
+        if current is None:
+            return self.leases_db.put_if_absent(lease)
+        if current.owner not in (None, self.owner) and current.expires_at > now:
+            return False
+        # 同时获取已到期租约的进程中只有一个比较写入成功
+        return self.leases_db.compare_and_set(lease, "expires_at", current.expires_at)
+
+    def release(self, name: str) -> None:
+        """释放本进程持有的租约"""
+        current = self.leases_db.get(name)
+        if current is None or current.owner != self.owner:
+            return
+        now = datetime.now()
+        released = current.model_copy(update={"owner": None, "expires_at": now, "update_time": now})
+        self.leases_db.compare_and_set(released, "expires_at", current.expires_at)
@@ -1,7 +1,7 @@
 # 土地基础信息模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterator
 from datetime import datetime
 import uuid
 
@@ -13,17 +13,32 @@ from models.land_base_info import (
     CreateLandTypePriceRequest,
     UpdateLandTypePriceRequest,
     CreateLandBaseInfoRequest,
-    UpdateLandBaseInfoRequest
+    UpdateLandBaseInfoRequest,
+    LandQueryRequest
 )
+from models.batch import BatchCreateResult
+from repositories.aggregates import Aggregate
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend
+from repositories.async_repository import AsyncDocumentRepository
+from services.basic_info_service import basic_info_service
+from utils.batch_utils import BatchErrors
+
+# 土地当前状态
+LAND_STATUSES = ["空闲", "已承包", "已出租", "已转让", "其他"]
 
 
 class LandBaseInfoService:
     def __init__(self):
-        # 模拟数据库存储
-        self.land_type_prices_db: Dict[str, LandTypePrice] = {}
-        self.land_base_info_db: Dict[str, LandBaseInfo] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.land_type_prices_db: Repository = create_repository("land_type_prices", LandTypePrice)
+        self.land_base_info_db: Repository = create_repository("land_base_info", LandBaseInfo)
+        # 异步读取仓储，供高频查询接口使用
+        self.land_base_info_async_repo = AsyncDocumentRepository("land_base_info", LandBaseInfo, lambda: self.land_base_info_db)
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
+        self._register_aggregates()
     
     def _init_test_data(self):
         # 初始化土地类型价格数据
@@ -56,16 +71,23 @@ class LandBaseInfoService:
         self.land_type_prices_db[land_type_price2.id] = land_type_price2
     
     # 土地类型价格管理
-    def get_land_type_prices(self, land_type: Optional[str] = None, status: Optional[int] = None) -> List[LandTypePrice]:
+    def get_land_type_prices(self, 
+                             land_type: Optional[str] = None, 
+                             status: Optional[int] = None, 
+                             land_code: Optional[str] = None, 
+                             effective_date_from: Optional[datetime] = None, 
+                             effective_date_to: Optional[datetime] = None,
+                             limit: Optional[int] = None,
+                             cursor: Optional[str] = None) -> List[LandTypePrice]:
         """获取所有土地类型价格信息"""
-        prices = list(self.land_type_prices_db.values())
-        
-        if land_type is not None:
-            prices = [p for p in prices if p.land_type == land_type]
-        if status is not None:
-            prices = [p for p in prices if p.status == status]
-            
-        return prices
+        filters = build_filters(
+            land_type=land_type,
+            status=status,
+            land_code=land_code,
+            effective_date__gte=effective_date_from,
+            effective_date__lte=effective_date_to
+        )
+        return self.land_type_prices_db.find_page(filters, limit=limit, cursor=cursor)
     
     def get_land_type_price_by_id(self, price_id: str) -> Optional[LandTypePrice]:
         """根据ID获取土地类型价格信息"""
@@ -125,12 +147,10 @@ class LandBaseInfoService:
         """获取当前有效的土地类型价格"""
         now = datetime.now()
         valid_prices = [
-            p for p in self.land_type_prices_db.values()
-            if p.land_type == land_type and 
-               p.land_code == land_code and 
-               p.status == 1 and 
-               p.effective_date <= now and 
-               (p.expiry_date is None or p.expiry_date >= now)
+            p for p in self.land_type_prices_db.find(
+                build_filters(land_type=land_type, status=1, land_code=land_code, effective_date__lte=now)
+            )
+            if p.expiry_date is None or p.expiry_date >= now
         ]
         
         # 如果有多个有效价格，返回最新的
@@ -142,18 +162,42 @@ class LandBaseInfoService:
     def get_land_base_info(self, 
                           land_code: Optional[str] = None, 
                           current_status: Optional[str] = None, 
-                          village_id: Optional[str] = None) -> List[LandBaseInfo]:
+                          village_id: Optional[str] = None,
+                          limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> List[LandBaseInfo]:
         """获取所有土地基础信息"""
-        lands = list(self.land_base_info_db.values())
-        
-        if land_code is not None:
-            lands = [l for l in lands if l.land_code == land_code]
-        if current_status is not None:
-            lands = [l for l in lands if l.current_status == current_status]
-        if village_id is not None:
-            lands = [l for l in lands if l.village_id == village_id]
-            
-        return lands
+        filters = build_filters(land_code=land_code, current_status=current_status, village_id=village_id)
+        return self.land_base_info_db.find_page(filters, limit=limit, cursor=cursor)
+    
+    def query_lands(self, request: LandQueryRequest,
+                    limit: Optional[int] = None, cursor: Optional[str] = None) -> List[LandBaseInfo]:
+        """高级土地查询，按ID游标分页，land_type 对应土地的地类ID"""
+        filters = build_filters(
+            land_code=request.land_code,
+            land_name__contains=request.land_name,
+            land_type_id=request.land_type,
+            village_id=request.village_id,
+            current_status=request.current_status
+        )
+        return self.land_base_info_db.find_page(filters, limit=limit, cursor=cursor)
+    
+    async def get_land_base_info_async(self,
+                                       land_code: Optional[str] = None,
+                                       land_name: Optional[str] = None,
+                                       land_type_id: Optional[str] = None,
+                                       village_id: Optional[str] = None,
+                                       current_status: Optional[str] = None,
+                                       limit: Optional[int] = None,
+                                       cursor: Optional[str] = None) -> List[LandBaseInfo]:
+        """异步获取土地基础信息"""
+        filters = build_filters(
+            land_code=land_code,
+            land_name__contains=land_name,
+            land_type_id=land_type_id,
+            village_id=village_id,
+            current_status=current_status
+        )
+        return await self.land_base_info_async_repo.find_page(filters, limit=limit, cursor=cursor)
     
     def get_land_base_info_by_id(self, land_id: str) -> Optional[LandBaseInfo]:
         """根据ID获取土地基础信息"""
@@ -184,6 +228,33 @@ class LandBaseInfoService:
         self.land_base_info_db[land.id] = land
         return land
     
+    def batch_create_land_base_info(self, requests: List[CreateLandBaseInfoRequest],
+                                    atomic: bool = True,
+                                    dry_run: bool = False) -> BatchCreateResult:
+        """批量创建土地基础信息
+
+        地类、所属村庄和土地编号一次性校验，通过校验的记录批量写入；atomic 为True时任一行有错误则全部不写入，
+        dry_run 为True时只校验不写入
+        """
+        errors = BatchErrors()
+        existing_types = self.land_type_prices_db.existing_ids(req.land_type_id for req in requests)
+        existing_villages = basic_info_service.villages_db.existing_ids(req.village_id for req in requests)
+        taken_codes = self.land_base_info_db.existing_values("land_code", (req.land_code for req in requests))
+        for index, req in enumerate(requests):
+            errors.check_exists(index, "land_type_id", req.land_type_id, existing_types, "Land type")
+            errors.check_exists(index, "village_id", req.village_id, existing_villages, "Village")
+        errors.check_unique([req.land_code for req in requests], "land_code", taken_codes)
+        if dry_run or (errors and atomic):
+            return errors.result([])
+
+        now = datetime.now()
+        lands = [
+            LandBaseInfo(id=str(uuid.uuid4()), **req.model_dump(), create_time=now, update_time=now)
+            for index, req in enumerate(requests) if index not in errors
+        ]
+        self.land_base_info_db.bulk_put(lands)
+        return errors.result([land.id for land in lands])
+    
     def update_land_base_info(self, land_id: str, request: UpdateLandBaseInfoRequest) -> Optional[LandBaseInfo]:
         """更新土地基础信息"""
         if land_id not in self.land_base_info_db:
@@ -232,6 +303,91 @@ class LandBaseInfoService:
         
         del self.land_base_info_db[land_id]
         return True
+    
+    # 增量统计
+    def _register_aggregates(self) -> None:
+        """注册统计接口使用的增量统计，随土地类型价格和土地基础信息的写入更新"""
+        self.price_stats_by_land_type = self.land_type_prices_db.add_aggregate(
+            "by_land_type", Aggregate("land_type", ["unit_price"]))
+        self.price_stats_by_status = self.land_type_prices_db.add_aggregate(
+            "by_status", Aggregate("status"))
+        self.land_stats_by_status = self.land_base_info_db.add_aggregate(
+            "by_status", Aggregate("current_status", ["area"]))
+        self.land_stats_by_type = self.land_base_info_db.add_aggregate(
+            "by_land_type", Aggregate("land_type_id", ["area"]))
+        # 按 (村队ID, 当前状态) 分组，村、乡镇统计由此汇总
+        self.land_stats_by_village_status = self.land_base_info_db.add_aggregate(
+            "by_village_status", Aggregate(["village_id", "current_status"], ["area"]))
+
+    # 数据统计
+    def get_land_type_price_statistics(self) -> Dict:
+        """获取土地类型价格统计信息"""
+        by_land_type = self.price_stats_by_land_type.groups()
+        return {
+            "total_prices": self.price_stats_by_status.total()["count"],
+            "status_count": {key: group["count"] for key, group in self.price_stats_by_status.groups().items()},
+            "land_type_count": {key: group["count"] for key, group in by_land_type.items()},
+            "land_type_avg_price": {
+                key: group["unit_price"] / group["count"] for key, group in by_land_type.items()
+            }
+        }
+
+    def get_land_statistics(self) -> Dict:
+        """获取土地基础信息统计信息"""
+        by_status = self.land_stats_by_status.groups()
+        by_type = self.land_stats_by_type.groups()
+        totals = self.land_stats_by_status.total()
+        return {
+            "total_lands": totals["count"],
+            "total_area": totals["area"],
+            "status_count": {key: group["count"] for key, group in by_status.items()},
+            "status_area": {key: group["area"] for key, group in by_status.items()},
+            "land_type_count": {key: group["count"] for key, group in by_type.items()},
+            "land_type_area": {key: group["area"] for key, group in by_type.items()}
+        }
+
+    def _summarize_villages(self, village_ids: List[str]) -> Optional[Dict]:
+        """汇总若干村队的土地数量和面积，均无土地时返回None"""
+        status_count: Dict[str, int] = {}
+        status_area: Dict[str, float] = {}
+        for village_id in village_ids:
+            for land_status in LAND_STATUSES:
+                group = self.land_stats_by_village_status.group((village_id, land_status))
+                if group["count"]:
+                    status_count[land_status] = status_count.get(land_status, 0) + group["count"]
+                    status_area[land_status] = status_area.get(land_status, 0) + group["area"]
+        if not status_count:
+            return None
+        return {
+            "total_lands": sum(status_count.values()),
+            "total_area": sum(status_area.values()),
+            "status_count": status_count,
+            "status_area": status_area
+        }
+
+    def get_lands_by_village_statistics(self, village_id: str) -> Optional[Dict]:
+        """获取指定村的土地统计信息"""
+        statistics = self._summarize_villages([village_id])
+        if statistics is None:
+            return None
+        return {"village_id": village_id, **statistics}
+
+    def get_lands_by_township_statistics(self, township_id: str) -> Optional[Dict]:
+        """获取指定乡镇的土地统计信息"""
+        villages = basic_info_service.villages_db.find(build_filters(township_id=township_id))
+        statistics = self._summarize_villages([village.id for village in villages])
+        if statistics is None:
+            return None
+        return {"township_id": township_id, "village_count": len(villages), **statistics}
+    
+    # 数据导出
+    def export_land_type_prices(self) -> Iterator[LandTypePrice]:
+        """导出土地类型价格，逐条产出供流式导出"""
+        return self.land_type_prices_db.stream()
+    
+    def export_lands(self) -> Iterator[LandBaseInfo]:
+        """导出土地基础信息，逐条产出供流式导出"""
+        return self.land_base_info_db.stream()
 
 
 # 创建服务实例供导入使用
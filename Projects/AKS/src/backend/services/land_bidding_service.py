@@ -1,7 +1,7 @@
 # 土地竞拍管理模块服务层实现
 import sys
 import os
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Tuple, Iterator
 from datetime import datetime, timedelta
 import uuid
 import random
@@ -20,8 +20,15 @@ from models.land_bidding import (
     BiddingInfoUpdateRequest,
     CreateBidRequest,
     CreateWinningPaymentRequest,
-    BiddingReviewRequest
+    BiddingReviewRequest,
+    BiddingQueryRequest
 )
+from repositories.base import Repository, build_filters
+from repositories.factory import create_repository, use_memory_backend, transaction
+from services.auction_engine import AuctionEngine, AuctionState, BidRejectedError, EligibilityCache
+from services.basic_info_service import basic_info_service
+from utils.pubsub import pubsub_hub
+from utils.scheduler import TimerScheduler
 from pydantic import BaseModel
 
 # 保证金交易创建请求（本地定义，因为models中没有）
@@ -42,16 +49,34 @@ class UpdateDepositTransactionRequest(BaseModel):
     remark: Optional[str] = None
 
 
+# 竞拍结束的状态，推送 closed 事件
+CLOSED_STATUSES = ("已结束", "已取消")
+# 中标后缴费期限
+WINNING_PAYMENT_DAYS = 30
+
+
+def bidding_topic(bidding_id: str) -> str:
+    """竞拍实时推送的订阅主题"""
+    return f"bidding:{bidding_id}"
+
+
 class LandBiddingService:
     def __init__(self):
-        # 模拟数据库存储
-        self.bidder_registrations_db: Dict[str, BidderRegistration] = {}
-        self.bidding_info_db: Dict[str, BiddingInfo] = {}
-        self.deposit_transactions_db: Dict[str, DepositTransaction] = {}
-        self.bid_records_db: Dict[str, BidRecord] = {}
-        self.winning_payments_db: Dict[str, WinningPayment] = {}
-        # 初始化一些测试数据
-        self._init_test_data()
+        # 数据存储（内存或PostgreSQL，由 repository_backend 配置决定）
+        self.bidder_registrations_db: Repository = create_repository("bidder_registrations", BidderRegistration)
+        self.bidding_info_db: Repository = create_repository("bidding_info", BiddingInfo)
+        self.deposit_transactions_db: Repository = create_repository("deposit_transactions", DepositTransaction)
+        self.bid_records_db: Repository = create_repository("bid_records", BidRecord)
+        self.winning_payments_db: Repository = create_repository("winning_payments", WinningPayment)
+        # 实时竞拍引擎，保存各竞拍的当前最高价和结束时间
+        self.auction_engine = AuctionEngine(on_bid=self._publish_bid)
+        # 竞拍资格缓存，出价路径上的资格检查不再逐次查询注册和保证金
+        self.eligibility_cache = EligibilityCache()
+        # 竞拍开始、结束定时任务，由 main 在服务启动时调用 start_scheduler 安排并启动调度线程
+        self.scheduler = TimerScheduler("auction-lifecycle")
+        # 初始化一些测试数据（仅内存存储）
+        if use_memory_backend():
+            self._init_test_data()
     
     def _init_test_data(self):
         # 初始化竞拍信息数据
@@ -76,18 +101,23 @@ class LandBiddingService:
     # 竞拍者注册管理
     def get_bidder_registrations(self, 
                                 user_id: Optional[str] = None, 
-                                status: Optional[str] = None) -> List[BidderRegistration]:
+                                status: Optional[str] = None, 
+                                real_name: Optional[str] = None, 
+                                id_card_number: Optional[str] = None, 
+                                phone_number: Optional[str] = None,
+                                limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> List[BidderRegistration]:
         """获取所有竞拍者注册信息"""
-        registrations = list(self.bidder_registrations_db.values())
-        
-        if user_id:
-            registrations = [r for r in registrations if r.user_id == user_id]
-        if status:
-            registrations = [r for r in registrations if r.status == status]
-            
+        filters = build_filters(
+            user_id=user_id or None,
+            status=status or None,
+            real_name__contains=real_name,
+            id_card_number=id_card_number,
+            phone_number=phone_number
+        )
         # 按时间倒序排序
-        registrations.sort(key=lambda x: x.create_time, reverse=True)
-        return registrations
+        return self.bidder_registrations_db.find_page(filters, order_by="create_time", descending=True,
+                                                      limit=limit, cursor=cursor)
     
     def get_bidder_registration_by_id(self, registration_id: str) -> Optional[BidderRegistration]:
         """根据ID获取竞拍者注册信息"""
@@ -95,10 +125,17 @@ class LandBiddingService:
     
     def get_bidder_registration_by_user_id(self, user_id: str) -> Optional[BidderRegistration]:
         """根据用户ID获取竞拍者注册信息"""
-        for registration in self.bidder_registrations_db.values():
-            if registration.user_id == user_id:
-                return registration
-        return None
+        return self.bidder_registrations_db.find_one(build_filters(user_id=user_id))
+    
+    def get_bidder_registration_by_farmer_id(self, farmer_id: str) -> Optional[BidderRegistration]:
+        """根据种植户ID获取竞拍者注册信息：先按用户ID查找，再按种植户身份证号查找"""
+        registration = self.get_bidder_registration_by_user_id(farmer_id)
+        if registration:
+            return registration
+        farmer = basic_info_service.get_user_by_id(farmer_id)
+        if not farmer:
+            return None
+        return self.bidder_registrations_db.find_one(build_filters(id_card_number=farmer.id_card_number))
     
     def create_bidder_registration(self, request: CreateBidderRegistrationRequest) -> BidderRegistration:
         """创建竞拍者注册信息"""
@@ -117,6 +154,7 @@ class LandBiddingService:
             create_time=datetime.now()
         )
         self.bidder_registrations_db[registration.id] = registration
+        self.eligibility_cache.invalidate_registration(registration.id)
         return registration
     
     def update_bidder_registration(self, registration_id: str, request: UpdateBidderRegistrationRequest) -> Optional[BidderRegistration]:
@@ -139,14 +177,17 @@ class LandBiddingService:
             registration.business_license = request.business_license
         
         self.bidder_registrations_db[registration_id] = registration
+        self.eligibility_cache.invalidate_registration(registration.id)
         return registration
     
     def delete_bidder_registration(self, registration_id: str) -> bool:
         """删除竞拍者注册信息"""
-        if registration_id not in self.bidder_registrations_db:
+        registration = self.bidder_registrations_db.get(registration_id)
+        if not registration:
             return False
         
         del self.bidder_registrations_db[registration_id]
+        self.eligibility_cache.invalidate_registration(registration.id)
         return True
     
     # 竞拍信息管理
@@ -154,22 +195,34 @@ class LandBiddingService:
                         land_id: Optional[str] = None, 
                         status: Optional[str] = None, 
                         start_date: Optional[datetime] = None, 
-                        end_date: Optional[datetime] = None) -> List[BiddingInfo]:
+                        end_date: Optional[datetime] = None,
+                        limit: Optional[int] = None,
+                        cursor: Optional[str] = None) -> List[BiddingInfo]:
         """获取所有竞拍信息"""
-        bidding_list = list(self.bidding_info_db.values())
-        
-        if land_id:
-            bidding_list = [b for b in bidding_list if b.land_id == land_id]
-        if status:
-            bidding_list = [b for b in bidding_list if b.status == status]
-        if start_date:
-            bidding_list = [b for b in bidding_list if b.start_time >= start_date]
-        if end_date:
-            bidding_list = [b for b in bidding_list if b.end_time <= end_date]
-            
+        filters = build_filters(
+            land_id=land_id or None,
+            status=status or None,
+            start_time__gte=start_date,
+            end_time__lte=end_date
+        )
         # 按开始时间排序
-        bidding_list.sort(key=lambda x: x.start_time)
-        return bidding_list
+        return self.bidding_info_db.find_page(filters, order_by="start_time",
+                                              limit=limit, cursor=cursor)
+    
+    def query_biddings(self, request: BiddingQueryRequest,
+                       limit: Optional[int] = None, cursor: Optional[str] = None) -> List[BiddingInfo]:
+        """高级竞拍信息查询，按开始时间游标分页"""
+        filters = build_filters(
+            land_id=request.land_id,
+            title__contains=request.title,
+            status=request.status,
+            start_time__gte=request.start_time_from,
+            start_time__lte=request.start_time_to,
+            end_time__gte=request.end_time_from,
+            end_time__lte=request.end_time_to
+        )
+        return self.bidding_info_db.find_page(filters, order_by="start_time",
+                                              limit=limit, cursor=cursor)
     
     def get_bidding_info_by_id(self, bidding_id: str) -> Optional[BiddingInfo]:
         """根据ID获取竞拍信息"""
@@ -194,6 +247,7 @@ class LandBiddingService:
             update_time=datetime.now()
         )
         self.bidding_info_db[bidding.id] = bidding
+        self._schedule_bidding(bidding)
         return bidding
     
     def update_bidding_info(self, bidding_id: str, request: BiddingInfoUpdateRequest) -> Optional[BiddingInfo]:
@@ -225,6 +279,10 @@ class LandBiddingService:
         bidding.update_time = datetime.now()
         
         self.bidding_info_db[bidding_id] = bidding
+        self.auction_engine.sync(bidding)
+        self._schedule_bidding(bidding)
+        if bidding.status in CLOSED_STATUSES:
+            self.publish_bidding_closed(bidding)
         return bidding
     
     def delete_bidding_info(self, bidding_id: str) -> bool:
@@ -238,26 +296,32 @@ class LandBiddingService:
             return False
         
         del self.bidding_info_db[bidding_id]
+        self.auction_engine.remove(bidding_id)
+        self.scheduler.cancel(f"open:{bidding_id}")
+        self.scheduler.cancel(f"close:{bidding_id}")
+        self.eligibility_cache.invalidate_bidding(bidding_id)
         return True
     
     # 保证金交易管理
     def get_deposit_transactions(self, 
                                 bidding_id: Optional[str] = None, 
                                 user_id: Optional[str] = None, 
-                                status: Optional[str] = None) -> List[DepositTransaction]:
+                                status: Optional[str] = None,
+                                transaction_time_from: Optional[datetime] = None,
+                                transaction_time_to: Optional[datetime] = None,
+                                limit: Optional[int] = None,
+                                cursor: Optional[str] = None) -> List[DepositTransaction]:
         """获取所有保证金交易记录"""
-        transactions = list(self.deposit_transactions_db.values())
-        
-        if bidding_id:
-            transactions = [t for t in transactions if t.bidding_id == bidding_id]
-        if user_id:
-            transactions = [t for t in transactions if t.user_id == user_id]
-        if status:
-            transactions = [t for t in transactions if t.status == status]
-            
+        filters = build_filters(
+            bidding_id=bidding_id or None,
+            user_id=user_id or None,
+            status=status or None,
+            transaction_time__gte=transaction_time_from,
+            transaction_time__lte=transaction_time_to
+        )
         # 按时间倒序排序
-        transactions.sort(key=lambda x: x.created_at, reverse=True)
-        return transactions
+        return self.deposit_transactions_db.find_page(filters, order_by="transaction_time", descending=True,
+                                                      limit=limit, cursor=cursor)
     
     def get_deposit_transaction_by_id(self, transaction_id: str) -> Optional[DepositTransaction]:
         """根据ID获取保证金交易记录"""
@@ -282,23 +346,25 @@ class LandBiddingService:
             remark=None
         )
         self.deposit_transactions_db[transaction.id] = transaction
+        self.eligibility_cache.invalidate_deposit(transaction.user_id, transaction.bidding_id)
         return transaction
     
     # 路由层使用的方法，与现有的内部方法名称保持一致
     def get_deposits(self, bidder_id: Optional[str] = None, bidding_id: Optional[str] = None,
                    transaction_no: Optional[str] = None, status: Optional[str] = None,
-                   transaction_date_from: Optional[datetime] = None, transaction_date_to: Optional[datetime] = None) -> List[DepositTransaction]:
+                   transaction_date_from: Optional[datetime] = None, transaction_date_to: Optional[datetime] = None,
+                   limit: Optional[int] = None, cursor: Optional[str] = None) -> List[DepositTransaction]:
         """获取保证金交易列表（路由层使用）"""
-        # 调用现有的get_deposit_transactions方法，并映射参数
-        transactions = self.get_deposit_transactions(bidding_id=bidding_id, user_id=bidder_id, status=status)
-        
-        # 添加额外的过滤条件
-        if transaction_date_from:
-            transactions = [t for t in transactions if t.transaction_time and t.transaction_time >= transaction_date_from]
-        if transaction_date_to:
-            transactions = [t for t in transactions if t.transaction_time and t.transaction_time <= transaction_date_to]
-            
-        return transactions
+        # 调用现有的get_deposit_transactions方法，并映射参数；日期条件一并下推，保证分页结果完整
+        return self.get_deposit_transactions(
+            bidding_id=bidding_id,
+            user_id=bidder_id,
+            status=status,
+            transaction_time_from=transaction_date_from,
+            transaction_time_to=transaction_date_to,
+            limit=limit,
+            cursor=cursor
+        )
     
     def get_deposit_by_id(self, deposit_id: str) -> Optional[DepositTransaction]:
         """根据ID获取保证金交易（路由层使用）"""
@@ -316,6 +382,8 @@ class LandBiddingService:
         transaction = self.get_deposit_transaction_by_id(transaction_id=deposit_id)
         if not transaction:
             return None
+        # 用户或竞拍变更时，原 (用户, 竞拍) 的保证金缓存同样失效
+        self.eligibility_cache.invalidate_deposit(transaction.user_id, transaction.bidding_id)
         
         # 更新交易记录的字段
         if request.user_id is not None:
@@ -332,7 +400,9 @@ class LandBiddingService:
             transaction.transaction_time = request.transaction_time
         if request.remark is not None:
             transaction.remark = request.remark
-            
+        
+        self.deposit_transactions_db[transaction.id] = transaction
+        self.eligibility_cache.invalidate_deposit(transaction.user_id, transaction.bidding_id)
         return transaction
     
     def confirm_deposit_payment(self, deposit_id: str) -> bool:
@@ -345,118 +415,304 @@ class LandBiddingService:
         # 更新交易状态为已支付
         transaction.status = "已支付"
         transaction.transaction_time = datetime.now()
+        self.deposit_transactions_db[transaction.id] = transaction
+        self.eligibility_cache.invalidate_deposit(transaction.user_id, transaction.bidding_id)
         return True
     
     # 竞价记录管理
     def get_bid_records(self, 
                        bidding_id: Optional[str] = None, 
-                       user_id: Optional[str] = None) -> List[BidRecord]:
+                       user_id: Optional[str] = None,
+                       limit: Optional[int] = None,
+                       cursor: Optional[str] = None) -> List[BidRecord]:
         """获取所有竞价记录"""
-        records = list(self.bid_records_db.values())
-        
-        if bidding_id:
-            records = [r for r in records if r.bidding_id == bidding_id]
-        if user_id:
-            records = [r for r in records if r.user_id == user_id]
-            
-        # 按时间倒序排序
-        records.sort(key=lambda x: x.create_time, reverse=True)
-        return records
+        filters = build_filters(bidding_id=bidding_id or None, user_id=user_id or None)
+        # 按出价时间倒序排序
+        return self.bid_records_db.find_page(filters, order_by="bid_time", descending=True,
+                                             limit=limit, cursor=cursor)
     
     def get_bid_record_by_id(self, record_id: str) -> Optional[BidRecord]:
         """根据ID获取竞价记录"""
         return self.bid_records_db.get(record_id)
     
-    def create_bid_record(self, request: CreateBidRequest) -> Optional[BidRecord]:
-        """创建竞价记录"""
-        # 检查竞拍信息是否存在且处于进行中
-        bidding = self.get_bidding_info_by_id(request.bidding_id)
-        now = datetime.now()
-        if (not bidding or 
-            bidding.status != "进行中" or 
-            now < bidding.start_time or 
-            now > bidding.end_time):
+    def _load_auction(self, bidding_id: str) -> Optional[AuctionState]:
+        """从仓储构建竞拍引擎状态：竞拍信息及其有效出价"""
+        bidding = self.get_bidding_info_by_id(bidding_id)
+        if not bidding:
+            return None
+        bids = self.bid_records_db.find(build_filters(bidding_id=bidding_id, status="有效"))
+        return AuctionState(bidding, bids)
+    
+    def create_bid_record(self, request: CreateBidRequest, user_id: str) -> Optional[BidRecord]:
+        """创建竞价记录
+
+        出价由竞拍引擎在该场竞拍的锁内校验：竞拍进行中、出价不低于起拍价或当前最高价加加价幅度，
+        不符合规则时抛出 BidRejectedError；竞拍不存在时返回None
+        """
+        state = self.auction_engine.ensure(request.bidding_id, self._load_auction)
+        if state is None:
             return None
         
-        # 创建竞价记录
-        bid_record = BidRecord(
-            id=str(uuid.uuid4()),
-            bidding_id=request.bidding_id,
-            user_id=str(uuid.uuid4()),  # 假设这是当前用户的ID
-            bid_price=request.bid_price,
-            bid_time=now,
-            status="有效"
-        )
-        self.bid_records_db[bid_record.id] = bid_record
+        def persist(bid_price: float, bid_time: datetime, new_end_time: Optional[datetime]) -> BidRecord:
+            bid_record = BidRecord(
+                id=str(uuid.uuid4()),
+                bidding_id=request.bidding_id,
+                user_id=user_id,
+                bid_price=bid_price,
+                bid_time=bid_time,
+                status="有效"
+            )
+            # 最后时刻出价延长竞拍结束时间；按更新时间比较写入，竞拍已被其他进程结算时拒绝出价
+            if new_end_time is not None:
+                bidding = self.bidding_info_db.get(request.bidding_id)
+                extended = bidding.model_copy(update={
+                    "end_time": max(bidding.end_time, new_end_time), "update_time": bid_time
+                }) if bidding is not None and bidding.status == "进行中" else None
+                if extended is None or not self.bidding_info_db.compare_and_set(
+                        extended, "update_time", bidding.update_time):
+                    raise BidRejectedError(f"Bidding {request.bidding_id} is not active")
+            self.bid_records_db[bid_record.id] = bid_record
+            return bid_record
         
-        return bid_record
+        return self.auction_engine.place_bid(state, user_id, request.bid_price, persist)
+    
+    def get_bidding_status(self, bidding_id: str) -> Optional[Dict]:
+        """获取竞拍实时状态（当前价格、出价次数、参与人数、结束时间），竞拍不存在时返回None"""
+        state = self.auction_engine.ensure(bidding_id, self._load_auction)
+        if state is None:
+            return None
+        return state.snapshot()
+    
+    # 实时推送
+    def _auction_event(self, event_type: str, state: AuctionState) -> Dict:
+        """由竞拍状态生成推送事件，时间字段转为ISO字符串，附带服务器时间和剩余秒数供客户端倒计时"""
+        event = state.snapshot()
+        now = datetime.now()
+        event["type"] = event_type
+        event["end_time"] = state.end_time.isoformat()
+        event["server_time"] = now.isoformat()
+        event["remaining_seconds"] = max((state.end_time - now).total_seconds(), 0)
+        return event
+    
+    def get_bidding_event(self, bidding_id: str, event_type: str = "snapshot") -> Optional[Dict]:
+        """获取竞拍当前状态的推送事件（订阅时的初始快照、心跳倒计时），竞拍不存在时返回None"""
+        state = self.auction_engine.ensure(bidding_id, self._load_auction)
+        if state is None:
+            return None
+        return self._auction_event(event_type, state)
+    
+    def _publish_bid(self, state: AuctionState, extended: bool) -> None:
+        """推送新的最高价；最后时刻出价延长了结束时间时另推送 extended 事件"""
+        topic = bidding_topic(state.bidding_id)
+        if not pubsub_hub.subscriber_count(topic):
+            return
+        pubsub_hub.publish(topic, self._auction_event("bid", state))
+        if extended:
+            pubsub_hub.publish(topic, self._auction_event("extended", state))
+    
+    def publish_bidding_closed(self, bidding: BiddingInfo) -> None:
+        """推送竞拍结束事件"""
+        pubsub_hub.publish(bidding_topic(bidding.id), {
+            "type": "closed",
+            "bidding_id": bidding.id,
+            "status": bidding.status,
+            "winner_id": bidding.winner_id,
+            "final_price": bidding.final_price,
+            "end_time": bidding.end_time.isoformat(),
+            "server_time": datetime.now().isoformat()
+        })
+    
+    def get_bidding_history(self, bidding_id: str) -> List[BidRecord]:
+        """获取竞拍的出价历史，按出价时间倒序"""
+        return self.bid_records_db.find(build_filters(bidding_id=bidding_id), order_by="bid_time", descending=True)
     
     # 成交支付管理
     def get_winning_payments(self, 
                             bidding_id: Optional[str] = None, 
                             user_id: Optional[str] = None, 
-                            status: Optional[str] = None) -> List[WinningPayment]:
+                            status: Optional[str] = None,
+                            limit: Optional[int] = None,
+                            cursor: Optional[str] = None) -> List[WinningPayment]:
         """获取所有成交支付记录"""
-        payments = list(self.winning_payments_db.values())
-        
-        if bidding_id:
-            payments = [p for p in payments if p.bidding_id == bidding_id]
-        if user_id:
-            payments = [p for p in payments if p.user_id == user_id]
-        if status:
-            payments = [p for p in payments if p.status == status]
-            
+        filters = build_filters(bidding_id=bidding_id or None, user_id=user_id or None, payment_status=status or None)
         # 按时间倒序排序
-        payments.sort(key=lambda x: x.create_time, reverse=True)
-        return payments
+        return self.winning_payments_db.find_page(filters, order_by="create_time", descending=True,
+                                                  limit=limit, cursor=cursor)
     
     def get_winning_payment_by_id(self, payment_id: str) -> Optional[WinningPayment]:
         """根据ID获取成交支付记录"""
         return self.winning_payments_db.get(payment_id)
     
     def create_winning_payment(self, request: CreateWinningPaymentRequest) -> Optional[WinningPayment]:
-        """创建成交支付记录"""
+        """登记中标缴费
+
+        竞拍结束时已自动生成待支付的缴费记录，本次金额计入该记录；没有记录时按成交价新建
+        """
         # 检查竞拍信息是否存在且已结束
         bidding = self.get_bidding_info_by_id(request.bidding_id)
-        now = datetime.now()
-        if (not bidding or 
-            bidding.status != "已结束" or 
-            now <= bidding.end_time or 
-            not bidding.winner_id):
+        if not bidding or bidding.status != "已结束" or not bidding.winner_id:
             return None
         
-        # 创建成交支付记录
-        payment = WinningPayment(
-            id=str(uuid.uuid4()),
-            bidding_id=request.bidding_id,
-            user_id=bidding.winner_id,
-            total_amount=bidding.final_price or 0,
-            paid_amount=request.amount,
-            status="已支付" if request.amount >= (bidding.final_price or 0) else "部分支付",
-            due_date=now + timedelta(days=30),
-            penalty_amount=0,
-            create_time=now,
-            update_time=now
-        )
+        now = datetime.now()
+        payment = self.winning_payments_db.find_one(build_filters(bidding_id=bidding.id, user_id=bidding.winner_id))
+        if payment is None:
+            payment = WinningPayment(
+                id=str(uuid.uuid4()),
+                bidding_id=request.bidding_id,
+                user_id=bidding.winner_id,
+                total_amount=bidding.final_price or 0,
+                paid_amount=0,
+                payment_status="待支付",
+                due_date=now + timedelta(days=WINNING_PAYMENT_DAYS),
+                penalty_amount=0,
+                create_time=now
+            )
+        payment.paid_amount += request.amount
+        payment.payment_status = "已支付" if payment.paid_amount >= payment.total_amount else "部分支付"
+        payment.update_time = now
         self.winning_payments_db[payment.id] = payment
         
         return payment
     
+    # 竞拍开始、结束定时任务
+    def start_scheduler(self) -> None:
+        """为待开始和进行中的竞拍安排定时任务并启动调度线程，已过时间的任务启动后立即执行"""
+        self._schedule_pending_biddings()
+        self.scheduler.start()
+
+    def _schedule_pending_biddings(self) -> None:
+        for bidding in self.bidding_info_db.find(build_filters(status__in=["待开始", "进行中"])):
+            self._schedule_bidding(bidding)
+    
+    def _schedule_bidding(self, bidding: BiddingInfo) -> None:
+        """按竞拍当前状态安排开始、结束任务，竞拍已结束或取消时撤销任务"""
+        open_key, close_key = f"open:{bidding.id}", f"close:{bidding.id}"
+        if bidding.status == "待开始":
+            self.scheduler.schedule(open_key, bidding.start_time, lambda: self._open_bidding(bidding.id))
+        else:
+            self.scheduler.cancel(open_key)
+        if bidding.status in ("待开始", "进行中"):
+            self.scheduler.schedule(close_key, bidding.end_time, lambda: self._close_bidding(bidding.id))
+        else:
+            self.scheduler.cancel(close_key)
+    
+    def _open_bidding(self, bidding_id: str) -> None:
+        """到达开始时间，竞拍状态改为进行中"""
+        bidding = self.get_bidding_info_by_id(bidding_id)
+        if not bidding or bidding.status != "待开始":
+            return
+        bidding.status = "进行中"
+        bidding.update_time = datetime.now()
+        self.bidding_info_db[bidding.id] = bidding
+        self.auction_engine.sync(bidding)
+        state = self.auction_engine.get(bidding_id)
+        if state is not None:
+            pubsub_hub.publish(bidding_topic(bidding_id), self._auction_event("opened", state))
+    
+    def _close_bidding(self, bidding_id: str) -> None:
+        """到达结束时间，结束竞拍并结算：确定中标人、退还未中标人保证金、生成中标缴费记录
+
+        每个工作进程都安排了结束任务，竞拍信息按更新时间比较写入为已结束，只有写入成功的进程结算；
+        其他进程接受的最后时刻出价会延长结束时间并更新竞拍信息，比较写入失败后重新读取、按新的结束时间重新安排。
+        中标人和成交价在比较写入成功后按仓储中的有效出价确定，不使用本进程的竞拍引擎状态
+        """
+        while True:
+            bidding = self.get_bidding_info_by_id(bidding_id)
+            if not bidding or bidding.status not in ("待开始", "进行中"):
+                # 已由其他进程结算或已取消
+                if bidding:
+                    self.auction_engine.sync(bidding)
+                return
+            state = self.auction_engine.ensure(bidding_id, self._load_auction)
+            end_time = max(bidding.end_time, state.end_time) if state is not None else bidding.end_time
+            if datetime.now() < end_time or (state is not None and not self.auction_engine.close(state, "已结束")):
+                # 最后时刻出价延长了结束时间，按新的结束时间重新安排
+                self.auction_engine.sync(bidding)
+                self.scheduler.schedule(f"close:{bidding_id}", end_time, lambda: self._close_bidding(bidding_id))
+                return
+            
+            now = datetime.now()
+            closing = bidding.model_copy(update={"status": "已结束", "update_time": now})
+            with transaction():
+                if not self.bidding_info_db.compare_and_set(closing, "update_time", bidding.update_time):
+                    continue
+                closed = self._settle_bidding(closing, now)
+            break
+        
+        self.auction_engine.sync(closed)
+        self.eligibility_cache.invalidate_bidding(bidding_id)
+        self.publish_bidding_closed(closed)
+    
+    def _winning_bid(self, bidding_id: str) -> Optional[BidRecord]:
+        """有效出价中金额最高的一笔，同价时先出价者中标"""
+        valid = build_filters(bidding_id=bidding_id, status="有效")
+        highest = self.bid_records_db.find(valid, order_by="bid_price", descending=True, limit=1)
+        if not highest:
+            return None
+        earliest = self.bid_records_db.find(valid + build_filters(bid_price__gte=highest[0].bid_price),
+                                            order_by="bid_time", limit=1)
+        return (earliest or highest)[0]
+    
+    def _settle_bidding(self, bidding: BiddingInfo, now: datetime) -> BiddingInfo:
+        """结算已改为已结束的竞拍，与状态写入在同一事务中执行，返回写入中标人和成交价后的竞拍信息"""
+        winning_bid = self._winning_bid(bidding.id)
+        winner_id = winning_bid.user_id if winning_bid is not None else None
+        bidding = bidding.model_copy(update={
+            "winner_id": winner_id,
+            "final_price": winning_bid.bid_price if winning_bid is not None else None
+        })
+        self.bidding_info_db[bidding.id] = bidding
+        if winning_bid is not None:
+            self.bid_records_db[winning_bid.id] = winning_bid.model_copy(update={"status": "中标"})
+        
+        # 未中标人的保证金批量退还：原支付记录标记为已退还，并记一笔退还交易
+        paid_deposits = self.deposit_transactions_db.find(build_filters(bidding_id=bidding.id, status="已支付"))
+        refunded = []
+        refunds = []
+        for deposit in paid_deposits:
+            if deposit.user_id == winner_id:
+                continue
+            refunded.append(deposit.model_copy(update={"status": "已退还"}))
+            refunds.append(DepositTransaction(
+                id=str(uuid.uuid4()),
+                user_id=deposit.user_id,
+                bidding_id=bidding.id,
+                amount=deposit.amount,
+                transaction_type="退还",
+                status="已退还",
+                transaction_time=now,
+                remark=f"竞拍结束未中标，退还保证金（原交易 {deposit.id}）"
+            ))
+        self.deposit_transactions_db.bulk_put(refunded + refunds)
+        
+        if winning_bid is not None:
+            payment = WinningPayment(
+                id=str(uuid.uuid4()),
+                bidding_id=bidding.id,
+                user_id=winner_id,
+                total_amount=winning_bid.bid_price,
+                paid_amount=0,
+                payment_status="待支付",
+                due_date=now + timedelta(days=WINNING_PAYMENT_DAYS),
+                penalty_amount=0,
+                create_time=now,
+                update_time=now
+            )
+            self.winning_payments_db[payment.id] = payment
+        return bidding
+    
     # 竞拍审核管理 - 获取已审核的注册信息
     def get_approved_registrations(self) -> List[BidderRegistration]:
         """获取所有已审核通过的竞拍者注册信息"""
-        approved = [r for r in self.bidder_registrations_db.values() if r.status == "已通过"]
         # 按时间倒序排序
-        approved.sort(key=lambda x: x.create_time, reverse=True)
-        return approved
+        return self.bidder_registrations_db.find(
+            build_filters(status="已通过"), order_by="create_time", descending=True
+        )
     
     def create_bidding_review(self, request: BiddingReviewRequest) -> Optional[BidderRegistration]:
         """创建竞拍审核记录"""
         # 检查注册信息是否存在
-        registration = next(
-            (r for r in self.bidder_registrations_db.values() if r.id == request.registration_id),
-            None
-        )
+        registration = self.bidder_registrations_db.get(request.registration_id)
         if not registration:
             return None
         
@@ -465,81 +721,88 @@ class LandBiddingService:
         registration.review_time = datetime.now()
         registration.review_remark = request.remark
         self.bidder_registrations_db[registration.id] = registration
+        self.eligibility_cache.invalidate_registration(registration.id)
         
         return registration
     
+    def review_bidder(self, registration_id: str, approved: bool, remark: Optional[str] = None) -> bool:
+        """审核竞拍者资格"""
+        return self.create_bidding_review(BiddingReviewRequest(
+            registration_id=registration_id,
+            status="已通过" if approved else "已拒绝",
+            remark=remark
+        )) is not None
+    
     # 竞拍者资格检查
+    def _load_registration_state(self, farmer_id: str) -> Tuple[Optional[str], bool]:
+        registration = self.get_bidder_registration_by_farmer_id(farmer_id)
+        if registration is None:
+            return None, False
+        return registration.id, registration.status == "已通过"
+    
+    def _load_deposit_state(self, farmer_id: str, bidding_id: str) -> bool:
+        return self.deposit_transactions_db.find_one(
+            build_filters(bidding_id=bidding_id, user_id=farmer_id, status="已支付")
+        ) is not None
+    
     def check_bidder_eligibility(self, farmer_id: str, bidding_id: str) -> Dict[str, bool]:
-        """检查竞拍者资格"""
-        result = {
-            "is_eligible": False,
-            "has_registration": False,
-            "is_registration_approved": False,
-            "has_deposit": False,
-            "bidding_is_active": False,
-            "bidding_in_time": False
-        }
-        
-        # 检查竞拍者注册信息
-        bidder_registration = self.get_bidder_registration_by_farmer_id(farmer_id)
-        if bidder_registration:
-            result["has_registration"] = True
-            if bidder_registration.status == "approved":
-                result["is_registration_approved"] = True
-        
-        # 检查保证金缴纳情况
-        deposit_transaction = next(
-            (t for t in self.deposit_transactions_db.values()
-             if t.bidding_id == bidding_id and 
-                t.farmer_id == farmer_id and 
-                t.status == "success"),
-            None
-        )
-        if deposit_transaction:
-            result["has_deposit"] = True
+        """检查竞拍者资格
+
+        注册审核和保证金情况读取资格缓存，竞拍状态和时间读取竞拍引擎，均不查询仓储
+        """
+        has_registration, is_approved = self.eligibility_cache.registration(farmer_id, self._load_registration_state)
+        has_deposit = self.eligibility_cache.deposit(farmer_id, bidding_id, self._load_deposit_state)
         
         # 检查竞拍状态和时间
-        bidding = self.get_bidding_info_by_id(bidding_id)
-        if bidding:
-            result["bidding_is_active"] = bidding.status == "active"
-            now = datetime.now()
-            result["bidding_in_time"] = bidding.start_time <= now <= bidding.end_time
+        bidding_is_active = False
+        bidding_in_time = False
+        state = self.auction_engine.ensure(bidding_id, self._load_auction)
+        if state is not None:
+            bidding_is_active = state.status == "进行中"
+            bidding_in_time = state.start_time <= datetime.now() <= state.end_time
         
-        # 判断是否具备资格
-        result["is_eligible"] = (
-            result["is_registration_approved"] and 
-            result["has_deposit"] and 
-            result["bidding_is_active"] and 
-            result["bidding_in_time"]
-        )
-        
-        return result
+        return {
+            "is_eligible": is_approved and has_deposit and bidding_is_active and bidding_in_time,
+            "has_registration": has_registration,
+            "is_registration_approved": is_approved,
+            "has_deposit": has_deposit,
+            "bidding_is_active": bidding_is_active,
+            "bidding_in_time": bidding_in_time
+        }
     
     # 自动延长竞拍时间
     def check_and_extend_bidding_time(self, bidding_id: str) -> Optional[BiddingInfo]:
-        """检查并延长竞拍时间（最后5分钟内有新报价则延长5分钟）"""
+        """检查竞拍时间是否因最后5分钟内的新报价而延长
+
+        延长在出价时由竞拍引擎完成并写回竞拍信息，这里只返回已延长过的进行中竞拍
+        """
         bidding = self.get_bidding_info_by_id(bidding_id)
         if not bidding or bidding.status != "进行中":
             return None
         
-        now = datetime.now()
-        # 检查是否在最后5分钟内
-        if bidding.end_time - now <= timedelta(minutes=5):
-            # 检查最后5分钟内是否有新报价
-            recent_bids = [
-                bid for bid in self.bid_records_db.values()
-                if bid.bidding_id == bidding_id and 
-                   bid.bid_time >= bidding.end_time - timedelta(minutes=5)
-            ]
-            
-            if recent_bids:
-                # 延长5分钟
-                bidding.end_time += timedelta(minutes=5)
-                bidding.update_time = datetime.now()
-                self.bidding_info_db[bidding.id] = bidding
-                return bidding
-        
-        return None
+        state = self.auction_engine.ensure(bidding_id, self._load_auction)
+        if state is None or not state.extension_count:
+            return None
+        return bidding
+    
+    # 数据导出
+    def export_bidders(self) -> Iterator[BidderRegistration]:
+        """导出竞拍者注册信息，按注册时间倒序，逐条产出供流式导出"""
+        return self.bidder_registrations_db.stream(order_by="create_time", descending=True)
+    
+    def export_biddings(self,
+                        time_from: Optional[datetime] = None,
+                        time_to: Optional[datetime] = None) -> Iterator[BiddingInfo]:
+        """导出竞拍信息，按开始时间排序，逐条产出供流式导出"""
+        filters = build_filters(start_time__gte=time_from, start_time__lte=time_to)
+        return self.bidding_info_db.stream(filters, order_by="start_time")
+    
+    def export_bid_records(self,
+                           time_from: Optional[datetime] = None,
+                           time_to: Optional[datetime] = None) -> Iterator[BidRecord]:
+        """导出出价记录，按出价时间倒序，逐条产出供流式导出"""
+        filters = build_filters(bid_time__gte=time_from, bid_time__lte=time_to)
+        return self.bid_records_db.stream(filters, order_by="bid_time", descending=True)
 
 
 # 创建服务实例供导入使用
@@ -0,0 +1,301 @@
+# 账户记账引擎
+# 余额变动按账户加锁串行处理：锁内重新读取账户，以 Decimal 校验并计算新余额，账户（版本号加一）与复式记账分录
+# 在同一事务中写入；账户按版本号比较写入，多进程部署时其他进程已修改该账户则重新读取后重试。
+# 每条分录记录本分录后的余额和累计转入、转出金额，对账单直接取用，无需回放历史流水
+# 金额只在计算时使用 Decimal，账户和分录中仍以 float 保存（与其他模型及接口的金额类型一致）：写入前已按分舍入，
+# 绝对值小于 10^13 元的两位小数（不超过15位有效数字）与 float 一一对应，经 to_amount 读回得到原值，不会累积误差；
+# PostgreSQL 中文档以JSON文本保存，按 numeric 求和同样精确
+import sys
+import os
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.account_management import AccountInfo, AccountTransaction
+from repositories.base import FieldFilter, Repository
+from repositories.factory import after_commit, transaction
+
+# 金额精度：分
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+# 外部资金往来（充值渠道、支出收款方）的对方账户，只记分录不维护余额
+EXTERNAL_ACCOUNT_ID = "external"
+# 正常状态的账户才能充值、支出和冻结
+ACTIVE_ACCOUNT_STATUS = 1
+# 版本冲突（其他进程同时修改了账户）时的最大尝试次数
+MAX_ATTEMPTS = 5
+
+# 一笔余额变动：(可用余额变动, 冻结余额变动, 业务类型, 业务ID, 备注)
+Movement = Tuple[Decimal, Decimal, str, Optional[str], Optional[str]]
+
+
+class LedgerError(ValueError):
+    """记账失败异常"""
+    pass
+
+
+class AccountUnavailableError(LedgerError):
+    """账户不存在或状态不允许记账异常"""
+    pass
+
+
+class InsufficientBalanceError(LedgerError):
+    """余额不足异常"""
+    pass
+
+
+class LedgerConflictError(LedgerError):
+    """账户被并发修改，重试后仍未写入异常"""
+    pass
+
+
+class _VersionConflict(Exception):
+    """比较写入失败，回滚本次事务后重试"""
+    pass
+
+
+def to_amount(value: Any) -> Decimal:
+    """金额转换为保留两位小数的 Decimal，经字符串转换避免浮点的二进制误差"""
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise LedgerError(f"Invalid amount: {value}")
+    if not amount.is_finite():
+        raise LedgerError(f"Invalid amount: {value}")
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+# 分录中代表本次业务的记录（账户可用余额一侧），按交易统计金额时每个分录只计一次
+PRIMARY_LEG_FILTERS = [
+    FieldFilter("account_id", "ne", EXTERNAL_ACCOUNT_ID),
+    FieldFilter("balance_type", "ne", "frozen"),
+]
+
+
+class LedgerEngine:
+    """账户记账引擎
+
+    每次余额变动生成一个分录：账户可用余额、冻结余额各一条变动记录，收支净额记在外部账户上，
+    同一分录借方（转出）与贷方（转入）金额相等
+    """
+
+    def __init__(self, accounts_db: Repository, transactions_db: Repository, max_attempts: int = MAX_ATTEMPTS,
+                 on_commit: Optional[Callable[[AccountInfo, List[AccountTransaction]], None]] = None):
+        self.accounts_db = accounts_db
+        self.transactions_db = transactions_db
+        self.max_attempts = max_attempts
+        # 最外层事务提交后回调 on_commit(账户, 分录)，回滚（含外层批量事务回滚）时不回调；
+        # 本引擎开启的事务在账户锁内提交，回调顺序与记账顺序一致
+        self.on_commit = on_commit
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+
+    def account_lock(self, account_id: str) -> threading.RLock:
+        """获取账户锁，同一账户的余额变动和信息修改按锁顺序串行处理；可重入，持有锁时仍可记账"""
+        lock = self._locks.get(account_id)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(account_id, threading.RLock())
+        return lock
+
+    @contextmanager
+    def accounts_locked(self, account_ids: Iterable[str]) -> Iterator[None]:
+        """同时持有多个账户的锁，按账户ID顺序加锁避免死锁；批量记账在锁内校验后写入，期间账户状态不会变化"""
+        with ExitStack() as stack:
+            for account_id in sorted(set(account_ids)):
+                stack.enter_context(self.account_lock(account_id))
+            yield
+
+    def forget(self, account_id: str) -> None:
+        """账户删除后释放账户锁"""
+        with self._locks_guard:
+            self._locks.pop(account_id, None)
+
+    # 余额变动
+    def recharge(self, account_id: str, amount: Any, business_type: str, business_id: Optional[str] = None,
+                 remark: Optional[str] = None,
+                 write: Optional[Callable[[AccountInfo], None]] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """充值：外部转入可用余额"""
+        amount = self._positive(amount)
+        return self._post(account_id, "recharge", [(amount, ZERO, business_type, business_id, remark)], write)
+
+    def recharge_many(self, account_id: str, items: List[Tuple[Any, str, Optional[str], Optional[str]]],
+                      write: Optional[Callable[[AccountInfo], None]] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """同一账户的多笔充值 [(金额, 业务类型, 业务ID, 备注)]，逐笔生成分录，账户只写入一次"""
+        movements = [(self._positive(amount), ZERO, business_type, business_id, remark)
+                     for amount, business_type, business_id, remark in items]
+        return self._post(account_id, "recharge", movements, write)
+
+    def debit(self, account_id: str, amount: Any, business_type: str, business_id: Optional[str] = None,
+              remark: Optional[str] = None,
+              write: Optional[Callable[[AccountInfo], None]] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """支出：可用余额转出到外部，余额不足时抛出 InsufficientBalanceError"""
+        amount = self._positive(amount)
+        return self._post(account_id, "expense", [(-amount, ZERO, business_type, business_id, remark)], write)
+
+    def freeze(self, account_id: str, amount: Any, remark: Optional[str] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """冻结：可用余额转入冻结余额"""
+        amount = self._positive(amount)
+        return self._post(account_id, "freeze", [(-amount, amount, "冻结", None, remark)])
+
+    def unfreeze(self, account_id: str, amount: Any, remark: Optional[str] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """解冻：冻结余额转回可用余额，账户非正常状态时也允许解冻"""
+        amount = self._positive(amount)
+        return self._post(account_id, "unfreeze", [(amount, -amount, "解冻", None, remark)], require_active=False)
+
+    def update(self, account_id: str, changes: Dict[str, Any]) -> Optional[AccountInfo]:
+        """修改账户信息（不含余额），与余额变动使用同一把锁和版本号，账户不存在时返回None"""
+        def change(account: AccountInfo, now: datetime) -> Tuple[AccountInfo, List[AccountTransaction]]:
+            return account.model_copy(update=dict(changes, version=account.version + 1, update_time=now)), []
+
+        try:
+            return self._commit(account_id, change)[0]
+        except AccountUnavailableError:
+            return None
+
+    def opening_entries(self, account: AccountInfo, now: datetime) -> List[AccountTransaction]:
+        """新开账户初始余额的分录，随账户一起写入（账户尚未保存，直接设置其分录序号和累计金额）"""
+        balance = to_amount(account.account_balance)
+        if balance <= ZERO:
+            return []
+        account.entry_sequence = 1
+        account.total_credit = float(balance)
+        return self._entries(account, "recharge", 1, ZERO, ZERO, balance, ZERO, balance, ZERO,
+                             "账户初始化充值", None, "账户初始化充值", now)
+
+    # 内部实现
+    @staticmethod
+    def _positive(amount: Any) -> Decimal:
+        amount = to_amount(amount)
+        if amount <= ZERO:
+            raise LedgerError(f"Amount must be positive: {amount}")
+        return amount
+
+    def _post(self, account_id: str, transaction_type: str, movements: List[Movement],
+              write: Optional[Callable[[AccountInfo], None]] = None,
+              require_active: bool = True) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """按顺序记入各笔变动，每笔生成一个分录；任一笔后余额为负则整体不写入"""
+        def change(account: AccountInfo, now: datetime) -> Tuple[AccountInfo, List[AccountTransaction]]:
+            if require_active and account.account_status != ACTIVE_ACCOUNT_STATUS:
+                raise AccountUnavailableError(f"Account {account_id} is not active")
+            available = to_amount(account.account_balance)
+            frozen = to_amount(account.frozen_balance)
+            credits = to_amount(account.total_credit)
+            debits = to_amount(account.total_debit)
+            sequence = account.entry_sequence
+            entries: List[AccountTransaction] = []
+            for available_change, frozen_change, business_type, business_id, remark in movements:
+                available_after = available + available_change
+                frozen_after = frozen + frozen_change
+                if available_after < ZERO:
+                    raise InsufficientBalanceError(
+                        f"Insufficient balance in account {account_id}: {available} < {-available_change}")
+                if frozen_after < ZERO:
+                    raise InsufficientBalanceError(
+                        f"Insufficient frozen balance in account {account_id}: {frozen} < {-frozen_change}")
+                if available_change > ZERO:
+                    credits += available_change
+                else:
+                    debits -= available_change
+                sequence += 1
+                entries.extend(self._entries(account, transaction_type, sequence, available, frozen,
+                                             available_after, frozen_after, credits, debits,
+                                             business_type, business_id, remark, now))
+                available, frozen = available_after, frozen_after
+
+            updated = account.model_copy(update={
+                "account_balance": float(available),
+                "frozen_balance": float(frozen),
+                "entry_sequence": sequence,
+                "total_credit": float(credits),
+                "total_debit": float(debits),
+                "version": account.version + 1,
+                "update_time": now
+            })
+            return updated, entries
+
+        return self._commit(account_id, change, write)
+
+    def _commit(self, account_id: str,
+                change: Callable[[AccountInfo, datetime], Tuple[AccountInfo, List[AccountTransaction]]],
+                write: Optional[Callable[[AccountInfo], None]] = None) -> Tuple[AccountInfo, List[AccountTransaction]]:
+        """在账户锁内读取账户并计算修改，账户、分录和业务记录（write）在同一事务中写入
+
+        本进程内的修改由账户锁串行化；账户按读取时的版本号比较写入，失败说明其他进程已修改，重新读取后重试。
+        记账时间不早于账户上次修改时间（时钟回拨时沿用上次时间），同一账户的分录时间随序号单调不减
+        """
+        for _ in range(self.max_attempts):
+            with self.account_lock(account_id):
+                account = self.accounts_db.get(account_id)
+                if account is None:
+                    raise AccountUnavailableError(f"Account {account_id} not found")
+                now = datetime.now()
+                if account.update_time is not None and account.update_time > now:
+                    now = account.update_time
+                updated, entries = change(account, now)
+                try:
+                    with transaction():
+                        if not self.accounts_db.compare_and_set(updated, "version", account.version):
+                            raise _VersionConflict()
+                        if entries:
+                            self.transactions_db.bulk_put(entries)
+                        if write is not None:
+                            write(updated)
+                        if self.on_commit is not None:
+                            after_commit(lambda: self.on_commit(updated, entries))
+                except _VersionConflict:
+                    continue
+                return updated, entries
+        raise LedgerConflictError(f"Account {account_id} was modified concurrently, please retry")
+
+    @staticmethod
+    def _entries(account: AccountInfo, transaction_type: str, sequence: int,
+                 available_before: Decimal, frozen_before: Decimal,
+                 available_after: Decimal, frozen_after: Decimal,
+                 credits: Decimal, debits: Decimal,
+                 business_type: str, business_id: Optional[str], remark: Optional[str],
+                 now: datetime) -> List[AccountTransaction]:
+        """生成分录：可用余额、冻结余额的变动各一条，净额由外部账户承担，借贷金额相等
+
+        本账户的记录带分录后的可用余额、冻结余额和可用余额的累计转入（credits）、转出（debits）金额
+        """
+        entry_id = str(uuid.uuid4())
+        legs: List[Tuple[str, Optional[str], Decimal, Optional[Decimal], Optional[Decimal]]] = []
+        running = {
+            "running_balance": float(available_after),
+            "running_frozen_balance": float(frozen_after),
+            "total_credit": float(credits),
+            "total_debit": float(debits)
+        }
+        if available_after != available_before:
+            legs.append((account.id, "available", available_after - available_before, available_before, available_after))
+        if frozen_after != frozen_before:
+            legs.append((account.id, "frozen", frozen_after - frozen_before, frozen_before, frozen_after))
+        net = sum((leg[2] for leg in legs), ZERO)
+        if net != ZERO:
+            legs.append((EXTERNAL_ACCOUNT_ID, None, -net, None, None))
+
+        return [
+            AccountTransaction(
+                id=str(uuid.uuid4()),
+                account_id=leg_account_id,
+                transaction_type=transaction_type,
+                amount=float(abs(change)),
+                balance_before=float(before) if before is not None else None,
+                balance_after=float(after) if after is not None else None,
+                transaction_time=now,
+                business_type=business_type,
+                business_id=business_id,
+                remark=remark,
+                entry_id=entry_id,
+                entry_side="credit" if change > ZERO else "debit",
+                balance_type=balance_type,
+                sequence=sequence,
+                **(running if leg_account_id == account.id else {})
+            )
+            for leg_account_id, balance_type, change, before, after in legs
+        ]
@@ -0,0 +1,346 @@
+# 融资项目组合风险分析
+# 项目以列存方式保存在 NumPy 数组中（贷款金额、抵押物价值、利率、期限、起息日，以及状态、借款人、
+# 抵押物类型的整数编码），作为增量统计注册在项目仓储上：首次读取看板时加载，之后项目写入时原位修改对应行，
+# 删除时以最后一行填补，不随项目数重建。看板按快照计算：分组求和用 bincount，分档用 digitize，全部为数组整体运算，
+# 10万个项目的完整看板在数十毫秒内完成
+import sys
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.aggregates import RepositoryView
+
+# 计入风险敞口的项目状态（已放款、尚未结清）
+EXPOSURE_STATUSES = ["已放款", "已逾期", "已违约"]
+# 抵押覆盖率（抵押物价值/贷款金额）分档边界
+COVERAGE_EDGES = [1.0, 1.5, 2.0, 3.0]
+# 到期阶梯分档边界（距到期月数），小于0为已过到期日
+MATURITY_EDGES = [0, 3, 6, 12, 24, 36]
+# 借款人集中度返回的借款人数
+TOP_BORROWERS = 10
+# 借款人所属地区的缓存时间（秒）
+REGION_CACHE_SECONDS = 300
+# 1970-01-01 的序数日，起息日以相对该日的天数保存
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# 列数组初始容量
+_INITIAL_CAPACITY = 1024
+
+
+class CodeTable:
+    """分类字段的取值与整数编码，编码按首次出现顺序分配，不回收"""
+
+    def __init__(self):
+        self.codes: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def bucket_labels(edges: Sequence[float]) -> List[str]:
+    """分档边界对应的区间名称，如 [1, 2] -> ["<1", "1-2", ">=2"]"""
+    labels = [f"<{edges[0]:g}"]
+    labels.extend(f"{low:g}-{high:g}" for low, high in zip(edges[:-1], edges[1:]))
+    labels.append(f">={edges[-1]:g}")
+    return labels
+
+
+def group_sum(codes: np.ndarray, values: Optional[np.ndarray], groups: int) -> np.ndarray:
+    """按编码分组求和（values 为None时计数）"""
+    return np.bincount(codes, weights=values, minlength=groups)[:groups]
+
+
+class ProjectColumns(RepositoryView):
+    """融资项目列存，以增量统计的方式注册到项目仓储，首次读取时加载
+
+    数值列为定长数组，容量不足时翻倍；行号与项目ID一一对应，删除项目时最后一行移入被删除的位置
+    """
+
+    NUMERIC_FIELDS = ("loan_amount", "collateral_value", "interest_rate")
+    CATEGORY_FIELDS = ("project_status", "borrower_id", "collateral_type")
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # 编码表的代次，重建后编码重新分配，代次加一
+        self.generation = 0
+        self._reset(_INITIAL_CAPACITY)
+
+    def _reset(self, capacity: int) -> None:
+        self.generation += 1
+        self.size = 0
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._numeric = {field: np.zeros(capacity) for field in self.NUMERIC_FIELDS}
+        self._terms = np.zeros(capacity, dtype=np.int64)
+        self._start_days = np.zeros(capacity, dtype=np.int64)
+        self.tables = {field: CodeTable() for field in self.CATEGORY_FIELDS}
+        self._codes = {field: np.zeros(capacity, dtype=np.int64) for field in self.CATEGORY_FIELDS}
+
+    def _columns(self) -> List[np.ndarray]:
+        return [*self._numeric.values(), self._terms, self._start_days, *self._codes.values()]
+
+    def _grow(self) -> None:
+        capacity = len(self._terms) * 2
+        for name, column in list(self._numeric.items()):
+            self._numeric[name] = np.resize(column, capacity)
+        for name, column in list(self._codes.items()):
+            self._codes[name] = np.resize(column, capacity)
+        self._terms = np.resize(self._terms, capacity)
+        self._start_days = np.resize(self._start_days, capacity)
+
+    def _write(self, row: int, record: BaseModel) -> None:
+        for field in self.NUMERIC_FIELDS:
+            self._numeric[field][row] = getattr(record, field)
+        self._terms[row] = record.loan_term
+        # 起息日依次取放款、批准、申请时间，与还款计划一致
+        start = record.loan_time or record.approval_time or record.apply_time
+        self._start_days[row] = start.toordinal() - _EPOCH_ORDINAL
+        for field in self.CATEGORY_FIELDS:
+            self._codes[field][row] = self.tables[field].code(getattr(record, field))
+
+    def update(self, record_id: str, record: Optional[BaseModel]) -> None:
+        with self._lock:
+            row = self._rows.get(record_id)
+            if record is None:
+                if row is None:
+                    return
+                last = self.size - 1
+                if row != last:
+                    for column in self._columns():
+                        column[row] = column[last]
+                    moved = self._ids[last]
+                    self._ids[row] = moved
+                    self._rows[moved] = row
+                self._ids.pop()
+                del self._rows[record_id]
+                self.size = last
+                return
+            if row is None:
+                if self.size == len(self._terms):
+                    self._grow()
+                row = self.size
+                self._rows[record_id] = row
+                self._ids.append(record_id)
+                self.size += 1
+            self._write(row, record)
+
+    def rebuild(self, records: Iterable[BaseModel]) -> bool:
+        """以全量项目重建列存，返回重建前的内容是否有偏差"""
+        records = list(records)
+        with self._lock:
+            before = self._fingerprint()
+            self._reset(max(_INITIAL_CAPACITY, len(records)))
+            for record in records:
+                row = self.size
+                self._rows[record.id] = row
+                self._ids.append(record.id)
+                self.size += 1
+                self._write(row, record)
+            after = self._fingerprint()
+            return any(len(old) != len(new) or not np.array_equal(old, new) for old, new in zip(before, after))
+
+    def _fingerprint(self) -> List[np.ndarray]:
+        """按项目ID排序的各列（分类字段为取值），用于比较重建前后是否一致"""
+        ids = np.array(self._ids, dtype=object)
+        order = np.argsort(ids, kind="stable")
+        columns = [ids[order]]
+        columns.extend(column[:self.size][order] for column in (*self._numeric.values(), self._terms, self._start_days))
+        for field in self.CATEGORY_FIELDS:
+            values = np.array(self.tables[field].values, dtype=object)
+            columns.append(values[self._codes[field][:self.size]][order])
+        return columns
+
+    def snapshot(self) -> "PortfolioSnapshot":
+        """当前数据的快照，数组为副本，计算期间项目写入不影响结果"""
+        self.ensure_built()
+        with self._lock:
+            size = self.size
+            columns = {field: column[:size].copy() for field, column in self._numeric.items()}
+            columns["loan_term"] = self._terms[:size].copy()
+            columns["start_day"] = self._start_days[:size].copy()
+            codes = {field: column[:size].copy() for field, column in self._codes.items()}
+            values = {field: list(table.values) for field, table in self.tables.items()}
+            generation = self.generation
+        return PortfolioSnapshot(columns, codes, values, generation)
+
+    def __len__(self) -> int:
+        self.ensure_built()
+        return self.size
+
+
+class PortfolioSnapshot:
+    """某一时刻的项目列数据：数值列、分类字段编码及编码对应的取值"""
+
+    def __init__(self, columns: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 values: Dict[str, List[Any]], generation: int = 0):
+        self.columns = columns
+        self.codes = codes
+        self.values = values
+        self.generation = generation
+
+    def __len__(self) -> int:
+        return len(self.columns["loan_amount"])
+
+    def mask(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        """分类字段取值在 values 中的行"""
+        table = {value: code for code, value in enumerate(self.values[field])}
+        codes = [table[value] for value in values if value in table]
+        return np.isin(self.codes[field], codes)
+
+    def take(self, mask: np.ndarray) -> "PortfolioSnapshot":
+        return PortfolioSnapshot({name: column[mask] for name, column in self.columns.items()},
+                                 {name: column[mask] for name, column in self.codes.items()},
+                                 self.values, self.generation)
+
+    def maturity_months(self, today: date) -> np.ndarray:
+        """各项目距到期的月数（到期月为起息月之后第 loan_term 个月），已过到期月为负数"""
+        start_days = self.columns["start_day"].astype("datetime64[D]")
+        maturity = start_days.astype("datetime64[M]") + self.columns["loan_term"].astype("timedelta64[M]")
+        return (maturity - np.datetime64(today, "M")).astype(np.int64)
+
+
+# 看板计算
+def exposure_by(snapshot: PortfolioSnapshot, group_codes: np.ndarray, labels: List[Any]) -> List[Dict]:
+    """按分组汇总项目数、贷款金额和抵押物价值，按贷款金额降序"""
+    groups = len(labels)
+    count = group_sum(group_codes, None, groups)
+    loan = group_sum(group_codes, snapshot.columns["loan_amount"], groups)
+    collateral = group_sum(group_codes, snapshot.columns["collateral_value"], groups)
+    order = np.argsort(-loan, kind="stable")
+    return [
+        {"key": labels[index], "project_count": int(count[index]), "loan_amount": float(loan[index]),
+         "collateral_value": float(collateral[index]),
+         "coverage_ratio": float(collateral[index] / loan[index]) if loan[index] else None}
+        for index in order.tolist() if count[index]
+    ]
+
+
+def coverage_profile(snapshot: PortfolioSnapshot, edges: Sequence[float] = COVERAGE_EDGES) -> Dict:
+    """抵押覆盖率分布：各覆盖率区间的项目数和贷款金额，整体覆盖率按贷款金额加权"""
+    loan = snapshot.columns["loan_amount"]
+    collateral = snapshot.columns["collateral_value"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(loan > 0, collateral / loan, np.inf)
+    buckets = np.digitize(ratio, edges)
+    labels = bucket_labels(edges)
+    count = group_sum(buckets, None, len(labels))
+    amount = group_sum(buckets, loan, len(labels))
+    total_loan = float(loan.sum())
+    return {
+        "weighted_coverage_ratio": float(collateral.sum() / total_loan) if total_loan else None,
+        "under_collateralized_count": int((ratio < 1.0).sum()),
+        "under_collateralized_amount": float(loan[ratio < 1.0].sum()),
+        "buckets": [{"range": label, "project_count": int(count[index]), "loan_amount": float(amount[index])}
+                    for index, label in enumerate(labels)]
+    }
+
+
+def maturity_ladder(snapshot: PortfolioSnapshot, today: date, edges: Sequence[int] = MATURITY_EDGES) -> List[Dict]:
+    """到期阶梯：按距到期月数分档的项目数和贷款金额，首档为已过到期月的项目"""
+    buckets = np.digitize(snapshot.maturity_months(today), edges)
+    labels = ["已到期"] + [f"{low}-{high}个月" for low, high in zip(edges[:-1], edges[1:])] + [f"{edges[-1]}个月以上"]
+    count = group_sum(buckets, None, len(labels))
+    amount = group_sum(buckets, snapshot.columns["loan_amount"], len(labels))
+    return [{"range": label, "project_count": int(count[index]), "loan_amount": float(amount[index])}
+            for index, label in enumerate(labels)]
+
+
+def borrower_concentration(snapshot: PortfolioSnapshot, top: int = TOP_BORROWERS) -> Dict:
+    """借款人集中度：贷款金额最大的借款人及占比、前 top 名合计占比、赫芬达尔指数（各借款人占比平方和）"""
+    borrowers = snapshot.values["borrower_id"]
+    amount = group_sum(snapshot.codes["borrower_id"], snapshot.columns["loan_amount"], len(borrowers))
+    total = float(amount.sum())
+    if not total:
+        return {"borrower_count": 0, "top_share": 0.0, "hhi": 0.0, "top_borrowers": []}
+    shares = amount / total
+    top_index = np.argsort(-amount, kind="stable")[:top]
+    top_index = top_index[amount[top_index] > 0]
+    return {
+        "borrower_count": int((amount > 0).sum()),
+        "top_share": float(shares[top_index].sum()),
+        "hhi": float(np.square(shares).sum()),
+        "top_borrowers": [{"borrower_id": borrowers[index], "loan_amount": float(amount[index]),
+                           "share": float(shares[index])} for index in top_index.tolist()]
+    }
+
+
+class RegionMap:
+    """借款人所属村队、乡镇
+
+    按借款人（而非按项目）解析地区，结果按借款人编码缓存在数组中，新出现的借款人在下次使用时补充解析；
+    借款人所属村队可能调整，缓存超过 max_age 秒后整体重新解析
+    """
+
+    def __init__(self, region_of: Callable[[str], Tuple[Optional[str], Optional[str]]],
+                 max_age: float = REGION_CACHE_SECONDS):
+        self.region_of = region_of
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self, generation: int = 0) -> None:
+        self.generation = generation
+        self.villages, self.townships = CodeTable(), CodeTable()
+        self._village_codes = np.empty(0, dtype=np.int64)
+        self._township_codes = np.empty(0, dtype=np.int64)
+        self._resolved_at = time.monotonic()
+
+    def codes(self, snapshot: PortfolioSnapshot) -> Dict[str, Tuple[np.ndarray, List[Any]]]:
+        """快照各行借款人所属的村队、乡镇 {"village": (各行编码, 编码对应的取值), "township": ...}
+
+        列存重建后借款人编码重新分配（快照代次变化），缓存随之重新解析
+        """
+        borrowers = snapshot.values["borrower_id"]
+        with self._lock:
+            if snapshot.generation != self.generation or time.monotonic() - self._resolved_at > self.max_age:
+                self._clear(snapshot.generation)
+            resolved = len(self._village_codes)
+            if resolved < len(borrowers):
+                regions = [self.region_of(borrower_id) for borrower_id in borrowers[resolved:]]
+                village_codes = [self.villages.code(village_id) for village_id, _ in regions]
+                township_codes = [self.townships.code(township_id) for _, township_id in regions]
+                self._village_codes = np.concatenate((self._village_codes, np.array(village_codes, dtype=np.int64)))
+                self._township_codes = np.concatenate((self._township_codes, np.array(township_codes, dtype=np.int64)))
+            borrower_codes = snapshot.codes["borrower_id"]
+            return {"village": (self._village_codes[borrower_codes], list(self.villages.values)),
+                    "township": (self._township_codes[borrower_codes], list(self.townships.values))}
+
+
+def portfolio_dashboard(snapshot: PortfolioSnapshot, today: date, regions: Optional[RegionMap] = None,
+                        statuses: Sequence[str] = EXPOSURE_STATUSES) -> Dict:
+    """组合风险看板：statuses 状态项目的敞口汇总、按状态和地区的敞口、抵押覆盖率、到期阶梯、借款人集中度"""
+    by_status = exposure_by(snapshot, snapshot.codes["project_status"], snapshot.values["project_status"])
+    exposure = snapshot.take(snapshot.mask("project_status", statuses))
+    dashboard = {
+        "as_of": today,
+        "statuses": list(statuses),
+        "project_count": len(exposure),
+        "loan_amount": float(exposure.columns["loan_amount"].sum()),
+        "collateral_value": float(exposure.columns["collateral_value"].sum()),
+        "weighted_interest_rate": (
+            float(np.average(exposure.columns["interest_rate"], weights=exposure.columns["loan_amount"]))
+            if exposure.columns["loan_amount"].sum() else None),
+        "by_status": by_status,
+        "by_collateral_type": exposure_by(exposure, exposure.codes["collateral_type"],
+                                          exposure.values["collateral_type"]),
+        "coverage": coverage_profile(exposure),
+        "maturity_ladder": maturity_ladder(exposure, today),
+        "concentration": borrower_concentration(exposure)
+    }
+    if regions is not None:
+        codes = regions.codes(exposure)
+        dashboard["by_township"] = exposure_by(exposure, *codes["township"])
+        dashboard["by_village"] = exposure_by(exposure, *codes["village"])
+    return dashboard
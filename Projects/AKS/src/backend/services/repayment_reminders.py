@@ -0,0 +1,263 @@
+# 还款提醒调度
+# 待发送的提醒按 (下次发送时间, 提醒ID) 放入最小堆，定时调度器只在堆顶到期时唤醒，取出全部到期提醒后
+# 分批交给通知器发送；发送前按状态比较写入为发送中，多进程部署时同一提醒只由一个进程发送。
+# 游标（此前的提醒均已发送或放弃）保存在仓储中；重启后按状态索引加载待发送的提醒（包括提醒日期早于游标、
+# 在停止前才创建的提醒），不扫描已发送的历史提醒；停止前已取走但未发送完成（发送中超时）的提醒恢复为待发送
+import sys
+import os
+import abc
+import heapq
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repositories.base import Repository, build_filters
+from utils.scheduler import TimerScheduler
+
+# 提醒状态
+PENDING = "待发送"
+SENDING = "发送中"
+SENT = "已发送"
+CANCELLED = "已取消"
+# 还款日前多少天发送到期提醒
+REMINDER_LEAD_DAYS = int(os.getenv("AKS_REMINDER_LEAD_DAYS", "3"))
+# 每批交给通知器的提醒数
+REMINDER_BATCH_SIZE = int(os.getenv("AKS_REMINDER_BATCH_SIZE", "200"))
+# 发送失败后的重试间隔（秒）
+REMINDER_RETRY_SECONDS = int(os.getenv("AKS_REMINDER_RETRY_SECONDS", "300"))
+# 发送中超过该时间（秒）未完成的提醒视为发送进程已退出，启动时恢复为待发送
+REMINDER_SENDING_TIMEOUT_SECONDS = int(os.getenv("AKS_REMINDER_SENDING_TIMEOUT_SECONDS", "600"))
+# 本地通知器写入的文件
+REMINDER_OUTBOX = os.getenv(
+    "AKS_REMINDER_OUTBOX",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outbox", "repayment_reminders.log")
+)
+# 游标记录ID
+CURSOR_ID = "repayment-reminders"
+
+
+class ReminderDispatchCursor(BaseModel):
+    id: str = Field(..., description="游标ID")
+    dispatched_until: Optional[datetime] = Field(None, description="提醒日期早于该时间的提醒均已处理")
+    backfilled_time: Optional[datetime] = Field(None, description="已放款项目补生成提醒的时间")
+    dispatched_count: int = Field(0, description="累计发送的提醒数")
+    update_time: Optional[datetime] = Field(None, description="更新时间")
+
+
+class ReminderNotifier(abc.ABC):
+    """提醒通知器，send 发送一批提醒，失败时抛出异常，整批稍后重试"""
+
+    @abc.abstractmethod
+    def send(self, reminders: List[BaseModel]) -> None:
+        pass
+
+
+class LogFileNotifier(ReminderNotifier):
+    """本地通知器：每条提醒以一行JSON追加到文件，未接入短信等渠道时使用"""
+
+    def __init__(self, path: str = REMINDER_OUTBOX):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminders: List[BaseModel]) -> None:
+        lines = [json.dumps(reminder.model_dump(mode="json"), ensure_ascii=False) for reminder in reminders]
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as outbox:
+                outbox.write("\n".join(lines) + "\n")
+
+
+def reminder_id(project_id: str, period: int) -> str:
+    """项目第 period 期到期提醒的ID，重复生成同一期提醒时ID相同"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"repayment-reminder:{project_id}:{period}"))
+
+
+class RepaymentReminderScheduler:
+    """还款提醒调度器
+
+    堆中条目的下次发送时间初始为提醒日期，发送失败后为重试时间；提醒修改或取消后堆中条目不删除，
+    出堆时重新读取提醒，已不是待发送状态的跳过，提醒日期推后的按新日期重新入堆
+    """
+
+    def __init__(self, reminders_db: Repository, cursors_db: Repository,
+                 notifier: Optional[ReminderNotifier] = None,
+                 backfill: Optional[Callable[[], Iterable[BaseModel]]] = None,
+                 batch_size: int = REMINDER_BATCH_SIZE, retry_seconds: int = REMINDER_RETRY_SECONDS,
+                 sending_timeout_seconds: int = REMINDER_SENDING_TIMEOUT_SECONDS):
+        self.reminders_db = reminders_db
+        self.cursors_db = cursors_db
+        self.notifier = notifier or LogFileNotifier()
+        # 首次启动（游标不存在）时调用一次，为已有数据生成提醒
+        self.backfill = backfill
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.sending_timeout_seconds = sending_timeout_seconds
+        self.scheduler = TimerScheduler("repayment-reminders")
+        self._heap: List[Tuple[datetime, str]] = []
+        # 发送失败等待重试的提醒 -> 提醒日期，游标不越过其中最早的日期
+        self._retrying: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        # 同一时间只有一次发送，调度线程与手动触发不并发
+        self._dispatch_lock = threading.Lock()
+        self._cursor: Optional[ReminderDispatchCursor] = None
+
+    # 启动和停止
+    def start(self) -> None:
+        """恢复发送中超时的提醒，加载全部待发送的提醒并启动调度线程"""
+        cursor = self.cursor()
+        if cursor.backfilled_time is None and self.backfill is not None:
+            self.backfill()
+            self._save_cursor(backfilled_time=datetime.now())
+        self.recover_stale()
+        self.load()
+        self.scheduler.start()
+
+    def stop(self) -> None:
+        self.scheduler.stop()
+
+    def load(self, since: Optional[datetime] = None) -> int:
+        """从仓储加载提醒日期不早于 since（为None时不限）的待发送提醒，返回加载数"""
+        reminders = self.reminders_db.find(build_filters(status=PENDING, reminder_date__gte=since))
+        self.enqueue(reminders)
+        return len(reminders)
+
+    def recover_stale(self, now: Optional[datetime] = None) -> int:
+        """发送中且超过 sending_timeout_seconds 未更新的提醒（取走后进程退出）按状态比较写回待发送，返回恢复数"""
+        now = now or datetime.now()
+        stale_before = now - timedelta(seconds=self.sending_timeout_seconds)
+        recovered = 0
+        for reminder in self.reminders_db.find(build_filters(status=SENDING)):
+            if reminder.updated_at >= stale_before:
+                continue
+            pending = reminder.model_copy(update={"status": PENDING, "batch_id": None, "updated_at": now})
+            if self.reminders_db.compare_and_set(pending, "status", SENDING):
+                recovered += 1
+        if recovered:
+            print(f"还款提醒: {recovered} 条发送中超时的提醒已恢复为待发送")
+        return recovered
+
+    def cursor(self) -> ReminderDispatchCursor:
+        if self._cursor is None:
+            self._cursor = self.cursors_db.get(CURSOR_ID) or ReminderDispatchCursor(id=CURSOR_ID)
+        return self._cursor
+
+    def _save_cursor(self, **changes) -> ReminderDispatchCursor:
+        self._cursor = self.cursor().model_copy(update=dict(changes, update_time=datetime.now()))
+        self.cursors_db.put(self._cursor)
+        return self._cursor
+
+    # 队列
+    def enqueue(self, reminders: Iterable[BaseModel]) -> None:
+        """待发送的提醒加入队列，早于当前唤醒时间时提前唤醒"""
+        with self._lock:
+            for reminder in reminders:
+                if reminder.status == PENDING:
+                    heapq.heappush(self._heap, (reminder.reminder_date, reminder.id))
+            self._wake()
+
+    def _wake(self) -> None:
+        """按堆顶时间设置唤醒（调用方持有 _lock）"""
+        if not self._heap:
+            self.scheduler.cancel("dispatch")
+            return
+        when = self._heap[0][0]
+        if self.scheduler.scheduled_time("dispatch") != when:
+            self.scheduler.schedule("dispatch", when, self._run_scheduled_dispatch)
+
+    def _pop_due(self, now: datetime) -> List[str]:
+        with self._lock:
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[1])
+            return list(dict.fromkeys(due))
+
+    def next_due(self) -> Optional[datetime]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    # 发送
+    def _run_scheduled_dispatch(self) -> None:
+        result = self.dispatch()
+        if result["dispatched"] or result["failed"]:
+            print(f"还款提醒发送完成: 发送 {result['dispatched']} 条，失败 {result['failed']} 条")
+
+    def dispatch(self, now: Optional[datetime] = None) -> Dict:
+        """发送全部到期的提醒，分批交给通知器；失败的批次恢复为待发送，REMINDER_RETRY_SECONDS 秒后重试"""
+        now = now or datetime.now()
+        with self._dispatch_lock:
+            due: List[BaseModel] = []
+            later: List[BaseModel] = []
+            for record_id in self._pop_due(now):
+                reminder = self.reminders_db.get(record_id)
+                if reminder is None or reminder.status != PENDING:
+                    self._retrying.pop(record_id, None)
+                elif reminder.reminder_date > now:
+                    later.append(reminder)
+                else:
+                    due.append(reminder)
+            due.sort(key=lambda item: (item.reminder_date, item.id))
+
+            dispatched = failed = batches = 0
+            retry_at = now + timedelta(seconds=self.retry_seconds)
+            for start in range(0, len(due), self.batch_size):
+                claimed = self._claim(due[start:start + self.batch_size], now)
+                if not claimed:
+                    continue
+                batches += 1
+                try:
+                    self.notifier.send(claimed)
+                except Exception as e:
+                    print(f"还款提醒发送失败，{self.retry_seconds} 秒后重试: {e}")
+                    self.reminders_db.bulk_put(
+                        reminder.model_copy(update={"status": PENDING, "batch_id": None}) for reminder in claimed)
+                    with self._lock:
+                        for reminder in claimed:
+                            self._retrying[reminder.id] = reminder.reminder_date
+                            heapq.heappush(self._heap, (retry_at, reminder.id))
+                    failed += len(claimed)
+                    continue
+                self.reminders_db.bulk_put(
+                    reminder.model_copy(update={"status": SENT, "sent_time": datetime.now(), "updated_at": datetime.now()})
+                    for reminder in claimed)
+                for reminder in claimed:
+                    self._retrying.pop(reminder.id, None)
+                dispatched += len(claimed)
+
+            self.enqueue(later)
+            # 游标推进到本次发送时间，仍有待重试的提醒时停在其中最早的提醒日期
+            cursor = self._save_cursor(
+                dispatched_until=min(self._retrying.values(), default=now),
+                dispatched_count=self.cursor().dispatched_count + dispatched
+            )
+            return {"run_time": now, "dispatched": dispatched, "failed": failed, "batches": batches,
+                    "dispatched_until": cursor.dispatched_until}
+
+    def _claim(self, reminders: List[BaseModel], now: datetime) -> List[BaseModel]:
+        """将提醒比较写入为发送中并记录批次号，返回写入成功（未被其他进程取走或修改）的提醒"""
+        batch_id = f"REMIND-{now:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        claimed = []
+        for reminder in reminders:
+            sending = reminder.model_copy(update={"status": SENDING, "batch_id": batch_id, "updated_at": now})
+            if self.reminders_db.compare_and_set(sending, "status", PENDING):
+                claimed.append(sending)
+        return claimed
+
+    def status(self) -> Dict:
+        """调度状态：游标、队列中的提醒数、下次唤醒时间"""
+        cursor = self.cursor()
+        return {
+            "dispatched_until": cursor.dispatched_until,
+            "dispatched_count": cursor.dispatched_count,
+            "backfilled_time": cursor.backfilled_time,
+            "queued": len(self),
+            "retrying": len(self._retrying),
+            "next_due": self.next_due()
+        }
@@ -0,0 +1,149 @@
+# 异步数据库连接工具
+# 基于asyncpg连接池，供 async def 路由使用，未安装asyncpg或连接失败时返回None由上层回退到内存数据
+from typing import Dict, Any
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse, parse_qs
+import asyncio
+import json
+import time
+
+from config.database import database_config
+
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+
+async def _init_connection(connection) -> None:
+    """为新连接注册JSON/JSONB编解码"""
+    for type_name in ("json", "jsonb"):
+        await connection.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog"
+        )
+
+
+class AsyncDatabaseConnection:
+    """异步数据库连接管理类"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncDatabaseConnection, cls).__new__(cls)
+            cls._instance._pool = None
+            cls._instance._env = "default"
+            cls._instance._lock = None
+            cls._instance._retry_after = 0.0
+            cls._instance._checkouts = 0
+            cls._instance._total_wait_time = 0.0
+            cls._instance._timeouts = 0
+        return cls._instance
+
+    def _get_connect_kwargs(self, env: str) -> Dict[str, Any]:
+        """从连接字符串解析asyncpg连接参数"""
+        parsed = urlparse(database_config.get_connection_string(env))
+        query = parse_qs(parsed.query)
+        kwargs = {
+            "host": parsed.hostname,
+            "port": parsed.port,
+            "user": parsed.username,
+            "password": parsed.password,
+            "database": parsed.path.lstrip("/")
+        }
+        sslmode = query.get("sslmode", [None])[0]
+        if sslmode:
+            kwargs["ssl"] = sslmode
+        return kwargs
+
+    async def connect(self, env: str = "default") -> None:
+        """创建异步连接池"""
+        if not ASYNCPG_AVAILABLE:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._pool is not None:
+                return
+
+            pool_config = database_config.get_pool_config(env)
+            try:
+                self._pool = await asyncpg.create_pool(
+                    min_size=pool_config["min_size"],
+                    max_size=pool_config["max_size"],
+                    max_inactive_connection_lifetime=pool_config["max_idle_time"],
+                    timeout=pool_config["checkout_timeout"],
+                    init=_init_connection,
+                    **self._get_connect_kwargs(env)
+                )
+                self._env = env
+                self._retry_after = 0.0
+                print(f"异步数据库连接池创建成功: min={pool_config['min_size']}, max={pool_config['max_size']}")
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+                self._pool = None
+                self._retry_after = time.monotonic() + pool_config["retry_interval"]
+                print(f"异步数据库连接失败: {e}")
+                print("将继续使用模拟数据进行开发和测试")
+
+    async def disconnect(self) -> None:
+        """关闭异步连接池"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            print("异步数据库连接池已关闭")
+
+    @asynccontextmanager
+    async def acquire(self, enabled: bool = True):
+        """借出一个异步连接，连接池不可用时返回None"""
+        if not enabled:
+            yield None
+            return
+
+        if self._pool is None and ASYNCPG_AVAILABLE and time.monotonic() >= self._retry_after:
+            await self.connect(self._env)
+
+        pool = self._pool
+        if pool is None:
+            yield None
+            return
+
+        pool_config = database_config.get_pool_config(self._env)
+        start = time.monotonic()
+        try:
+            connection = await pool.acquire(timeout=pool_config["checkout_timeout"])
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            print("获取异步数据库连接超时")
+            yield None
+            return
+
+        self._checkouts += 1
+        self._total_wait_time += time.monotonic() - start
+        try:
+            yield connection
+        finally:
+            await pool.release(connection)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取异步连接池指标"""
+        if self._pool is None:
+            return {"status": "unavailable", "driver_installed": ASYNCPG_AVAILABLE}
+        avg_wait = self._total_wait_time / self._checkouts if self._checkouts else 0.0
+        return {
+            "status": "available",
+            "size": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "checkouts": self._checkouts,
+            "timeouts": self._timeouts,
+            "avg_wait_ms": round(avg_wait * 1000, 3)
+        }
+
+# 单例实例
+async_db_connection = AsyncDatabaseConnection()
@@ -0,0 +1,95 @@
+# 批量导入工具
+# 批量接口先对整批请求做一次校验（外键、唯一字段一次解析），收集逐行错误，
+# 再将通过校验的记录一次性批量写入
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from models.batch import BatchCreateResult, BatchRowError
+
+
+class BatchErrors:
+    """收集批量导入的逐行错误"""
+
+    def __init__(self):
+        self.errors: List[BatchRowError] = []
+        self.failed_rows: Set[int] = set()
+        # 已处理过而跳过的行，不计为错误
+        self.duplicate_rows: Set[int] = set()
+
+    def add(self, index: int, message: str, field: Optional[str] = None) -> None:
+        self.errors.append(BatchRowError(index=index, field=field, message=message))
+        self.failed_rows.add(index)
+
+    def __contains__(self, index: int) -> bool:
+        """该行是否不写入（有错误或为重复行）"""
+        return index in self.failed_rows or index in self.duplicate_rows
+
+    def __bool__(self) -> bool:
+        return bool(self.errors)
+
+    def check_exists(self, index: int, field: str, value: Any, existing: Set[Any], label: str) -> None:
+        """外键引用的记录不存在时记录错误"""
+        if value not in existing:
+            self.add(index, f"{label} {value} not found", field)
+
+    def check_unique(self, values: Iterable[Any], field: str, taken: Set[Any]) -> None:
+        """唯一字段与已有记录或批次内前面的行重复时记录错误"""
+        first_rows: Dict[Any, int] = {}
+        for index, value in enumerate(values):
+            if value in taken:
+                self.add(index, f"{field} {value} already exists", field)
+            elif value in first_rows:
+                self.add(index, f"{field} {value} duplicates row {first_rows[value]}", field)
+            else:
+                first_rows[value] = index
+
+    def skip_duplicates(self, values: Iterable[Any], processed: Set[Any]) -> None:
+        """幂等入账：键值已有记录或与批次内前面的行相同的行标记为重复并跳过，键值为空的行不参与判断"""
+        seen: Set[Any] = set()
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            if value in processed or value in seen:
+                self.duplicate_rows.add(index)
+            else:
+                seen.add(value)
+
+    def result(self, created_ids: List[str]) -> BatchCreateResult:
+        """生成批量导入结果，错误按行序号排列"""
+        errors = sorted(self.errors, key=lambda x: x.index)
+        return BatchCreateResult(
+            created_count=len(created_ids),
+            created_ids=created_ids,
+            failed_count=len(self.failed_rows),
+            duplicate_count=len(self.duplicate_rows),
+            errors=errors
+        )
+
+
+class UniqueKeyClaims:
+    """进程内唯一键占用
+
+    查询已有记录与登记占用在同一把锁内完成，占用持续到写入结束；并发提交相同键值的请求中只有一个能占用，
+    其余视为已有记录。lookup(键值) 返回其中已有记录的键值。多进程之间由数据库唯一索引保证
+    """
+
+    def __init__(self, lookup: Callable[[Iterable[Any]], Set[Any]]):
+        self.lookup = lookup
+        self._claimed: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def claim(self, values: Iterable[Any]) -> Iterator[Set[Any]]:
+        """占用键值直到退出，产出已有记录或被其他请求占用的键值，空值不参与"""
+        values = {value for value in values if value is not None}
+        with self._lock:
+            taken = values & self._claimed
+            taken |= self.lookup(values - taken)
+            claimed = values - taken
+            self._claimed |= claimed
+        try:
+            yield taken
+        finally:
+            with self._lock:
+                self._claimed -= claimed
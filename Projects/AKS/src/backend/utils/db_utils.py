@@ -1,73 +1,447 @@
 # 数据库连接工具
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 from contextlib import contextmanager
+from collections import deque
 from config.database import database_config
+import threading
+import time
 import os
 
+
+class PoolTimeoutError(Exception):
+    """获取连接超时异常"""
+    pass
+
+
+class PooledConnection:
+    """连接池中的连接包装，记录创建和最近使用时间"""
+
+    def __init__(self, raw_connection):
+        self.raw = raw_connection
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.raw.closed)
+
+    def age(self, now: float) -> float:
+        return now - self.created_at
+
+    def idle_time(self, now: float) -> float:
+        return now - self.last_used_at
+
+
+class PoolMetrics:
+    """连接池运行指标"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.connections_recycled = 0
+        self.health_check_failures = 0
+        self.broken_connections = 0
+
+    def record_checkout(self, wait_time: float) -> None:
+        self.checkouts += 1
+        self.total_wait_time += wait_time
+        if wait_time > self.max_wait_time:
+            self.max_wait_time = wait_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        avg_wait = self.total_wait_time / self.checkouts if self.checkouts else 0.0
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(avg_wait * 1000, 3),
+            "max_wait_ms": round(self.max_wait_time * 1000, 3),
+            "total_wait_ms": round(self.total_wait_time * 1000, 3),
+            "connections_created": self.connections_created,
+            "connections_recycled": self.connections_recycled,
+            "health_check_failures": self.health_check_failures,
+            "broken_connections": self.broken_connections
+        }
+
+
+class ConnectionPool:
+    """线程安全的PostgreSQL连接池"""
+
+    def __init__(self, conn_string: str, min_size: int = 2, max_size: int = 20,
+                 checkout_timeout: float = 10.0, max_lifetime: float = 1800.0,
+                 max_idle_time: float = 300.0, health_check_interval: float = 30.0, **kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"连接池大小配置无效: min_size={min_size}, max_size={max_size}")
+
+        self.conn_string = conn_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+
+        self._condition = threading.Condition(threading.Lock())
+        # 空闲连接，右端为最近归还的连接
+        self._idle = deque()
+        # 已建立（空闲+借出）以及正在建立的连接数
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self.metrics = PoolMetrics()
+
+        # 预先建立最小连接数
+        for _ in range(min_size):
+            with self._condition:
+                self._size += 1
+            try:
+                pooled = self._create_connection()
+            except Exception:
+                self.close()
+                raise
+            with self._condition:
+                self._idle.append(pooled)
+
+    def _create_connection(self) -> PooledConnection:
+        """建立新的物理连接"""
+        try:
+            raw = psycopg2.connect(self.conn_string, cursor_factory=RealDictCursor)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.metrics.connections_created += 1
+        return PooledConnection(raw)
+
+    def _close_connection(self, pooled: PooledConnection) -> None:
+        """关闭物理连接（不持有锁时调用）"""
+        try:
+            if not pooled.closed:
+                pooled.raw.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, pooled: PooledConnection, now: float) -> bool:
+        """判断连接是否已关闭或超过最长存活时间"""
+        return pooled.closed or (self.max_lifetime > 0 and pooled.age(now) >= self.max_lifetime)
+
+    def _health_check(self, pooled: PooledConnection) -> bool:
+        """对连接执行健康检查"""
+        try:
+            with pooled.raw.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            pooled.raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """从连接池借出连接，池满时等待直至超时"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            pooled = None
+            need_create = False
+            to_close = []
+
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError("连接池已关闭")
+
+                    now = time.monotonic()
+                    # 优先使用最近归还的连接，并顺带回收过期连接
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._is_stale(candidate, now):
+                            self._size -= 1
+                            self.metrics.connections_recycled += 1
+                            to_close.append(candidate)
+                            continue
+                        pooled = candidate
+                        break
+                    if pooled is not None:
+                        break
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        need_create = True
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.metrics.timeouts += 1
+                        raise PoolTimeoutError(
+                            f"获取数据库连接超时（{timeout}秒），连接池已满: {self.max_size}"
+                        )
+                    self._condition.wait(remaining)
+
+            for stale in to_close:
+                self._close_connection(stale)
+
+            if need_create:
+                pooled = self._create_connection()
+            elif pooled.idle_time(time.monotonic()) >= self.health_check_interval:
+                # 长时间空闲的连接在借出前做健康检查，失败则丢弃后重新获取
+                if not self._health_check(pooled):
+                    with self._condition:
+                        self._size -= 1
+                        self.metrics.health_check_failures += 1
+                        self._condition.notify()
+                    self._close_connection(pooled)
+                    continue
+
+            with self._condition:
+                self._in_use += 1
+                self.metrics.record_checkout(time.monotonic() - start)
+            return pooled
+
+    def release(self, pooled: PooledConnection, discard: bool = False) -> None:
+        """归还连接，损坏或过期的连接直接关闭"""
+        now = time.monotonic()
+        if not discard and not pooled.closed:
+            try:
+                # 归还前结束未提交的事务，避免将事务状态带给下一个请求
+                if pooled.raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    pooled.raw.rollback()
+            except Exception:
+                discard = True
+
+        with self._condition:
+            self._in_use -= 1
+            if discard or self._closed or self._is_stale(pooled, now):
+                self._size -= 1
+                if discard:
+                    self.metrics.broken_connections += 1
+                else:
+                    self.metrics.connections_recycled += 1
+                pooled_to_close = pooled
+            else:
+                pooled.last_used_at = now
+                self._idle.append(pooled)
+                pooled_to_close = None
+            self._condition.notify()
+
+        if pooled_to_close is not None:
+            self._close_connection(pooled_to_close)
+
+    def prune(self) -> int:
+        """回收超出最小连接数且空闲过久或已过期的连接"""
+        now = time.monotonic()
+        to_close = []
+        with self._condition:
+            kept = deque()
+            # 左端为最早归还的连接
+            while self._idle:
+                pooled = self._idle.popleft()
+                idle_expired = (
+                    self.max_idle_time > 0
+                    and pooled.idle_time(now) >= self.max_idle_time
+                    and self._size > self.min_size
+                )
+                if self._is_stale(pooled, now) or idle_expired:
+                    self._size -= 1
+                    self.metrics.connections_recycled += 1
+                    to_close.append(pooled)
+                else:
+                    kept.append(pooled)
+            self._idle = kept
+
+        for pooled in to_close:
+            self._close_connection(pooled)
+        return len(to_close)
+
+    def close(self) -> None:
+        """关闭连接池及所有空闲连接，借出中的连接在归还时关闭"""
+        with self._condition:
+            self._closed = True
+            to_close = list(self._idle)
+            self._size -= len(to_close)
+            self._idle.clear()
+            self._condition.notify_all()
+        for pooled in to_close:
+            self._close_connection(pooled)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池状态和指标"""
+        with self._condition:
+            stats = {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle)
+            }
+            stats.update(self.metrics.to_dict())
+        return stats
+
+
 class DatabaseConnection:
-    """数据库连接管理类"""
+    """数据库连接管理类，每次 get_cursor() 从连接池借出独立连接"""
     _instance = None
-    
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseConnection, cls).__new__(cls)
-            cls._instance._connection = None
+            cls._instance._pool = None
+            cls._instance._env = "default"
+            cls._instance._lock = threading.Lock()
+            cls._instance._retry_after = 0.0
+            cls._instance._last_prune = 0.0
+            # 当前线程进行中的事务游标及提交后回调
+            cls._instance._local = threading.local()
         return cls._instance
-    
+
     def __init__(self):
-        # 初始化时不创建连接，延迟到需要时创建
+        # 初始化时不创建连接池，延迟到需要时创建
         pass
-    
+
     def connect(self, env: str = "default") -> None:
-        """创建数据库连接"""
-        if self._connection and not self._connection.closed:
-            return
-        
-        try:
-            conn_string = database_config.get_connection_string(env)
-            self._connection = psycopg2.connect(
-                conn_string,
-                cursor_factory=RealDictCursor
-            )
-            print("数据库连接成功")
-        except psycopg2.OperationalError as e:
-            print(f"数据库连接失败: {e}")
-            # 在连接失败的情况下，继续使用模拟数据
-            print("将继续使用模拟数据进行开发和测试")
-    
+        """创建数据库连接池"""
+        with self._lock:
+            if self._pool and not self._pool.closed:
+                return
+
+            pool_config = database_config.get_pool_config(env)
+            try:
+                conn_string = database_config.get_connection_string(env)
+                self._pool = ConnectionPool(conn_string, **pool_config)
+                self._env = env
+                self._retry_after = 0.0
+                print(f"数据库连接池创建成功: min={pool_config['min_size']}, max={pool_config['max_size']}")
+            except (psycopg2.OperationalError, ValueError) as e:
+                self._pool = None
+                # 失败后一段时间内不再重试，避免每个请求都等待连接超时
+                self._retry_after = time.monotonic() + pool_config["retry_interval"]
+                print(f"数据库连接失败: {e}")
+                # 在连接失败的情况下，继续使用模拟数据
+                print("将继续使用模拟数据进行开发和测试")
+
     def disconnect(self) -> None:
-        """关闭数据库连接"""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            print("数据库连接已关闭")
-    
+        """关闭数据库连接池"""
+        with self._lock:
+            if self._pool and not self._pool.closed:
+                self._pool.close()
+                print("数据库连接池已关闭")
+            self._pool = None
+
+    def _ensure_pool(self) -> Optional[ConnectionPool]:
+        """确保连接池可用，失败重试间隔内直接返回None"""
+        pool = self._pool
+        if pool is None or pool.closed:
+            if time.monotonic() < self._retry_after:
+                return None
+            self.connect(self._env)
+            pool = self._pool
+        return pool
+
+    def _maybe_prune(self, pool: ConnectionPool) -> None:
+        """按空闲超时的频率回收空闲连接"""
+        now = time.monotonic()
+        interval = max(pool.max_idle_time / 2, 1.0)
+        if now - self._last_prune >= interval:
+            self._last_prune = now
+            pool.prune()
+
     @contextmanager
     def get_cursor(self):
-        """获取数据库游标，使用上下文管理器自动处理提交和回滚"""
-        if not self._connection or self._connection.closed:
-            self.connect()
-            
-        # 如果连接仍然关闭（可能是连接失败），返回None
-        if not self._connection or self._connection.closed:
+        """获取数据库游标，使用上下文管理器自动处理提交和回滚
+
+        当前线程处于 transaction() 中时复用事务游标，由事务统一提交
+        """
+        active = getattr(self._local, "cursor", None)
+        if active is not None:
+            yield active
+            return
+
+        pool = self._ensure_pool()
+
+        # 如果连接池不可用（可能是连接失败），返回None
+        if pool is None:
+            yield None
+            return
+
+        try:
+            pooled = pool.acquire()
+        except (PoolTimeoutError, psycopg2.OperationalError) as e:
+            print(f"获取数据库连接失败: {e}")
             yield None
             return
-        
+
+        discard = False
         cursor = None
         try:
-            cursor = self._connection.cursor()
+            cursor = pooled.raw.cursor()
             yield cursor
-            self._connection.commit()
+            pooled.raw.commit()
         except Exception as e:
-            if self._connection and not self._connection.closed:
-                self._connection.rollback()
+            if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                # 连接层面的错误，归还时丢弃该连接
+                discard = True
+            elif not pooled.closed:
+                pooled.raw.rollback()
             print(f"数据库操作失败: {e}")
-            # 如果操作失败，仍然返回None，让上层代码使用模拟数据
-            yield None
+            raise
         finally:
-            if cursor:
-                cursor.close()
+            if cursor is not None and not cursor.closed:
+                try:
+                    cursor.close()
+                except Exception:
+                    discard = True
+            pool.release(pooled, discard=discard)
+            self._maybe_prune(pool)
+
+    @contextmanager
+    def transaction(self):
+        """在当前线程开启事务，期间的 get_cursor() 共用同一连接，全部成功后提交，任一失败则整体回滚
+
+        期间登记的提交后回调（after_commit）在最外层事务提交后按登记顺序执行，回滚时丢弃
+        """
+        if getattr(self._local, "after_commit", None) is not None:
+            # 嵌套事务并入外层事务
+            yield getattr(self._local, "cursor", None)
+            return
+        callbacks = []
+        with self.get_cursor() as cursor:
+            self._local.cursor = cursor
+            self._local.after_commit = callbacks
+            try:
+                yield cursor
+            finally:
+                self._local.cursor = None
+                self._local.after_commit = None
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """当前线程处于事务中时登记提交后回调，否则立即执行"""
+        callbacks = getattr(self._local, "after_commit", None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池指标"""
+        pool = self._pool
+        if pool is None or pool.closed:
+            return {"status": "unavailable"}
+        stats = pool.get_stats()
+        stats["status"] = "available"
+        return stats
 
 # 单例实例
-db_connection = DatabaseConnection()
\ No newline at end of file
+db_connection = DatabaseConnection()
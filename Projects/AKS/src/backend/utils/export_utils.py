@@ -0,0 +1,333 @@
+# 流式导出工具
+# 记录从仓储按批读取，经生成器逐行编码为CSV或XLSX，直接写入分块的 StreamingResponse，
+# 不在内存中拼装整个文件，也不落地临时文件
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# 每次向客户端输出的数据块大小
+CHUNK_SIZE = 64 * 1024
+
+# 导出列定义: (字段名, 表头)
+ExportColumn = Tuple[str, str]
+
+
+class ExportFormat(str, Enum):
+    """导出文件格式"""
+    CSV = "csv"
+    XLSX = "xlsx"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def model_columns(model_class: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> List[ExportColumn]:
+    """根据模型字段生成导出列，表头取字段描述"""
+    names = fields or list(model_class.model_fields)
+    return [(name, model_class.model_fields[name].description or name) for name in names]
+
+
+def format_cell(value: Any) -> Any:
+    """将字段值转换为导出单元格的值，数值保持原样，其余转为文本"""
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return "是" if value else "否"
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def iter_rows(records: Iterable[Any], columns: Sequence[ExportColumn]) -> Iterator[List[Any]]:
+    """将记录逐条转换为单元格值列表"""
+    for record in records:
+        yield [format_cell(getattr(record, field, None)) for field, _ in columns]
+
+
+# CSV
+def csv_stream(columns: Sequence[ExportColumn], rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    """生成CSV数据块，带UTF-8 BOM以便Excel正确识别中文"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow([header for _, header in columns])
+    # 表头立即输出，缩短首字节时间
+    yield buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# XLSX
+class _ChunkBuffer:
+    """只写缓冲区，zipfile 写入的压缩数据暂存于此，由生成器分块取走
+
+    不提供 tell/seek，zipfile 会按不可定位流的方式写入（使用数据描述符），无需回写文件头
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL_XML_CHARS = dict.fromkeys(c for c in range(32) if c not in (9, 10, 13))
+
+
+def column_letter(index: int) -> str:
+    """列序号（从0开始）转换为Excel列字母"""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(row_number: int, values: Sequence[Any], letters: Sequence[str]) -> str:
+    """生成一行单元格XML，文本使用内联字符串，无需维护共享字符串表"""
+    cells = []
+    for letter, value in zip(letters, values):
+        ref = f"{letter}{row_number}"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value != "":
+            text = escape(str(value).translate(_ILLEGAL_XML_CHARS))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+
+def xlsx_stream(columns: Sequence[ExportColumn], rows: Iterable[List[Any]],
+                sheet_name: str = "Sheet1") -> Iterator[bytes]:
+    """生成XLSX数据块，工作表XML边生成边压缩输出"""
+    buffer = _ChunkBuffer()
+    letters = [column_letter(i) for i in range(len(columns))]
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(sheet_name=escape(sheet_name, {'"': "&quot;"})))
+        archive.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(_XLSX_SHEET_HEAD.encode("utf-8"))
+            sheet.write(_xlsx_row(1, [header for _, header in columns], letters).encode("utf-8"))
+            yield buffer.drain()
+
+            # 行XML攒够一块再写入压缩流，减少压缩调用次数
+            pending: List[str] = []
+            pending_size = 0
+            for row_number, values in enumerate(rows, start=2):
+                row_xml = _xlsx_row(row_number, values, letters)
+                pending.append(row_xml)
+                pending_size += len(row_xml)
+                if pending_size >= CHUNK_SIZE:
+                    sheet.write("".join(pending).encode("utf-8"))
+                    pending = []
+                    pending_size = 0
+                    if buffer.size:
+                        yield buffer.drain()
+            pending.append(_XLSX_SHEET_TAIL)
+            sheet.write("".join(pending).encode("utf-8"))
+    # 关闭压缩包后写入中央目录
+    yield buffer.drain()
+
+
+def content_disposition(file_name: str) -> str:
+    """生成附件下载的 Content-Disposition 头，文件名按RFC 5987编码"""
+    return f"attachment; filename*=UTF-8''{quote(file_name)}"
+
+
+def export_file_name(file_stem: str, file_format: ExportFormat) -> str:
+    """生成带时间戳的导出文件名"""
+    return f"{file_stem}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_format.value}"
+
+
+def export_body(records: Iterable[Any], model_class: Type[BaseModel], file_stem: str,
+                file_format: ExportFormat = ExportFormat.CSV,
+                columns: Optional[Sequence[ExportColumn]] = None) -> Iterator[bytes]:
+    """将记录编码为导出文件的数据块"""
+    columns = list(columns or model_columns(model_class))
+    rows = iter_rows(records, columns)
+    if file_format == ExportFormat.XLSX:
+        return xlsx_stream(columns, rows, sheet_name=file_stem[:31])
+    return csv_stream(columns, rows)
+
+
+def export_response(records: Iterable[Any], model_class: Type[BaseModel], file_stem: str,
+                    file_format: ExportFormat = ExportFormat.CSV,
+                    columns: Optional[Sequence[ExportColumn]] = None) -> StreamingResponse:
+    """构造流式导出响应
+
+    records 应为惰性迭代器（如 Repository.stream()），记录边读取边编码输出
+    """
+    body = export_body(records, model_class, file_stem, file_format, columns)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": content_disposition(export_file_name(file_stem, file_format))}
+    )
+
+
+# 断点续传下载
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range 请求头，返回闭区间 (start, end)
+
+    无 Range 头或为多段范围时返回None（按完整文件响应），范围无法满足时抛出416
+    """
+    if not range_header or "," in range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        end = min(int(end_text), file_size - 1) if end_text else file_size - 1
+    else:
+        # bytes=-N 表示最后N个字节
+        start = max(file_size - int(end_text), 0)
+        end = file_size - 1
+    if start > end or start >= file_size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail=f"Requested range not satisfiable for file of {file_size} bytes",
+            headers={"Content-Range": f"bytes */{file_size}"}
+        )
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    """按块读取文件的指定区间"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_range_response(path: str, download_name: str, media_type: str,
+                        range_header: Optional[str] = None,
+                        if_range: Optional[str] = None) -> StreamingResponse:
+    """下载文件，支持 Range/If-Range 断点续传"""
+    stat = os.stat(path)
+    file_size = stat.st_size
+    etag = f'"{int(stat.st_mtime)}-{file_size}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": content_disposition(download_name),
+    }
+
+    # If-Range 与当前文件不一致时忽略 Range，返回完整文件
+    byte_range = parse_range(range_header, file_size) if not if_range or if_range == etag else None
+    if byte_range is None:
+        headers["Content-Length"] = str(file_size)
+        return StreamingResponse(_iter_file(path, 0, file_size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers=headers
+    )
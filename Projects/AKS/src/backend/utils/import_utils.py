@@ -0,0 +1,271 @@
+# 流式导入工具
+# 上传的CSV/XLSX逐行解析，不整体载入内存：CSV按行读取，XLSX用 iterparse 逐行解析工作表XML，
+# 表头按字段名或字段描述（与导出文件的表头一致）映射到模型字段
+import codecs
+import csv
+import io
+import json
+import re
+import typing
+import zipfile
+from datetime import date, datetime, timedelta
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Type
+from xml.etree.ElementTree import ParseError, iterparse
+
+from pydantic import BaseModel
+
+from utils.export_utils import ExportFormat
+
+# 编码探测时读取的字节数
+_SNIFF_SIZE = 64 * 1024
+
+_SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Excel 日期序列号的起点
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_CELL_REF_PATTERN = re.compile(r"^([A-Z]+)")
+_LIST_SEPARATORS = re.compile(r"[,，、;；]")
+
+
+class ImportFormatError(ValueError):
+    """导入文件格式无效异常"""
+    pass
+
+
+def detect_format(file_name: Optional[str]) -> ExportFormat:
+    """根据文件扩展名判断导入格式"""
+    extension = (file_name or "").rsplit(".", 1)[-1].lower()
+    try:
+        return ExportFormat(extension)
+    except ValueError:
+        raise ImportFormatError(f"Unsupported import file type: {file_name}, expected .csv or .xlsx")
+
+
+# CSV
+def _detect_encoding(file: BinaryIO) -> str:
+    """探测CSV编码：UTF-8（含BOM）优先，否则按GB18030读取（Excel中文版另存的CSV）"""
+    head = file.read(_SNIFF_SIZE)
+    file.seek(0)
+    try:
+        # 增量解码，允许截断在多字节字符中间
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[List[str]]:
+    """逐行读取CSV"""
+    text = io.TextIOWrapper(file, encoding=_detect_encoding(file), newline="")
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFormatError(f"Invalid CSV file: {e}")
+    finally:
+        # 交还底层文件，由调用方关闭
+        if not text.closed:
+            text.detach()
+
+
+# XLSX
+def _column_index(cell_ref: str) -> Optional[int]:
+    """单元格引用（如 AB12）转换为列序号（从0开始）"""
+    match = _CELL_REF_PATTERN.match(cell_ref)
+    if not match:
+        return None
+    index = 0
+    for letter in match.group(1):
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _element_text(element) -> str:
+    """拼接元素下所有 <t> 文本（富文本单元格由多段 <r><t> 组成）"""
+    return "".join(node.text or "" for node in element.iter(f"{_SHEET_NS}t"))
+
+
+def _read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """读取共享字符串表，表中只保存去重后的字符串"""
+    try:
+        source = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, element in iterparse(source):
+            if element.tag == f"{_SHEET_NS}si":
+                strings.append(_element_text(element))
+                element.clear()
+    return strings
+
+
+def _first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """查找工作簿中第一个工作表的路径"""
+    try:
+        with archive.open("xl/workbook.xml") as source:
+            sheet = next(
+                (element for _, element in iterparse(source) if element.tag == f"{_SHEET_NS}sheet"),
+                None
+            )
+        with archive.open("xl/_rels/workbook.xml.rels") as source:
+            targets = {
+                element.get("Id"): element.get("Target")
+                for _, element in iterparse(source) if element.tag == f"{_PKG_REL_NS}Relationship"
+            }
+        target = targets[sheet.get(f"{_REL_NS}id")]
+    except (KeyError, AttributeError):
+        return "xl/worksheets/sheet1.xml"
+    target = target.lstrip("/")
+    return target if target.startswith("xl/") else f"xl/{target}"
+
+
+def _parse_row(row, shared_strings: List[str]) -> List[str]:
+    values: List[str] = []
+    for cell in row.iter(f"{_SHEET_NS}c"):
+        index = _column_index(cell.get("r", ""))
+        if index is None:
+            index = len(values)
+        cell_type = cell.get("t")
+        if cell_type == "inlineStr":
+            value = _element_text(cell)
+        else:
+            node = cell.find(f"{_SHEET_NS}v")
+            value = (node.text or "") if node is not None else ""
+            if cell_type == "s" and value:
+                value = shared_strings[int(value)]
+        if index >= len(values):
+            values.extend([""] * (index - len(values) + 1))
+        values[index] = value
+    return values
+
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[List[str]]:
+    """逐行读取XLSX第一个工作表，已处理的行即时清理，内存占用与行数无关"""
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ImportFormatError("Invalid XLSX file")
+    with archive:
+        shared_strings = _read_shared_strings(archive)
+        try:
+            source = archive.open(_first_sheet_path(archive))
+        except KeyError:
+            raise ImportFormatError("XLSX file has no worksheet")
+        with source:
+            sheet_data = None
+            try:
+                for event, element in iterparse(source, events=("start", "end")):
+                    if event == "start":
+                        if element.tag == f"{_SHEET_NS}sheetData":
+                            sheet_data = element
+                    elif element.tag == f"{_SHEET_NS}row":
+                        yield _parse_row(element, shared_strings)
+                        if sheet_data is not None:
+                            sheet_data.clear()
+            except ParseError as e:
+                raise ImportFormatError(f"Invalid XLSX worksheet: {e}")
+
+
+def iter_upload_rows(file: BinaryIO, file_format: ExportFormat) -> Iterator[List[str]]:
+    """按格式逐行读取上传文件"""
+    if file_format == ExportFormat.XLSX:
+        return iter_xlsx_rows(file)
+    return iter_csv_rows(file)
+
+
+# 单元格转换
+def _parse_list(value: str) -> Any:
+    """列表单元格：JSON数组（导出文件的格式）或以逗号、顿号分隔的文本"""
+    if value.startswith("["):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return [item.strip() for item in _LIST_SEPARATORS.split(value) if item.strip()]
+
+
+def _parse_json(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _parse_int(value: str) -> Any:
+    """整数单元格，XLSX中的数字可能以 3.0 的形式保存"""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else value
+
+
+def _parse_datetime(value: str) -> Any:
+    """日期单元格，XLSX中未设置文本格式的日期以序列号保存"""
+    try:
+        serial = float(value)
+    except ValueError:
+        return value
+    return _EXCEL_EPOCH + timedelta(days=serial)
+
+
+def _parse_bool(value: str) -> Any:
+    return {"是": True, "否": False}.get(value, value)
+
+
+def _converter(annotation: Any) -> Optional[Callable[[str], Any]]:
+    """按字段类型选择单元格转换函数，其余类型交由模型校验时转换"""
+    candidates = [item for item in (typing.get_args(annotation) or (annotation,)) if item is not type(None)]
+    if typing.get_origin(annotation) in (list, dict):
+        candidates = [annotation]
+    for candidate in candidates:
+        origin = typing.get_origin(candidate) or candidate
+        if origin is list:
+            return _parse_list
+        if origin is dict:
+            return _parse_json
+        if origin is bool:
+            return _parse_bool
+        if origin is int:
+            return _parse_int
+        if isinstance(origin, type) and issubclass(origin, date):
+            return _parse_datetime
+    return None
+
+
+class ColumnMapping:
+    """表头到模型字段的映射，表头可为字段名或字段描述"""
+
+    def __init__(self, model_class: Type[BaseModel], header: Sequence[str]):
+        lookup: Dict[str, str] = {}
+        for name, field in model_class.model_fields.items():
+            lookup[name] = name
+            if field.description:
+                lookup.setdefault(field.description, name)
+        self.fields: List[Optional[str]] = [lookup.get(str(title).strip()) for title in header]
+
+        missing = [
+            field.description or name for name, field in model_class.model_fields.items()
+            if field.is_required() and name not in self.fields
+        ]
+        if missing:
+            raise ImportFormatError(f"Missing required columns: {', '.join(missing)}")
+        self.converters = {
+            name: _converter(field.annotation) for name, field in model_class.model_fields.items()
+        }
+
+    def to_data(self, row: Sequence[str]) -> Dict[str, Any]:
+        """将一行单元格转换为模型字段字典，空单元格不传入以使用字段默认值"""
+        data: Dict[str, Any] = {}
+        for field, value in zip(self.fields, row):
+            if field is None:
+                continue
+            value = value.strip()
+            if not value:
+                continue
+            converter = self.converters[field]
+            data[field] = converter(value) if converter else value
+        return data
@@ -0,0 +1,94 @@
+# 游标（keyset）分页工具
+# 游标记录上一页最后一条记录的 (排序字段值, 记录ID)，下一页从该位置之后继续读取，
+# 与 offset 分页不同，翻页代价与历史数据量无关
+import base64
+import json
+from typing import Any, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+
+# 默认每页数量
+DEFAULT_PAGE_LIMIT = 100
+# 每页最大数量
+MAX_PAGE_LIMIT = 1000
+# 下一页游标的响应头
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无效异常"""
+    pass
+
+
+class PageCursor:
+    """解码后的分页游标"""
+
+    def __init__(self, order_by: str, descending: bool, value: Any, record_id: str):
+        self.order_by = order_by
+        self.descending = descending
+        # 排序字段值，使用文档中的JSON表示（日期为ISO字符串）
+        self.value = value
+        self.record_id = record_id
+
+    def encode(self) -> str:
+        """编码为不透明的URL安全字符串"""
+        payload = json.dumps(
+            {"o": self.order_by, "d": self.descending, "v": self.value, "i": self.record_id},
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str) -> "PageCursor":
+        """解码游标字符串"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+            return cls(payload["o"], bool(payload["d"]), payload["v"], str(payload["i"]))
+        except (ValueError, KeyError, TypeError, UnicodeError) as e:
+            raise InvalidCursorError(f"无效的分页游标: {cursor}") from e
+
+    def check(self, order_by: str, descending: bool) -> None:
+        """校验游标与当前查询的排序方式一致"""
+        if self.order_by != order_by or self.descending != descending:
+            raise InvalidCursorError("分页游标与当前查询的排序方式不一致")
+
+    def position(self) -> Tuple[Any, str]:
+        return self.value, self.record_id
+
+
+class Page(list):
+    """一页查询结果
+
+    本身是记录列表，原有按列表使用的调用方无需改动；next_cursor 为下一页游标，没有更多数据时为None
+    """
+
+    def __init__(self, items: Iterable[Any] = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+class PageParams:
+    """列表接口的分页查询参数，作为路由依赖使用"""
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT, description="每页数量"),
+        cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        if cursor:
+            try:
+                PageCursor.decode(cursor)
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def with_next_cursor(response: Response, page: Any) -> Any:
+    """将下一页游标写入响应头，返回原结果"""
+    next_cursor = getattr(page, "next_cursor", None)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return page
@@ -0,0 +1,110 @@
+# 进程内发布订阅
+# 业务线程（同步接口、后台任务）发布事件，WebSocket/SSE 连接在事件循环中订阅；
+# 每个订阅有独立的有界队列，消费慢的订阅丢弃最旧的事件并记录丢弃数，不阻塞发布方和其他订阅
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+# 每个订阅最多积压的事件数
+DEFAULT_MAX_PENDING = 100
+
+
+class Subscription:
+    """单个订阅，push 可在任意线程调用，get 在订阅所属的事件循环中等待"""
+
+    def __init__(self, hub: "PubSubHub", topic: str, loop: asyncio.AbstractEventLoop,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        self.hub = hub
+        self.topic = topic
+        self.loop = loop
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event()
+        self._wakeup_scheduled = False
+        # 队列已满被丢弃的事件数，下次读取时告知订阅方
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, event: Dict[str, Any]) -> None:
+        """加入事件，队列满时丢弃最旧的事件"""
+        with self._lock:
+            if self.closed:
+                return
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(event)
+            if self._wakeup_scheduled:
+                return
+            self._wakeup_scheduled = True
+        try:
+            self.loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # 事件循环已关闭，连接已断开
+            self.close()
+
+    async def get(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """等待并取出积压的全部事件，超时返回空列表；有事件被丢弃时首个事件为 lagged"""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        with self._lock:
+            self._ready.clear()
+            self._wakeup_scheduled = False
+            events = list(self._pending)
+            self._pending.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            events.insert(0, {"type": "lagged", "dropped": dropped})
+        return events
+
+    def close(self) -> None:
+        """取消订阅"""
+        with self._lock:
+            self.closed = True
+            self._pending.clear()
+        self.hub.unsubscribe(self)
+
+
+class PubSubHub:
+    """按主题分发事件"""
+
+    def __init__(self):
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str, max_pending: int = DEFAULT_MAX_PENDING) -> Subscription:
+        """订阅主题，需在事件循环中调用"""
+        subscription = Subscription(self, topic, asyncio.get_running_loop(), max_pending)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._topics.get(subscription.topic)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> int:
+        """向主题的全部订阅发布事件，返回订阅数；无订阅时不做任何处理"""
+        subscriptions = self._topics.get(topic)
+        if not subscriptions:
+            return 0
+        with self._lock:
+            subscriptions = list(self._topics.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+        return len(subscriptions)
+
+    def subscriber_count(self, topic: str) -> int:
+        """主题当前的订阅数"""
+        return len(self._topics.get(topic, ()))
+
+
+# 创建实例供导入使用
+pubsub_hub = PubSubHub()
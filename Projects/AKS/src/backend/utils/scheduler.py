@@ -0,0 +1,92 @@
+# 定时任务调度
+# 最小堆按执行时间排列任务，后台线程只等待最早到期的任务，不按固定间隔轮询；
+# 同一 key 重新调度时旧任务作废（延迟删除），取消和改期均为O(log n)
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class TimerScheduler:
+    """基于最小堆的定时调度器，回调在调度线程中依次执行"""
+
+    def __init__(self, name: str = "timer-scheduler"):
+        self.name = name
+        self._heap: List[Tuple[datetime, int, str]] = []
+        # key -> (序号, 执行时间, 回调)，堆中序号与之不符的条目已作废
+        self._entries: Dict[str, Tuple[int, datetime, Callable[[], None]]] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def schedule(self, key: str, when: datetime, callback: Callable[[], None]) -> None:
+        """在 when 执行回调，已存在相同 key 的任务时替换；when 已过去时尽快执行"""
+        with self._condition:
+            sequence = next(self._counter)
+            self._entries[key] = (sequence, when, callback)
+            heapq.heappush(self._heap, (when, sequence, key))
+            # 新任务早于当前等待的任务时唤醒调度线程
+            if self._heap[0][1] == sequence:
+                self._condition.notify()
+
+    def cancel(self, key: str) -> bool:
+        """取消任务，返回任务是否存在"""
+        with self._condition:
+            return self._entries.pop(key, None) is not None
+
+    def scheduled_time(self, key: str) -> Optional[datetime]:
+        """获取任务的执行时间，不存在时返回None"""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _next_due(self) -> Optional[Callable[[], None]]:
+        """等待并取出下一个到期任务，停止时返回None"""
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                when, sequence, key = self._heap[0]
+                entry = self._entries.get(key)
+                if entry is None or entry[0] != sequence:
+                    # 已取消或已改期
+                    heapq.heappop(self._heap)
+                    continue
+                delay = (when - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                del self._entries[key]
+                return entry[2]
+            return None
+
+    def _run(self) -> None:
+        while True:
+            callback = self._next_due()
+            if callback is None:
+                return
+            try:
+                callback()
+            except Exception as e:
+                print(f"{self.name} 执行定时任务失败: {e}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# 竞拍者资格检查验证脚本：注册、审核后资格缓存随之更新
+
+import sys
+import os
+import time
+import uuid
+
+# 添加项目路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src/backend'))
+
+from models.basic_info import CreateFarmerInfoRequest
+from models.land_bidding import CreateBidderRegistrationRequest
+from services.basic_info_service import basic_info_service
+from services.land_bidding_service import land_bidding_service
+
+
+def create_farmer():
+    """在测试数据的村队下创建种植户，身份证号随机生成"""
+    village_id = next(iter(basic_info_service.villages_db.keys()))
+    return basic_info_service.create_user(CreateFarmerInfoRequest(
+        farmer_name="资格测试户",
+        id_card_number=uuid.uuid4().hex[:18],
+        phone_number="13800000000",
+        address="测试地址",
+        village_id=village_id,
+        household_size=3,
+        cultivated_area=10.0,
+        main_crops=["小麦"],
+        status=1
+    ))
+
+
+def register(farmer):
+    return land_bidding_service.create_bidder_registration(CreateBidderRegistrationRequest(
+        user_type="承包户",
+        real_name=farmer.farmer_name,
+        id_card_number=farmer.id_card_number,
+        phone_number=farmer.phone_number,
+        address=farmer.address
+    ))
+
+
+def registration_state(farmer_id):
+    result = land_bidding_service.check_bidder_eligibility(farmer_id, "no-such-bidding")
+    return result["has_registration"], result["is_registration_approved"]
+
+
+def test_register_then_approve():
+    """先检查资格（缓存无注册），再按身份证号注册、审核通过，资格检查立即反映"""
+    farmer = create_farmer()
+    assert registration_state(farmer.id) == (False, False)
+
+    registration = register(farmer)
+    assert registration_state(farmer.id) == (True, False)
+
+    assert land_bidding_service.review_bidder(registration.id, approved=True)
+    assert registration_state(farmer.id) == (True, True)
+
+    assert land_bidding_service.review_bidder(registration.id, approved=False)
+    assert registration_state(farmer.id) == (True, False)
+
+
+def test_cache_expires():
+    """其他进程直接修改注册（不经本进程失效）时，缓存过期后读到新的审核结果"""
+    farmer = create_farmer()
+    registration = register(farmer)
+    cache = land_bidding_service.eligibility_cache
+    ttl = cache.ttl
+    cache.ttl = 0.05
+    try:
+        assert registration_state(farmer.id) == (True, False)
+        approved = registration.model_copy(update={"status": "已通过"})
+        land_bidding_service.bidder_registrations_db[registration.id] = approved
+        assert registration_state(farmer.id) == (True, False)
+        time.sleep(0.1)
+        assert registration_state(farmer.id) == (True, True)
+    finally:
+        cache.ttl = ttl
+
+
+def main():
+    """主函数"""
+    tests = [test_register_then_approve, test_cache_expires]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e!r}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())